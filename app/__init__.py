@@ -30,6 +30,10 @@ def create_app():
         app.config.from_object(Config)
         logger.info("Configuration loaded successfully.")
 
+        from app.serialization import init_serialization
+        init_serialization(app)
+        logger.info("Serialization configured successfully.")
+
         db.init_app(app)
         logger.info("Database initialized successfully.")
 
@@ -40,6 +44,48 @@ def create_app():
         app.register_blueprint(auth_bp)
         logger.info("Blueprints registered successfully.")
 
+        from app.tasks import init_tasks
+        init_tasks(app)
+
+        from app.tracing import init_tracing
+        init_tracing(app)
+
+        from app.load_shedding import init_load_shedding
+        init_load_shedding(app)
+
+        from app.idempotency import init_idempotency
+        init_idempotency(app)
+
+        from app.events import init_events
+        init_events(app)
+
+        from app.health import init_health
+        init_health(app)
+
+        from app.models.changelog import configure_changelog
+        configure_changelog(app.config)
+
+        from app.sharding import init_sharding
+        init_sharding(app)
+
+        from app.models.goals import init_goals
+        init_goals(app)
+
+        from app.models.journal import init_journal
+        init_journal(app)
+
+        from app.models.retention import init_retention
+        init_retention(app)
+
+        from app.models.eviction import init_eviction
+        init_eviction(app)
+
+        from app.compression import init_compression
+        init_compression(app)
+
+        from app.commands import init_commands
+        init_commands(app)
+
         logger.info("App initialization completed.")
     except Exception as e:
         logger.error(f"Error during app initialization: {e}")
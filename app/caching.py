@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app, jsonify, request
+from app.serialization import JSON_MIMETYPE, MSGPACK_MIMETYPE, wants_msgpack
+
+logger = logging.getLogger(__name__)
+
+# How long clients and proxies may reuse catalog responses proxied from wger
+CATALOG_MAX_AGE = 300
+
+# Changes on every process start so ETags issued before a restart never match fresh data
+_EPOCH = os.urandom(4).hex()
+
+
+class ResponseCache:
+    """
+    Keeps the last serialized response body per (user, query, format) key.
+
+    Every entry is tagged with the store version it was built from, so an entry
+    is only served while the underlying data has not changed. The cache is a
+    bounded LRU; the least recently used key is dropped once `max_entries` is reached.
+
+    Attributes:
+        max_entries (int): The maximum number of cached responses.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that had to rebuild the response.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """
+        Returns the cached body for a key if it was built from the given version.
+
+        Args:
+            key (tuple): The cache key, usually (kind, user_id, query string, negotiated mimetype).
+            version (int): The current version of the underlying data.
+
+        Returns:
+            tuple: (body, mimetype) if a fresh entry exists, otherwise None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, version, body, mimetype):
+        """
+        Stores a serialized body for a key, replacing any older version.
+
+        Args:
+            key (tuple): The cache key.
+            version (int): The version of the data the body was built from.
+            body (bytes): The serialized response body.
+            mimetype (str): The mimetype of the body.
+        """
+        with self._lock:
+            self._entries[key] = (version, body, mimetype)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every cached entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+response_cache = ResponseCache()
+
+
+def make_etag(kind, user_id, version, variant=b""):
+    """
+    Builds the opaque ETag value for one representation of a user's collection at a given version.
+
+    Args:
+        kind (str): The collection name, e.g. "workouts" or "favorites".
+        user_id (int): The ID of the user.
+        version (int): The collection version.
+        variant (bytes, optional): What else selects the representation, e.g. the query
+            string and negotiated mimetype; it is folded into the tag as a short digest.
+
+    Returns:
+        str: The ETag value (without quotes or the weak prefix).
+    """
+    digest = hashlib.blake2b(variant, digest_size=6).hexdigest()
+    return f"{kind}-{user_id}-{version}-{_EPOCH}-{digest}"
+
+
+def conditional_response(kind, user_id, version, build_payload):
+    """
+    Answers a read of a versioned per-user collection with ETag support.
+
+    If the request carries an `If-None-Match` header matching the current
+    version of the same representation (query string and negotiated format), a
+    304 is returned without calling `build_payload`. Otherwise the last
+    serialized body for this (user, query, format) is reused when still current,
+    and only rebuilt through `build_payload` and `jsonify` when the data changed.
+    Every response carries `Vary: Accept`.
+
+    Args:
+        kind (str): The collection name, used in the ETag and cache key.
+        user_id (int): The ID of the user.
+        version (int): The current version of the user's collection.
+        build_payload (callable): Returns the JSON-serializable payload on a cache miss.
+
+    Returns:
+        Response: A 304 response or a 200 JSON response carrying a weak ETag.
+    """
+    mimetype = MSGPACK_MIMETYPE if wants_msgpack() else JSON_MIMETYPE
+    etag = make_etag(kind, user_id, version, request.query_string + b"|" + mimetype.encode("ascii"))
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        response.vary.add("Accept")
+        return response
+
+    key = (kind, user_id, request.query_string, mimetype)
+    cached = response_cache.get(key, version)
+    if cached is not None:
+        body, mimetype = cached
+        response = current_app.response_class(body, mimetype=mimetype)
+        response.vary.add("Accept")
+    else:
+        response = jsonify(build_payload())
+        response_cache.put(key, version, response.get_data(), response.mimetype)
+        logger.debug(f"Cached {kind} response for user {user_id} at version {version}")
+
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def mark_cacheable(response, max_age=CATALOG_MAX_AGE):
+    """
+    Marks a response as publicly cacheable.
+
+    Shared catalog data is identical for every user, so besides letting clients
+    reuse it, the flag lets the compression layer reuse compressed bodies.
+
+    Args:
+        response (Response): The response to mark.
+        max_age (int, optional): Freshness lifetime in seconds.
+
+    Returns:
+        Response: The same response, for chaining.
+    """
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def mark_stale(response, age):
+    """
+    Marks a response as served from the last known good upstream data.
+
+    The `Age` header tells clients how old the data is, and `no-cache` keeps
+    them from reusing it once the upstream recovers.
+
+    Args:
+        response (Response): The response to mark.
+        age (float): Seconds since the data was fetched.
+
+    Returns:
+        Response: The same response, for chaining.
+    """
+    response.headers["Age"] = str(int(age))
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for calls to one upstream endpoint.
+
+    While closed, the outcomes of the last `window` calls are kept; once at
+    least `min_calls` were made and the share of failures reaches
+    `failure_rate`, the breaker opens and refuses calls without trying them.
+    After `reset_timeout` seconds it lets up to `half_open_calls` trial calls
+    through: a success closes it, a failure opens it again.
+
+    Attributes:
+        name (str): The endpoint the breaker guards, used in monitoring.
+        opened (int): How many times the breaker has opened.
+        rejected (int): How many calls were refused.
+    """
+
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=5, reset_timeout=30.0, half_open_calls=1,
+                 clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.opened = 0
+        self.rejected = 0
+        self._clock = clock
+        self._outcomes = deque(maxlen=window)  # True for success
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """The current state: "closed", "open" or "half_open"."""
+        with self._lock:
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        Decides whether a call may be attempted.
+
+        Every allowed call must be followed by `record_success` or `record_failure`.
+
+        Returns:
+            bool: False if the circuit is open and the call should fail fast.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state, self._trials = HALF_OPEN, 0
+                logger.info(f"Circuit {self.name} half-open, trying the upstream again")
+            if self._state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self._trials += 1
+            return True
+
+    def record_success(self):
+        """Records a successful call, closing a half-open circuit."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+                logger.info(f"Circuit {self.name} closed")
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """Records a failed call, opening the circuit if the failure rate is too high."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self.opened += 1
+        logger.warning(f"Circuit {self.name} opened for {self.reset_timeout}s")
+
+    def retry_after(self):
+        """
+        Returns the seconds until the breaker lets a trial call through.
+
+        Returns:
+            float: 0 unless the circuit is open.
+        """
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self._clock() - self._opened_at))
+
+    def snapshot(self):
+        """
+        Returns the breaker's state for monitoring.
+
+        Returns:
+            dict: {"state", "calls", "failures", "opened", "rejected", "retry_after"}.
+        """
+        state, retry_after = self.state, self.retry_after()
+        with self._lock:
+            return {"state": state, "calls": len(self._outcomes), "failures": self._outcomes.count(False),
+                    "opened": self.opened, "rejected": self.rejected, "retry_after": round(retry_after, 3)}
+
+    def reset(self):
+        """Closes the circuit and forgets recorded outcomes."""
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._trials = 0
+
+
+class LastKnownGood:
+    """
+    The most recent successful response per key, served while the upstream is failing.
+
+    Keys are kept in least-recently-updated order and the oldest are evicted
+    beyond `max_entries`.
+
+    Attributes:
+        max_entries (int): The number of keys kept.
+    """
+
+    def __init__(self, max_entries=256, clock=time.time):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # {key: (value, stored_at)}
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        """Stores a successful response for a key."""
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        """
+        Returns the last successful response for a key.
+
+        Args:
+            key (hashable): The request's filter key.
+
+        Returns:
+            tuple: (value, age in seconds), or None if nothing was stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, stored_at = entry
+        return value, max(0.0, self._clock() - stored_at)
+
+    def clear(self):
+        """Drops every stored response."""
+        with self._lock:
+            self._entries.clear()
+
+
+breakers = {}  # {endpoint name: CircuitBreaker}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(name, **settings):
+    """
+    Returns the process-wide breaker of an endpoint, creating it on first use.
+
+    Args:
+        name (str): The endpoint name, e.g. "wger:exercise".
+        **settings: CircuitBreaker arguments, used only when the breaker is created.
+
+    Returns:
+        CircuitBreaker: The endpoint's breaker.
+    """
+    with _breakers_lock:
+        if name not in breakers:
+            breakers[name] = CircuitBreaker(name, **settings)
+        return breakers[name]
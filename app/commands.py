@@ -0,0 +1,126 @@
+import gzip
+import logging
+import sys
+import threading
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.models.provisioning import FORMATS as USER_FORMATS, parse_users, provision_users
+from app.models.transfer import InvalidRow, export_workouts, import_workouts, parse_rows
+
+logger = logging.getLogger(__name__)
+
+workouts_cli = AppGroup('workouts', help="Bulk export and import of workout history.")
+users_cli = AppGroup('users', help="Bulk account management.")
+shards_cli = AppGroup('shards', help="Sharded in-memory store.")
+
+
+def _require_journal():
+    """Fails unless workouts are journaled, so the command reads and writes what the server recovers."""
+    from app.models import workout
+
+    if workout.journal is None:
+        raise click.ClickException("Workout export and import need WORKOUT_JOURNAL_DIR (and no sharding): "
+                                   "without a journal the workouts only live in a server's memory")
+
+
+def _open_text(path, mode):
+    """Opens a path as text, transparently handling .gz files and '-' for stdin/stdout."""
+    if path == '-':
+        return sys.stdout if 'w' in mode else sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+@workouts_cli.command('export')
+@click.argument('user_id', type=int)
+@click.argument('output', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--start-date', default=None, help="Only export workouts from this date (YYYY-MM-DD).")
+@click.option('--end-date', default=None, help="Only export workouts up to this date (YYYY-MM-DD).")
+def export_command(user_id, output, fmt, start_date, end_date):
+    """
+    Export USER_ID's workouts to OUTPUT (a path, '.gz' for gzip, or '-' for stdout).
+
+    Reads the journal in WORKOUT_JOURNAL_DIR, which must not be in use by a running server.
+    """
+    _require_journal()
+    out = _open_text(output, 'w')
+    try:
+        for chunk in export_workouts(user_id, fmt, start_date, end_date):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+@workouts_cli.command('import')
+@click.argument('user_id', type=int)
+@click.argument('source', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--batch-size', default=5000, show_default=True)
+def import_command(user_id, source, fmt, batch_size):
+    """
+    Import workouts for USER_ID from SOURCE (a path, '.gz' for gzip, or '-' for stdin).
+
+    Writes to the journal in WORKOUT_JOURNAL_DIR, which must not be in use by a running
+    server; the server recovers the imported workouts when it next starts.
+    """
+    _require_journal()
+    stream = _open_text(source, 'r')
+    try:
+        imported = import_workouts(user_id, parse_rows(stream, fmt), batch_size=batch_size)
+    except InvalidRow as e:
+        raise click.ClickException(f"{e}; the {e.imported} rows before it were imported")
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    click.echo(f"Imported {imported} workouts for user {user_id}")
+
+
+@users_cli.command('provision')
+@click.argument('source', default='-')
+@click.option('--format', 'fmt', type=click.Choice(USER_FORMATS), default='ndjson')
+@click.option('--batch-size', type=int, default=None, help="Users per insert; defaults to PROVISION_BATCH_SIZE.")
+@click.option('--workers', type=int, default=None, help="Hashing processes; defaults to PROVISION_WORKERS.")
+def provision_command(source, fmt, batch_size, workers):
+    """Create accounts from SOURCE (a path, '.gz' for gzip, or '-' for stdin)."""
+    stream = _open_text(source, 'r')
+    try:
+        result = provision_users(parse_users(stream, fmt),
+                                 batch_size=batch_size or current_app.config['PROVISION_BATCH_SIZE'],
+                                 workers=workers if workers is not None else current_app.config['PROVISION_WORKERS'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    click.echo(f"Created {result['created']} accounts, skipped {len(result['conflicts'])} existing usernames")
+
+
+@shards_cli.command('serve')
+def serve_shards_command():
+    """Start SHARD_COUNT shard processes and keep them running for other web workers."""
+    cluster = current_app.extensions.get('shard_cluster')
+    if cluster is None:
+        raise click.ClickException("Set SHARD_COUNT above 0 with SHARD_SPAWN=1 to serve shards")
+    click.echo(f"Serving {len(cluster)} shards in {cluster.socket_dir}; press Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        cluster.stop()
+
+
+def init_commands(app):
+    """
+    Registers the application's Flask CLI command groups.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    app.cli.add_command(workouts_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(shards_cli)
@@ -0,0 +1,235 @@
+import functools
+import hashlib
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = {
+    "application/json",
+    "application/msgpack",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "text/csv",
+    "text/html",
+    "text/plain",
+    "text/xml",
+}
+
+
+def available_encodings():
+    """
+    Lists the content encodings usable in this process, most preferred first.
+
+    Returns:
+        list: Encoding names; "gzip" is always available, "zstd" and "br" only
+        when the optional `zstandard` and `brotli` packages are installed.
+    """
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def compress(data, encoding, level):
+    """
+    Compresses a complete body with the given encoding.
+
+    Args:
+        data (bytes): The body to compress.
+        encoding (str): One of "gzip", "zstd" or "br".
+        level (int): The compression level; clamped to the codec's range.
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=min(level, 22)).compress(data)
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding, level):
+    """
+    Compresses an iterable of chunks incrementally.
+
+    Each chunk is flushed as soon as it is compressed, so clients of streamed
+    responses keep receiving data as it is produced.
+
+    Args:
+        chunks (iterable): The body chunks, as bytes or str.
+        encoding (str): One of "gzip", "zstd" or "br".
+        level (int): The compression level.
+
+    Yields:
+        bytes: Compressed output.
+    """
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=min(level, 22)).compressobj()
+        process = compressor.compress
+        flush = functools.partial(compressor.flush, zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        finish = compressor.flush
+    elif encoding == "br":
+        compressor = brotli.Compressor(quality=min(level, 11))
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(min(level, 9), zlib.DEFLATED, 31)
+        process = compressor.compress
+        flush = functools.partial(compressor.flush, zlib.Z_SYNC_FLUSH)
+        finish = compressor.flush
+
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            output = process(chunk) + flush()
+            if output:
+                yield output
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+class CompressedBodyCache:
+    """
+    Bounded LRU of compressed bodies keyed by a digest of the uncompressed payload.
+
+    Used for cacheable catalog responses so identical payloads are compressed only once.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compress(self, data, encoding, level):
+        """
+        Returns the compressed form of a body, compressing it only on a cache miss.
+
+        Args:
+            data (bytes): The uncompressed body.
+            encoding (str): The content encoding.
+            level (int): The compression level.
+
+        Returns:
+            bytes: The compressed body.
+        """
+        key = (encoding, level, hashlib.blake2b(data, digest_size=16).digest())
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compressed
+            self.misses += 1
+
+        compressed = compress(data, encoding, level)
+        with self._lock:
+            self._entries[key] = compressed
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compressed
+
+    def clear(self):
+        """Drops every cached body and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+compressed_cache = CompressedBodyCache()
+
+
+def negotiate_encoding(accept_encodings, encodings):
+    """
+    Picks the best content encoding the client accepts.
+
+    Args:
+        accept_encodings (werkzeug.datastructures.Accept): The parsed Accept-Encoding header.
+        encodings (list): Server-supported encodings in preference order.
+
+    Returns:
+        str: The chosen encoding, or None if the client accepts none of them.
+    """
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def init_compression(app):
+    """
+    Registers the response compression layer on the application.
+
+    Configuration keys:
+        COMPRESS_ENABLED (bool): Turns the layer on or off.
+        COMPRESS_MIN_SIZE (int): Bodies smaller than this many bytes are sent as is.
+        COMPRESS_LEVEL (int): The compression level passed to the codec.
+        COMPRESS_ALGORITHMS (list): Allowed encodings in preference order.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    encodings = [e for e in app.config.get("COMPRESS_ALGORITHMS", available_encodings())
+                 if e in available_encodings()]
+
+    @app.after_request
+    def compress_response(response):
+        if not app.config.get("COMPRESS_ENABLED", True):
+            return response
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if "Content-Encoding" in response.headers or response.direct_passthrough:
+            return response
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = negotiate_encoding(request.accept_encodings, encodings)
+        if encoding is None:
+            return response
+        level = app.config.get("COMPRESS_LEVEL", 6)
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding, level)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < app.config.get("COMPRESS_MIN_SIZE", 500):
+                return response
+            if response.cache_control.public:
+                response.set_data(compressed_cache.get_or_compress(data, encoding, level))
+            else:
+                response.set_data(compress(data, encoding, level))
+
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    logger.info(f"Response compression enabled with encodings: {encodings}")
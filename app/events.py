@@ -0,0 +1,241 @@
+import logging
+import threading
+from collections import deque
+from app.signals import favorite_removed, favorite_saved, goals_updated, workout_logged
+
+logger = logging.getLogger(__name__)
+
+# Optional EventHub attached by init_events; the signal receivers below publish to it
+hub = None
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when a stream is opened while the hub already has its maximum of subscribers."""
+
+
+class Subscription:
+    """
+    The queue of events waiting to be written to one open stream.
+
+    A subscription is only a bounded deque and an Event, so idle subscribers
+    cost no thread. If the stream falls `buffer_size` events behind, it is
+    dropped: its buffer is discarded and `get` reports the end of the stream,
+    and the client resumes from its Last-Event-ID when it reconnects.
+
+    Attributes:
+        user_ids (frozenset): The users whose events the stream receives.
+        dropped (bool): Whether the subscriber was dropped for falling behind.
+    """
+
+    def __init__(self, user_ids, buffer_size):
+        self.user_ids = frozenset(user_ids)
+        self.dropped = False
+        self._buffer_size = buffer_size
+        self._events = deque()
+        self._ready = threading.Event()
+
+    def _push(self, entry):
+        # Called with the hub lock held
+        if len(self._events) >= self._buffer_size:
+            self.dropped = True
+            self._events.clear()
+        else:
+            self._events.append(entry)
+        self._ready.set()
+
+    def get(self, timeout):
+        """
+        Waits for pending events.
+
+        Args:
+            timeout (float): Seconds to wait before returning an empty list.
+
+        Returns:
+            list: (event_id, user_id, event, data) tuples in publication order, or None once
+            the subscriber was dropped.
+        """
+        self._ready.wait(timeout)
+        self._ready.clear()
+        if self.dropped:
+            return None
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+
+class EventHub:
+    """
+    In-process publish/subscribe of per-user events for server-sent event streams.
+
+    Every event gets an ID from one increasing counter and is kept in a bounded
+    history, so a reconnecting client can resume after the last ID it saw.
+    When the missed events are no longer in the history, or there are more
+    than fit its buffer, the client gets a single "reset" event telling it to
+    refetch its state instead. So does a client whose last ID is ahead of the
+    counter: the IDs were issued by an earlier process, which restarts at 0.
+
+    Each open stream holds a server worker for as long as it is connected, so
+    `max_subscribers` should stay below the server's worker threads to leave
+    some for other requests.
+
+    Attributes:
+        buffer_size (int): Events a subscriber may fall behind before it is dropped.
+        max_subscribers (int): Streams allowed at once.
+        published (int): Events published.
+        dropped (int): Subscribers dropped for falling behind.
+    """
+
+    def __init__(self, buffer_size=256, history_size=10000, max_subscribers=16):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self.published = 0
+        self.dropped = 0
+        self._last_id = 0
+        self._history = deque(maxlen=history_size)  # [(event_id, user_id, event, data)]
+        self._subscribers = {}  # {user_id: {Subscription}}
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, event, data):
+        """
+        Sends an event to every stream subscribed to a user.
+
+        Args:
+            user_id (int): The user the event is about.
+            event (str): The event name, e.g. "workout".
+            data (dict): The JSON-serializable payload; it must not be modified afterwards.
+
+        Returns:
+            int: The event's ID.
+        """
+        with self._lock:
+            self._last_id += 1
+            entry = (self._last_id, user_id, event, data)
+            self._history.append(entry)
+            self.published += 1
+            for subscription in list(self._subscribers.get(user_id, ())):
+                subscription._push(entry)
+                if subscription.dropped:
+                    self._remove(subscription)
+                    self.dropped += 1
+                    logger.warning(f"Dropped slow event stream for users {sorted(subscription.user_ids)}")
+            return self._last_id
+
+    def subscribe(self, user_ids, last_event_id=None):
+        """
+        Opens a subscription to the events of some users.
+
+        Args:
+            user_ids (iterable): The IDs of the users to follow.
+            last_event_id (int, optional): The last event ID the client received; later
+                events for the users are queued first.
+
+        Returns:
+            Subscription: The new subscription; pass it to `unsubscribe` when the stream closes.
+
+        Raises:
+            SubscriberLimitReached: If `max_subscribers` streams are already open.
+        """
+        subscription = Subscription(user_ids, self.buffer_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise SubscriberLimitReached(f"{self._count} event streams are open")
+            if last_event_id is not None and last_event_id != self._last_id:
+                self._replay(subscription, last_event_id)
+            for user_id in subscription.user_ids:
+                self._subscribers.setdefault(user_id, set()).add(subscription)
+            self._count += 1
+        return subscription
+
+    def _replay(self, subscription, last_event_id):
+        if last_event_id > self._last_id:
+            subscription._push((self._last_id, None, "reset", {}))
+            return
+        oldest = self._history[0][0] if self._history else self._last_id + 1
+        missed = []
+        if oldest <= last_event_id + 1:
+            for entry in reversed(self._history):
+                if entry[0] <= last_event_id:
+                    break
+                if entry[1] in subscription.user_ids:
+                    missed.append(entry)
+        if oldest > last_event_id + 1 or len(missed) > self.buffer_size:
+            subscription._push((self._last_id, None, "reset", {}))
+            return
+        for entry in reversed(missed):
+            subscription._push(entry)
+
+    def unsubscribe(self, subscription):
+        """Closes a subscription; closing one twice is harmless."""
+        with self._lock:
+            self._remove(subscription)
+
+    def _remove(self, subscription):
+        removed = False
+        for user_id in subscription.user_ids:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self._subscribers[user_id]
+        if removed:
+            self._count -= 1
+
+    def stats(self):
+        """
+        Returns the hub's counters.
+
+        Returns:
+            dict: {"subscribers", "last_event_id", "published", "dropped"}.
+        """
+        with self._lock:
+            return {"subscribers": self._count, "last_event_id": self._last_id,
+                    "published": self.published, "dropped": self.dropped}
+
+
+@workout_logged.connect
+def _on_workout_logged(sender, user_id, workout, **extra):
+    if hub is not None:
+        hub.publish(user_id, "workout", {"user_id": user_id, "workout": workout})
+
+
+@favorite_saved.connect
+def _on_favorite_saved(sender, user_id, exercise, **extra):
+    if hub is not None:
+        hub.publish(user_id, "favorite", {"user_id": user_id, "exercise": exercise})
+
+
+@favorite_removed.connect
+def _on_favorite_removed(sender, user_id, exercise_id, **extra):
+    if hub is not None:
+        hub.publish(user_id, "favorite_removed", {"user_id": user_id, "exercise_id": exercise_id})
+
+
+@goals_updated.connect
+def _on_goals_updated(sender, user_id, goals, **extra):
+    if hub is not None:
+        hub.publish(user_id, "goals", {"user_id": user_id, "goals": goals})
+
+
+def init_events(app):
+    """
+    Creates the event hub behind /stream.
+
+    Configuration keys:
+        STREAM_BUFFER_SIZE (int): Events a stream may fall behind before it is dropped.
+        STREAM_HISTORY_SIZE (int): Recent events kept for Last-Event-ID resumption.
+        STREAM_MAX_SUBSCRIBERS (int): Streams allowed at once per process; each holds a server worker.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        EventHub: The attached hub.
+    """
+    global hub
+    hub = EventHub(app.config.get("STREAM_BUFFER_SIZE", 256), app.config.get("STREAM_HISTORY_SIZE", 10000),
+                   app.config.get("STREAM_MAX_SUBSCRIBERS", 16))
+    app.extensions["events"] = hub
+    return hub
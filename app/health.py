@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+import requests
+from flask import current_app
+from sqlalchemy import text
+from app.tasks import PRIORITY_HIGH, task
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProbes:
+    """
+    Dependency checks run in the background, with the latest results cached.
+
+    Readiness requests only read the cache, so they answer in constant time even
+    while a dependency hangs. Probe rounds start on the first read, as a periodic
+    task of `runner` or, without one, on a thread of their own.
+
+    Attributes:
+        interval (float): Seconds between probe rounds.
+        runner (TaskRunner): The app's task runner, or None.
+    """
+
+    def __init__(self, interval=10.0, runner=None):
+        self.interval = interval
+        self.runner = runner
+        self._probes = {}  # {name: (check, required)}
+        self._results = {}  # {name: {"ok", "required", "latency_ms", "checked_at", "error"}}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def register(self, name, check, required=True):
+        """
+        Adds a probe.
+
+        Args:
+            name (str): The name reported in results.
+            check (callable): Raises on failure; its return value is ignored.
+            required (bool, optional): Whether a failure makes the app not ready.
+        """
+        self._probes[name] = (check, required)
+
+    def run_once(self):
+        """Runs every probe once and stores the results."""
+        for name, (check, required) in self._probes.items():
+            started = time.monotonic()
+            try:
+                check()
+                error = None
+            except Exception as e:
+                error = str(e)
+                logger.warning(f"Health probe {name} failed: {error}")
+            result = {"ok": error is None, "required": required,
+                      "latency_ms": round((time.monotonic() - started) * 1000, 1),
+                      "checked_at": time.time(), "error": error}
+            with self._lock:
+                self._results[name] = result
+
+    def _run(self):
+        # Used instead of the task runner when TASK_WORKERS=0
+        while True:
+            self.run_once()
+            time.sleep(self.interval)
+
+    def start(self):
+        """Starts the probe rounds unless they already run."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        if self.runner is not None:
+            try:
+                self.runner.schedule("health.probe", self.interval, delay=0)
+                return
+            except RuntimeError as e:
+                logger.warning(f"Running health probes on their own thread: {e}")
+        threading.Thread(target=self._run, name="health-probes", daemon=True).start()
+
+    def status(self):
+        """
+        Returns the cached readiness, starting the probe rounds if needed.
+
+        Returns:
+            tuple: (ready, results). Not ready until every required probe has
+            passed in its latest round.
+        """
+        self.start()
+        with self._lock:
+            results = {name: dict(result) for name, result in self._results.items()}
+        ready = all(name in results and results[name]["ok"]
+                    for name, (_, required) in self._probes.items() if required)
+        return ready, results
+
+
+@task("health.probe", priority=PRIORITY_HIGH)
+def run_probes():
+    """Runs one round of the current app's health probes."""
+    current_app.extensions["health_probes"].run_once()
+
+
+def init_health(app):
+    """
+    Registers the database and wger probes behind `/health/ready`.
+
+    Configuration keys:
+        HEALTH_PROBE_INTERVAL (float): Seconds between probe rounds.
+        HEALTH_PROBE_TIMEOUT (float): Timeout of the wger request.
+        HEALTH_REQUIRE_UPSTREAM (bool): Whether a failing wger API makes the app not ready.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        HealthProbes: The registered probes.
+    """
+    from app import db
+    from app.models.recommendations import WGER_API_HEADERS, WGER_API_URL
+
+    probes = HealthProbes(app.config.get("HEALTH_PROBE_INTERVAL", 10.0), runner=app.extensions.get("tasks"))
+    timeout = app.config.get("HEALTH_PROBE_TIMEOUT", 2.0)
+
+    def check_database():
+        with app.app_context():
+            db.session.execute(text("SELECT 1"))
+            db.session.remove()
+
+    def check_wger():
+        response = requests.get(WGER_API_URL, headers=WGER_API_HEADERS, params={"limit": 1}, timeout=timeout)
+        response.raise_for_status()
+
+    probes.register("database", check_database)
+    probes.register("wger", check_wger, required=app.config.get("HEALTH_REQUIRE_UPSTREAM", False))
+    app.extensions["health_probes"] = probes
+    return probes
@@ -0,0 +1,253 @@
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, jsonify, make_response, request
+from app.serialization import wants_msgpack
+
+logger = logging.getLogger(__name__)
+
+# Longest Idempotency-Key accepted, so keys cannot be used to inflate the cache
+MAX_KEY_LENGTH = 255
+
+# Rough per-entry bookkeeping cost added to the key and body sizes when enforcing the byte budget
+ENTRY_OVERHEAD = 200
+
+# Keys the request fingerprints, so stored digests of bodies carrying passwords cannot be brute-forced
+_FINGERPRINT_KEY = os.urandom(16)
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an Idempotency-Key is sent again with a different request."""
+
+
+class IdempotencyInProgress(Exception):
+    """Raised when a request with the same key is still running after the wait timeout."""
+
+
+class IdempotencyCache:
+    """
+    Bounded store of the responses to requests carrying an Idempotency-Key.
+
+    The first request with a key reserves it and runs; duplicates arriving
+    meanwhile wait for it to finish and are answered with its stored response.
+    Entries expire `ttl` seconds after they are stored, and the oldest are
+    evicted early once `max_entries` or `max_bytes` would be exceeded. Since
+    every entry lives for the same time, insertion order is also expiry order.
+
+    Attributes:
+        ttl (float): Seconds a stored response is replayed for.
+        max_entries (int): The maximum number of stored responses.
+        max_bytes (int): The approximate memory budget for stored responses.
+        hits (int): Requests answered from a stored response.
+        misses (int): Requests that were executed.
+        evicted (int): Entries dropped to stay within the budget before they expired.
+    """
+
+    def __init__(self, ttl=86400, max_entries=10000, max_bytes=8 * 1024 * 1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._clock = clock
+        self._entries = OrderedDict()  # {key: (fingerprint, status, headers, body, size, expires_at)}
+        self._pending = {}  # {key: fingerprint} of requests still running
+        self._bytes = 0
+        self._condition = threading.Condition()
+
+    def begin(self, key, fingerprint, timeout):
+        """
+        Looks up a key, reserving it if no response is stored yet.
+
+        Args:
+            key (tuple): The request's method, path, client, user and format, then its Idempotency-Key.
+            fingerprint (bytes): Digest of the request's query string and body.
+            timeout (float): Seconds to wait for a running request with the same key.
+
+        Returns:
+            tuple: The stored (status, headers, body), or None if the caller now holds
+            the key and must call `finish` once it has a response.
+
+        Raises:
+            IdempotencyKeyReused: If the key was used with a different request.
+            IdempotencyInProgress: If the running request did not finish in time.
+        """
+        deadline = self._clock() + timeout
+        with self._condition:
+            while True:
+                self._expire()
+                entry = self._entries.get(key)
+                pending = self._pending.get(key)
+                stored = entry[0] if entry is not None else pending
+                if stored is not None and stored != fingerprint:
+                    raise IdempotencyKeyReused(key[-1])
+                if entry is not None:
+                    self.hits += 1
+                    return entry[1:4]
+                if pending is None:
+                    self._pending[key] = fingerprint
+                    self.misses += 1
+                    return None
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    raise IdempotencyInProgress(key[-1])
+                self._condition.wait(remaining)
+
+    def finish(self, key, status=None, headers=(), body=b""):
+        """
+        Releases a key reserved by `begin`, storing the response to replay.
+
+        Args:
+            key (tuple): The key passed to `begin`.
+            status (int, optional): The response status, or None to store nothing and let
+                a retry run the request again.
+            headers (list, optional): (name, value) pairs to replay.
+            body (bytes, optional): The response body.
+        """
+        with self._condition:
+            fingerprint = self._pending.pop(key)
+            if status is not None:
+                size = ENTRY_OVERHEAD + len(body) + sum(len(str(part)) for part in key) + \
+                    sum(len(name) + len(value) for name, value in headers)
+                if size <= self.max_bytes:
+                    self._entries[key] = (fingerprint, status, headers, body, size, self._clock() + self.ttl)
+                    self._bytes += size
+                    self._expire()
+                else:
+                    logger.warning(f"Response of {size} bytes exceeds the idempotency budget; not stored")
+            self._condition.notify_all()
+
+    def _expire(self):
+        now = self._clock()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            over_budget = len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            if entry[5] > now and not over_budget:
+                break
+            self._entries.popitem(last=False)
+            self._bytes -= entry[4]
+            if over_budget and entry[5] > now:
+                self.evicted += 1
+
+    def stats(self):
+        """
+        Returns the cache's size and counters.
+
+        Returns:
+            dict: {"entries", "bytes", "max_entries", "max_bytes", "in_flight", "hits", "misses", "evicted"}.
+        """
+        with self._condition:
+            self._expire()
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_entries": self.max_entries,
+                    "max_bytes": self.max_bytes, "in_flight": len(self._pending), "hits": self.hits,
+                    "misses": self.misses, "evicted": self.evicted}
+
+    def clear(self):
+        """Drops every stored response and resets the counters."""
+        with self._condition:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evicted = 0
+
+
+def _error(message, status):
+    response = jsonify({"status": "error", "message": message})
+    response.status_code = status
+    return response
+
+
+def _scope():
+    # Keys are only unique per client: scope them to the caller's credentials and user,
+    # and to the response encoding so a JSON retry is never answered with MessagePack
+    authorization = request.headers.get("Authorization", "").encode("utf-8")
+    client = hashlib.blake2b(authorization, key=_FINGERPRINT_KEY, digest_size=8).hexdigest() if authorization else None
+    user_id = request.args.get("user_id")
+    if user_id is None:
+        body = request.get_json(silent=True)
+        user_id = body.get("user_id") if isinstance(body, dict) else None
+    return client, None if user_id is None else str(user_id), wants_msgpack()
+
+
+def idempotent(view):
+    """
+    Lets clients retry a write route safely by sending an `Idempotency-Key` header.
+
+    The first response to each key is stored, unless it is a server error, and
+    replayed with an `Idempotent-Replayed: true` header for retries carrying
+    the same key, query string and body, without running the view again.
+    Keys are scoped to the caller's Authorization header, the request's
+    user_id and the negotiated response format.
+    Reusing a key with a different request is answered with 422. Requests
+    without the header, or while the cache is disabled, run as usual.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = current_app.extensions.get("idempotency")
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if cache is None or idempotency_key is None:
+            return view(*args, **kwargs)
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            return _error(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters", 400)
+
+        key = (request.method, request.path, *_scope(), idempotency_key)
+        fingerprint = hashlib.blake2b(request.query_string + b"?" + request.get_data(), key=_FINGERPRINT_KEY,
+                                      digest_size=16).digest()
+        try:
+            stored = cache.begin(key, fingerprint, current_app.config.get("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+        except IdempotencyKeyReused:
+            return _error("Idempotency-Key was already used with a different request", 422)
+        except IdempotencyInProgress:
+            response = _error("A request with this Idempotency-Key is still in progress", 409)
+            response.headers["Retry-After"] = "1"
+            return response
+
+        if stored is not None:
+            status, headers, body = stored
+            response = current_app.response_class(body, status=status, headers=headers)
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except BaseException:
+            cache.finish(key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            cache.finish(key)
+        else:
+            headers = [(name, value) for name, value in response.headers if name != "Content-Length"]
+            cache.finish(key, response.status_code, headers, response.get_data())
+        return response
+
+    return wrapper
+
+
+def init_idempotency(app):
+    """
+    Creates the cache behind the `idempotent` routes.
+
+    Configuration keys:
+        IDEMPOTENCY_TTL (float): Seconds a response is replayed for.
+        IDEMPOTENCY_MAX_ENTRIES (int): Stored responses kept at most; 0 disables idempotency keys.
+        IDEMPOTENCY_MAX_BYTES (int): Approximate memory budget of the stored responses.
+        IDEMPOTENCY_WAIT_TIMEOUT (float): Seconds a duplicate waits for the original request.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        IdempotencyCache: The cache, or None when disabled.
+    """
+    max_entries = app.config.get("IDEMPOTENCY_MAX_ENTRIES", 10000)
+    if max_entries <= 0:
+        return None
+    cache = IdempotencyCache(app.config.get("IDEMPOTENCY_TTL", 86400), max_entries,
+                             app.config.get("IDEMPOTENCY_MAX_BYTES", 8 * 1024 * 1024))
+    app.extensions["idempotency"] = cache
+    logger.info(f"Idempotency keys enabled: up to {max_entries} responses, {cache.max_bytes} bytes")
+    return cache
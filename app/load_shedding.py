@@ -0,0 +1,155 @@
+import logging
+import math
+import threading
+import time
+from flask import jsonify, request
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest request in the moving average of request durations
+LATENCY_SMOOTHING = 0.1
+
+
+def priority(view):
+    """Marks a cheap view that is admitted ahead of queued expensive requests."""
+    view.load_shed = "priority"
+    return view
+
+
+def exempt(view):
+    """Marks a constant-time view that bypasses the limiter entirely."""
+    view.load_shed = "exempt"
+    return view
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of requests processed at once, queueing the rest briefly.
+
+    A request that cannot start within `queue_timeout` seconds is rejected, so
+    under overload latency stays bounded by the queue timeout instead of
+    growing with the backlog. Priority requests are admitted before any
+    waiting normal request.
+
+    Attributes:
+        max_in_flight (int): The number of requests allowed to run concurrently.
+        queue_timeout (float): Seconds a request may wait for a slot.
+    """
+
+    def __init__(self, max_in_flight, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.rejected = 0
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = {True: 0, False: 0}  # {is priority: number of waiting requests}
+        self._latency = 0.05  # moving average of request durations in seconds
+
+    def acquire(self, is_priority=False):
+        """
+        Waits for a free slot.
+
+        Args:
+            is_priority (bool, optional): Whether the request may overtake normal waiters.
+
+        Returns:
+            bool: True if a slot was taken and must be released, False if the request timed out.
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        with self._condition:
+            self._waiting[is_priority] += 1
+            try:
+                while self._in_flight >= self.max_in_flight or (not is_priority and self._waiting[True]):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected += 1
+                        if is_priority:
+                            # Normal waiters may have been held back only by this request
+                            self._condition.notify_all()
+                        return False
+                    self._condition.wait(remaining)
+                self._in_flight += 1
+                return True
+            finally:
+                self._waiting[is_priority] -= 1
+
+    def release(self, elapsed):
+        """
+        Frees a slot taken by `acquire`.
+
+        Args:
+            elapsed (float): How long the request held the slot, in seconds.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self._latency += LATENCY_SMOOTHING * (elapsed - self._latency)
+            self._condition.notify_all()
+
+    def retry_after(self):
+        """
+        Estimates how many seconds a rejected client should wait before retrying.
+
+        Returns:
+            int: The time to drain the current backlog at the recent request latency, at least 1.
+        """
+        with self._condition:
+            backlog = self._in_flight + self._waiting[True] + self._waiting[False]
+            return max(1, math.ceil(self._latency * backlog / self.max_in_flight))
+
+    def stats(self):
+        """
+        Returns the limiter's current state.
+
+        Returns:
+            dict: {"in_flight", "waiting", "rejected", "latency_ms"}.
+        """
+        with self._condition:
+            return {"in_flight": self._in_flight, "waiting": self._waiting[True] + self._waiting[False],
+                    "rejected": self.rejected, "latency_ms": round(self._latency * 1000, 3)}
+
+
+def init_load_shedding(app):
+    """
+    Limits concurrent requests to the auth blueprint's routes.
+
+    Configuration keys:
+        LOAD_SHED_MAX_IN_FLIGHT (int): Concurrent requests allowed; 0 disables the limiter.
+        LOAD_SHED_QUEUE_TIMEOUT (float): Seconds a request may wait before a 503.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        ConcurrencyLimiter: The limiter, or None when disabled.
+    """
+    max_in_flight = app.config.get("LOAD_SHED_MAX_IN_FLIGHT", 32)
+    if max_in_flight <= 0:
+        return None
+    limiter = ConcurrencyLimiter(max_in_flight, app.config.get("LOAD_SHED_QUEUE_TIMEOUT", 0.5))
+    app.extensions["load_shedding"] = limiter
+
+    @app.before_request
+    def admit_request():
+        view = app.view_functions.get(request.endpoint)
+        if request.blueprint != "auth" or view is None:
+            return None
+        mode = getattr(view, "load_shed", None)
+        if mode == "exempt":
+            return None
+        if not limiter.acquire(is_priority=mode == "priority"):
+            logger.warning(f"Shedding request to {request.path}: {limiter.stats()}")
+            response = jsonify({"status": "error", "message": "Server is overloaded, please retry later"})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(limiter.retry_after())
+            return response
+        request.environ["load_shedding.started"] = time.monotonic()
+        return None
+
+    @app.teardown_request
+    def release_slot(exc):
+        started = request.environ.pop("load_shedding.started", None)
+        if started is not None:
+            limiter.release(time.monotonic() - started)
+
+    logger.info(f"Load shedding enabled: {max_in_flight} requests in flight")
+    return limiter
@@ -0,0 +1,187 @@
+import itertools
+import logging
+import os
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Changes on every process start, so sync cursors issued before a restart are never trusted
+EPOCH = os.urandom(4).hex()
+
+# Optional ShardRouter attached by init_sharding, forwarding syncs to the owning shard
+router = None
+
+
+class ChangeLog:
+    """
+    Per-user log of recent writes, numbered by a per-user sequence.
+
+    The stores record every change while holding the user's lock, so sequence
+    numbers follow the order the changes were applied in. Only the newest
+    `max_changes` entries per user are kept; the sequence just before the
+    oldest kept entry is the user's compaction horizon.
+
+    Attributes:
+        max_changes (int): The number of changes kept per user.
+    """
+
+    def __init__(self, max_changes=1000):
+        self.max_changes = max_changes
+        self._changes = {}  # {user_id: deque of {"seq", "type", "op", "data"}}
+        self._sequences = {}  # {user_id: last sequence number}
+        self._lock = threading.Lock()
+
+    def record(self, user_id, kind, op, data):
+        """
+        Appends a change to a user's log.
+
+        Args:
+            user_id (int): The ID of the user.
+            kind (str): What changed, "workout" or "favorite".
+            op (str): "add" or "delete".
+            data (dict): The added entry, or the key of the deleted one; it must not be modified afterwards.
+
+        Returns:
+            int: The change's sequence number.
+        """
+        with self._lock:
+            sequence = self._sequences.get(user_id, 0) + 1
+            self._sequences[user_id] = sequence
+            changes = self._changes.get(user_id)
+            if changes is None:
+                changes = self._changes[user_id] = deque(maxlen=self.max_changes)
+            changes.append({"seq": sequence, "type": kind, "op": op, "data": data})
+            return sequence
+
+    def version(self, user_id):
+        """Returns the sequence number of a user's latest change, 0 if there is none."""
+        with self._lock:
+            return self._sequences.get(user_id, 0)
+
+    def count(self, user_id):
+        """Returns the number of changes kept for a user."""
+        with self._lock:
+            return len(self._changes.get(user_id, ()))
+
+    def since(self, user_id, since):
+        """
+        Returns a user's changes after a sequence number.
+
+        Only the requested changes are visited, so the cost grows with their
+        number rather than with the user's history.
+
+        Args:
+            user_id (int): The ID of the user.
+            since (int): The last sequence number the client has applied.
+
+        Returns:
+            tuple: (version, changes oldest first), or None if `since` is behind the
+            compaction horizon or ahead of the log, and the client must resync.
+        """
+        with self._lock:
+            version = self._sequences.get(user_id, 0)
+            changes = self._changes.get(user_id, ())
+            horizon = changes[0]["seq"] - 1 if changes else version
+            if since > version or since < horizon:
+                return None
+            return version, list(itertools.islice(reversed(changes), version - since))[::-1]
+
+    def adopt(self, user_id, version):
+        """
+        Continues a user's sequence from another process, e.g. after the user moved shards.
+
+        Sequences never go back, even when a user returns to a process it left,
+        and none of the changes from before the move are kept: a cursor at
+        `version` gets only newer changes, and every older one must resync.
+
+        Args:
+            user_id (int): The ID of the user.
+            version (int): The user's last sequence number in the process it came from.
+        """
+        with self._lock:
+            self._changes.pop(user_id, None)
+            self._sequences[user_id] = max(self._sequences.get(user_id, 0), version)
+
+    def compact(self, user_id):
+        """
+        Forgets a user's recorded changes but keeps the version, so every older cursor must resync.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        with self._lock:
+            self._changes.pop(user_id, None)
+
+    def drop(self, user_id):
+        """Forgets a user's log, e.g. after the user moved to another shard."""
+        with self._lock:
+            self._changes.pop(user_id, None)
+            self._sequences.pop(user_id, None)
+
+    def users(self):
+        """Returns the IDs of the users with a sequence in this log."""
+        with self._lock:
+            return set(self._sequences)
+
+    def clear(self):
+        """Forgets every user's log."""
+        with self._lock:
+            self._changes.clear()
+            self._sequences.clear()
+
+
+changelog = ChangeLog()
+
+
+def configure_changelog(config):
+    """
+    Sizes this process's change log from SYNC_MAX_CHANGES.
+
+    Called before any writes, by `create_app` and in every shard process.
+
+    Args:
+        config (Mapping): The application config, or the settings handed to a shard.
+    """
+    changelog.max_changes = config.get("SYNC_MAX_CHANGES", 1000)
+
+
+def get_changes(user_id, since=0, epoch=None):
+    """
+    Returns what changed for a user since a sync cursor.
+
+    A cursor is the (epoch, version) pair of an earlier response. If it is
+    from this process and not behind the compaction horizon, only the newer
+    changes are returned; otherwise the user's full state is, with the
+    version it corresponds to.
+
+    Args:
+        user_id (int): The ID of the user.
+        since (int, optional): The version of the client's last sync.
+        epoch (str, optional): The epoch of the client's last sync; None for a first sync.
+
+    Returns:
+        dict: {"resync": False, "epoch", "version", "changes"} or
+        {"resync": True, "epoch", "version", "workouts", "favorites"}.
+    """
+    if router is not None:
+        return router.call(user_id, "get_changes", user_id, since, epoch)
+
+    from app.models import recommendations, workout
+
+    if epoch == EPOCH:
+        result = changelog.since(user_id, since)
+        if result is not None:
+            version, changes = result
+            return {"resync": False, "epoch": EPOCH, "version": version, "changes": changes}
+
+    # Holding both stores' locks keeps writers from changing the state between reading it and its version
+    with workout.user_locks.for_key(user_id), recommendations.favorite_locks.for_key(user_id):
+        if workout.eviction is not None:
+            # Reloaded under the lock, a spilled user stays in memory for get_workouts below
+            workout.eviction.fetch_locked(user_id)
+        version = changelog.version(user_id)
+        workouts = workout.get_workouts(user_id)
+        favorites = recommendations.get_favorite_exercises(user_id)
+    logger.info(f"Full resync for user {user_id} at version {version}")
+    return {"resync": True, "epoch": EPOCH, "version": version, "workouts": workouts, "favorites": favorites}
@@ -0,0 +1,330 @@
+import glob
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.models.changelog import changelog
+from app.models.journal import decode_record, encode_record
+
+logger = logging.getLogger(__name__)
+
+# Estimated memory of one workout entry in `workout_logs`: the dict, its date string and weight
+# float and the list slot (about 290 bytes measured on CPython 3.11), plus its comment
+ENTRY_BYTES = 320
+
+# Estimated memory of the change log's record of a write, kept for a user's last SYNC_MAX_CHANGES writes
+CHANGE_BYTES = 220
+
+SPILL_SUFFIX = ".bin"
+
+
+def entry_size(workout):
+    """
+    Estimates the memory one workout entry takes in the store.
+
+    Args:
+        workout (dict): The workout entry.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    comment = workout.get("comment")
+    return ENTRY_BYTES + (len(comment) if isinstance(comment, str) else 0)
+
+
+class ColdStore:
+    """
+    Keeps the in-memory workout store within a memory budget by spilling cold users to disk.
+
+    Resident users are tracked in least-recently-used order with their estimated
+    size. When the total exceeds the budget, the least recently used users'
+    histories are written to one file each, in the journal's compact record
+    format, and removed from the store; the next read or write for such a user
+    loads the file back first. A spilled user's recorded changes are dropped as
+    well, so their clients' next delta sync is a full resync. Spill files only
+    mirror memory and are deleted on startup: durability still comes from the
+    journal, if one is attached.
+
+    Readers must take a user's entries from `fetch` rather than the store, and
+    writers must call `fetch_locked` before and `added` or `account` after changing them.
+
+    Attributes:
+        directory (str): Where spilled users' files are kept.
+        budget (int): The estimated bytes the resident users may take.
+    """
+
+    def __init__(self, directory, budget, store, locks, clock=time.perf_counter):
+        self.directory = directory
+        self.budget = budget
+        self._store = store
+        self._locks = locks
+        self._clock = clock
+        self._resident = OrderedDict()  # {user_id: estimated bytes}, least recently used first
+        self._spilled = set()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reload_seconds = 0.0
+        self.max_reload_seconds = 0.0
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "*" + SPILL_SUFFIX)):
+            os.remove(path)
+
+    def _path(self, user_id):
+        # Integer IDs name their file directly; anything else is hashed so it cannot escape the directory
+        name = str(user_id) if type(user_id) is int else hashlib.blake2b(repr(user_id).encode("utf-8"),
+                                                                         digest_size=16).hexdigest()
+        return os.path.join(self.directory, name + SPILL_SUFFIX)
+
+    def fetch(self, user_id):
+        """
+        Returns a user's entries, loading them from disk if they were spilled.
+
+        Callers holding the user's lock must use `fetch_locked` instead.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            list: The user's list in the store (callers copy it before reading), or None if
+            the user has no entries.
+        """
+        workouts, spilled = self._lookup(user_id)
+        if not spilled:
+            return workouts
+        with self._locks.for_key(user_id):
+            workouts = self.fetch_locked(user_id)
+        self.enforce(keep=user_id)
+        return workouts
+
+    def fetch_locked(self, user_id):
+        """
+        Like `fetch`, for callers already holding the user's lock; call `enforce` after releasing it.
+
+        While the lock is held the user cannot be spilled again, so later reads of
+        the store see the returned list.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            list: The user's list in the store, or None if the user has no entries.
+        """
+        workouts, spilled = self._lookup(user_id)
+        if not spilled:
+            return workouts
+
+        start = self._clock()
+        path = self._path(user_id)
+        workouts = self._read(path)
+        size = sum(map(entry_size, workouts))  # the change log was compacted when the user was spilled
+        with self._lock:
+            self._store[user_id] = workouts
+            self._spilled.discard(user_id)
+            self._resident[user_id] = size
+            self._resident_bytes += size
+        os.remove(path)
+        elapsed = self._clock() - start
+
+        with self._lock:
+            self.misses += 1
+            self.reload_seconds += elapsed
+            self.max_reload_seconds = max(self.max_reload_seconds, elapsed)
+        logger.debug(f"Reloaded {len(workouts)} workouts for user {user_id} in {elapsed * 1000:.2f} ms")
+        return workouts
+
+    def _read(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        workouts, offset = [], 0
+        while offset < len(data):
+            _, workout, offset = decode_record(data, offset)
+            workouts.append(workout)
+        return workouts
+
+    def peek(self, user_id):
+        """
+        Returns a copy of a user's entries without reloading a spilled user or marking them as used.
+
+        Must not be called while holding the user's lock.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            list: A copy of the user's entries, empty if the user has none.
+        """
+        with self._locks.for_key(user_id):
+            with self._lock:
+                workouts = self._store.get(user_id)
+                spilled = workouts is None and user_id in self._spilled
+            if spilled:
+                return self._read(self._path(user_id))
+            return list(workouts or ())
+
+    def users(self):
+        """Returns the IDs of resident and spilled users."""
+        with self._lock:
+            return list(self._store) + list(self._spilled)
+
+    def _lookup(self, user_id):
+        # Spills and reloads update the store and the spill set together under this lock
+        with self._lock:
+            workouts = self._store.get(user_id)
+            if workouts is None and user_id in self._spilled:
+                return None, True
+            if workouts is not None:
+                # Users with nothing resident or spilled are neither hits nor misses
+                self.hits += 1
+            if user_id in self._resident:
+                self._resident.move_to_end(user_id)
+            return workouts, False
+
+    def account(self, user_id):
+        """
+        Updates a resident user's estimated size after a write, marking the user as recently used.
+
+        Call it while holding the user's lock, and `enforce` after releasing it.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        size = sum(map(entry_size, self._store.get(user_id, ()))) + CHANGE_BYTES * changelog.count(user_id)
+        with self._lock:
+            self._resident_bytes += size - self._resident.pop(user_id, 0)
+            self._resident[user_id] = size
+
+    def added(self, user_id, workouts):
+        """
+        Adds newly appended entries, and their change log records, to a resident user's estimated size.
+
+        A cheaper `account` for appends; call it while holding the user's lock. Records the
+        change log has since discarded are still counted until the next `account` or reload,
+        so the estimate errs on the high side.
+
+        Args:
+            user_id (int): The ID of the user.
+            workouts (list): The entries just appended.
+        """
+        size = sum(map(entry_size, workouts)) + CHANGE_BYTES * len(workouts)
+        with self._lock:
+            self._resident[user_id] = self._resident.pop(user_id, 0) + size
+            self._resident_bytes += size
+
+    def enforce(self, keep=None):
+        """
+        Spills least recently used users until the resident users fit the budget.
+
+        Must not be called while holding a user's lock, as it takes the victims' locks.
+
+        Args:
+            keep (int, optional): A user to leave resident, e.g. the one just accessed.
+
+        Returns:
+            int: The number of users spilled.
+        """
+        spilled = 0
+        while True:
+            with self._lock:
+                if self._resident_bytes <= self.budget:
+                    return spilled
+                victim = next((user_id for user_id in self._resident if user_id != keep), None)
+                if victim is None:
+                    return spilled
+                size = self._resident.pop(victim)
+                self._resident_bytes -= size
+            if not self._spill(victim, size):
+                return spilled  # the disk is failing; retry on the next write
+            spilled += 1
+
+    def _spill(self, user_id, size):
+        with self._locks.for_key(user_id):
+            workouts = self._store.get(user_id)
+            if not workouts:
+                return True
+            path = self._path(user_id)
+            try:
+                with open(path, "wb") as f:
+                    f.write(b"".join(encode_record(user_id, workout) for workout in workouts))
+            except OSError as e:
+                logger.error(f"Could not spill workouts of user {user_id}: {e}")
+                if os.path.exists(path):
+                    os.remove(path)
+                with self._lock:
+                    self._resident[user_id] = self._resident.pop(user_id, 0) + size
+                    self._resident_bytes += size
+                return False
+            # Recorded changes reference the entries; cold users' clients resync fully instead
+            changelog.compact(user_id)
+            with self._lock:
+                del self._store[user_id]
+                self._spilled.add(user_id)
+                # A write between choosing the victim and taking its lock accounted the user again
+                self._resident_bytes -= self._resident.pop(user_id, 0)
+                self.evictions += 1
+        return True
+
+    def stats(self):
+        """
+        Reports the budget, usage and hit rate of the store.
+
+        Returns:
+            dict: Resident and spilled users, estimated bytes, hits, misses, evictions and
+            reload latency.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "budget_bytes": self.budget,
+                "resident_bytes": self._resident_bytes,
+                "resident_users": len(self._resident),
+                "spilled_users": len(self._spilled),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "reload_ms_avg": self.reload_seconds * 1000 / self.misses if self.misses else None,
+                "reload_ms_max": self.max_reload_seconds * 1000,
+            }
+
+
+def init_eviction(app):
+    """
+    Bounds the memory of the workout store when WORKOUT_SPILL_DIR is set.
+
+    Users beyond WORKOUT_MEMORY_BUDGET (estimated bytes) are spilled to disk,
+    least recently used first, and loaded back when next accessed. Users
+    recovered by the journal are accounted for and spilled right away if they
+    exceed the budget.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        ColdStore: The attached store, or None when eviction is disabled.
+    """
+    from app.models import workout
+
+    directory = app.config.get("WORKOUT_SPILL_DIR")
+    if not directory:
+        return None
+    if workout.eviction is not None:
+        app.extensions["cold_store"] = workout.eviction
+        return workout.eviction
+    if workout.router is not None:
+        logger.warning("WORKOUT_SPILL_DIR is ignored in sharded mode")
+        return None
+
+    cold_store = ColdStore(directory, app.config.get("WORKOUT_MEMORY_BUDGET", 256 * 1024 * 1024),
+                           workout.workout_logs, workout.user_locks)
+    for user_id in list(workout.workout_logs):
+        cold_store.account(user_id)
+    workout.eviction = cold_store
+    app.extensions["cold_store"] = cold_store
+    spilled = cold_store.enforce()
+    logger.info(f"Workout store limited to {cold_store.budget} bytes in memory; spilled {spilled} users")
+    return cold_store
@@ -0,0 +1,367 @@
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+from collections import Counter
+from datetime import date as date_type, datetime, timedelta
+from app.models.leaderboard import bucket_for, leaderboards
+from app.models.locks import StripedLock
+from app.models.workout import get_workouts
+from app.signals import goals_updated, workout_logged, workouts_restored
+
+logger = logging.getLogger(__name__)
+
+GOAL_TYPES = ("target_weight", "weekly_volume", "weekly_sessions")
+
+# How many past weeks of weekly goals stay queryable; older weeks are dropped as newer ones open
+RETAINED_WEEKS = 8
+
+# Goal definitions are saved in this file inside WORKOUT_JOURNAL_DIR; their progress is rebuilt from the workouts
+GOALS_FILE = "goals.json"
+
+
+class Goal:
+    """
+    A user's goal together with the running state its progress is read from.
+
+    Target weight goals keep the best weight lifted for their exercise. Weekly
+    goals keep one total per week, either the volume (repetitions x weight) or
+    the distinct workout days, for their exercise or for every exercise when
+    `exercise_id` is None. Applying a workout touches one value, so the cost
+    does not depend on how much history the user has. Weekly totals are kept
+    for the RETAINED_WEEKS weeks up to today's.
+
+    Attributes:
+        goal_id (int): The goal's ID.
+        user_id (int): The ID of the user.
+        goal_type (str): One of GOAL_TYPES.
+        target (float): The weight, weekly volume or weekly number of sessions to reach.
+        exercise_id (int): The exercise the goal tracks, or None for every exercise.
+    """
+
+    def __init__(self, goal_id, user_id, goal_type, target, exercise_id=None, today=date_type.today):
+        self.goal_id = goal_id
+        self.user_id = user_id
+        self.goal_type = goal_type
+        self.target = target
+        self.exercise_id = exercise_id
+        self.best = 0.0
+        self.weeks = {}  # {week start: volume, or set of workout days for weekly_sessions}
+        self._today = today
+        self._horizon = None
+        self._recorded = None  # Counter of workouts recorded while the goal is being seeded
+
+    def _expire(self):
+        """Drops weeks before the retained ones and returns the first and last week a workout may count for."""
+        today = self._today()
+        horizon = bucket_for("week", today) - timedelta(weeks=RETAINED_WEEKS - 1)
+        if horizon != self._horizon:
+            self._horizon = horizon
+            for expired in [w for w in self.weeks if w < horizon]:
+                del self.weeks[expired]
+        return horizon, bucket_for("week", today + timedelta(days=1))
+
+    def apply(self, day, weight, volume):
+        """
+        Updates the running state with one workout; weekly goals ignore workouts
+        outside the retained weeks or later than tomorrow.
+
+        Args:
+            day (datetime.date): The workout's date, or None when unknown.
+            weight (float): The weight used.
+            volume (float): Repetitions times weight.
+        """
+        if self.goal_type == "target_weight":
+            self.best = max(self.best, weight)
+            return
+        week = bucket_for("week", day)
+        if week is None:
+            return
+        first, last = self._expire()
+        if not first <= week <= last:
+            return
+        if self.goal_type == "weekly_volume":
+            self.weeks[week] = self.weeks.get(week, 0.0) + volume
+        else:
+            self.weeks.setdefault(week, set()).add(day)
+
+    def reset(self):
+        """Forgets the running state, before it is rebuilt from scratch."""
+        self.best = 0.0
+        self.weeks.clear()
+
+    def progress(self, day):
+        """
+        Reports the goal's progress.
+
+        Args:
+            day (datetime.date): A date inside the week weekly goals are reported for.
+
+        Returns:
+            dict: The goal's definition with "current", "progress" (0 to 1) and "achieved",
+            plus "week" for weekly goals.
+        """
+        report = {"goal_id": self.goal_id, "type": self.goal_type, "exercise_id": self.exercise_id,
+                  "target": self.target}
+        if self.goal_type == "target_weight":
+            current = self.best
+        else:
+            self._expire()
+            week = bucket_for("week", day)
+            value = self.weeks.get(week)
+            current = 0 if value is None else len(value) if self.goal_type == "weekly_sessions" else value
+            report["week"] = week.isoformat()
+        report.update(current=current, progress=round(min(1.0, current / self.target), 4),
+                      achieved=current >= self.target)
+        return report
+
+
+def _parse_workout(user_id, workout):
+    try:
+        weight = float(workout.get("weight") or 0)
+        volume = weight * float(workout.get("repetitions") or 0)
+    except (TypeError, ValueError):
+        logger.warning(f"Skipping goal update for non-numeric workout of user {user_id}")
+        return None
+    try:
+        day = datetime.strptime(workout.get("date"), "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        day = None
+    return day, weight, volume
+
+
+def _fingerprint(workout):
+    return (workout.get("exercise_id"), workout.get("repetitions"), workout.get("weight"), workout.get("date"),
+            workout.get("comment"))
+
+
+class GoalTracker:
+    """
+    Every user's goals, indexed by the exercise they track.
+
+    A logged workout is applied only to the goals of its user that track its
+    exercise or every exercise, so neither updates nor progress queries ever
+    scan workout history.
+
+    Once `load` has been called, every goal definition is also saved to a file,
+    and the running state is rebuilt from the restored workouts by `rebuild`.
+
+    Attributes:
+        path (str): The file goal definitions are saved to, or None to keep them in memory only.
+    """
+
+    def __init__(self):
+        self.path = None
+        self._goals = {}  # {user_id: {goal_id: Goal}}
+        self._by_exercise = {}  # {(user_id, exercise_id or None): [Goal]}
+        self._ids = itertools.count(1)
+        self._locks = StripedLock()
+        self._save_lock = threading.Lock()
+
+    def _register(self, goal):
+        self._goals.setdefault(goal.user_id, {})[goal.goal_id] = goal
+        self._by_exercise.setdefault((goal.user_id, goal.exercise_id), []).append(goal)
+
+    def load(self, path):
+        """
+        Restores the goal definitions saved in a file and saves new goals there from now on.
+
+        Their progress starts empty; `rebuild` fills it in from the restored workouts.
+
+        Args:
+            path (str): The goals file; it need not exist yet.
+
+        Returns:
+            int: The number of goals restored.
+        """
+        self.path = path
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding="utf-8") as f:
+            definitions = json.load(f)
+        for definition in definitions:
+            goal = Goal(definition["goal_id"], definition["user_id"], definition["type"], definition["target"],
+                        definition["exercise_id"])
+            with self._locks.for_key(goal.user_id):
+                self._register(goal)
+        self._ids = itertools.count(max((d["goal_id"] for d in definitions), default=0) + 1)
+        logger.info(f"Restored {len(definitions)} goals from {path}")
+        return len(definitions)
+
+    def _save(self):
+        """Atomically rewrites the goals file with every goal definition."""
+        if self.path is None:
+            return
+        with self._save_lock:
+            definitions = sorted(({"goal_id": goal.goal_id, "user_id": goal.user_id, "type": goal.goal_type,
+                                   "target": goal.target, "exercise_id": goal.exercise_id}
+                                  for goals in list(self._goals.values()) for goal in list(goals.values())),
+                                 key=lambda definition: definition["goal_id"])
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(definitions, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def add(self, user_id, goal_type, target, exercise_id=None):
+        """
+        Creates a goal, seeded from the user's recent workouts.
+
+        Target weight goals start from the user's all-time best on the
+        leaderboards; weekly goals replay only the retained weeks.
+
+        The goal is registered before its history is read, so a workout logged
+        meanwhile is never missed; one that is both recorded and in the history
+        is applied once.
+
+        Args:
+            user_id (int): The ID of the user.
+            goal_type (str): One of GOAL_TYPES.
+            target (float): The value to reach; must be positive.
+            exercise_id (int, optional): The exercise to track; required for target weight goals.
+
+        Returns:
+            dict: The goal's progress, as returned by `progress`.
+
+        Raises:
+            ValueError: If the type is unknown, the target is not a positive finite number or
+                the exercise is missing or not an integer.
+            OSError: If the goal could not be saved.
+        """
+        if goal_type not in GOAL_TYPES:
+            raise ValueError(f"Unknown goal type: {goal_type}")
+        if type(target) not in (int, float) or not math.isfinite(target) or target <= 0:
+            raise ValueError("Goal target must be a positive finite number")
+        if goal_type == "target_weight" and exercise_id is None:
+            raise ValueError("Target weight goals need an exercise_id")
+        if exercise_id is not None and type(exercise_id) is not int:
+            raise ValueError(f"exercise_id must be an integer, got {exercise_id!r}")
+
+        with self._locks.for_key(user_id):
+            goal = Goal(next(self._ids), user_id, goal_type, target, exercise_id)
+            goal._recorded = Counter()
+            self._register(goal)
+        self._save()
+
+        today = date_type.today()
+        if goal_type == "target_weight":
+            rank = leaderboards.query(exercise_id, "max_weight", "all", user_id=user_id)["user"]
+            seed = [{"exercise_id": exercise_id, "weight": rank["score"], "repetitions": 0, "date": None}] if rank else []
+        else:
+            since = bucket_for("week", today) - timedelta(weeks=RETAINED_WEEKS - 1)
+            seed = get_workouts(user_id, start_date=since.isoformat())
+
+        with self._locks.for_key(user_id):
+            recorded, goal._recorded = goal._recorded, None
+            for workout in seed:
+                if exercise_id is not None and workout.get("exercise_id") != exercise_id:
+                    continue
+                fingerprint = _fingerprint(workout)
+                if recorded[fingerprint]:
+                    recorded[fingerprint] -= 1  # logged after the goal was registered and already applied
+                    continue
+                parsed = _parse_workout(user_id, workout)
+                if parsed is not None:
+                    goal.apply(*parsed)
+            report = goal.progress(today)
+        logger.info(f"Created {goal_type} goal {goal.goal_id} for user {user_id}")
+        return report
+
+    def record(self, user_id, workout):
+        """
+        Applies one logged workout to the goals it affects, then sends `goals_updated`.
+
+        Args:
+            user_id (int): The ID of the user.
+            workout (dict): The workout entry from `log_workout`.
+        """
+        if user_id not in self._goals:
+            return
+        parsed = _parse_workout(user_id, workout)
+        if parsed is None:
+            return
+        updated = False
+        with self._locks.for_key(user_id):
+            for exercise_id in (workout.get("exercise_id"), None):
+                for goal in self._by_exercise.get((user_id, exercise_id), ()):
+                    goal.apply(*parsed)
+                    if goal._recorded is not None:
+                        goal._recorded[_fingerprint(workout)] += 1
+                    updated = True
+        if updated and goals_updated.receivers:
+            goals_updated.send(None, user_id=user_id, goals=self.progress(user_id))
+
+    def progress(self, user_id, day=None):
+        """
+        Returns the progress of every goal of a user.
+
+        Args:
+            user_id (int): The ID of the user.
+            day (datetime.date, optional): A date inside the week weekly goals are reported for;
+                defaults to today.
+
+        Returns:
+            list: Progress dictionaries ordered by goal ID.
+        """
+        day = day or date_type.today()
+        with self._locks.for_key(user_id):
+            return [goal.progress(day) for goal in self._goals.get(user_id, {}).values()]
+
+    def rebuild(self, workout_logs):
+        """
+        Recomputes every goal's state from a full workout store.
+
+        Args:
+            workout_logs (dict): {user_id: [workout]} as restored from disk.
+        """
+        for user_id, goals in list(self._goals.items()):
+            with self._locks.for_key(user_id):
+                for goal in goals.values():
+                    goal.reset()
+                for workout in list(workout_logs.get(user_id, ())):
+                    parsed = _parse_workout(user_id, workout)
+                    if parsed is None:
+                        continue
+                    for goal in goals.values():
+                        if goal.exercise_id is None or goal.exercise_id == workout.get("exercise_id"):
+                            goal.apply(*parsed)
+
+    def clear(self):
+        """Drops every goal."""
+        self._goals.clear()
+        self._by_exercise.clear()
+
+
+goal_tracker = GoalTracker()
+
+
+def init_goals(app):
+    """
+    Keeps goal definitions next to the workout journal when WORKOUT_JOURNAL_DIR is set.
+
+    Must run before `init_journal`, so the restored goals are rebuilt from the
+    workouts it recovers. Like the journal, it is off in sharded mode.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    from app.models import workout
+
+    directory = app.config.get("WORKOUT_JOURNAL_DIR")
+    if not directory or workout.router is not None or goal_tracker.path is not None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    goal_tracker.load(os.path.join(directory, GOALS_FILE))
+
+
+@workout_logged.connect
+def _on_workout_logged(sender, user_id, workout, **extra):
+    goal_tracker.record(user_id, workout)
+
+
+@workouts_restored.connect
+def _on_workouts_restored(sender, workout_logs, **extra):
+    goal_tracker.rebuild(workout_logs)
@@ -0,0 +1,542 @@
+import atexit
+import bisect
+import fcntl
+import glob
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zlib
+from app.models.retention import _merge_runs, _unarchived_positions
+from app.signals import workouts_restored
+from app.tasks import PRIORITY_LOW, task
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"WKSNAP01"
+
+# Held with an exclusive flock by the one process that owns a journal directory
+LOCK_FILE = "LOCK"
+# Sidecar of a snapshot listing, per user, the [start, stop) runs of insertion positions it left out
+EXCLUDED_SUFFIX = ".excluded.json"
+_SNAPSHOT_HEADER = struct.Struct("<8sQQ")  # magic, last journal sequence included, record count
+_FRAME = struct.Struct("<IIQ")  # record length, crc32 of sequence + record, sequence number
+
+# Records are packed as fixed fields plus the two strings when the values have the
+# expected types; anything else (string IDs, missing fields, ...) falls back to JSON.
+_PACKED = struct.Struct("<BqqqdHI")  # tag, user_id, exercise_id, repetitions, weight, len(date), len(comment)
+_JSON = struct.Struct("<BI")  # tag, len(json)
+_TAG_JSON, _TAG_FLOAT_WEIGHT, _TAG_INT_WEIGHT = 0, 1, 2
+_INT64 = (-2 ** 63, 2 ** 63)
+
+
+def _is_int64(value):
+    return type(value) is int and _INT64[0] <= value < _INT64[1]
+
+
+def encode_record(user_id, workout):
+    """
+    Encodes one workout entry into the compact binary record format.
+
+    Args:
+        user_id (int): ID of the user the workout belongs to.
+        workout (dict): The workout entry as stored in `workout_logs`.
+
+    Returns:
+        bytes: The encoded record.
+    """
+    weight = workout.get("weight")
+    if type(weight) is float:
+        tag = _TAG_FLOAT_WEIGHT
+    elif _is_int64(weight) and abs(weight) < 2 ** 53:
+        tag = _TAG_INT_WEIGHT
+    else:
+        tag = _TAG_JSON
+
+    if (tag != _TAG_JSON and len(workout) == 5 and _is_int64(user_id)
+            and _is_int64(workout.get("exercise_id")) and _is_int64(workout.get("repetitions"))
+            and isinstance(workout.get("date"), str) and isinstance(workout.get("comment"), str)):
+        date = workout["date"].encode("utf-8")
+        comment = workout["comment"].encode("utf-8")
+        if len(date) < 2 ** 16:
+            return _PACKED.pack(tag, user_id, workout["exercise_id"], workout["repetitions"],
+                                float(weight), len(date), len(comment)) + date + comment
+
+    payload = json.dumps([user_id, workout], separators=(",", ":")).encode("utf-8")
+    return _JSON.pack(_TAG_JSON, len(payload)) + payload
+
+
+def decode_record(buffer, offset):
+    """
+    Decodes one record starting at `offset`.
+
+    Args:
+        buffer (bytes | mmap.mmap): The buffer holding encoded records.
+        offset (int): Position of the record in the buffer.
+
+    Returns:
+        tuple: (user_id, workout, next_offset).
+    """
+    tag = buffer[offset]
+    if tag == _TAG_JSON:
+        _, length = _JSON.unpack_from(buffer, offset)
+        start = offset + _JSON.size
+        user_id, workout = json.loads(buffer[start:start + length])
+        return user_id, workout, start + length
+
+    _, user_id, exercise_id, repetitions, weight, date_len, comment_len = _PACKED.unpack_from(buffer, offset)
+    start = offset + _PACKED.size
+    date = buffer[start:start + date_len].decode("utf-8")
+    comment = buffer[start + date_len:start + date_len + comment_len].decode("utf-8")
+    workout = {
+        "exercise_id": exercise_id,
+        "repetitions": repetitions,
+        "weight": int(weight) if tag == _TAG_INT_WEIGHT else weight,
+        "date": date,
+        "comment": comment,
+    }
+    return user_id, workout, start + date_len + comment_len
+
+
+def _frame(sequence, record):
+    body = struct.pack("<Q", sequence) + record
+    return struct.pack("<II", len(record), zlib.crc32(body)) + body
+
+
+def _read_frames(path):
+    """
+    Yields (sequence, record, end_offset) for every intact frame of a journal segment.
+
+    Reading stops at the first truncated or corrupt frame, which is what a crash
+    in the middle of a write leaves behind.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + _FRAME.size <= len(data):
+        length, crc, sequence = _FRAME.unpack_from(data, offset)
+        end = offset + _FRAME.size + length
+        if end > len(data) or zlib.crc32(data[offset + 8:end]) != crc:
+            logger.warning(f"Discarding torn journal tail in {path} at offset {offset}")
+            return
+        yield sequence, data[offset + _FRAME.size:end], end
+        offset = end
+
+
+def _in_runs(runs, position):
+    index = bisect.bisect_right(runs, (position, float("inf"))) - 1
+    return index >= 0 and position < runs[index][1]
+
+
+def _read_excluded(snapshot_path):
+    path = snapshot_path[:-len(".bin")] + EXCLUDED_SUFFIX
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {user_id: [tuple(run) for run in runs] for user_id, runs in json.load(f)}
+
+
+def _fsync_directory(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WorkoutJournal:
+    """
+    Append-only, group-committed journal with periodic binary snapshots.
+
+    Writers enqueue encoded records and a single background thread writes every
+    pending record with one write and one fsync, so concurrent writers share the
+    cost of a commit. `snapshot` seals the current journal segment and merges it
+    into a new snapshot by copying records, without reading the live store.
+
+    Files in `directory`:
+        snapshot-<sequence>.bin: Header followed by the records up to `sequence`.
+        journal-<first sequence>.log: Framed records with sequence numbers and checksums.
+
+    Attributes:
+        directory (str): Where the journal and snapshots are stored.
+        sync (bool): Whether writers should wait for their record to be fsynced.
+        durable_sequence (int): Highest sequence number known to be on disk.
+        snapshot_sequence (int): Sequence number the latest snapshot covers.
+        commits (int): Number of fsync batches written.
+        archived_runs (callable): Optional; returns {user_id: runs} of insertion positions stored
+            elsewhere (the retention archive), which snapshots leave out.
+        excluded_runs (dict): {user_id: runs} of positions the recovered snapshot left out, so
+            the recovered entries can be matched to their insertion positions.
+    """
+
+    def __init__(self, directory, sync=True):
+        self.directory = directory
+        self.sync = sync
+        self.durable_sequence = 0
+        self.snapshot_sequence = 0
+        self.commits = 0
+        self.archived_runs = None
+        self.excluded_runs = {}
+        self._sequence = 0
+        self._written_sequence = 0
+        self._pending = []
+        self._error = None
+        self._closing = False
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._durable = threading.Condition(self._lock)
+        self._file_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._file = None
+        self._thread = None
+        self._lock_file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def lock(self):
+        """
+        Claims the directory for this process until it exits.
+
+        Raises:
+            RuntimeError: If another process, e.g. a running server, already holds it.
+        """
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f"The workout journal in {self.directory} is in use by another process") from None
+        self._lock_file = lock_file
+
+    def _segments(self):
+        return sorted(glob.glob(os.path.join(self.directory, "journal-*.log")))
+
+    def _snapshots(self):
+        return sorted(glob.glob(os.path.join(self.directory, "snapshot-*.bin")))
+
+    def recover(self, store):
+        """
+        Rebuilds the workout store from the latest snapshot and the journal tail.
+
+        The snapshot is memory-mapped and decoded in place; journal records newer
+        than the snapshot are then replayed in sequence order. Must be called
+        before `start`.
+
+        Args:
+            store (dict): The dictionary to fill, keyed by user ID.
+
+        Returns:
+            int: The number of entries recovered.
+        """
+        recovered = 0
+        snapshot_sequence = 0
+        snapshots = self._snapshots()
+        if snapshots:
+            with open(snapshots[-1], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                magic, snapshot_sequence, count = _SNAPSHOT_HEADER.unpack_from(buffer, 0)
+                if magic != SNAPSHOT_MAGIC:
+                    raise ValueError(f"{snapshots[-1]} is not a workout snapshot")
+                offset = _SNAPSHOT_HEADER.size
+                for _ in range(count):
+                    user_id, workout, offset = decode_record(buffer, offset)
+                    store.setdefault(user_id, []).append(workout)
+                recovered += count
+            self.excluded_runs = _read_excluded(snapshots[-1])
+
+        sequence = snapshot_sequence
+        for path in self._segments():
+            intact_end = 0
+            for record_sequence, record, intact_end in _read_frames(path):
+                if record_sequence <= snapshot_sequence:
+                    continue
+                user_id, workout, _ = decode_record(record, 0)
+                store.setdefault(user_id, []).append(workout)
+                sequence = record_sequence
+                recovered += 1
+            if os.path.getsize(path) > intact_end:
+                os.truncate(path, intact_end)
+
+        self._sequence = self._written_sequence = self.durable_sequence = sequence
+        self.snapshot_sequence = snapshot_sequence
+        logger.info(f"Recovered {recovered} workouts from {self.directory} up to sequence {sequence}")
+        return recovered
+
+    def start(self):
+        """Opens a fresh journal segment and starts the group-commit thread."""
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="workout-journal", daemon=True)
+        self._thread.start()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, f"journal-{self._written_sequence + 1:020d}.log")
+        self._file = open(path, "ab")
+        _fsync_directory(self.directory)
+
+    def append(self, user_id, workout):
+        """
+        Queues a workout entry for the next group commit.
+
+        Args:
+            user_id (int): ID of the user.
+            workout (dict): The workout entry.
+
+        Returns:
+            int: The sequence number assigned to the record; pass it to `wait_durable`.
+
+        Raises:
+            OSError: If the background writer has failed.
+        """
+        record = encode_record(user_id, workout)
+        with self._lock:
+            if self._error is not None:
+                raise OSError(f"Workout journal is unavailable: {self._error}")
+            self._sequence += 1
+            self._pending.append(_frame(self._sequence, record))
+            self._work.notify()
+            return self._sequence
+
+    def wait_durable(self, sequence):
+        """
+        Blocks until the record with the given sequence number has been fsynced.
+
+        Args:
+            sequence (int): A sequence number returned by `append`.
+
+        Raises:
+            OSError: If the background writer failed before the record was written.
+        """
+        with self._lock:
+            while self.durable_sequence < sequence:
+                if self._error is not None:
+                    raise OSError(f"Workout journal is unavailable: {self._error}")
+                self._durable.wait()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._work.wait()
+                if not self._pending:
+                    return
+                batch, self._pending = self._pending, []
+                last_sequence = self._sequence
+
+            try:
+                with self._file_lock:
+                    self._file.write(b"".join(batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._written_sequence = last_sequence
+            except OSError as e:
+                logger.error(f"Workout journal write failed: {e}")
+                with self._lock:
+                    self._error = e
+                    self._durable.notify_all()
+                return
+
+            with self._lock:
+                self.durable_sequence = last_sequence
+                self.commits += 1
+                self._durable.notify_all()
+
+    def snapshot(self):
+        """
+        Folds the sealed journal into a new snapshot and deletes what it replaces.
+
+        The current segment is sealed and a new one opened, then the previous
+        snapshot's records and the sealed segments' records are copied into a
+        new snapshot file, which is atomically renamed into place. Nothing is
+        done when no record was written since the latest snapshot. Entries at
+        positions reported by `archived_runs` are left out and listed in a
+        sidecar, so the snapshot does not keep carrying archived history.
+
+        Returns:
+            int: The sequence number the latest snapshot covers.
+        """
+        with self._snapshot_lock:
+            with self._file_lock:
+                snapshot_sequence = self._written_sequence
+                if snapshot_sequence == self.snapshot_sequence:
+                    return snapshot_sequence
+                sealed = self._segments()
+                self._file.close()
+                self._open_segment()
+            sealed = [path for path in sealed if path != self._file.name]
+
+            previous = self._snapshots()
+            excluded = _read_excluded(previous[-1]) if previous else {}
+            archived = self.archived_runs() if self.archived_runs is not None else {}
+            tmp_path = os.path.join(self.directory, "snapshot.tmp")
+            with open(tmp_path, "wb") as out:
+                out.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, snapshot_sequence, 0))
+                if archived or excluded:
+                    count, excluded = self._write_unarchived(out, previous, sealed, snapshot_sequence,
+                                                             excluded, archived)
+                else:
+                    count = self._write_all(out, previous, sealed, snapshot_sequence)
+                out.seek(0)
+                out.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, snapshot_sequence, count))
+                out.flush()
+                os.fsync(out.fileno())
+
+            name = f"snapshot-{snapshot_sequence:020d}"
+            if excluded:
+                # Renamed before the snapshot, so a crash in between leaves the previous pair intact
+                with open(tmp_path + EXCLUDED_SUFFIX, "w", encoding="utf-8") as out:
+                    json.dump([[user_id, runs] for user_id, runs in excluded.items()], out)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path + EXCLUDED_SUFFIX, os.path.join(self.directory, name + EXCLUDED_SUFFIX))
+            os.replace(tmp_path, os.path.join(self.directory, name + ".bin"))
+            _fsync_directory(self.directory)
+            for path in previous + sealed:
+                if not path.endswith(name + ".bin"):
+                    os.remove(path)
+                    if os.path.exists(path[:-len(".bin")] + EXCLUDED_SUFFIX):
+                        os.remove(path[:-len(".bin")] + EXCLUDED_SUFFIX)
+            self.snapshot_sequence = snapshot_sequence
+            logger.info(f"Wrote workout snapshot with {count} entries up to sequence {snapshot_sequence}")
+            return snapshot_sequence
+
+    def _write_all(self, out, previous, sealed, snapshot_sequence):
+        count = 0
+        if previous:
+            with open(previous[-1], "rb") as f:
+                _, previous_sequence, count = _SNAPSHOT_HEADER.unpack(f.read(_SNAPSHOT_HEADER.size))
+                shutil.copyfileobj(f, out)
+        else:
+            previous_sequence = 0
+        for path in sealed:
+            for record_sequence, record, _ in _read_frames(path):
+                if previous_sequence < record_sequence <= snapshot_sequence:
+                    out.write(record)
+                    count += 1
+        return count
+
+    def _write_unarchived(self, out, previous, sealed, snapshot_sequence, excluded, archived):
+        """
+        Copies the previous snapshot's and the sealed segments' records, leaving out archived ones.
+
+        Returns:
+            tuple: (records written, {user_id: runs} of every position the new snapshot leaves out).
+        """
+        positions = {}  # {user_id: iterator over the insertion positions of the user's next records}
+        totals = {user_id: runs[-1][1] for user_id, runs in excluded.items() if runs}
+        count = 0
+
+        def copy(user_id, record):
+            nonlocal count
+            if user_id not in positions:
+                positions[user_id] = _unarchived_positions(excluded.get(user_id, ()))
+            position = next(positions[user_id])
+            totals[user_id] = max(totals.get(user_id, 0), position + 1)
+            if not _in_runs(archived.get(user_id, ()), position):
+                out.write(record)
+                count += 1
+
+        previous_sequence = 0
+        if previous:
+            with open(previous[-1], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                _, previous_sequence, previous_count = _SNAPSHOT_HEADER.unpack_from(buffer, 0)
+                offset = _SNAPSHOT_HEADER.size
+                for _ in range(previous_count):
+                    user_id, _, end = decode_record(buffer, offset)
+                    copy(user_id, buffer[offset:end])
+                    offset = end
+        for path in sealed:
+            for record_sequence, record, _ in _read_frames(path):
+                if previous_sequence < record_sequence <= snapshot_sequence:
+                    copy(decode_record(record, 0)[0], record)
+
+        # Only positions of records up to this snapshot are recorded; later ones are still in the journal
+        left_out = {}
+        for user_id, total in totals.items():
+            runs = [(start, min(stop, total)) for start, stop in archived.get(user_id, ()) if start < total]
+            runs = _merge_runs(list(excluded.get(user_id, ())) + runs)
+            if runs:
+                left_out[user_id] = runs
+        return count, left_out
+
+    def close(self):
+        """Flushes pending records, stops the writer thread, closes the segment and releases the directory."""
+        with self._lock:
+            self._closing = True
+            self._work.notify()
+        if self._thread is not None:
+            self._thread.join()
+        with self._file_lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+@task("journal.snapshot", priority=PRIORITY_LOW)
+def snapshot_journal():
+    """Folds the sealed journal of the attached workout journal into a new snapshot."""
+    from app.models import workout
+
+    if workout.journal is not None:
+        workout.journal.snapshot()
+
+
+def _run_snapshots(interval, stop):
+    # Used instead of the task runner when TASK_WORKERS=0
+    while not stop.wait(interval):
+        try:
+            snapshot_journal()
+        except Exception as e:
+            logger.error(f"Periodic workout snapshot failed: {e}")
+
+
+def init_journal(app):
+    """
+    Enables durability for the in-memory workout store when WORKOUT_JOURNAL_DIR is set.
+
+    Recovers `workout_logs` from disk, attaches the journal to `log_workout` and
+    schedules a snapshot every WORKOUT_SNAPSHOT_INTERVAL seconds on the app's task
+    runner (on a thread of its own when TASK_WORKERS=0). The journal
+    is process-wide, so later calls reuse the one already attached, and only one
+    process at a time may use a journal directory.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        WorkoutJournal: The attached journal, or None when journaling is disabled.
+
+    Raises:
+        RuntimeError: If another process holds the journal directory.
+    """
+    from app.models import workout
+
+    directory = app.config.get("WORKOUT_JOURNAL_DIR")
+    if not directory:
+        return None
+    if workout.journal is not None:
+        return workout.journal
+    if workout.router is not None:
+        logger.warning("WORKOUT_JOURNAL_DIR is ignored in sharded mode; shard data is kept in memory only")
+        return None
+
+    journal = WorkoutJournal(directory, sync=app.config.get("WORKOUT_JOURNAL_SYNC", True))
+    journal.lock()
+    journal.recover(workout.workout_logs)
+    for user_id, workouts in workout.workout_logs.items():
+        workout.workout_versions[user_id] = len(workouts)
+    journal.start()
+    workout.journal = journal
+    atexit.register(journal.close)
+    workouts_restored.send(None, workout_logs=workout.workout_logs)
+
+    interval = app.config.get("WORKOUT_SNAPSHOT_INTERVAL", 300)
+    runner = app.extensions.get("tasks")
+    if runner is not None:
+        runner.schedule("journal.snapshot", interval)
+    else:
+        threading.Thread(target=_run_snapshots, args=(interval, threading.Event()),
+                         name="workout-snapshots", daemon=True).start()
+    return journal
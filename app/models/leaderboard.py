@@ -0,0 +1,269 @@
+import bisect
+import logging
+from datetime import date as date_type, datetime, timedelta
+from app.models.locks import StripedLock
+from app.signals import workout_logged, workouts_restored
+
+logger = logging.getLogger(__name__)
+
+METRICS = ("max_weight", "volume")
+WINDOWS = ("day", "week", "all")
+
+# How many past buckets of each window stay queryable; older boards are dropped lazily
+RETAINED_BUCKETS = {"day": 14, "week": 8}
+
+# Most entries a query may return
+MAX_LIMIT = 100
+
+
+class RankedBoard:
+    """
+    Per-user scores kept in a sorted array for logarithmic rank lookups.
+
+    Entries are ordered by descending score, then by when the score was reached,
+    so the earlier of two equal scores ranks higher. Finding a user's entry or
+    rank is a binary search; top-k is a slice of the front of the array.
+    """
+
+    def __init__(self):
+        self._entries = []  # sorted [(-score, stamp)]
+        self._scores = {}  # {user_id: (score, stamp)}
+        self._owners = {}  # {stamp: user_id}
+        self._clock = 0
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _set(self, user_id, score):
+        current = self._scores.get(user_id)
+        if current is not None:
+            old_score, old_stamp = current
+            del self._entries[bisect.bisect_left(self._entries, (-old_score, old_stamp))]
+            del self._owners[old_stamp]
+        self._clock += 1
+        self._scores[user_id] = (score, self._clock)
+        self._owners[self._clock] = user_id
+        bisect.insort(self._entries, (-score, self._clock))
+
+    def record_max(self, user_id, value):
+        """Keeps the user's best single value."""
+        current = self._scores.get(user_id)
+        if current is None or value > current[0]:
+            self._set(user_id, value)
+
+    def record_sum(self, user_id, value):
+        """Adds a value to the user's running total."""
+        current = self._scores.get(user_id)
+        self._set(user_id, value + (current[0] if current else 0))
+
+    def top(self, limit):
+        """
+        Returns the highest-ranked users.
+
+        Args:
+            limit (int): The number of entries wanted.
+
+        Returns:
+            list: {"rank", "user_id", "score"} dictionaries, best first.
+        """
+        return [{"rank": rank, "user_id": self._owners[stamp], "score": -negative_score}
+                for rank, (negative_score, stamp) in enumerate(self._entries[:limit], start=1)]
+
+    def rank(self, user_id):
+        """
+        Returns a user's position on the board.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            dict: {"rank", "user_id", "score"}, or None if the user has no score.
+        """
+        current = self._scores.get(user_id)
+        if current is None:
+            return None
+        score, stamp = current
+        return {"rank": bisect.bisect_left(self._entries, (-score, stamp)) + 1, "user_id": user_id, "score": score}
+
+
+def bucket_for(window, day):
+    """
+    Returns the bucket key of a date for a window.
+
+    Args:
+        window (str): "day", "week" or "all".
+        day (datetime.date): The date, or None when unknown.
+
+    Returns:
+        datetime.date: The first day of the bucket, or None for the all-time window.
+    """
+    if window == "all" or day is None:
+        return None
+    if window == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+class Leaderboards:
+    """
+    Leaderboards per exercise, metric and time window, maintained on every write.
+
+    Each logged workout updates at most six boards (two metrics times three
+    windows) for its exercise, so no query ever scans workout history.
+    Day and week boards are kept per bucket, counted back from today; when a
+    new bucket is opened the buckets that fell out of the retention horizon
+    are discarded whole, so expiry never rescans entries. The first record or
+    query of each day also runs `expire` over every exercise, so boards of
+    exercises nobody logs anymore do not linger. Workouts dated after
+    tomorrow only count towards the all-time boards.
+    """
+
+    def __init__(self, retained_buckets=None, today=date_type.today):
+        self.retained_buckets = dict(RETAINED_BUCKETS, **(retained_buckets or {}))
+        self._today = today
+        self._boards = {}  # {(exercise_id, metric, window): {bucket: RankedBoard}}
+        self._locks = StripedLock()
+        self._expired_on = None
+
+    def _horizon(self, window):
+        span = timedelta(weeks=1) if window == "week" else timedelta(days=1)
+        return bucket_for(window, self._today()) - span * (self.retained_buckets[window] - 1)
+
+    def _retained(self, window, bucket):
+        # Buckets from the horizon up to tomorrow's, which leaves room for clients a timezone ahead
+        horizon = self._horizon(window)
+        return horizon, horizon <= bucket <= bucket_for(window, self._today() + timedelta(days=1))
+
+    def expire(self):
+        """
+        Drops the day and week buckets that fell out of the retention horizon on every board.
+
+        Returns:
+            int: The number of buckets dropped.
+        """
+        dropped = 0
+        for key in list(self._boards):
+            exercise_id, _, window = key
+            if window == "all":
+                continue
+            horizon = self._horizon(window)
+            with self._locks.for_key(exercise_id):
+                buckets = self._boards.get(key, {})
+                for expired in [bucket for bucket in buckets if bucket < horizon]:
+                    del buckets[expired]
+                    dropped += 1
+                if not buckets:
+                    self._boards.pop(key, None)
+        if dropped:
+            logger.info(f"Expired {dropped} leaderboard buckets")
+        return dropped
+
+    def _expire_daily(self):
+        # Called without an exercise lock held, since `expire` takes every exercise's lock
+        today = self._today()
+        if self._expired_on != today:
+            self._expired_on = today
+            self.expire()
+
+    def _board(self, exercise_id, metric, window, bucket, create):
+        key = (exercise_id, metric, window)
+        buckets = self._boards.get(key)
+        if buckets is None:
+            if not create:
+                return None
+            buckets = self._boards[key] = {}
+        if bucket is not None:
+            horizon, retained = self._retained(window, bucket)
+            if not retained:
+                return None
+        board = buckets.get(bucket)
+        if board is None and create:
+            board = buckets[bucket] = RankedBoard()
+            if bucket is not None:
+                for expired in [b for b in buckets if b < horizon]:
+                    del buckets[expired]
+        return board
+
+    def record(self, user_id, workout):
+        """
+        Applies one logged workout to the boards of its exercise.
+
+        Args:
+            user_id (int): The ID of the user.
+            workout (dict): The workout entry from `log_workout`.
+        """
+        try:
+            weight = float(workout.get("weight") or 0)
+            volume = weight * float(workout.get("repetitions") or 0)
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping leaderboard update for non-numeric workout of user {user_id}")
+            return
+        try:
+            day = datetime.strptime(workout.get("date"), "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            day = None
+
+        exercise_id = workout.get("exercise_id")
+        self._expire_daily()
+        with self._locks.for_key(exercise_id):
+            for window in WINDOWS:
+                bucket = bucket_for(window, day)
+                if window != "all" and bucket is None:
+                    continue
+                board = self._board(exercise_id, "max_weight", window, bucket, create=True)
+                if board is None:
+                    continue  # the workout is outside the retained buckets
+                board.record_max(user_id, weight)
+                self._board(exercise_id, "volume", window, bucket, create=True).record_sum(user_id, volume)
+
+    def query(self, exercise_id, metric="max_weight", window="week", day=None, limit=10, user_id=None):
+        """
+        Returns the top of a leaderboard and optionally one user's rank.
+
+        Args:
+            exercise_id (int): The ID of the exercise.
+            metric (str, optional): "max_weight" or "volume".
+            window (str, optional): "day", "week" or "all".
+            day (datetime.date, optional): A date inside the wanted day or week; defaults to today.
+            limit (int, optional): The number of top entries; at most MAX_LIMIT are returned.
+            user_id (int, optional): A user whose rank should be included.
+
+        Returns:
+            dict: {"leaderboard": [...], "user": {...} or None}.
+
+        Raises:
+            ValueError: If the metric or window is unknown, or the limit is below 1.
+        """
+        if metric not in METRICS or window not in WINDOWS:
+            raise ValueError(f"Unknown metric or window: {metric}, {window}")
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        limit = min(limit, MAX_LIMIT)
+        bucket = bucket_for(window, day or date_type.today())
+        self._expire_daily()
+        with self._locks.for_key(exercise_id):
+            board = self._board(exercise_id, metric, window, bucket, create=False)
+            if board is None:
+                return {"leaderboard": [], "user": None}
+            return {"leaderboard": board.top(limit),
+                    "user": board.rank(user_id) if user_id is not None else None}
+
+    def clear(self):
+        """Drops every board."""
+        self._boards.clear()
+
+
+leaderboards = Leaderboards()
+
+
+@workout_logged.connect
+def _on_workout_logged(sender, user_id, workout, **extra):
+    leaderboards.record(user_id, workout)
+
+
+@workouts_restored.connect
+def _on_workouts_restored(sender, workout_logs, **extra):
+    leaderboards.clear()
+    for user_id, workouts in list(workout_logs.items()):
+        for workout in list(workouts):
+            leaderboards.record(user_id, workout)
@@ -0,0 +1,30 @@
+import threading
+
+
+class StripedLock:
+    """
+    A fixed pool of locks selected by hashing a key.
+
+    Writers for the same key always take the same lock, while writers for
+    different keys are spread over `stripes` independent locks instead of
+    contending on a single global one.
+
+    Attributes:
+        stripes (int): The number of locks in the pool.
+    """
+
+    def __init__(self, stripes=64):
+        self.stripes = stripes
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def for_key(self, key):
+        """
+        Returns the lock guarding a key.
+
+        Args:
+            key (hashable): The key, usually a user ID.
+
+        Returns:
+            threading.Lock: The lock for the key's stripe.
+        """
+        return self._locks[hash(key) % self.stripes]
@@ -0,0 +1,162 @@
+import atexit
+import csv
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.user import User, hash_password
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("ndjson", "csv")
+
+# Hashing processes shared by every provisioning run, by worker count (in practice only PROVISION_WORKERS)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def parse_users(stream, fmt="ndjson"):
+    """
+    Parses account records from a text stream without reading it all into memory.
+
+    Args:
+        stream (io.TextIOBase): The text to parse, e.g. a file or wrapped request body.
+        fmt (str, optional): "ndjson" or "csv" (with a username,password header row).
+
+    Yields:
+        tuple: (username, password) pairs.
+
+    Raises:
+        ValueError: If the format is unsupported or a record is malformed; the message
+            includes the line number.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        records = ((reader.line_num, row) for row in reader)
+    elif fmt == "ndjson":
+        records = ((number, json.loads(line)) for number, line in enumerate(stream, start=1) if line.strip())
+    else:
+        raise ValueError(f"Unsupported provisioning format: {fmt}")
+
+    line = 0
+    try:
+        for line, record in records:
+            username, password = record["username"], record["password"]
+            if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+                raise ValueError("username and password must be non-empty strings")
+            yield username, password
+    except (KeyError, TypeError, ValueError, csv.Error) as e:
+        raise ValueError(f"Invalid user at line {line}: {e}") from e
+
+
+def _hashing_pool(workers):
+    """
+    Returns the shared pool of `workers` hashing processes, starting it on first use.
+
+    The workers are spawned rather than forked, so they don't inherit the app's
+    threads, locks or database connections, and are kept until the process exits.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        return pool
+
+
+@atexit.register
+def _shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
+
+
+def _existing_usernames(usernames):
+    """Returns which of the given usernames are already taken, using a single query."""
+    return set(db.session.scalars(select(User.username).where(User.username.in_(usernames))))
+
+
+def _insert_batch(batch, hash_many):
+    """
+    Hashes and inserts one batch, returning (created, conflicting usernames).
+
+    Conflicts are found with one IN query before hashing, so no work is spent on
+    taken usernames. If a concurrent writer claims a username between the query
+    and the insert, the unique index rejects the batch; it is rolled back and
+    retried once with the new conflicts removed.
+    """
+    for attempt in range(2):
+        taken = _existing_usernames(list(batch))
+        pending = [(username, password) for username, password in batch.items() if username not in taken]
+        if not pending:
+            return 0, taken
+        hashes = hash_many([password for _, password in pending])
+        rows = [{"username": username, "salt": salt, "password_hash": password_hash}
+                for (username, _), (salt, password_hash) in zip(pending, hashes)]
+        try:
+            db.session.execute(insert(User), rows)
+            db.session.commit()
+            return len(rows), taken
+        except IntegrityError:
+            db.session.rollback()
+            if attempt:
+                raise
+            logger.warning("Username conflict while provisioning a batch; retrying without new conflicts")
+
+
+def provision_users(users, batch_size=1000, workers=None):
+    """
+    Creates many accounts with batched inserts and parallel password hashing.
+
+    Users are processed in batches of `batch_size`. Each batch costs one query to
+    find usernames that already exist, a parallel hashing pass over the shared
+    process pool, and a single executemany insert and commit. Usernames that exist, or
+    repeat earlier in the input, are skipped and reported as conflicts.
+
+    Args:
+        users (iterable): (username, password) pairs, e.g. from `parse_users`.
+        batch_size (int, optional): Number of users per insert.
+        workers (int, optional): Hashing processes; defaults to the CPU count. With
+            1 or fewer, passwords are hashed in the calling process.
+
+    Returns:
+        dict: {"created": int, "conflicts": [username]}.
+
+    Raises:
+        ValueError: If a record is malformed. Batches already committed are kept.
+    """
+    workers = os.cpu_count() if workers is None else workers
+    pool = _hashing_pool(workers) if workers > 1 else None
+
+    def hash_many(passwords):
+        if pool is None:
+            return [hash_password(password) for password in passwords]
+        return list(pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+    created = 0
+    conflicts = []
+    seen = set()
+    batch = {}
+    for username, password in users:
+        if username in seen:
+            conflicts.append(username)
+            continue
+        seen.add(username)
+        batch[username] = password
+        if len(batch) >= batch_size:
+            inserted, taken = _insert_batch(batch, hash_many)
+            created += inserted
+            conflicts.extend(taken)
+            batch = {}
+    if batch:
+        inserted, taken = _insert_batch(batch, hash_many)
+        created += inserted
+        conflicts.extend(taken)
+
+    logger.info(f"Provisioned {created} accounts ({len(conflicts)} conflicting usernames skipped)")
+    return {"created": created, "conflicts": conflicts}
@@ -1,15 +1,112 @@
 import logging
 import requests
 import os
+from urllib.parse import parse_qsl, urlsplit
+from app.circuit_breaker import CircuitOpenError, LastKnownGood, breaker_for
+from app.models.changelog import changelog
+from app.models.locks import StripedLock
+from app.signals import catalog_fetched, favorite_removed, favorite_saved
+from app.tasks import PRIORITY_LOW, task
+from app.tracing import current_span, span
 
 logger = logging.getLogger(__name__)
 favorite_exercises = {}
+favorite_versions = {}  # {user_id: int}, bumped on every change to a user's favorites
+
+# Guards the per-user duplicate check and insert; readers copy the list without locking
+favorite_locks = StripedLock()
+
+# Optional ShardRouter attached by init_sharding, forwarding favorites to the owning shard
+router = None
 
 # External API Configuration
-WGER_API_URL = "https://wger.de/api/v2/exercise/"
+WGER_API_BASE = "https://wger.de/api/v2/"
+WGER_API_URL = f"{WGER_API_BASE}exercise/"
 WGER_API_HEADERS = {
     "Authorization": f"Token {os.getenv('WGER_API_KEY')}"
 }
+WGER_TIMEOUT = float(os.getenv('WGER_TIMEOUT', 5))
+# Exercises requested per page when the whole catalog is fetched
+WGER_PAGE_SIZE = int(os.getenv('WGER_PAGE_SIZE', 100))
+
+# The last successful wger response per endpoint and filters, served while its circuit is open
+last_known_good = LastKnownGood()
+
+
+class ExerciseList(list):
+    """
+    Exercises returned by `fetch_exercises`.
+
+    Attributes:
+        stale_age (float): Seconds since the exercises were fetched if they are the last
+            known good response served during a wger failure, or None if they are fresh.
+    """
+
+    def __init__(self, exercises=(), stale_age=None):
+        super().__init__(exercises)
+        self.stale_age = stale_age
+
+
+def fetch_wger(endpoint, params):
+    """
+    GETs a wger endpoint through its circuit breaker.
+
+    Each endpoint has its own breaker. When the circuit is open, or the call fails,
+    the last successful response for the same parameters is returned instead;
+    while open, wger is not called at all, so callers never wait on a known outage.
+
+    Args:
+        endpoint (str): The API path below WGER_API_BASE, e.g. "exercise".
+        params (dict): Query parameters; None values are left out.
+
+    Returns:
+        tuple: (payload, stale_age), where stale_age is None for a fresh response
+        and otherwise the age in seconds of the last known good payload.
+
+    Raises:
+        CircuitOpenError: If the circuit is open and no earlier response exists.
+        requests.RequestException: If the call failed and no earlier response exists.
+    """
+    breaker = breaker_for(f"wger:{endpoint}")
+    key = (endpoint, tuple(sorted((name, str(value)) for name, value in params.items() if value is not None)))
+
+    if not breaker.allow():
+        cached = last_known_good.get(key)
+        request_span = current_span()
+        if request_span is not None:
+            request_span.set_attribute(f"wger.{endpoint}.circuit", "open")
+        if cached is None:
+            raise CircuitOpenError(f"wger {endpoint} circuit is open")
+        logger.warning(f"wger {endpoint} circuit is open; serving response from {cached[1]:.0f}s ago")
+        return cached
+
+    try:
+        with span("wger.get", endpoint=endpoint) as call:
+            headers = WGER_API_HEADERS if call is None else dict(WGER_API_HEADERS, traceparent=call.traceparent())
+            response = requests.get(f"{WGER_API_BASE}{endpoint}/", headers=headers, params=params,
+                                    timeout=WGER_TIMEOUT)
+            if call is not None:
+                call.set_attribute("http.status_code", response.status_code)
+        if response.status_code != 200:
+            logger.error(f"Wger API error: {response.status_code} - {response.text}")
+            if response.status_code >= 500 or response.status_code == 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise requests.HTTPError(f"Wger API error: {response.status_code}", response=response)
+        payload = response.json()
+    except Exception as e:
+        if not isinstance(e, requests.HTTPError):  # status errors were recorded above
+            breaker.record_failure()
+        cached = last_known_good.get(key)
+        if cached is None:
+            raise
+        logger.warning(f"wger {endpoint} call failed; serving response from {cached[1]:.0f}s ago")
+        return cached
+
+    breaker.record_success()
+    last_known_good.put(key, payload)
+    return payload, None
 
 
 def fetch_exercises(category=None, equipment=None):
@@ -21,22 +118,70 @@ def fetch_exercises(category=None, equipment=None):
         equipment (str, optional): ID for filtering exercises by equipment.
 
     Returns:
-        list: A list of exercise dictionaries.
+        ExerciseList: A list of exercise dictionaries. During a wger failure it holds the
+        last successful result for the same filters, with `stale_age` set, or is empty.
     """
     try:
-        params = {"language": 2, "category": category, "equipment": equipment}
-        response = requests.get(WGER_API_URL, headers=WGER_API_HEADERS, params=params)
-
-        if response.status_code == 200:
-            exercises = response.json().get("results", [])
-            logger.info(f"Successfully fetched {len(exercises)} exercises.")
-            return exercises
-        else:
-            logger.error(f"Wger API error: {response.status_code} - {response.text}")
-            return []
+        payload, stale_age = fetch_wger("exercise", {"language": 2, "category": category, "equipment": equipment})
     except Exception as e:
         logger.error(f"Error fetching exercises: {str(e)}")
-        return []
+        return ExerciseList()
+
+    exercises = payload.get("results", [])
+    if stale_age is None:
+        logger.info(f"Successfully fetched {len(exercises)} exercises.")
+        catalog_fetched.send(None, exercises=exercises)
+    return ExerciseList(exercises, stale_age)
+
+
+def fetch_catalog():
+    """
+    Fetches the whole exercise catalog, following wger's `next` links page by page.
+
+    Returns:
+        ExerciseList: Every exercise of the catalog. If any page was served from the last
+        known good responses, `stale_age` is the oldest page's age; if a page could not be
+        fetched at all, the list is empty, since a partial catalog cannot be told apart
+        from one with exercises removed.
+    """
+    exercises = ExerciseList()
+    params = {"language": 2, "limit": WGER_PAGE_SIZE, "offset": 0}
+    seen = set()
+    try:
+        while params is not None:
+            key = tuple(sorted(params.items()))
+            if key in seen:
+                raise RuntimeError(f"wger pagination loops back to {params}")
+            seen.add(key)
+            payload, stale_age = fetch_wger("exercise", params)
+            exercises.extend(payload.get("results", []))
+            if stale_age is not None:
+                exercises.stale_age = max(exercises.stale_age or 0.0, stale_age)
+            next_url = payload.get("next")
+            params = dict(parse_qsl(urlsplit(next_url).query)) if next_url else None
+    except Exception as e:
+        logger.error(f"Error fetching the exercise catalog: {str(e)}")
+        return ExerciseList()
+
+    logger.info(f"Fetched {len(exercises)} exercises in {len(seen)} catalog pages.")
+    return exercises
+
+
+@task("catalog.refresh", priority=PRIORITY_LOW, retries=2)
+def refresh_catalog():
+    """
+    Fetches the whole exercise catalog in the background and reconciles the search index with it,
+    so it is indexed before a request needs it and exercises removed from wger drop out.
+
+    Raises:
+        RuntimeError: If wger could not be reached, so the runner retries it.
+    """
+    from app.models.search import exercise_index
+
+    exercises = fetch_catalog()
+    if exercises.stale_age is not None or not exercises:
+        raise RuntimeError("wger exercise catalog unavailable")
+    exercise_index.reconcile(exercises)
 
 
 def save_favorite_exercise(user_id, exercise_id, name, description=""):
@@ -52,21 +197,63 @@ def save_favorite_exercise(user_id, exercise_id, name, description=""):
     Returns:
         dict: A dictionary representing the saved exercise.
     """
-    if user_id not in favorite_exercises:
-        favorite_exercises[user_id] = []
+    if router is not None:
+        exercise = router.call(user_id, "save_favorite_exercise", user_id, exercise_id, name, description)
+        if "exercise_id" in exercise:
+            favorite_saved.send(None, user_id=user_id, exercise=exercise)
+        return exercise
 
-    # Avoid duplicate entries for the same exercise
-    for exercise in favorite_exercises[user_id]:
-        if exercise["exercise_id"] == exercise_id:
-            logger.warning(f"Exercise ID {exercise_id} is already in favorites for user {user_id}.")
-            return {"message": "Exercise already exists in favorites"}
+    with favorite_locks.for_key(user_id):
+        if user_id not in favorite_exercises:
+            favorite_exercises[user_id] = []
 
-    exercise = {"exercise_id": exercise_id, "name": name, "description": description}
-    favorite_exercises[user_id].append(exercise)
+        # Avoid duplicate entries for the same exercise
+        for exercise in favorite_exercises[user_id]:
+            if exercise["exercise_id"] == exercise_id:
+                logger.warning(f"Exercise ID {exercise_id} is already in favorites for user {user_id}.")
+                return {"message": "Exercise already exists in favorites"}
+
+        exercise = {"exercise_id": exercise_id, "name": name, "description": description}
+        favorite_exercises[user_id].append(exercise)
+        favorite_versions[user_id] = favorite_versions.get(user_id, 0) + 1
+        changelog.record(user_id, "favorite", "add", exercise)
     logger.info(f"Saved favorite exercise for user {user_id}: {exercise}")
+    favorite_saved.send(None, user_id=user_id, exercise=exercise)
     return exercise
 
 
+def remove_favorite_exercise(user_id, exercise_id):
+    """
+    Removes an exercise from a user's favorites.
+
+    Args:
+        user_id (int): The ID of the user.
+        exercise_id (int): The ID of the exercise from the API.
+
+    Returns:
+        bool: True if the exercise was a favorite and has been removed.
+    """
+    if router is not None:
+        removed = router.call(user_id, "remove_favorite_exercise", user_id, exercise_id)
+        if removed:
+            favorite_removed.send(None, user_id=user_id, exercise_id=exercise_id)
+        return removed
+
+    with favorite_locks.for_key(user_id):
+        favorites = favorite_exercises.get(user_id, [])
+        remaining = [exercise for exercise in favorites if exercise["exercise_id"] != exercise_id]
+        if len(remaining) == len(favorites):
+            logger.warning(f"Exercise ID {exercise_id} is not in favorites for user {user_id}.")
+            return False
+        # Replaced rather than edited in place, so lock-free readers copy either list whole
+        favorite_exercises[user_id] = remaining
+        favorite_versions[user_id] = favorite_versions.get(user_id, 0) + 1
+        changelog.record(user_id, "favorite", "delete", {"exercise_id": exercise_id})
+    logger.info(f"Removed favorite exercise {exercise_id} for user {user_id}")
+    favorite_removed.send(None, user_id=user_id, exercise_id=exercise_id)
+    return True
+
+
 def get_favorite_exercises(user_id):
     """
     Retrieves all favorite exercises for a user.
@@ -75,6 +262,23 @@ def get_favorite_exercises(user_id):
         user_id (int): The ID of the user.
 
     Returns:
-        list: A list of favorite exercises.
+        list: A snapshot of the user's favorite exercises.
+    """
+    if router is not None:
+        return router.call(user_id, "get_favorite_exercises", user_id)
+    return list(favorite_exercises.get(user_id, ()))
+
+
+def get_favorites_version(user_id):
+    """
+    Returns the current version of a user's favorite exercises.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The version counter, incremented on every saved or removed favorite.
     """
-    return favorite_exercises.get(user_id, [])
+    if router is not None:
+        return router.call(user_id, "get_favorites_version", user_id)
+    return favorite_versions.get(user_id, 0)
@@ -0,0 +1,313 @@
+import heapq
+import logging
+import math
+import threading
+from app.models.recommendations import favorite_exercises
+from app.signals import favorite_removed, favorite_saved, workout_logged, workouts_restored
+from app.tasks import PRIORITY_LOW, task
+
+logger = logging.getLogger(__name__)
+
+
+class CooccurrenceIndex:
+    """
+    Incrementally maintained item-item co-occurrence index over user interactions.
+
+    An interaction is a user logging or favoriting an exercise. When a user
+    interacts with a new exercise, its co-occurrence count with each exercise
+    the user already has is incremented, so an update costs O(items of the user)
+    and never rescans other users. Interactions are counted per user and
+    exercise, and `forget` undoes one (a removed favorite); the exercise only
+    leaves the user's set once none are left. Similarity is cosine over user
+    sets: co(i, j) / sqrt(users(i) * users(j)).
+
+    Each exercise keeps a precomputed list of its `neighbors` most similar
+    exercises. Lists touched by a write are only marked dirty and rebuilt on
+    their next read or by `refresh`, which keeps writes cheap; lists of
+    exercises whose popularity changed are refreshed by `refresh` as well,
+    which builds them off the lock and swaps them in.
+
+    Attributes:
+        neighbors (int): Length of each precomputed neighbor list.
+    """
+
+    def __init__(self, neighbors=20):
+        self.neighbors = neighbors
+        self._user_items = {}  # {user_id: {exercise_id: number of interactions}}
+        self._item_users = {}  # {exercise_id: number of users}
+        self._cooccurrence = {}  # {exercise_id: {exercise_id: count}}
+        self._neighbor_lists = {}  # {exercise_id: [(similarity, exercise_id)]}
+        self._dirty = set()
+        self._touched = None  # exercises written while `refresh` builds lists off the lock
+        self._lock = threading.Lock()
+
+    def _mark_dirty(self, exercise_id):
+        self._dirty.add(exercise_id)
+        if self._touched is not None:
+            self._touched.add(exercise_id)
+
+    def observe(self, user_id, exercise_id):
+        """
+        Records that a user interacted with an exercise.
+
+        Args:
+            user_id (int): The ID of the user.
+            exercise_id (int): The ID of the exercise.
+        """
+        with self._lock:
+            items = self._user_items.setdefault(user_id, {})
+            if exercise_id in items:
+                items[exercise_id] += 1
+                return
+            row = self._cooccurrence.setdefault(exercise_id, {})
+            for other in items:
+                row[other] = row.get(other, 0) + 1
+                other_row = self._cooccurrence[other]
+                other_row[exercise_id] = other_row.get(exercise_id, 0) + 1
+                self._mark_dirty(other)
+            items[exercise_id] = 1
+            self._item_users[exercise_id] = self._item_users.get(exercise_id, 0) + 1
+            self._mark_dirty(exercise_id)
+
+    def forget(self, user_id, exercise_id):
+        """
+        Undoes one interaction of a user with an exercise, e.g. when a favorite is removed.
+
+        Args:
+            user_id (int): The ID of the user.
+            exercise_id (int): The ID of the exercise.
+        """
+        with self._lock:
+            items = self._user_items.get(user_id)
+            if not items or exercise_id not in items:
+                return
+            items[exercise_id] -= 1
+            if items[exercise_id]:
+                return
+            del items[exercise_id]
+            if not items:
+                del self._user_items[user_id]
+            row = self._cooccurrence[exercise_id]
+            for other in items:
+                other_row = self._cooccurrence[other]
+                for counts, key in ((row, other), (other_row, exercise_id)):
+                    counts[key] -= 1
+                    if not counts[key]:
+                        del counts[key]
+                self._mark_dirty(other)
+            self._item_users[exercise_id] -= 1
+            if self._item_users[exercise_id]:
+                self._mark_dirty(exercise_id)
+            else:
+                del self._item_users[exercise_id]
+                del self._cooccurrence[exercise_id]
+                self._neighbor_lists.pop(exercise_id, None)
+                self._dirty.discard(exercise_id)
+
+    def _similar(self, exercise_id, item_users, row):
+        count = item_users[exercise_id]
+        return heapq.nlargest(
+            self.neighbors,
+            ((shared / math.sqrt(count * item_users[other]), other) for other, shared in row.items())
+        )
+
+    def _build_neighbors(self, exercise_id):
+        self._neighbor_lists[exercise_id] = self._similar(exercise_id, self._item_users,
+                                                          self._cooccurrence.get(exercise_id, {}))
+        self._dirty.discard(exercise_id)
+
+    def neighbors_of(self, exercise_id):
+        """
+        Returns the precomputed most similar exercises.
+
+        Args:
+            exercise_id (int): The ID of the exercise.
+
+        Returns:
+            list: (similarity, exercise_id) tuples, most similar first.
+        """
+        with self._lock:
+            if exercise_id in self._dirty:
+                self._build_neighbors(exercise_id)
+            return self._neighbor_lists.get(exercise_id, [])
+
+    def refresh(self):
+        """
+        Rebuilds every neighbor list so similarities reflect current popularity.
+
+        The counts are copied under the lock, the lists are built from the copy
+        without it and then swapped in at once, so reads and writes only wait for
+        the copy and the swap. Exercises written meanwhile stay dirty and are
+        rebuilt on their next read.
+
+        Returns:
+            int: The number of lists rebuilt.
+        """
+        with self._lock:
+            if self._touched is not None:
+                return 0  # another refresh is building the lists
+            item_users = dict(self._item_users)
+            rows = {exercise_id: dict(row) for exercise_id, row in self._cooccurrence.items()}
+            self._touched = set()
+        try:
+            lists = {exercise_id: self._similar(exercise_id, item_users, rows.get(exercise_id, {}))
+                     for exercise_id in item_users}
+        except Exception:
+            with self._lock:
+                self._touched = None
+            raise
+        with self._lock:
+            touched, self._touched = self._touched, None
+            for exercise_id, neighbor_list in lists.items():
+                if exercise_id in self._item_users:
+                    self._neighbor_lists[exercise_id] = neighbor_list
+                    if exercise_id not in touched:
+                        self._dirty.discard(exercise_id)
+        return len(lists)
+
+    def seen(self, user_id):
+        """
+        Returns the exercises a user has already interacted with.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            set: A copy of the user's exercise IDs.
+        """
+        with self._lock:
+            return set(self._user_items.get(user_id, ()))
+
+    def recommend(self, user_id, limit=10):
+        """
+        Scores unseen exercises by summing their similarity to the user's exercises.
+
+        Only the neighbor lists of the user's own exercises are read, so the cost
+        depends on the user's history size and `neighbors`, not on the catalog.
+
+        Args:
+            user_id (int): The ID of the user.
+            limit (int, optional): The maximum number of recommendations; None for every scored exercise.
+
+        Returns:
+            list: (exercise_id, score) tuples, best first.
+        """
+        with self._lock:
+            items = self._user_items.get(user_id)
+            if not items:
+                return []
+            scores = {}
+            for exercise_id in items:
+                if exercise_id in self._dirty:
+                    self._build_neighbors(exercise_id)
+                for similarity, other in self._neighbor_lists.get(exercise_id, ()):
+                    if other not in items:
+                        scores[other] = scores.get(other, 0.0) + similarity
+        return heapq.nlargest(len(scores) if limit is None else limit, scores.items(), key=lambda item: item[1])
+
+    def clear(self):
+        """Drops every interaction and neighbor list."""
+        with self._lock:
+            self._user_items.clear()
+            self._item_users.clear()
+            self._cooccurrence.clear()
+            self._neighbor_lists.clear()
+            self._dirty.clear()
+
+    def __len__(self):
+        return len(self._user_items)
+
+
+index = CooccurrenceIndex()
+
+
+@workout_logged.connect
+def _on_workout_logged(sender, user_id, workout, **extra):
+    index.observe(user_id, workout["exercise_id"])
+
+
+@favorite_saved.connect
+def _on_favorite_saved(sender, user_id, exercise, **extra):
+    index.observe(user_id, exercise["exercise_id"])
+
+
+@favorite_removed.connect
+def _on_favorite_removed(sender, user_id, exercise_id, **extra):
+    index.forget(user_id, exercise_id)
+
+
+def rebuild_index(workout_logs, favorite_exercises):
+    """
+    Rebuilds the co-occurrence index from the current stores.
+
+    Used after the workout store has been restored at startup, since recovered
+    entries do not go through `log_workout`.
+
+    Args:
+        workout_logs (dict): {user_id: [workout]} as in the workout store.
+        favorite_exercises (dict): {user_id: [exercise]} as in the favorites store.
+
+    Returns:
+        int: The number of users indexed.
+    """
+    index.clear()
+    for user_id, workouts in list(workout_logs.items()):
+        for workout in list(workouts):
+            index.observe(user_id, workout["exercise_id"])
+    for user_id, favorites in list(favorite_exercises.items()):
+        for exercise in list(favorites):
+            index.observe(user_id, exercise["exercise_id"])
+    index.refresh()
+    logger.info(f"Rebuilt recommendation index for {len(index)} users")
+    return len(index)
+
+
+@workouts_restored.connect
+def _on_workouts_restored(sender, workout_logs, **extra):
+    rebuild_index(workout_logs, favorite_exercises)
+
+
+@task("recommender.refresh", priority=PRIORITY_LOW)
+def refresh_index():
+    """Rebuilds every neighbor list in the background, so popularity changes reach idle exercises too."""
+    rebuilt = index.refresh()
+    logger.info(f"Refreshed {rebuilt} recommendation neighbor lists")
+
+
+def personalized_recommendations(user_id, limit=10, catalog=None):
+    """
+    Returns top-k personalized exercises for a user, topped up from the catalog.
+
+    With a catalog, only the exercises it contains are recommended, so the
+    filters it was fetched with (e.g. category and equipment) apply, and each
+    one is returned as its catalog entry with a "score" added.
+
+    Args:
+        user_id (int): The ID of the user.
+        limit (int, optional): The number of exercises wanted.
+        catalog (list, optional): Catalog exercise dictionaries to choose from.
+
+    Returns:
+        list: Personalized exercises, best first, followed by catalog exercises the
+        user has not interacted with yet. Without a catalog, entries are only
+        {"id": int, "score": float}.
+    """
+    if catalog is None:
+        return [{"id": exercise_id, "score": round(score, 6)}
+                for exercise_id, score in index.recommend(user_id, limit)]
+
+    by_id = {exercise.get("id"): exercise for exercise in catalog}
+    exercises = []
+    for exercise_id, score in index.recommend(user_id, limit=None):
+        if len(exercises) >= limit:
+            break
+        if exercise_id in by_id:
+            exercises.append(dict(by_id[exercise_id], score=round(score, 6)))
+    if len(exercises) < limit:
+        excluded = index.seen(user_id) | {exercise["id"] for exercise in exercises}
+        for exercise in catalog:
+            if len(exercises) >= limit:
+                break
+            if exercise.get("id") not in excluded:
+                exercises.append(exercise)
+    return exercises
@@ -0,0 +1,653 @@
+import bisect
+import functools
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from operator import itemgetter
+from datetime import date as date_type, datetime, timedelta
+from app.tasks import PRIORITY_LOW, task
+
+logger = logging.getLogger(__name__)
+
+# Segment files: <user_id>/<offset>_<count>_<first date>_<last date>.ndjson.gz plus a .summary.json
+# sidecar and a .positions.json sidecar listing the [start, stop) runs of the rows' positions in the
+# user's insertion order. The offset is the first row's position; segments written before the
+# positions sidecar existed hold the contiguous run starting there.
+SEGMENT_SUFFIX = ".ndjson.gz"
+SUMMARY_SUFFIX = ".summary.json"
+POSITIONS_SUFFIX = ".positions.json"
+
+Segment = namedtuple("Segment", "path offset count first_date last_date runs")
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def summarize(workouts, summaries=None):
+    """
+    Rolls raw workout entries into daily per-exercise summaries.
+
+    Args:
+        workouts (iterable): Workout entries with a YYYY-MM-DD date.
+        summaries (dict, optional): Existing {(date, exercise_id): summary} to add to.
+
+    Returns:
+        dict: {(date, exercise_id): {"date", "exercise_id", "sets", "repetitions",
+        "volume", "max_weight"}}.
+    """
+    summaries = {} if summaries is None else summaries
+    for workout in workouts:
+        try:
+            weight = float(workout.get("weight") or 0)
+            repetitions = int(workout.get("repetitions") or 0)
+        except (TypeError, ValueError):
+            weight, repetitions = 0.0, 0
+        key = (workout.get("date"), workout.get("exercise_id"))
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = {"date": key[0], "exercise_id": key[1], "sets": 0,
+                                        "repetitions": 0, "volume": 0.0, "max_weight": 0.0}
+        summary["sets"] += 1
+        summary["repetitions"] += repetitions
+        summary["volume"] += weight * repetitions
+        summary["max_weight"] = max(summary["max_weight"], weight)
+    return summaries
+
+
+def _to_runs(positions):
+    """Collapses sorted positions into [start, stop) runs."""
+    runs = []
+    for position in positions:
+        if runs and runs[-1][1] == position:
+            runs[-1][1] = position + 1
+        else:
+            runs.append([position, position + 1])
+    return [tuple(run) for run in runs]
+
+
+def _merge_runs(runs):
+    merged = []
+    for start, stop in sorted(runs):
+        if merged and merged[-1][1] >= start:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return [tuple(run) for run in merged]
+
+
+def _unarchived_positions(runs):
+    """Yields, in order, the insertion positions outside the archived runs, i.e. those of the hot entries."""
+    position = 0
+    for start, stop in runs:
+        while position < start:
+            yield position
+            position += 1
+        position = max(position, stop)
+    yield from itertools.count(position)
+
+
+@functools.lru_cache(maxsize=32)
+def _read_segment(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return tuple(json.loads(line) for line in f)
+
+
+def _iter_segment(segment, start_position):
+    """Yields a segment's (position, entry) rows from `start_position` on, decompressing one line at a time."""
+    positions = itertools.chain.from_iterable(itertools.starmap(range, segment.runs))
+    with gzip.open(segment.path, "rt", encoding="utf-8") as f:
+        for position, line in zip(positions, f):
+            if position >= start_position:
+                yield position, json.loads(line)
+
+
+class _ArchiveChanged(Exception):
+    """Raised while iterating a user's entries when a sweep archived more of them meanwhile."""
+
+
+class WorkoutArchive:
+    """
+    Compressed on-disk segments of raw workout entries, read only when queried.
+
+    Each segment holds some of one user's entries in insertion order,
+    gzip-compressed as NDJSON, with small JSON sidecars of its daily summaries
+    and of the entries' positions in the user's insertion order. Only segment
+    metadata and the archived positions, as runs, are kept in memory; a query
+    decompresses just the segments whose date span overlaps the requested
+    range, and recently read segments are cached.
+
+    Attributes:
+        directory (str): The directory holding one subdirectory of segments per user.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._segments = {}  # {user_id: [Segment] ordered by offset}
+        self._runs = {}  # {user_id: merged [(start, stop)] of every archived position}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def load(self):
+        """
+        Indexes the segments already on disk.
+
+        Returns:
+            int: The number of segments found.
+        """
+        found = 0
+        for name in os.listdir(self.directory):
+            user_dir = os.path.join(self.directory, name)
+            if not os.path.isdir(user_dir):
+                continue
+            user_id = int(name) if name.lstrip("-").isdigit() else name
+            segments = []
+            for filename in os.listdir(user_dir):
+                if not filename.endswith(SEGMENT_SUFFIX):
+                    continue
+                stem = filename[:-len(SEGMENT_SUFFIX)]
+                offset, count, first, last = stem.split("_")
+                runs = [(int(offset), int(offset) + int(count))]
+                positions_path = os.path.join(user_dir, stem + POSITIONS_SUFFIX)
+                if os.path.exists(positions_path):
+                    with open(positions_path, encoding="utf-8") as f:
+                        runs = [tuple(run) for run in json.load(f)]
+                segments.append(Segment(os.path.join(user_dir, filename), int(offset), int(count),
+                                        _parse_date(first), _parse_date(last), runs))
+            if segments:
+                self._segments[user_id] = sorted(segments, key=lambda segment: segment.offset)
+                self._runs[user_id] = _merge_runs(run for segment in segments for run in segment.runs)
+                found += len(segments)
+        logger.info(f"Indexed {found} workout archive segments")
+        return found
+
+    def archived_count(self, user_id):
+        """Returns how many of a user's entries are archived."""
+        return sum(stop - start for start, stop in self._runs.get(user_id, ()))
+
+    def archived_runs(self, user_id):
+        """Returns the [start, stop) runs of a user's archived insertion positions, in order."""
+        return self._runs.get(user_id, [])
+
+    def is_archived(self, user_id, position):
+        """Returns whether the entry at a position of a user's insertion order is archived."""
+        runs = self._runs.get(user_id, ())
+        index = bisect.bisect_right(runs, (position, float("inf"))) - 1
+        return index >= 0 and position < runs[index][1]
+
+    def users(self):
+        """Returns the IDs of users with archived entries."""
+        return list(self._segments)
+
+    def all_runs(self):
+        """Returns a copy of every user's archived runs, as {user_id: [(start, stop)]}."""
+        with self._lock:
+            return {user_id: list(runs) for user_id, runs in self._runs.items()}
+
+    def has_entries(self, user_id):
+        """Returns whether any of a user's entries are archived."""
+        return user_id in self._segments
+
+    def write(self, user_id, workouts, positions):
+        """
+        Adds a segment with some of the user's entries.
+
+        The segment and its sidecars are written to temporary files, fsynced and
+        renamed, the segment last, so a crash never leaves a partial segment behind.
+
+        Args:
+            user_id (int): The ID of the user.
+            workouts (list): The entries to archive in insertion order; their dates must be valid.
+            positions (list): Each entry's position in the user's insertion order, ascending;
+                none may be archived already.
+
+        Returns:
+            Segment: The written segment.
+        """
+        dates = [_parse_date(workout["date"]) for workout in workouts]
+        runs = _to_runs(positions)
+        user_dir = os.path.join(self.directory, str(user_id))
+        os.makedirs(user_dir, exist_ok=True)
+        with self._lock:
+            offset = positions[0]
+            stem = os.path.join(user_dir, f"{offset:012d}_{len(workouts)}_{min(dates)}_{max(dates)}")
+
+            for suffix, content in ((SUMMARY_SUFFIX, list(summarize(workouts).values())), (POSITIONS_SUFFIX, runs)):
+                with open(stem + suffix + ".tmp", "w", encoding="utf-8") as f:
+                    json.dump(content, f, separators=(",", ":"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(stem + suffix + ".tmp", stem + suffix)
+
+            segment_path = stem + SEGMENT_SUFFIX
+            with open(segment_path + ".tmp", "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as f:
+                    for workout in workouts:
+                        f.write(json.dumps(workout, separators=(",", ":")).encode("utf-8"))
+                        f.write(b"\n")
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(segment_path + ".tmp", segment_path)
+
+            segment = Segment(segment_path, offset, len(workouts), min(dates), max(dates), runs)
+            self._segments[user_id] = sorted(self._segments.get(user_id, []) + [segment],
+                                             key=lambda segment: segment.offset)
+            self._runs[user_id] = _merge_runs(self._runs.get(user_id, []) + runs)
+        return segment
+
+    def _overlapping(self, user_id, start, end):
+        return [segment for segment in self._segments.get(user_id, ())
+                if (start is None or segment.last_date >= start) and (end is None or segment.first_date <= end)]
+
+    def read(self, user_id, start=None, end=None):
+        """
+        Returns archived entries from the segments overlapping a date range.
+
+        Rows of an overlapping segment are returned whole; callers filter by date.
+
+        Args:
+            user_id (int): The ID of the user.
+            start (datetime.date, optional): First day of the range.
+            end (datetime.date, optional): Last day of the range.
+
+        Returns:
+            list: (position, entry) pairs in insertion order.
+        """
+        rows = []
+        for segment in self._overlapping(user_id, start, end):
+            positions = itertools.chain.from_iterable(itertools.starmap(range, segment.runs))
+            rows.extend(zip(positions, _read_segment(segment.path)))
+        rows.sort(key=itemgetter(0))
+        return rows
+
+    def read_summaries(self, user_id, start=None, end=None):
+        """
+        Returns the daily summaries stored with the segments overlapping a date range.
+
+        Args:
+            user_id (int): The ID of the user.
+            start (datetime.date, optional): First day of the range.
+            end (datetime.date, optional): Last day of the range.
+
+        Returns:
+            list: Summary dictionaries; a day split across segments appears once per segment.
+        """
+        summaries = []
+        for segment in self._overlapping(user_id, start, end):
+            with open(segment.path[:-len(SEGMENT_SUFFIX)] + SUMMARY_SUFFIX, encoding="utf-8") as f:
+                summaries.extend(json.load(f))
+        return summaries
+
+
+class RetentionEngine:
+    """
+    Tiered retention for the workout store.
+
+    Raw entries older than `raw_days` are moved to the archive and rolled into
+    daily per-exercise summaries; summaries younger than `summary_days` stay in
+    memory, older ones are read back from the archive's sidecars when asked for.
+    A user's entries are archived by date wherever they sit in the list, and
+    only once at least `min_rows` have aged out, so segments stay reasonably
+    large. The archive records each entry's position in the user's insertion
+    order, which lets queries merge the tiers back in order and lets recovered
+    journals be trimmed. Entries with unparseable dates stay in memory.
+
+    Attributes:
+        archive (WorkoutArchive): Where aged raw entries are stored.
+        raw_days (int): Age in days after which raw entries leave memory.
+        summary_days (int): Age in days after which summaries leave memory.
+        min_rows (int): Minimum number of aged entries written as one segment.
+        window_days (int): How far back queries without a start date read the archive; 0 reads all of it.
+    """
+
+    def __init__(self, archive, raw_days=90, summary_days=730, min_rows=500, window_days=365):
+        self.archive = archive
+        self.raw_days = raw_days
+        self.summary_days = summary_days
+        self.min_rows = min_rows
+        self.window_days = window_days
+        self.daily_summaries = {}  # {user_id: {(date, exercise_id): summary}}
+        self._sweep_lock = threading.RLock()
+
+    def _cutoffs(self, today):
+        today = today or date_type.today()
+        return today - timedelta(days=self.raw_days), today - timedelta(days=self.summary_days)
+
+    def sweep_user(self, user_id, today=None):
+        """
+        Archives a user's aged entries if enough have accumulated.
+
+        Args:
+            user_id (int): The ID of the user.
+            today (datetime.date, optional): The reference date; defaults to today.
+
+        Returns:
+            int: The number of entries archived.
+        """
+        from app.models import workout as store
+
+        raw_cutoff, summary_cutoff = self._cutoffs(today)
+        with self._sweep_lock:
+            # A spilled user's entries are read from disk and only reloaded if enough of them aged out
+            history = store.eviction.peek(user_id) if store.eviction is not None \
+                else list(store.workout_logs.get(user_id, ()))
+            indexes, positions, workouts = [], [], []
+            malformed = 0
+            hot_positions = _unarchived_positions(self.archive.archived_runs(user_id))
+            for index, (position, workout) in enumerate(zip(hot_positions, history)):
+                day = _parse_date(workout.get("date"))
+                if day is None:
+                    malformed += 1
+                elif day < raw_cutoff:
+                    indexes.append(index)
+                    positions.append(position)
+                    workouts.append(workout)
+            if malformed:
+                logger.warning(f"Keeping {malformed} workouts with unparseable dates of user {user_id} in memory")
+            if len(workouts) < self.min_rows:
+                return 0
+
+            self.archive.write(user_id, workouts, positions)
+            summarize((workout for workout in workouts if _parse_date(workout["date"]) >= summary_cutoff),
+                      self.daily_summaries.setdefault(user_id, {}))
+            archived = set(indexes)
+            with store.user_locks.for_key(user_id):
+                # Writers only append, so the archived entries are still at the same indexes
+                hot = store.eviction.fetch_locked(user_id) if store.eviction is not None \
+                    else store.workout_logs[user_id]
+                hot[:] = [workout for index, workout in enumerate(hot) if index not in archived]
+                if store.eviction is not None:
+                    store.eviction.account(user_id)
+        if store.eviction is not None:
+            store.eviction.enforce(keep=user_id)
+        return len(workouts)
+
+    def sweep(self, today=None):
+        """
+        Archives aged entries of every user, including users spilled to disk, and drops
+        summaries past `summary_days`.
+
+        Args:
+            today (datetime.date, optional): The reference date; defaults to today.
+
+        Returns:
+            int: The number of entries archived.
+        """
+        from app.models import workout as store
+
+        users = store.eviction.users() if store.eviction is not None else list(store.workout_logs)
+        with self._sweep_lock:
+            archived = sum(self.sweep_user(user_id, today) for user_id in users)
+            summary_cutoff = self._cutoffs(today)[1]
+            for summaries in self.daily_summaries.values():
+                for key in [key for key in summaries if _parse_date(key[0]) < summary_cutoff]:
+                    del summaries[key]
+        if archived:
+            logger.info(f"Archived {archived} workout entries")
+        return archived
+
+    def restore_summaries(self, today=None):
+        """
+        Reloads the in-memory summaries from the archive's sidecars after a restart.
+
+        Args:
+            today (datetime.date, optional): The reference date; defaults to today.
+
+        Returns:
+            int: The number of summaries loaded.
+        """
+        summary_cutoff = self._cutoffs(today)[1]
+        loaded = 0
+        for user_id in self.archive.users():
+            summaries = self.daily_summaries.setdefault(user_id, {})
+            for summary in self.archive.read_summaries(user_id, start=summary_cutoff):
+                if _parse_date(summary["date"]) >= summary_cutoff:
+                    _merge_summary(summaries, summary)
+                    loaded += 1
+        return loaded
+
+    def trim_recovered(self, workout_logs, excluded_runs=None):
+        """
+        Drops entries restored from a journal that are already archived.
+
+        Args:
+            workout_logs (dict): The recovered workout store.
+            excluded_runs (dict, optional): {user_id: runs} of positions the journal's snapshot
+                left out (see `WorkoutJournal.excluded_runs`), so the recovered entries are
+                matched to their insertion positions.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        excluded_runs = excluded_runs or {}
+        dropped = 0
+        for user_id, workouts in workout_logs.items():
+            if not self.archive.has_entries(user_id):
+                continue
+            positions = _unarchived_positions(excluded_runs.get(user_id, ()))
+            kept = [workout for position, workout in zip(positions, workouts)
+                    if not self.archive.is_archived(user_id, position)]
+            dropped += len(workouts) - len(kept)
+            workouts[:] = kept
+        return dropped
+
+    def with_archived(self, user_id, hot_workouts, start_date=None, end_date=None):
+        """
+        Merges a user's in-memory entries with the archived ones whose segments overlap a date range.
+
+        Without a start date only archived entries from the `window_days` before the end
+        date (or today) are read back, so an unbounded query does not decompress the
+        whole archive; `iter_with_archived` streams all of it.
+
+        Args:
+            user_id (int): The ID of the user.
+            hot_workouts (list): The user's raw entries still in memory.
+            start_date (str, optional): First day of the range (YYYY-MM-DD).
+            end_date (str, optional): Last day of the range (YYYY-MM-DD).
+
+        Returns:
+            list: Entries in insertion order; callers filter them by date.
+        """
+        start, end = _parse_date(start_date), _parse_date(end_date)
+        if start is None and self.window_days:
+            window_start = (end or date_type.today()) - timedelta(days=self.window_days)
+            rows = [(position, workout) for position, workout in self.archive.read(user_id, window_start, end)
+                    if _parse_date(workout["date"]) >= window_start]
+        else:
+            rows = self.archive.read(user_id, start, end)
+        if not rows:
+            return list(hot_workouts)
+        hot_rows = zip(_unarchived_positions(self.archive.archived_runs(user_id)), hot_workouts)
+        return [workout for _, workout in heapq.merge(rows, hot_rows, key=itemgetter(0))]
+
+    def _iter_hot(self, user_id, runs, position):
+        """Yields (position, entry) pairs of the in-memory entries from `position` on, a chunk at a time."""
+        from app.models import workout as store
+
+        index = position - sum(min(stop, position) - start for start, stop in runs if start < position)
+        positions = itertools.islice(_unarchived_positions(runs), index, None)
+        while True:
+            # Sweeps archive and trim under the sweep lock, so the runs and the list are read consistently
+            with self._sweep_lock, store.user_locks.for_key(user_id):
+                if self.archive.archived_runs(user_id) != runs:
+                    raise _ArchiveChanged()
+                hot = store.eviction.fetch_locked(user_id) if store.eviction is not None \
+                    else store.workout_logs.get(user_id)
+                chunk = hot[index:index + store.ITER_CHUNK_ROWS] if hot else []
+            if store.eviction is not None:
+                store.eviction.enforce(keep=user_id)
+            if not chunk:
+                return
+            for workout in chunk:
+                yield next(positions), workout
+            index += len(chunk)
+
+    def iter_with_archived(self, user_id, start_date=None, end_date=None):
+        """
+        Lazily merges a user's in-memory entries with the archived ones whose segments overlap a date range.
+
+        Segments are decompressed a row at a time and in-memory entries read a
+        chunk at a time, so memory does not grow with the history. If a sweep
+        archives more of the user's entries meanwhile, the merge restarts after
+        the last entry yielded.
+
+        Args:
+            user_id (int): The ID of the user.
+            start_date (str, optional): First day of the range (YYYY-MM-DD).
+            end_date (str, optional): Last day of the range (YYYY-MM-DD).
+
+        Yields:
+            dict: Entries in insertion order; callers filter them by date.
+        """
+        start, end = _parse_date(start_date), _parse_date(end_date)
+        position = 0
+        while True:
+            with self._sweep_lock:
+                runs = list(self.archive.archived_runs(user_id))
+                segments = [segment for segment in self.archive._overlapping(user_id, start, end)
+                            if segment.runs[-1][1] > position]
+            archived = heapq.merge(*(_iter_segment(segment, position) for segment in segments), key=itemgetter(0))
+            try:
+                for row_position, workout in heapq.merge(archived, self._iter_hot(user_id, runs, position),
+                                                         key=itemgetter(0)):
+                    position = row_position + 1
+                    yield workout
+                return
+            except _ArchiveChanged:
+                continue
+
+    def summaries(self, user_id, hot_workouts, start_date=None, end_date=None):
+        """
+        Returns daily per-exercise summaries across every tier.
+
+        Args:
+            user_id (int): The ID of the user.
+            hot_workouts (list): The user's raw entries still in memory.
+            start_date (str, optional): First day of the range (YYYY-MM-DD).
+            end_date (str, optional): Last day of the range (YYYY-MM-DD).
+
+        Returns:
+            list: Summaries ordered by date and exercise.
+        """
+        summary_cutoff = self._cutoffs(None)[1]
+        start, end = _parse_date(start_date), _parse_date(end_date)
+        combined = {}
+        # Sidecars are only read for days whose summaries already left memory
+        if start is None or start < summary_cutoff:
+            for summary in self.archive.read_summaries(user_id, start, min(end or summary_cutoff, summary_cutoff)):
+                if _parse_date(summary["date"]) < summary_cutoff:
+                    _merge_summary(combined, summary)
+        for summary in list(self.daily_summaries.get(user_id, {}).values()):
+            if _parse_date(summary["date"]) >= summary_cutoff:
+                _merge_summary(combined, summary)
+        summarize(hot_workouts, combined)
+        return daily_totals(combined.values(), start_date, end_date)
+
+
+def daily_totals(summaries, start_date=None, end_date=None):
+    """
+    Filters daily summaries to a date range and orders them by date and exercise.
+
+    Args:
+        summaries (iterable): Summary dictionaries, e.g. the values of `summarize`.
+        start_date (str, optional): First day of the range (YYYY-MM-DD).
+        end_date (str, optional): Last day of the range (YYYY-MM-DD).
+
+    Returns:
+        list: The summaries in range, with invalid dates dropped.
+    """
+    start, end = _parse_date(start_date), _parse_date(end_date)
+    in_range = []
+    for summary in summaries:
+        day = _parse_date(summary["date"])
+        if day is not None and (start is None or day >= start) and (end is None or day <= end):
+            in_range.append(summary)
+    return sorted(in_range, key=lambda summary: (summary["date"], str(summary["exercise_id"])))
+
+
+def _merge_summary(combined, summary):
+    key = (summary["date"], summary["exercise_id"])
+    current = combined.get(key)
+    if current is None:
+        combined[key] = dict(summary)
+        return
+    current["sets"] += summary["sets"]
+    current["repetitions"] += summary["repetitions"]
+    current["volume"] += summary["volume"]
+    current["max_weight"] = max(current["max_weight"], summary["max_weight"])
+
+
+@task("retention.sweep", priority=PRIORITY_LOW)
+def sweep_workouts():
+    """Archives aged workout entries with the attached retention engine."""
+    from app.models import workout
+
+    if workout.retention is not None:
+        workout.retention.sweep()
+
+
+def _run_sweeps(interval, stop):
+    # Used instead of the task runner when TASK_WORKERS=0
+    while not stop.wait(interval):
+        try:
+            sweep_workouts()
+        except Exception as e:
+            logger.error(f"Workout retention sweep failed: {e}")
+
+
+def init_retention(app):
+    """
+    Enables tiered retention for the workout store when WORKOUT_ARCHIVE_DIR is set.
+
+    Indexes existing archive segments, drops journal-recovered entries that are
+    already archived, attaches the engine to `get_workouts` and schedules a sweep
+    every WORKOUT_RETENTION_INTERVAL seconds on the app's task runner (on a thread
+    of its own when TASK_WORKERS=0).
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        RetentionEngine: The attached engine, or None when retention is disabled.
+    """
+    from app.models import workout
+
+    directory = app.config.get("WORKOUT_ARCHIVE_DIR")
+    if not directory:
+        return None
+    if workout.retention is not None:
+        return workout.retention
+    if workout.router is not None:
+        logger.warning("WORKOUT_ARCHIVE_DIR is ignored in sharded mode")
+        return None
+
+    archive = WorkoutArchive(directory)
+    archive.load()
+    engine = RetentionEngine(archive, raw_days=app.config.get("WORKOUT_RAW_DAYS", 90),
+                             summary_days=app.config.get("WORKOUT_SUMMARY_DAYS", 730),
+                             min_rows=app.config.get("WORKOUT_ARCHIVE_MIN_ROWS", 500),
+                             window_days=app.config.get("WORKOUT_ARCHIVE_WINDOW_DAYS", 365))
+    engine.restore_summaries()
+    if workout.journal is not None:
+        dropped = engine.trim_recovered(workout.workout_logs, workout.journal.excluded_runs)
+        logger.info(f"Dropped {dropped} recovered workout entries that are already archived")
+        # Later snapshots leave archived entries out instead of carrying them forever
+        workout.journal.archived_runs = archive.all_runs
+    workout.retention = engine
+
+    interval = app.config.get("WORKOUT_RETENTION_INTERVAL", 3600)
+    runner = app.extensions.get("tasks")
+    if runner is not None:
+        runner.schedule("retention.sweep", interval)
+    else:
+        threading.Thread(target=_run_sweeps, args=(interval, threading.Event()),
+                         name="workout-retention", daemon=True).start()
+    return engine
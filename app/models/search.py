@@ -0,0 +1,273 @@
+import bisect
+import hashlib
+import heapq
+import logging
+import math
+import re
+import threading
+from app.signals import catalog_fetched
+from app.tasks import PRIORITY_LOW, defer, task
+
+logger = logging.getLogger(__name__)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_TOKEN_RE = re.compile(r"\w+")
+
+NAME_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+PREFIX_FACTOR = 0.8
+FUZZY_FACTOR = 0.6
+MIN_FUZZY_SIMILARITY = 0.4
+MAX_EXPANSIONS = 50
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens, dropping HTML markup.
+
+    Args:
+        text (str): Text such as an exercise name or HTML description.
+
+    Returns:
+        list: The tokens in order of appearance.
+    """
+    return _TOKEN_RE.findall(_TAG_RE.sub(" ", text or "").casefold())
+
+
+def trigrams(token):
+    """
+    Returns the character trigrams of a token, padded so short tokens have some.
+
+    Args:
+        token (str): A single token.
+
+    Returns:
+        set: The token's trigrams.
+    """
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _text_fields(exercise):
+    """Returns (name, description) for both flat and translation-based wger payloads."""
+    name, description = exercise.get("name"), exercise.get("description")
+    if name is None and exercise.get("translations"):
+        translation = exercise["translations"][0]
+        name, description = translation.get("name"), translation.get("description")
+    return name or "", description or ""
+
+
+class ExerciseSearchIndex:
+    """
+    In-process inverted index over exercise names and descriptions.
+
+    Postings map each token to the documents containing it with a field-weighted
+    term frequency (name matches count more than description matches). Query
+    terms are matched exactly, by prefix for the last term (autocomplete), and
+    through a trigram index for misspellings when a term has no exact match.
+    Results are ranked by the sum of idf-weighted term scores.
+
+    Updates are incremental: `upsert` only re-indexes exercises whose name or
+    description changed, `remove` drops a single exercise, and `reconcile`
+    does both against a complete catalog.
+    """
+
+    def __init__(self):
+        self._documents = {}  # {exercise_id: {"id", "name", "fingerprint", "terms"}}
+        self._postings = {}  # {token: {exercise_id: weight}}
+        self._trigrams = {}  # {trigram: set(token)}
+        self._vocabulary = []  # sorted tokens, for prefix lookups
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def _add_token(self, token):
+        bisect.insort(self._vocabulary, token)
+        for trigram in trigrams(token):
+            self._trigrams.setdefault(trigram, set()).add(token)
+
+    def _drop_token(self, token):
+        del self._postings[token]
+        del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+        for trigram in trigrams(token):
+            tokens = self._trigrams[trigram]
+            tokens.discard(token)
+            if not tokens:
+                del self._trigrams[trigram]
+
+    def _unindex(self, exercise_id):
+        document = self._documents.pop(exercise_id, None)
+        if document is None:
+            return
+        for token in document["terms"]:
+            postings = self._postings[token]
+            postings.pop(exercise_id, None)
+            if not postings:
+                self._drop_token(token)
+
+    def upsert(self, exercises):
+        """
+        Adds or updates exercises, skipping those whose text is unchanged.
+
+        Args:
+            exercises (list): Exercise dictionaries with an "id" and name/description.
+
+        Returns:
+            int: The number of exercises (re)indexed.
+        """
+        changed = 0
+        with self._lock:
+            for exercise in exercises:
+                exercise_id = exercise.get("id")
+                if exercise_id is None:
+                    continue
+                name, description = _text_fields(exercise)
+                fingerprint = hashlib.blake2b(f"{name}\0{description}".encode("utf-8"), digest_size=8).digest()
+                current = self._documents.get(exercise_id)
+                if current is not None and current["fingerprint"] == fingerprint:
+                    continue
+
+                self._unindex(exercise_id)
+                terms = {}
+                for token in tokenize(name):
+                    terms[token] = terms.get(token, 0.0) + NAME_WEIGHT
+                for token in tokenize(description):
+                    terms[token] = terms.get(token, 0.0) + DESCRIPTION_WEIGHT
+                for token, weight in terms.items():
+                    if token not in self._postings:
+                        self._postings[token] = {}
+                        self._add_token(token)
+                    self._postings[token][exercise_id] = weight
+                self._documents[exercise_id] = {"id": exercise_id, "name": name,
+                                                "fingerprint": fingerprint, "terms": tuple(terms)}
+                changed += 1
+        if changed:
+            logger.info(f"Indexed {changed} changed exercises ({len(self._documents)} total)")
+        return changed
+
+    def remove(self, exercise_id):
+        """
+        Removes one exercise from the index.
+
+        Args:
+            exercise_id (int): The ID of the exercise.
+        """
+        with self._lock:
+            self._unindex(exercise_id)
+
+    def reconcile(self, catalog):
+        """
+        Makes the index match a complete catalog: changed exercises are re-indexed and
+        exercises missing from the catalog are removed.
+
+        Args:
+            catalog (list): Every exercise of the catalog, e.g. from `fetch_catalog`.
+
+        Returns:
+            tuple: (the number of exercises (re)indexed, the number removed).
+        """
+        with self._lock:
+            changed = self.upsert(catalog)
+            current = {exercise.get("id") for exercise in catalog}
+            removed = [exercise_id for exercise_id in self._documents if exercise_id not in current]
+            for exercise_id in removed:
+                self.remove(exercise_id)
+        if removed:
+            logger.info(f"Removed {len(removed)} exercises no longer in the catalog")
+        return changed, len(removed)
+
+    def _prefix_matches(self, term):
+        start = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        for token in self._vocabulary[start:start + MAX_EXPANSIONS + 1]:
+            if not token.startswith(term):
+                break
+            if token != term:
+                matches.append((token, PREFIX_FACTOR))
+        return matches
+
+    def _fuzzy_matches(self, term):
+        grams = trigrams(term)
+        shared = {}
+        for trigram in grams:
+            for token in self._trigrams.get(trigram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        matches = []
+        for token, count in shared.items():
+            similarity = count / (len(grams) + len(trigrams(token)) - count)
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                matches.append((token, FUZZY_FACTOR * similarity))
+        return heapq.nlargest(MAX_EXPANSIONS, matches, key=lambda match: match[1])
+
+    def search(self, query, limit=10, prefix=True):
+        """
+        Returns the best-matching exercises for a free-text query.
+
+        Args:
+            query (str): The user's query, e.g. "bench" or "dumbell pres".
+            limit (int, optional): The maximum number of results.
+            prefix (bool, optional): Whether the last term also matches as a prefix.
+
+        Returns:
+            list: {"id", "name", "score"} dictionaries, best first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            total = len(self._documents)
+            scores = {}
+            for position, term in enumerate(terms):
+                matches = [(term, 1.0)] if term in self._postings else []
+                if prefix and position == len(terms) - 1:
+                    matches.extend(self._prefix_matches(term))
+                if not matches:
+                    matches = self._fuzzy_matches(term)
+
+                term_scores = {}
+                for token, factor in matches:
+                    postings = self._postings[token]
+                    idf = math.log(1 + total / len(postings))
+                    for exercise_id, weight in postings.items():
+                        score = factor * idf * weight
+                        if score > term_scores.get(exercise_id, 0.0):
+                            term_scores[exercise_id] = score
+                for exercise_id, score in term_scores.items():
+                    scores[exercise_id] = scores.get(exercise_id, 0.0) + score
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [{"id": exercise_id, "name": self._documents[exercise_id]["name"], "score": round(score, 4)}
+                    for exercise_id, score in best]
+
+    def clear(self):
+        """Drops every indexed exercise."""
+        with self._lock:
+            self._documents.clear()
+            self._postings.clear()
+            self._trigrams.clear()
+            self._vocabulary.clear()
+
+
+exercise_index = ExerciseSearchIndex()
+
+
+@task("search.index_catalog", priority=PRIORITY_LOW)
+def index_catalog(exercises):
+    """
+    Adds fetched exercises to the shared search index.
+
+    Args:
+        exercises (list): Exercise dictionaries from the wger API.
+    """
+    exercise_index.upsert(exercises)
+
+
+@catalog_fetched.connect
+def _on_catalog_fetched(sender, exercises, **extra):
+    # Indexing a page of the catalog is deferred so it does not add to the fetching request's latency
+    try:
+        defer("search.index_catalog", list(exercises))
+    except Exception as e:
+        logger.error(f"Failed to index fetched exercises: {e}")
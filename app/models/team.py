@@ -0,0 +1,129 @@
+import logging
+from datetime import datetime
+from operator import itemgetter
+from app.models.retention import daily_totals, summarize
+
+logger = logging.getLogger(__name__)
+
+# Optional ShardRouter attached by init_sharding; team queries are split into one call per shard
+router = None
+
+
+def get_team_workouts(user_ids, start_date=None, end_date=None, exercise_id=None):
+    """
+    Retrieves the workouts of many users in one pass over the workout store.
+
+    Dates are parsed once per distinct value rather than once per entry, and in
+    sharded mode each shard is asked once for all of its users.
+
+    Args:
+        user_ids (list): IDs of the users; duplicates are ignored.
+        start_date (str, optional): Start date for filtering (YYYY-MM-DD).
+        end_date (str, optional): End date for filtering (YYYY-MM-DD).
+        exercise_id (int, optional): Only return entries for this exercise.
+
+    Returns:
+        dict: {user_id: list of matching workout entries in stored order}, in the order
+        the users were given.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if router is not None:
+        return router.call_many(user_ids, "get_team_workouts", start_date, end_date, exercise_id)
+
+    from app.models import workout
+
+    start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+    end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
+    days = {}  # {date string: whether it is in range}
+
+    def in_range(date):
+        keep = days.get(date)
+        if keep is None:
+            day = datetime.strptime(date, "%Y-%m-%d")
+            keep = days[date] = (not start or day >= start) and (not end or day <= end)
+        return keep
+
+    team = {}
+    for user_id in user_ids:
+        workouts = list(workout.stored_workouts(user_id) or ())
+        if workout.retention is not None and workout.retention.archive.has_entries(user_id):
+            workouts = workout.retention.with_archived(user_id, workouts, start_date, end_date)
+        if exercise_id is not None:
+            workouts = [entry for entry in workouts if entry["exercise_id"] == exercise_id]
+        if start or end:
+            workouts = [entry for entry in workouts if in_range(entry["date"])]
+        team[user_id] = workouts
+    logger.info(f"Retrieved {sum(map(len, team.values()))} workouts for {len(team)} users")
+    return team
+
+
+def merge_by_date(team):
+    """
+    Interleaves the users' workouts into one list ordered by date.
+
+    The users' entries are concatenated in the order the users were given and
+    stably sorted by date, which merges the runs in C (timsort finds each
+    user's dated run) and is faster than a `heapq.merge` k-way merge in Python.
+    Equal dates keep the order of the users, then the stored order.
+
+    Args:
+        team (dict): {user_id: workout entries}, e.g. from `get_team_workouts`.
+
+    Returns:
+        list: Copies of the entries with a "user_id" key added, oldest first.
+    """
+    merged = []
+    for user_id, workouts in team.items():
+        merged.extend({**entry, "user_id": user_id} for entry in workouts)
+    merged.sort(key=itemgetter("date"))
+    return merged
+
+
+def _totals(workouts):
+    sets, repetitions, volume, max_weight = 0, 0, 0.0, 0.0
+    for workout in workouts:
+        try:
+            weight = float(workout.get("weight") or 0)
+            reps = int(workout.get("repetitions") or 0)
+        except (TypeError, ValueError):
+            weight, reps = 0.0, 0
+        sets += 1
+        repetitions += reps
+        volume += weight * reps
+        if weight > max_weight:
+            max_weight = weight
+    return {"sets": sets, "repetitions": repetitions, "volume": volume, "max_weight": max_weight}
+
+
+def team_totals(team, by="user"):
+    """
+    Aggregates a team's workouts so callers need not download the entries.
+
+    Args:
+        team (dict): {user_id: workout entries}, e.g. from `get_team_workouts`.
+        by (str, optional): "user" for one total per user, or "daily" for per-day,
+            per-exercise totals across the whole team.
+
+    Returns:
+        dict: {"users": [{"user_id", "sets", "repetitions", "volume", "max_weight"}], "team": totals}
+        for "user", or {"summaries": [...]} ordered by date and exercise for "daily".
+
+    Raises:
+        ValueError: If `by` is not a known aggregation.
+    """
+    if by == "user":
+        users = [{"user_id": user_id, **_totals(workouts)} for user_id, workouts in team.items()]
+        overall = {"sets": sum(user["sets"] for user in users),
+                   "repetitions": sum(user["repetitions"] for user in users),
+                   "volume": sum(user["volume"] for user in users),
+                   "max_weight": max((user["max_weight"] for user in users), default=0.0)}
+        return {"users": users, "team": overall}
+    if by == "daily":
+        summaries = {}
+        for workouts in team.values():
+            summarize(workouts, summaries)
+        return {"summaries": daily_totals(summaries.values())}
+    raise ValueError(f"Unknown aggregation: {by}")
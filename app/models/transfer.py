@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+import logging
+from app.models.workout import iter_workouts, log_workouts, validate_workout
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("exercise_id", "repetitions", "weight", "date", "comment")
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Rows are buffered into chunks of roughly this many characters before being yielded
+CHUNK_SIZE = 64 * 1024
+
+
+class InvalidRow(ValueError):
+    """
+    Raised when an imported row is malformed or invalid.
+
+    Attributes:
+        line (int): The row's line number in the input (CSV counts the header as line 1).
+        imported (int): How many rows before it were stored, or None when it was raised while parsing.
+    """
+
+    def __init__(self, line, reason, imported=None):
+        super().__init__(f"Invalid row at line {line}: {reason}")
+        self.line = line
+        self.reason = reason
+        self.imported = imported
+
+
+def export_workouts(user_id, fmt="ndjson", start_date=None, end_date=None):
+    """
+    Streams a user's workout history as CSV or NDJSON.
+
+    The history is read lazily with `iter_workouts` and rows are serialized one at
+    a time and yielded in chunks of about CHUNK_SIZE characters, so memory use
+    does not grow with the history.
+
+    Args:
+        user_id (int): ID of the user.
+        fmt (str, optional): "csv" or "ndjson".
+        start_date (str, optional): Only export workouts on or after this date (YYYY-MM-DD).
+        end_date (str, optional): Only export workouts on or before this date (YYYY-MM-DD).
+
+    Yields:
+        str: Chunks of the serialized export.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return _export_rows(iter_workouts(user_id, start_date=start_date, end_date=end_date), fmt)
+
+
+def _export_rows(workouts, fmt):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if fmt == "csv" else None
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    if writer is not None:
+        writer.writerow(FIELDS)
+
+    for workout in workouts:
+        if writer is not None:
+            writer.writerow([workout.get(field) for field in FIELDS])
+        else:
+            buffer.write(dumps(workout))
+            buffer.write("\n")
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _coerce_csv_row(row):
+    workout = {
+        "exercise_id": int(row["exercise_id"]),
+        "repetitions": int(row["repetitions"]),
+        "weight": float(row["weight"]) if row.get("weight") not in (None, "") else 0,
+        "date": row["date"],
+        "comment": row.get("comment") or "",
+    }
+    validate_workout(workout["exercise_id"], workout["repetitions"], workout["weight"], workout["date"])
+    return workout
+
+
+def _coerce_json_line(line):
+    row = json.loads(line)
+    workout = {
+        "exercise_id": row["exercise_id"],
+        "repetitions": row["repetitions"],
+        "weight": row.get("weight", 0),
+        "date": row["date"],
+        "comment": row.get("comment", ""),
+    }
+    validate_workout(workout["exercise_id"], workout["repetitions"], workout["weight"], workout["date"])
+    return workout
+
+
+def parse_rows(stream, fmt="ndjson"):
+    """
+    Parses workout rows from a text stream without reading it all into memory.
+
+    Args:
+        stream (io.TextIOBase): The text to parse, e.g. a file or wrapped request body.
+        fmt (str, optional): "csv" (with a header row) or "ndjson".
+
+    Yields:
+        dict: Workout entries ready for `log_workouts`.
+
+    Raises:
+        ValueError: If the format is unsupported.
+        InvalidRow: If a row is malformed or invalid (see `validate_workout`).
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        records = ((reader.line_num, row) for row in reader)
+        coerce = _coerce_csv_row
+    elif fmt == "ndjson":
+        records = ((number, line) for number, line in enumerate(stream, start=1) if line.strip())
+        coerce = _coerce_json_line
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+    line = 0
+    try:
+        for line, record in records:
+            yield coerce(record)
+    except (KeyError, TypeError, ValueError, csv.Error) as e:
+        raise InvalidRow(line, e) from e
+
+
+def import_workouts(user_id, rows, batch_size=1000):
+    """
+    Inserts parsed workout rows into the workout store in batches.
+
+    Rows of each batch are stored with a single `log_workouts` call. If a row is
+    invalid, every row before it is stored, so an import can be resumed from the
+    failing row once it is fixed.
+
+    Args:
+        user_id (int): ID of the user the rows belong to.
+        rows (iterable): Workout entries, e.g. from `parse_rows`.
+        batch_size (int, optional): Number of rows per batch.
+
+    Returns:
+        int: The number of workouts imported.
+
+    Raises:
+        InvalidRow: If a row is invalid; its `imported` says how many rows before it were stored.
+    """
+    imported = 0
+    batch = []
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                imported += len(log_workouts(user_id, batch))
+                batch = []
+    except InvalidRow as e:
+        if batch:
+            imported += len(log_workouts(user_id, batch))
+        logger.warning(f"Imported {imported} workouts for user {user_id} before an invalid row at line {e.line}")
+        raise InvalidRow(e.line, e.reason, imported) from e
+    if batch:
+        imported += len(log_workouts(user_id, batch))
+    logger.info(f"Imported {imported} workouts for user {user_id}")
+    return imported
@@ -1,11 +1,32 @@
 import logging
 import os
 from app import db
+from app.tracing import traced
 from werkzeug.security import generate_password_hash, check_password_hash
 
 logger = logging.getLogger(__name__)
 
 
+@traced("user.hash_password")
+def hash_password(password, salt=None):
+    """
+    Salts and hashes a plain-text password the same way `User.set_password` does.
+
+    Kept at module level so it can be sent to worker processes when many
+    passwords are hashed at once.
+
+    Args:
+        password (str): The plain-text password.
+        salt (str, optional): A hex salt; a new random one is generated if omitted.
+
+    Returns:
+        tuple: (salt, password_hash).
+    """
+    if salt is None:
+        salt = os.urandom(16).hex()
+    return salt, generate_password_hash(password + salt)
+
+
 class User(db.Model):
     """
      Represents a user in the system.
@@ -43,13 +64,13 @@ class User(db.Model):
                 their hashes will be different.
         """
         try:
-            self.salt = os.urandom(16).hex()
-            self.password_hash = generate_password_hash(password + self.salt)
+            self.salt, self.password_hash = hash_password(password)
             logger.info(f"Password set successfully for user: {self.username}")
         except Exception as e:
             logger.error(f"Error setting password for user: {self.username}. Exception: {e}")
             raise
 
+    @traced("user.check_password")
     def check_password(self, password):
         """
         Compares the provided password with the stored hashed password.
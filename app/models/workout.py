@@ -1,5 +1,9 @@
 import logging
-from datetime import datetime
+from datetime import date as date_type, datetime, timedelta
+from app.models.changelog import changelog
+from app.models.locks import StripedLock
+from app.models.retention import daily_totals, summarize
+from app.signals import workout_logged
 
 
 logger = logging.getLogger(__name__)
@@ -7,6 +11,59 @@ logger = logging.getLogger(__name__)
 # In-memory storage for workout logs
 workout_logs = {}  # {user_id: [{"exercise_id": int, "repetitions": int, "weight": float, "date": str, "comment": str}]}
 
+# Per-user version counters, bumped on every write so readers can answer conditional GETs
+workout_versions = {}  # {user_id: int}
+
+# Writers serialize per user on a lock stripe; readers never lock and work on a copy of the
+# user's list, which CPython takes atomically, so reads never block behind writers.
+user_locks = StripedLock()
+
+# Optional WorkoutJournal making logged workouts durable, attached by init_journal
+journal = None
+
+# Optional RetentionEngine attached by init_retention; entries it archived are read back
+# from disk when a query's date range reaches them
+retention = None
+
+# Optional ColdStore attached by init_eviction; it spills least recently used users to disk to keep
+# the store within a memory budget, so reads go through stored_workouts and writers reload first
+eviction = None
+
+# Optional ShardRouter attached by init_sharding; when set, workouts live in shard processes
+# and the functions below forward to the shard owning the user
+router = None
+
+# Entries read from a user's list at a time by `iter_workouts`
+ITER_CHUNK_ROWS = 1000
+
+
+def validate_workout(exercise_id, repetitions, weight, date):
+    """
+    Checks the fields of a workout before it is stored.
+
+    Args:
+        exercise_id (int): ID of the exercise.
+        repetitions (int): Number of repetitions.
+        weight (float): Weight used in kilograms.
+        date (str): Date of the workout in YYYY-MM-DD format.
+
+    Raises:
+        ValueError: If a field has the wrong type, a number is negative, or the date is malformed
+            or later than tomorrow (which leaves room for clients a timezone ahead).
+    """
+    if type(exercise_id) is not int:
+        raise ValueError(f"exercise_id must be an integer, got {exercise_id!r}")
+    if type(repetitions) is not int or repetitions < 0:
+        raise ValueError(f"repetitions must be a non-negative integer, got {repetitions!r}")
+    if type(weight) not in (int, float) or not 0 <= weight < float("inf"):
+        raise ValueError(f"weight must be a non-negative number, got {weight!r}")
+    try:
+        day = datetime.strptime(date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"date must be in YYYY-MM-DD format, got {date!r}") from None
+    if day > date_type.today() + timedelta(days=1):
+        raise ValueError(f"date {date} is in the future")
+
 
 def log_workout(user_id, exercise_id, repetitions, weight, date, comment):
     """
@@ -22,9 +79,16 @@ def log_workout(user_id, exercise_id, repetitions, weight, date, comment):
 
     Returns:
         dict: The logged workout entry.
+
+    Raises:
+        ValueError: If a field is invalid (see `validate_workout`).
+        OSError: If a journal is attached and the workout could not be made durable.
     """
-    if user_id not in workout_logs:
-        workout_logs[user_id] = []
+    validate_workout(exercise_id, repetitions, weight, date)
+    if router is not None:
+        workout = router.call(user_id, "log_workout", user_id, exercise_id, repetitions, weight, date, comment)
+        workout_logged.send(None, user_id=user_id, workout=workout)
+        return workout
 
     workout = {
         "exercise_id": exercise_id,
@@ -33,11 +97,109 @@ def log_workout(user_id, exercise_id, repetitions, weight, date, comment):
         "date": date,
         "comment": comment,
     }
-    workout_logs[user_id].append(workout)
+    with user_locks.for_key(user_id):
+        if eviction is not None:
+            eviction.fetch_locked(user_id)
+        sequence = journal.append(user_id, workout) if journal is not None else None
+
+        if user_id not in workout_logs:
+            workout_logs[user_id] = []
+
+        workout_logs[user_id].append(workout)
+        workout_versions[user_id] = workout_versions.get(user_id, 0) + 1
+        changelog.record(user_id, "workout", "add", workout)
+        if eviction is not None:
+            eviction.added(user_id, [workout])
     logger.info(f"Logged workout for user {user_id}: {workout}")
+    if eviction is not None:
+        eviction.enforce(keep=user_id)
+
+    if sequence is not None and journal.sync:
+        journal.wait_durable(sequence)
+    workout_logged.send(None, user_id=user_id, workout=workout)
     return workout
 
 
+def log_workouts(user_id, entries):
+    """
+    Logs a batch of workouts for a user with one lock acquisition and one durability wait.
+
+    Args:
+        user_id (int): ID of the user.
+        entries (list): Dictionaries with "exercise_id", "repetitions", "weight", "date"
+            and "comment" keys, in the order they should be stored.
+
+    Returns:
+        list: The logged workout entries.
+
+    Raises:
+        ValueError: If a field of any entry is invalid (see `validate_workout`); nothing is logged then.
+        OSError: If a journal is attached and the batch could not be made durable.
+    """
+    entries = list(entries)
+    for entry in entries:
+        validate_workout(entry["exercise_id"], entry["repetitions"], entry["weight"], entry["date"])
+    if router is not None:
+        workouts = router.call(user_id, "log_workouts", user_id, entries)
+        for workout in workouts:
+            workout_logged.send(None, user_id=user_id, workout=workout)
+        return workouts
+
+    workouts = [{
+        "exercise_id": entry["exercise_id"],
+        "repetitions": entry["repetitions"],
+        "weight": entry["weight"],
+        "date": entry["date"],
+        "comment": entry["comment"],
+    } for entry in entries]
+    if not workouts:
+        return workouts
+
+    with user_locks.for_key(user_id):
+        if eviction is not None:
+            eviction.fetch_locked(user_id)
+        sequence = None
+        if journal is not None:
+            for workout in workouts:
+                sequence = journal.append(user_id, workout)
+
+        if user_id not in workout_logs:
+            workout_logs[user_id] = []
+
+        workout_logs[user_id].extend(workouts)
+        workout_versions[user_id] = workout_versions.get(user_id, 0) + len(workouts)
+        for workout in workouts:
+            changelog.record(user_id, "workout", "add", workout)
+        if eviction is not None:
+            eviction.added(user_id, workouts)
+    logger.info(f"Logged {len(workouts)} workouts for user {user_id}")
+    if eviction is not None:
+        eviction.enforce(keep=user_id)
+
+    if sequence is not None and journal.sync:
+        journal.wait_durable(sequence)
+    for workout in workouts:
+        workout_logged.send(None, user_id=user_id, workout=workout)
+    return workouts
+
+
+def stored_workouts(user_id):
+    """
+    Returns a user's list in the in-memory store, reloading it first if it was spilled to disk.
+
+    Readers copy the list before iterating it, as writers may append to it.
+
+    Args:
+        user_id (int): ID of the user.
+
+    Returns:
+        list: The stored entries, or None if the user has none in memory or spilled.
+    """
+    if eviction is not None:
+        return eviction.fetch(user_id)
+    return workout_logs.get(user_id)
+
+
 def get_workouts(user_id, start_date=None, end_date=None):
     """
     Retrieves workout logs for a user, optionally filtered by date.
@@ -48,13 +210,20 @@ def get_workouts(user_id, start_date=None, end_date=None):
         end_date (str, optional): End date for filtering (YYYY-MM-DD).
 
     Returns:
-        list: A list of workout entries.
+        list: A snapshot of the matching workout entries; later writes do not change it.
     """
-    if user_id not in workout_logs:
+    if router is not None:
+        return router.call(user_id, "get_workouts", user_id, start_date, end_date)
+
+    archived = retention is not None and retention.archive.has_entries(user_id)
+    stored = stored_workouts(user_id)
+    if stored is None and not archived:
         logger.info(f"No workouts found for user {user_id}")
         return []
 
-    workouts = workout_logs[user_id]
+    workouts = list(stored or ())
+    if archived:
+        workouts = retention.with_archived(user_id, workouts, start_date, end_date)
     logger.info(f"Retrieved {len(workouts)} workouts for user {user_id}")
 
     if start_date or end_date:
@@ -72,3 +241,93 @@ def get_workouts(user_id, start_date=None, end_date=None):
 
     return workouts
 
+
+def _iter_stored(user_id):
+    index = 0
+    while True:
+        with user_locks.for_key(user_id):
+            stored = eviction.fetch_locked(user_id) if eviction is not None else workout_logs.get(user_id)
+            chunk = stored[index:index + ITER_CHUNK_ROWS] if stored else []
+        if eviction is not None:
+            eviction.enforce(keep=user_id)
+        if not chunk:
+            return
+        yield from chunk
+        index += len(chunk)
+
+
+def _iter_in_range(workouts, start, end):
+    for workout in workouts:
+        if start or end:
+            day = datetime.strptime(workout["date"], "%Y-%m-%d")
+            if (start and day < start) or (end and day > end):
+                continue
+        yield workout
+
+
+def iter_workouts(user_id, start_date=None, end_date=None):
+    """
+    Iterates over a user's workout logs lazily, optionally filtered by date.
+
+    Unlike `get_workouts`, the history is never copied whole: in-memory entries
+    are read ITER_CHUNK_ROWS at a time and archived segments are decompressed
+    as they are reached, so memory stays flat however long the history is.
+    In sharded mode the owning shard still returns the entries as one list.
+
+    Args:
+        user_id (int): ID of the user.
+        start_date (str, optional): Start date for filtering (YYYY-MM-DD).
+        end_date (str, optional): End date for filtering (YYYY-MM-DD).
+
+    Returns:
+        iterator: The matching workout entries in insertion order.
+
+    Raises:
+        ValueError: If a date is not in YYYY-MM-DD format.
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else None
+    end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else None
+    if router is not None:
+        return iter(router.call(user_id, "get_workouts", user_id, start_date, end_date))
+    if retention is not None:
+        return _iter_in_range(retention.iter_with_archived(user_id, start_date, end_date), start, end)
+    return _iter_in_range(_iter_stored(user_id), start, end)
+
+
+def get_daily_summaries(user_id, start_date=None, end_date=None):
+    """
+    Retrieves daily per-exercise totals for a user, optionally filtered by date.
+
+    With retention enabled, days whose raw entries were archived come from the
+    stored summaries instead of the archive itself.
+
+    Args:
+        user_id (int): ID of the user.
+        start_date (str, optional): Start date for filtering (YYYY-MM-DD).
+        end_date (str, optional): End date for filtering (YYYY-MM-DD).
+
+    Returns:
+        list: {"date", "exercise_id", "sets", "repetitions", "volume", "max_weight"}
+        dictionaries ordered by date.
+    """
+    if retention is not None:
+        return retention.summaries(user_id, list(stored_workouts(user_id) or ()), start_date, end_date)
+    return daily_totals(summarize(get_workouts(user_id, start_date, end_date)).values(), start_date, end_date)
+
+
+def get_workout_version(user_id):
+    """
+    Returns the current version of a user's workout log.
+
+    The version starts at 0 and is incremented by every call to `log_workout`,
+    so it can be compared without reading the workouts themselves.
+
+    Args:
+        user_id (int): ID of the user.
+
+    Returns:
+        int: The version counter for the user's workouts.
+    """
+    if router is not None:
+        return router.call(user_id, "get_workout_version", user_id)
+    return workout_versions.get(user_id, 0)
@@ -1,19 +1,51 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from app.models.user import User
 from app import db
 from datetime import datetime, timedelta
 import jwt
 import os
 import logging
-import requests
-from app.models.recommendations import fetch_exercises, get_favorite_exercises, save_favorite_exercise
-from app.models.workout import log_workout, get_workouts
+import gzip
+import io
+from app.caching import conditional_response, mark_cacheable, mark_stale
+from app.circuit_breaker import CircuitOpenError, breakers
+from app.compression import compress_stream
+from app.events import SubscriberLimitReached
+from app.idempotency import idempotent
+from app.load_shedding import exempt, priority
+from app.models.recommendations import (fetch_catalog, fetch_exercises, fetch_wger, get_favorite_exercises,
+                                        get_favorites_version, remove_favorite_exercise, save_favorite_exercise)
+from app.models.goals import goal_tracker
+from app.models.changelog import get_changes
+from app.models.leaderboard import leaderboards
+from app.models.recommender import personalized_recommendations
+from app.models.search import exercise_index
+from app.models.team import get_team_workouts, merge_by_date, team_totals
+from app.models.transfer import FORMATS, InvalidRow, export_workouts, import_workouts, parse_rows
+from app.models.workout import log_workout, get_daily_summaries, get_workouts, get_workout_version
+from app.sharding import ShardUnavailable
 
 logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def shard_unavailable(error):
+    """
+    Builds the response for a request whose user data lives on a shard that cannot be reached.
+
+    Args:
+        error (ShardUnavailable): The failed shard call.
+
+    Returns:
+        tuple: A JSON error response with Retry-After and a 503 status.
+    """
+    logger.error(f"Shard unavailable: {str(error)}")
+    response = jsonify({"status": "error", "message": "Workout storage temporarily unavailable"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """
@@ -58,6 +90,7 @@ def login():
 
 
 @auth_bp.route('/create-account', methods=['POST'])
+@idempotent
 def create_account():
     """
         Creates a new user account.
@@ -103,6 +136,7 @@ def create_account():
 
 
 @auth_bp.route('/update-password', methods=['POST'])
+@idempotent
 def update_password():
     """
         Updates the user's password.
@@ -146,6 +180,7 @@ def update_password():
 
 
 @auth_bp.route('/health', methods=['GET'])
+@exempt
 def health_check():
     """
     Health check route to verify the app is running.
@@ -157,32 +192,95 @@ def health_check():
     return jsonify({"status": "OK"}), 200
 
 
+@auth_bp.route('/health/live', methods=['GET'])
+@exempt
+def liveness_check():
+    """
+    Liveness probe: answers without touching any dependency.
+
+    Returns:
+        Response: {"status": "OK"} with a 200 status.
+    """
+    return jsonify({"status": "OK"}), 200
+
+
+@auth_bp.route('/health/ready', methods=['GET'])
+@exempt
+def readiness_check():
+    """
+    Readiness probe: reports the cached results of the background dependency checks.
+
+    The database and wger API are probed on a background thread, so this route never
+    waits on a slow dependency. It returns 503 until every required check passes.
+
+    Returns:
+        Response: {"status": "ready" | "not ready", "checks": {...}} with a 200 or 503 status.
+    """
+    ready, checks = current_app.extensions['health_probes'].status()
+    return jsonify({"status": "ready" if ready else "not ready", "checks": checks}), 200 if ready else 503
+
+
+@auth_bp.route('/metrics', methods=['GET'])
+@exempt
+def metrics():
+    """
+    Reports the state of the circuit breakers, the load shedder, the idempotency cache, the event hub,
+    the workout store's memory budget and the background task runner for monitoring.
+
+    Returns:
+        Response: JSON with a snapshot per circuit breaker and the other components' counters.
+    """
+    limiter = current_app.extensions.get('load_shedding')
+    idempotency = current_app.extensions.get('idempotency')
+    cold_store = current_app.extensions.get('cold_store')
+    tasks = current_app.extensions.get('tasks')
+    return jsonify({
+        "circuit_breakers": {name: breaker.snapshot() for name, breaker in list(breakers.items())},
+        "load_shedding": limiter.stats() if limiter is not None else None,
+        "idempotency": idempotency.stats() if idempotency is not None else None,
+        "events": current_app.extensions['events'].stats(),
+        "workout_store": cold_store.stats() if cold_store is not None else None,
+        "tasks": tasks.stats() if tasks is not None else None,
+    }), 200
+
+
 @auth_bp.route('/get-exercises', methods=['GET'])
 def get_exercises():
     """
     Fetches a list of exercises from the wger Workout Manager API.
 
     This function sends a GET request to the external wger API to retrieve a list of exercises.
-    The response is returned to the client in JSON format. If the request fails, an error
-    message is returned with a 500 status code.
+    The response is returned to the client in JSON format. The call goes through the wger
+    circuit breaker: during an outage the last successful response is returned with an
+    `Age` header, and while the circuit is open without one, the route fails fast.
 
     Returns:
         Response: A Flask JSON response containing either:
             - A list of exercises if the request is successful (status code 200).
+            - An error message with Retry-After if the circuit is open (status code 503).
             - An error message if the request fails (status code 500).
 
     Raises:
         None: This function handles exceptions internally and logs errors if necessary.
     """
-    url = 'https://wger.de/api/v2/exercise/'
-    response = requests.get(url, params={'language': 'en'})
-    if response.status_code == 200:
-        return jsonify(response.json())
-    else:
+    try:
+        payload, stale_age = fetch_wger('exercise', {'language': 'en'})
+    except CircuitOpenError as e:
+        logger.warning(f"Failing fast on /get-exercises: {str(e)}")
+        response = jsonify({"error": "Exercise service temporarily unavailable"})
+        response.headers['Retry-After'] = str(max(1, int(breakers['wger:exercise'].retry_after())))
+        return response, 503
+    except Exception as e:
+        logger.error(f"Error fetching exercises: {str(e)}")
         return jsonify({"error": "Failed to fetch exercises"}), 500
+    if stale_age is not None:
+        return mark_stale(jsonify(payload), stale_age)
+    return mark_cacheable(jsonify(payload))
 
 
 @auth_bp.route('/log-workout', methods=['POST'])
+@priority
+@idempotent
 def log_workout_route():
     """
     Logs a workout entry for a user using the in-memory dictionary.
@@ -212,12 +310,18 @@ def log_workout_route():
     except KeyError as e:
         logger.error(f"Missing required field: {str(e)}")
         return jsonify({"status": "error", "message": f"Missing required field: {str(e)}"}), 400
+    except ValueError as e:
+        logger.warning(f"Rejected workout: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
     except Exception as e:
         logger.error(f"Error logging workout: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
 @auth_bp.route('/view-workouts', methods=['GET'])
+@priority
 def view_workouts_route():
     """
     Retrieves workout entries for a user using the in-memory dictionary.
@@ -226,6 +330,13 @@ def view_workouts_route():
     - user_id (int): ID of the user.
     - start_date (str, optional): Filter workouts starting from this date.
     - end_date (str, optional): Filter workouts up to this date.
+    - summary (str, optional): "daily" to return per-day, per-exercise totals instead of entries.
+
+    Entries that retention moved to the on-disk archive are merged back in when the
+    date range reaches them.
+
+    Supports conditional requests: the response carries a weak ETag derived from the
+    user's workout version, and an `If-None-Match` header matching it yields a 304.
 
     Returns:
         JSON response with the list of workout logs or an error message.
@@ -235,37 +346,363 @@ def view_workouts_route():
     end_date = request.args.get('end_date')
 
     try:
-        workouts = get_workouts(user_id=int(user_id), start_date=start_date, end_date=end_date)
-        return jsonify({"status": "success", "workouts": workouts}), 200
+        user_id = int(user_id)
+        if request.args.get('summary') == 'daily':
+            return conditional_response(
+                "workouts", user_id, get_workout_version(user_id),
+                lambda: {"status": "success",
+                         "summaries": get_daily_summaries(user_id, start_date=start_date, end_date=end_date)}
+            )
+        return conditional_response(
+            "workouts", user_id, get_workout_version(user_id),
+            lambda: {"status": "success",
+                     "workouts": get_workouts(user_id=user_id, start_date=start_date, end_date=end_date)}
+        )
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
     except Exception as e:
         logger.error(f"Error retrieving workouts: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@auth_bp.route('/team-workouts', methods=['GET'])
+def team_workouts_route():
+    """
+    Retrieves the workouts of many users, e.g. a coach's team, in one request.
+
+    Query parameters:
+    - user_id (int): ID of a user; repeat the parameter for each user (up to TEAM_MAX_USERS).
+    - start_date (str, optional): Filter workouts starting from this date.
+    - end_date (str, optional): Filter workouts up to this date.
+    - exercise_id (int, optional): Only include workouts of this exercise.
+    - order (str, optional): "user" (default) to group entries by user, or "date" to return
+      one list merged by date with a user_id on each entry.
+    - aggregate (str, optional): "user" for per-user and team totals, or "daily" for per-day,
+      per-exercise team totals, instead of the entries.
+
+    Returns:
+        JSON response with the grouped or merged workouts, or the requested totals.
+    """
+    user_ids = request.args.getlist('user_id', type=int)
+    order = request.args.get('order', 'user')
+    aggregate = request.args.get('aggregate')
+    if not user_ids:
+        return jsonify({"status": "error", "message": "Missing user_id"}), 400
+    max_users = current_app.config['TEAM_MAX_USERS']
+    if len(set(user_ids)) > max_users:
+        return jsonify({"status": "error", "message": f"At most {max_users} users per request"}), 400
+    if order not in ("user", "date") or aggregate not in (None, "user", "daily"):
+        return jsonify({"status": "error", "message": "Unknown order or aggregate"}), 400
+
+    try:
+        team = get_team_workouts(user_ids, start_date=request.args.get('start_date'),
+                                 end_date=request.args.get('end_date'),
+                                 exercise_id=request.args.get('exercise_id', type=int))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error retrieving team workouts: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    if aggregate:
+        return jsonify({"status": "success", **team_totals(team, by=aggregate)}), 200
+    if order == "date":
+        return jsonify({"status": "success", "workouts": merge_by_date(team)}), 200
+    return jsonify({"status": "success",
+                    "users": [{"user_id": user_id, "workouts": workouts} for user_id, workouts in team.items()]}), 200
+
+
+@auth_bp.route('/sync', methods=['GET'])
+@priority
+def sync_route():
+    """
+    Returns a user's workout and favorite changes since the client's last sync.
+
+    Query parameters:
+    - user_id (int): ID of the user.
+    - since (int, optional): The "version" of the client's last sync response.
+    - epoch (str, optional): The "epoch" of the client's last sync response; omit it on a first sync.
+
+    The response lists only the changes after `since`, oldest first, unless the client is
+    behind the compaction horizon, on another epoch (e.g. after a restart) or syncing for the
+    first time; then "resync" is true and the full workouts and favorites are returned instead.
+
+    Returns:
+        JSON response with the changes or the full state, and the new version and epoch.
+    """
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None:
+        return jsonify({"status": "error", "message": "Missing user_id"}), 400
+
+    try:
+        result = get_changes(user_id, request.args.get('since', default=0, type=int), request.args.get('epoch'))
+        return jsonify({"status": "success", **result}), 200
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error syncing workouts: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@auth_bp.route('/export-workouts', methods=['GET'])
+def export_workouts_route():
+    """
+    Streams a user's full workout history as a CSV or NDJSON download.
+
+    Query parameters:
+    - user_id (int): ID of the user.
+    - format (str, optional): "ndjson" (default) or "csv".
+    - compress (str, optional): "gzip" to download a gzip file instead of plain text.
+    - start_date (str, optional): Only export workouts from this date.
+    - end_date (str, optional): Only export workouts up to this date.
+
+    Returns:
+        A streamed response, or a JSON error message.
+    """
+    user_id = request.args.get('user_id', type=int)
+    fmt = request.args.get('format', 'ndjson')
+    if user_id is None:
+        return jsonify({"status": "error", "message": "Missing user_id"}), 400
+
+    try:
+        chunks = export_workouts(user_id, fmt, request.args.get('start_date'), request.args.get('end_date'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
+
+    filename = f"workouts-{user_id}.{fmt}"
+    mimetype = FORMATS[fmt]
+    if request.args.get('compress') == 'gzip':
+        chunks = compress_stream(chunks, 'gzip', 6)
+        filename, mimetype = f"{filename}.gz", 'application/gzip'
+    response = Response(chunks, mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@auth_bp.route('/import-workouts', methods=['POST'])
+def import_workouts_route():
+    """
+    Imports workout history from a CSV or NDJSON request body.
+
+    The body is parsed as a stream and inserted in batches, so large uploads are not
+    held in memory. Bodies sent with `Content-Encoding: gzip` are decompressed on the fly.
+    An invalid row stops the import with a 400 naming its `line`; the `imported` rows
+    before it are stored, so the upload can be resumed from that row once it is fixed.
+
+    Query parameters:
+    - user_id (int): ID of the user the workouts belong to.
+    - format (str, optional): "ndjson" (default) or "csv".
+
+    Returns:
+        JSON response with the number of imported workouts or an error message.
+    """
+    user_id = request.args.get('user_id', type=int)
+    fmt = request.args.get('format', 'ndjson')
+    if user_id is None:
+        return jsonify({"status": "error", "message": "Missing user_id"}), 400
+
+    body = request.stream
+    if request.headers.get('Content-Encoding') == 'gzip':
+        body = gzip.GzipFile(fileobj=body, mode='rb')
+    try:
+        imported = import_workouts(user_id, parse_rows(io.TextIOWrapper(body, encoding='utf-8', newline=''), fmt))
+        return jsonify({"status": "success", "imported": imported}), 201
+    except InvalidRow as e:
+        logger.error(f"Stopped workout import for user {user_id}: {str(e)}")
+        return jsonify({"status": "error", "message": str(e), "line": e.line, "imported": e.imported}), 400
+    except ValueError as e:
+        logger.error(f"Rejected workout import for user {user_id}: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error importing workouts: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@auth_bp.route('/leaderboard', methods=['GET'])
+@priority
+def leaderboard_route():
+    """
+    Returns the top lifters for an exercise, maintained incrementally as workouts are logged.
+
+    Query parameters:
+    - exercise_id (int): ID of the exercise.
+    - metric (str, optional): "max_weight" (default) or "volume" (repetitions x weight).
+    - window (str, optional): "day", "week" (default) or "all".
+    - date (str, optional): A date (YYYY-MM-DD) inside the wanted day or week; defaults to today.
+    - limit (int, optional): Number of entries to return (default 10, at most 100).
+    - user_id (int, optional): Also return this user's rank.
+
+    Returns:
+        JSON response with the leaderboard or an error message.
+    """
+    exercise_id = request.args.get('exercise_id', type=int)
+    if exercise_id is None:
+        return jsonify({"status": "error", "message": "Missing exercise_id"}), 400
+
+    try:
+        day = request.args.get('date')
+        result = leaderboards.query(
+            exercise_id,
+            metric=request.args.get('metric', 'max_weight'),
+            window=request.args.get('window', 'week'),
+            day=datetime.strptime(day, "%Y-%m-%d").date() if day else None,
+            limit=request.args.get('limit', default=10, type=int),
+            user_id=request.args.get('user_id', type=int),
+        )
+        return jsonify({"status": "success", **result}), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error retrieving leaderboard: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@auth_bp.route('/goals', methods=['POST'])
+@priority
+@idempotent
+def create_goal_route():
+    """
+    Sets a fitness goal for a user.
+
+    Expects JSON payload with:
+    - user_id (int): ID of the user.
+    - type (str): "target_weight", "weekly_volume" or "weekly_sessions".
+    - target (float): The weight in kilograms, weekly volume (repetitions x weight) or workout days per week.
+    - exercise_id (int, optional): The exercise to track; required for "target_weight", all exercises otherwise.
+
+    Returns:
+        JSON response with the new goal and its current progress, or an error message.
+    """
+    data = request.get_json()
+    try:
+        goal = goal_tracker.add(
+            user_id=data['user_id'],
+            goal_type=data['type'],
+            target=float(data['target']),
+            exercise_id=data.get('exercise_id'),
+        )
+        return jsonify({"status": "success", "goal": goal}), 201
+    except KeyError as e:
+        return jsonify({"status": "error", "message": f"Missing required field: {str(e)}"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error creating goal: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@auth_bp.route('/goals', methods=['GET'])
+@priority
+def list_goals_route():
+    """
+    Returns a user's goals with their progress, kept up to date as workouts are logged.
+
+    Query parameters:
+    - user_id (int): ID of the user.
+    - date (str, optional): A date (YYYY-MM-DD) inside the week weekly goals are reported for; defaults to today.
+
+    Returns:
+        JSON response with the goals or an error message.
+    """
+    user_id = request.args.get('user_id', type=int)
+    if user_id is None:
+        return jsonify({"status": "error", "message": "Missing user_id"}), 400
+
+    try:
+        day = request.args.get('date')
+        goals = goal_tracker.progress(user_id, datetime.strptime(day, "%Y-%m-%d").date() if day else None)
+        return jsonify({"status": "success", "goals": goals}), 200
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error listing goals: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @auth_bp.route('/recommendations', methods=['GET'])
 def get_recommendations_route():
     """
     Fetches exercise recommendations from the Wger Workout Manager API.
 
+    When a user_id is given, the filtered catalog is ranked with the co-occurrence index
+    built from what similar users logged and favorited, and topped up with other catalog
+    exercises if the index has fewer than `limit` suggestions among them.
+
     Query Parameters:
     - category (str, optional): Filter exercises by category ID.
     - equipment (str, optional): Filter exercises by equipment ID.
+    - user_id (int, optional): Personalize recommendations for this user.
+    - limit (int, optional): Number of personalized recommendations (default 10).
 
     Returns:
         JSON response with the list of recommended exercises or an error message.
     """
     category = request.args.get('category')
     equipment = request.args.get('equipment')
+    user_id = request.args.get('user_id', type=int)
+    limit = request.args.get('limit', default=10, type=int)
 
     try:
         exercises = fetch_exercises(category=category, equipment=equipment)
-        return jsonify({"status": "success", "exercises": exercises}), 200
+        stale_age = getattr(exercises, 'stale_age', None)
+        if user_id is not None:
+            response = jsonify({"status": "success",
+                                "exercises": personalized_recommendations(user_id, limit, catalog=exercises)})
+            return (mark_stale(response, stale_age) if stale_age is not None else response), 200
+
+        response = jsonify({"status": "success", "exercises": exercises})
+        return (mark_stale(response, stale_age) if stale_age is not None else mark_cacheable(response)), 200
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
     except Exception as e:
         logger.error(f"Error fetching recommendations: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@auth_bp.route('/search-exercises', methods=['GET'])
+def search_exercises_route():
+    """
+    Searches exercises by name and description using the local search index.
+
+    The index is filled from catalog data fetched from wger; if it is still empty,
+    every page of the catalog is fetched once to warm it.
+
+    Query Parameters:
+    - q (str): The search text, e.g. "bench".
+    - limit (int, optional): Maximum number of results (default 10).
+    - prefix (bool, optional): Treat the last word as a prefix for autocomplete (default true).
+
+    Returns:
+        JSON response with the ranked results or an error message.
+    """
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', default=10, type=int)
+    prefix = request.args.get('prefix', default='true').lower() != 'false'
+    if not query.strip():
+        return jsonify({"status": "error", "message": "Missing search query"}), 400
+
+    try:
+        if not len(exercise_index):
+            # Indexed inline here: the background indexing of the fetch would finish after this search
+            exercise_index.upsert(fetch_catalog())
+        results = exercise_index.search(query, limit=limit, prefix=prefix)
+        return jsonify({"status": "success", "results": results}), 200
+    except Exception as e:
+        logger.error(f"Error searching exercises: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @auth_bp.route('/favorites', methods=['POST'])
+@priority
+@idempotent
 def add_favorite_exercise():
     """
     Save a favorite exercise for a user.
@@ -294,12 +731,45 @@ def add_favorite_exercise():
             return jsonify({"status": "error", "message": favorite["message"]}), 400
 
         return jsonify({"status": "success", "favorite": favorite}), 201
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
     except Exception as e:
         logger.error(f"Error saving favorite exercise: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@auth_bp.route('/favorites', methods=['DELETE'])
+@priority
+@idempotent
+def remove_favorite_exercise_route():
+    """
+    Remove an exercise from a user's favorites.
+
+    Query Parameters:
+    - user_id (int): The ID of the user.
+    - exercise_id (int): The ID of the exercise to remove.
+
+    Returns:
+        JSON response indicating success, or 404 if the exercise was not a favorite.
+    """
+    user_id = request.args.get("user_id", type=int)
+    exercise_id = request.args.get("exercise_id", type=int)
+    if not user_id or not exercise_id:
+        return jsonify({"status": "error", "message": "Missing required fields"}), 400
+
+    try:
+        if not remove_favorite_exercise(user_id=user_id, exercise_id=exercise_id):
+            return jsonify({"status": "error", "message": "Exercise is not in favorites"}), 404
+        return jsonify({"status": "success"}), 200
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error removing favorite exercise: {str(e)}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @auth_bp.route('/favorites', methods=['GET'])
+@priority
 def list_favorite_exercises():
     """
     Retrieve all favorite exercises for a user.
@@ -307,6 +777,8 @@ def list_favorite_exercises():
     Query Parameters:
     - user_id (int): The ID of the user.
 
+    Supports conditional requests through a weak ETag derived from the user's favorites version.
+
     Returns:
         JSON response with the list of favorite exercises or an error message.
     """
@@ -315,14 +787,73 @@ def list_favorite_exercises():
         return jsonify({"status": "error", "message": "Missing user_id"}), 400
 
     try:
-        favorites = get_favorite_exercises(user_id=user_id)
-        return jsonify({"status": "success", "favorites": favorites}), 200
+        return conditional_response(
+            "favorites", user_id, get_favorites_version(user_id),
+            lambda: {"status": "success", "favorites": get_favorite_exercises(user_id=user_id)}
+        )
+    except ShardUnavailable as e:
+        return shard_unavailable(e)
     except Exception as e:
         logger.error(f"Error retrieving favorite exercises: {str(e)}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@auth_bp.route('/stream', methods=['GET'])
+@exempt
+def stream_route():
+    """
+    Streams live events for one or more users as server-sent events.
+
+    Query parameters:
+    - user_id (int): ID of a user to follow; may be repeated to follow several athletes.
+
+    Events are "workout", "favorite" and "goals", each with a JSON payload and an ID.
+    A reconnecting client sending `Last-Event-ID` first receives what it missed, or a
+    "reset" event if that is no longer available. The stream is exempt from load shedding
+    because it stays open; idle streams receive a keep-alive comment.
+
+    Returns:
+        Response: A text/event-stream response, or a JSON error.
+    """
+    user_ids = request.args.getlist('user_id', type=int)
+    if not user_ids:
+        return jsonify({"status": "error", "message": "Missing user_id"}), 400
+
+    hub = current_app.extensions['events']
+    try:
+        subscription = hub.subscribe(user_ids, request.headers.get('Last-Event-ID', type=int))
+    except SubscriberLimitReached as e:
+        logger.warning(f"Refusing event stream: {str(e)}")
+        response = jsonify({"status": "error", "message": "Too many open streams, please retry later"})
+        response.headers['Retry-After'] = "5"
+        return response, 503
+
+    dumps = current_app.json.dumps
+    heartbeat = current_app.config.get('STREAM_HEARTBEAT', 15)
+
+    def generate():
+        try:
+            yield "retry: 2000\n\n"
+            while True:
+                events = subscription.get(heartbeat)
+                if events is None:
+                    return
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield "".join(f"id: {event_id}\nevent: {event}\ndata: {dumps(data)}\n\n"
+                              for event_id, _, event, data in events)
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @auth_bp.route('/', methods=['GET'])
+@exempt
 def home():
     """
     Default route to provide a homepage or redirect to a relevant route.
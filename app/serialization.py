@@ -0,0 +1,147 @@
+import logging
+from flask import Request, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from app.tracing import span
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+
+
+def wants_msgpack():
+    """
+    Checks whether the current request prefers a MessagePack response.
+
+    JSON stays the default: MessagePack is only chosen when msgpack is installed
+    and the client ranks `application/msgpack` above `application/json` in `Accept`.
+
+    Returns:
+        bool: True if the response should be encoded as MessagePack.
+    """
+    if msgpack is None or not has_request_context():
+        return False
+    return request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE]) == MSGPACK_MIMETYPE
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """
+    Standard library JSON provider that can answer in MessagePack.
+
+    `jsonify` delegates to the provider's `response` method, so negotiating
+    there covers every route without changing how routes build responses.
+    """
+
+    def response(self, *args, **kwargs):
+        """
+        Serializes the given data as MessagePack or JSON depending on the request's `Accept` header.
+
+        Returns:
+            Response: The serialized response, with `Vary: Accept` set.
+        """
+        with span("serialize") as serialize:
+            if wants_msgpack():
+                obj = self._prepare_response_obj(args, kwargs)
+                response = self._app.response_class(
+                    msgpack.packb(obj, default=self.default, use_bin_type=True), mimetype=MSGPACK_MIMETYPE
+                )
+            else:
+                response = super().response(*args, **kwargs)
+            if serialize is not None:
+                serialize.set_attribute("mimetype", response.mimetype)
+                serialize.set_attribute("bytes", response.content_length)
+        response.vary.add("Accept")
+        return response
+
+
+class OrjsonProvider(NegotiatingJSONProvider):
+    """
+    JSON provider backed by orjson.
+
+    Output matches the standard provider (compact, keys sorted when `sort_keys`
+    is set, dates formatted by `default`). Calls using options orjson does not
+    support, such as `indent` in debug mode, and values orjson cannot encode,
+    such as integers wider than 64 bits, fall back to the standard library.
+    """
+
+    def dumps(self, obj, **kwargs):
+        # orjson output is always compact, which is what `response` asks for outside debug mode
+        if kwargs.get("separators") == (",", ":"):
+            kwargs.pop("separators")
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+        except orjson.JSONEncodeError:
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+class NegotiatingRequest(Request):
+    """
+    Request class that also parses MessagePack bodies through `get_json`.
+
+    Routes keep calling `request.get_json()`; a body sent with
+    `Content-Type: application/msgpack` is decoded into the same structures.
+    """
+
+    def get_json(self, force=False, silent=False, cache=True):
+        if self.mimetype != MSGPACK_MIMETYPE or msgpack is None:
+            return super().get_json(force=force, silent=silent, cache=cache)
+
+        if cache and getattr(self, "_cached_msgpack", None) is not None:
+            return self._cached_msgpack
+        try:
+            data = msgpack.unpackb(self.get_data(cache=cache), raw=False, strict_map_key=False)
+        except Exception as e:
+            if silent:
+                return None
+            return self.on_json_loading_failed(e)
+        if cache:
+            self._cached_msgpack = data
+        return data
+
+
+JSON_PROVIDERS = {
+    "stdlib": NegotiatingJSONProvider,
+    "orjson": OrjsonProvider,
+}
+
+
+def init_serialization(app):
+    """
+    Installs the JSON provider and the content-negotiating request class.
+
+    The provider is picked from the JSON_PROVIDER config key: "orjson",
+    "stdlib", or "auto" (the default) which uses orjson when it is installed.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    name = app.config.get("JSON_PROVIDER", "auto")
+    if name == "auto":
+        name = "orjson" if orjson is not None else "stdlib"
+    if name == "orjson" and orjson is None:
+        logger.warning("JSON_PROVIDER is 'orjson' but orjson is not installed; using the standard library.")
+        name = "stdlib"
+
+    app.json = JSON_PROVIDERS[name](app)
+    app.request_class = NegotiatingRequest
+    logger.info(f"Using the {name} JSON provider (MessagePack {'enabled' if msgpack else 'unavailable'}).")
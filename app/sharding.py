@@ -0,0 +1,583 @@
+import atexit
+import bisect
+import builtins
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+# Points per shard on the hash ring; more points even out the share of users per shard
+RING_REPLICAS = 100
+
+# File in the socket directory holding the cluster's random authentication key
+AUTHKEY_FILE = "authkey"
+
+# A well-known key (config.py's SECRET_KEY default) that must never authenticate shard connections
+DEFAULT_SECRET_KEY = "dev"
+
+
+class ShardUnavailable(Exception):
+    """Raised when a shard cannot be reached or does not reply in time."""
+
+
+def private_directory(path):
+    """
+    Creates a directory only the current user can enter, or checks an existing one.
+
+    Args:
+        path (str): The directory.
+
+    Returns:
+        str: The path.
+
+    Raises:
+        PermissionError: If the directory belongs to another user.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if os.stat(path).st_uid != os.getuid():
+        raise PermissionError(f"{path} belongs to another user")
+    os.chmod(path, 0o700)
+    return path
+
+
+def write_authkey(socket_dir, authkey):
+    """Stores a cluster's key in its socket directory, readable only by the current user."""
+    path = os.path.join(socket_dir, AUTHKEY_FILE)
+    descriptor = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "wb") as f:
+        f.write(authkey)
+    os.replace(path + ".tmp", path)
+
+
+def read_authkey(socket_dir):
+    """Returns the key stored by `write_authkey`, or None if there is none."""
+    try:
+        with open(os.path.join(socket_dir, AUTHKEY_FILE), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _ring_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring mapping user IDs to shard indexes.
+
+    Each shard owns RING_REPLICAS points on the ring and a user belongs to the
+    shard owning the first point at or after the user's hash. Growing from N to
+    N + 1 shards therefore moves only about 1 / (N + 1) of the users, all of them
+    to the new shard.
+
+    Attributes:
+        shards (int): The number of shards on the ring.
+    """
+
+    def __init__(self, shards, replicas=RING_REPLICAS):
+        if shards < 1:
+            raise ValueError("A hash ring needs at least one shard")
+        self.shards = shards
+        points = sorted((_ring_hash(f"shard-{shard}:{replica}"), shard)
+                        for shard in range(shards) for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def owner(self, user_id):
+        """
+        Returns the index of the shard owning a user.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            int: The shard index, in range(shards).
+        """
+        position = bisect.bisect_left(self._hashes, _ring_hash(str(user_id)))
+        return self._owners[position % len(self._owners)]
+
+
+def _shard_operations():
+    """Returns the operations a shard process serves, bound to its local stores."""
+    from app.models import changelog, recommendations, team, workout
+
+    def list_users():
+        return set(workout.workout_logs) | set(recommendations.favorite_exercises) | changelog.changelog.users()
+
+    def export_users(user_ids):
+        return {user_id: {"workouts": workout.get_workouts(user_id),
+                          "workout_version": workout.get_workout_version(user_id),
+                          "favorites": recommendations.get_favorite_exercises(user_id),
+                          "favorites_version": recommendations.get_favorites_version(user_id),
+                          "change_version": changelog.changelog.version(user_id)}
+                for user_id in user_ids}
+
+    def import_users(states):
+        for user_id, state in states.items():
+            # Continuing the sequence keeps a cursor from before an earlier move here from validating again
+            changelog.changelog.adopt(user_id, state["change_version"])
+            with workout.user_locks.for_key(user_id):
+                if state["workouts"]:
+                    workout.workout_logs[user_id] = list(state["workouts"])
+                    workout.workout_versions[user_id] = state["workout_version"]
+            with recommendations.favorite_locks.for_key(user_id):
+                if state["favorites"]:
+                    recommendations.favorite_exercises[user_id] = list(state["favorites"])
+                    recommendations.favorite_versions[user_id] = state["favorites_version"]
+
+    def drop_users(user_ids):
+        for user_id in user_ids:
+            with workout.user_locks.for_key(user_id):
+                workout.workout_logs.pop(user_id, None)
+                workout.workout_versions.pop(user_id, None)
+            with recommendations.favorite_locks.for_key(user_id):
+                recommendations.favorite_exercises.pop(user_id, None)
+                recommendations.favorite_versions.pop(user_id, None)
+            changelog.changelog.drop(user_id)
+
+    return {
+        "log_workout": workout.log_workout,
+        "log_workouts": workout.log_workouts,
+        "get_workouts": workout.get_workouts,
+        "get_workout_version": workout.get_workout_version,
+        "save_favorite_exercise": recommendations.save_favorite_exercise,
+        "get_favorite_exercises": recommendations.get_favorite_exercises,
+        "get_favorites_version": recommendations.get_favorites_version,
+        "remove_favorite_exercise": recommendations.remove_favorite_exercise,
+        "get_changes": changelog.get_changes,
+        "get_team_workouts": team.get_team_workouts,
+        "list_users": list_users,
+        "export_users": export_users,
+        "import_users": import_users,
+        "drop_users": drop_users,
+    }
+
+
+def _serve_connection(connection, operations):
+    with connection:
+        while True:
+            try:
+                operation, args = connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = ("ok", operations[operation](*args))
+            except Exception as e:
+                reply = ("error", type(e).__name__, str(e))
+            connection.send(reply)
+
+
+def serve_shard(address, authkey, settings=None):
+    """
+    Runs a shard server on a Unix socket until the process is terminated.
+
+    The shard keeps its users in this process's own `workout` and
+    `recommendations` stores and serves each client connection on a thread.
+
+    Args:
+        address (str): Path of the Unix socket to listen on.
+        authkey (bytes): Shared key clients must authenticate with.
+        settings (dict, optional): Application config values for the shard's stores, e.g. SYNC_MAX_CHANGES.
+    """
+    from app.models.changelog import configure_changelog
+
+    configure_changelog(settings or {})
+    operations = _shard_operations()
+    if os.path.exists(address):
+        os.unlink(address)
+    listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    logger.info(f"Shard listening on {address}")
+    while True:
+        try:
+            connection = listener.accept()
+        except (OSError, multiprocessing.AuthenticationError) as e:
+            logger.warning(f"Rejected shard connection on {address}: {e}")
+            continue
+        threading.Thread(target=_serve_connection, args=(connection, operations), daemon=True).start()
+
+
+class ShardClient:
+    """
+    Client for one shard, pooling authenticated connections across threads.
+
+    A connection is used by one thread at a time: `call` takes an idle one from
+    the pool, or opens a new one, and returns it after the reply. A connection
+    whose reply does not arrive within `timeout` is discarded.
+
+    Attributes:
+        address (str): Path of the shard's Unix socket.
+        timeout (float): Seconds to wait for a reply.
+    """
+
+    def __init__(self, address, authkey, timeout=10.0):
+        self.address = address
+        self.timeout = timeout
+        self._authkey = authkey
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        return Client(self.address, family="AF_UNIX", authkey=self._authkey)
+
+    def wait_ready(self, timeout=30.0):
+        """
+        Blocks until the shard accepts connections.
+
+        Args:
+            timeout (float, optional): Seconds to wait before giving up.
+
+        Returns:
+            ShardClient: This client, for chaining.
+
+        Raises:
+            TimeoutError: If the shard does not come up in time.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._idle.put(self._connect())
+                return self
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Shard at {self.address} did not start within {timeout}s")
+                time.sleep(0.05)
+
+    def call(self, operation, *args):
+        """
+        Runs an operation on the shard and returns its result.
+
+        Args:
+            operation (str): The operation name, e.g. "log_workout".
+            *args: Positional arguments for the operation.
+
+        Returns:
+            The operation's return value.
+
+        Raises:
+            ShardUnavailable: If the shard cannot be reached or does not reply within `timeout`.
+            Exception: The shard's exception, re-raised as the same builtin type
+                (RuntimeError for other types).
+        """
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                connection = self._connect()
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                raise ShardUnavailable(f"Shard at {self.address} is not running: {e}") from None
+        try:
+            connection.send((operation, args))
+            if not connection.poll(self.timeout):
+                raise ShardUnavailable(f"Shard at {self.address} did not answer {operation} "
+                                       f"within {self.timeout}s")
+            reply = connection.recv()
+        except BaseException as e:
+            connection.close()
+            if isinstance(e, (EOFError, ConnectionError)):
+                raise ShardUnavailable(f"Lost connection to shard at {self.address}: {e}") from None
+            raise
+        self._idle.put(connection)
+
+        if reply[0] == "error":
+            _, name, message = reply
+            error = getattr(builtins, name, None)
+            if not (isinstance(error, type) and issubclass(error, Exception)):
+                error = RuntimeError
+            raise error(message)
+        return reply[1]
+
+    def close(self):
+        """Closes every pooled connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _Gate:
+    """Lets calls pass concurrently, or holds them while the gate is closed for a rebalance."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._closed = False
+
+    @contextmanager
+    def passage(self):
+        with self._condition:
+            while self._closed:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                if not self._active:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def closed(self):
+        with self._condition:
+            while self._closed:
+                self._condition.wait()
+            self._closed = True
+            while self._active:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._closed = False
+                self._condition.notify_all()
+
+
+class ShardRouter:
+    """
+    Routes per-user operations to the shard owning the user.
+
+    Attributes:
+        clients (list): One ShardClient per shard, indexed like the hash ring.
+    """
+
+    def __init__(self, clients):
+        self.clients = list(clients)
+        self._ring = HashRing(len(self.clients))
+        self._gate = _Gate()
+
+    def call(self, user_id, operation, *args):
+        """
+        Runs an operation on the shard owning a user.
+
+        Args:
+            user_id (int): The ID of the user the operation concerns.
+            operation (str): The operation name.
+            *args: Positional arguments for the operation.
+
+        Returns:
+            The operation's return value.
+        """
+        with self._gate.passage():
+            return self.clients[self._ring.owner(user_id)].call(operation, *args)
+
+    def call_many(self, user_ids, operation, *args):
+        """
+        Runs a multi-user operation with one call per shard instead of one per user.
+
+        Args:
+            user_ids (list): The IDs of the users the operation concerns.
+            operation (str): The operation name; it takes the shard's share of
+                `user_ids` followed by `args` and returns a {user_id: result} dict.
+            *args: Further positional arguments for the operation.
+
+        Returns:
+            dict: {user_id: result} in the order of `user_ids`.
+        """
+        with self._gate.passage():
+            owned = {}
+            for user_id in user_ids:
+                owned.setdefault(self._ring.owner(user_id), []).append(user_id)
+            results = {}
+            for index, shard_user_ids in owned.items():
+                results.update(self.clients[index].call(operation, shard_user_ids, *args))
+        return {user_id: results[user_id] for user_id in user_ids}
+
+    def rebalance(self, clients):
+        """
+        Switches to a new set of shards, moving users whose owner changed.
+
+        Calls are held while users move, so no write can land on a shard that
+        is about to give the user away. Clients kept from the current set should
+        be passed as the same objects at the same index; only users whose shard
+        index changes are moved.
+
+        Args:
+            clients (list): The ShardClients of the new shard set.
+
+        Returns:
+            int: The number of users moved.
+        """
+        clients = list(clients)
+        ring = HashRing(len(clients))
+        moved = 0
+        with self._gate.closed():
+            for source in self.clients:
+                moves = {}
+                for user_id in source.call("list_users"):
+                    target = clients[ring.owner(user_id)]
+                    if target is not source:
+                        moves.setdefault(target, []).append(user_id)
+                for target, user_ids in moves.items():
+                    target.call("import_users", source.call("export_users", user_ids))
+                    source.call("drop_users", user_ids)
+                    moved += len(user_ids)
+            self.clients, self._ring = clients, ring
+        logger.info(f"Rebalanced onto {len(clients)} shards, moved {moved} users")
+        return moved
+
+    def close(self):
+        """Closes the connections of every shard client."""
+        for client in self.clients:
+            client.close()
+
+
+class ShardCluster:
+    """
+    Starts and supervises local shard processes behind a ShardRouter.
+
+    Shards are separate interpreters (spawned, not forked) listening on Unix
+    sockets named shard-<index>.sock in `socket_dir`, so other processes can
+    connect to them as well. The directory is private to the current user and
+    holds the cluster's key for those processes.
+
+    Attributes:
+        socket_dir (str): Directory holding the shard sockets.
+        router (ShardRouter): Router over the running shards, set by `start`.
+        timeout (float): Seconds the router's clients wait for a shard's reply.
+        settings (dict): Application config values handed to every shard process.
+    """
+
+    def __init__(self, socket_dir, authkey, timeout=10.0, settings=None):
+        self.socket_dir = socket_dir
+        self.router = None
+        self.timeout = timeout
+        self.settings = dict(settings or {})
+        self._authkey = authkey
+        self._processes = []
+        self._context = multiprocessing.get_context("spawn")
+
+    def address(self, index):
+        """Returns the socket path of a shard."""
+        return os.path.join(self.socket_dir, f"shard-{index}.sock")
+
+    def _spawn(self, indexes):
+        processes = []
+        for index in indexes:
+            process = self._context.Process(target=serve_shard,
+                                            args=(self.address(index), self._authkey, self.settings),
+                                            name=f"workout-shard-{index}", daemon=True)
+            process.start()
+            processes.append(process)
+        clients = [ShardClient(self.address(index), self._authkey, self.timeout).wait_ready() for index in indexes]
+        return processes, clients
+
+    def start(self, count):
+        """
+        Starts `count` shards and the router over them.
+
+        Args:
+            count (int): The number of shard processes.
+
+        Returns:
+            ShardRouter: The router.
+        """
+        private_directory(self.socket_dir)
+        write_authkey(self.socket_dir, self._authkey)
+        self._processes, clients = self._spawn(range(count))
+        self.router = ShardRouter(clients)
+        logger.info(f"Started {count} workout shards in {self.socket_dir}")
+        return self.router
+
+    def resize(self, count):
+        """
+        Grows or shrinks the cluster to `count` shards, moving users as needed.
+
+        Only this process's router learns the new ring. Routers in other processes
+        attached with SHARD_SPAWN=0 keep the old one and would send users to the
+        wrong shard, so resize only clusters that no other process is connected to;
+        to change the size of a cluster served by `flask shards serve`, stop it and
+        every worker and start them again with the new SHARD_COUNT (its data is lost).
+
+        Args:
+            count (int): The new number of shards.
+
+        Returns:
+            int: The number of users moved.
+        """
+        current = len(self._processes)
+        retired = self.router.clients[count:]
+        processes, clients = self._spawn(range(current, count))
+        moved = self.router.rebalance(self.router.clients[:count] + clients)
+        for index, (process, client) in enumerate(zip(self._processes[count:], retired), start=count):
+            client.close()
+            self._stop(process, index)
+        self._processes = self._processes[:count] + processes
+        return moved
+
+    def _stop(self, process, index):
+        process.terminate()
+        process.join()
+        if os.path.exists(self.address(index)):
+            os.unlink(self.address(index))
+
+    def stop(self):
+        """Stops every shard; their in-memory data is discarded."""
+        if self.router is not None:
+            self.router.close()
+        for index, process in enumerate(self._processes):
+            self._stop(process, index)
+        self._processes = []
+
+    def __len__(self):
+        return len(self._processes)
+
+
+def init_sharding(app):
+    """
+    Enables sharded mode when SHARD_COUNT is greater than zero.
+
+    Attaches a ShardRouter to the workout and favorites stores so their functions
+    forward to the shard owning each user. With SHARD_SPAWN the shards are started
+    by this process; otherwise they are expected to be served already, e.g. by
+    `flask shards serve`, which lets several web worker processes share them.
+
+    Shards authenticate clients with SHARD_AUTHKEY, or with a random key generated
+    by the process spawning them and stored in the private socket directory.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        ShardRouter: The attached router, or None when sharding is disabled.
+
+    Raises:
+        RuntimeError: If SHARD_AUTHKEY is the default SECRET_KEY, or SHARD_SPAWN is off and no key
+            is configured or stored.
+    """
+    from app.models import changelog, recommendations, team, workout
+
+    count = app.config.get("SHARD_COUNT", 0)
+    if count <= 0:
+        return None
+    if workout.router is not None:
+        return workout.router
+
+    socket_dir = app.config.get("SHARD_SOCKET_DIR") or \
+        os.path.join(tempfile.gettempdir(), f"workout-shards-{os.getuid()}")
+    timeout = app.config.get("SHARD_CALL_TIMEOUT", 10.0)
+    authkey = (app.config.get("SHARD_AUTHKEY") or "").encode("utf-8")
+    if authkey == DEFAULT_SECRET_KEY.encode("utf-8"):
+        raise RuntimeError("Refusing to authenticate shards with the default key")
+    if app.config.get("SHARD_SPAWN", True):
+        cluster = ShardCluster(socket_dir, authkey or os.urandom(32), timeout,
+                               settings={"SYNC_MAX_CHANGES": app.config.get("SYNC_MAX_CHANGES", 1000)})
+        router = cluster.start(count)
+        atexit.register(cluster.stop)
+        app.extensions["shard_cluster"] = cluster
+    else:
+        authkey = authkey or read_authkey(private_directory(socket_dir))
+        if not authkey:
+            raise RuntimeError(f"No shard key in SHARD_AUTHKEY or {socket_dir}; start the shards first")
+        router = ShardRouter(ShardClient(os.path.join(socket_dir, f"shard-{index}.sock"), authkey, timeout)
+                             .wait_ready() for index in range(count))
+    workout.router = recommendations.router = changelog.router = team.router = router
+    return router
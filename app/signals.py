@@ -0,0 +1,24 @@
+from blinker import Namespace
+
+# Signals emitted by the in-memory stores after a write has been applied.
+# Receivers are called synchronously on the writer's thread with keyword arguments.
+_signals = Namespace()
+
+# Sent by log_workout with user_id and workout
+workout_logged = _signals.signal("workout-logged")
+
+# Sent by save_favorite_exercise with user_id and exercise, only when a new favorite is stored
+favorite_saved = _signals.signal("favorite-saved")
+
+# Sent by remove_favorite_exercise with user_id and exercise_id after a favorite was removed
+favorite_removed = _signals.signal("favorite-removed")
+
+# Sent by fetch_exercises with exercises after a successful catalog fetch from wger
+catalog_fetched = _signals.signal("catalog-fetched")
+
+# Sent by the goal tracker with user_id and goals (their progress) after a workout updated them
+goals_updated = _signals.signal("goals-updated")
+
+# Sent by init_journal with workout_logs after the store was recovered from disk, so derived
+# indexes can rebuild from entries that did not pass through log_workout
+workouts_restored = _signals.signal("workouts-restored")
@@ -0,0 +1,425 @@
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, has_app_context
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers run first
+PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW = 0, 5, 9
+
+TaskDefinition = namedtuple("TaskDefinition", "name function priority retries")
+
+# Registered tasks by name; brokers carry names and arguments, never functions
+TASKS = {}
+
+
+def task(name, priority=PRIORITY_NORMAL, retries=0):
+    """
+    Registers a function as a background task under a name.
+
+    Args:
+        name (str): The task name, e.g. "search.index_catalog".
+        priority (int, optional): Default queue priority; lower runs first.
+        retries (int, optional): Default number of retries after a failure.
+
+    Returns:
+        callable: A decorator returning the function unchanged.
+    """
+    def decorator(function):
+        TASKS[name] = TaskDefinition(name, function, priority, retries)
+        return function
+    return decorator
+
+
+class TaskQueueFull(Exception):
+    """Raised when a task is submitted to a broker that is at capacity."""
+
+
+class LocalBroker:
+    """
+    Bounded in-process priority queue of task envelopes.
+
+    This is the broker interface the runner relies on: `put(envelope)`,
+    `get(timeout)` returning an envelope or None, and `len()`. Envelopes are
+    plain dictionaries of a task name, JSON-serializable arguments and
+    bookkeeping fields, so a broker shared by several processes (e.g. over a
+    socket or a database table) can implement the same three methods.
+
+    Attributes:
+        max_size (int): The most envelopes held at once.
+    """
+
+    def __init__(self, max_size=1000):
+        self.max_size = max_size
+        self._heap = []
+        self._sequence = itertools.count()
+        self._ready = threading.Condition()
+
+    def put(self, envelope):
+        """
+        Queues an envelope behind those of higher or equal priority.
+
+        Raises:
+            TaskQueueFull: If `max_size` envelopes are already queued.
+        """
+        with self._ready:
+            if len(self._heap) >= self.max_size:
+                raise TaskQueueFull(f"Task queue is full ({self.max_size} tasks)")
+            heapq.heappush(self._heap, (envelope["priority"], next(self._sequence), envelope))
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """
+        Takes the most urgent envelope, waiting up to `timeout` seconds for one.
+
+        Returns:
+            dict: The envelope, or None if none arrived in time.
+        """
+        with self._ready:
+            if not self._ready.wait_for(lambda: self._heap, timeout):
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def __len__(self):
+        with self._ready:
+            return len(self._heap)
+
+
+BROKERS = {
+    "local": lambda app: LocalBroker(app.config.get("TASK_QUEUE_SIZE", 1000)),
+}
+
+
+class TaskRunner:
+    """
+    Runs registered tasks on a bounded pool of worker threads.
+
+    Tasks are queued by priority in a broker and run inside the application
+    context. A failed task is retried after an exponential backoff
+    (`backoff`, then twice that, ...) until its retries are used up. Periodic
+    tasks are queued by a timer thread and skipped while their previous run
+    is still queued or running. Threads start with the first task.
+
+    Attributes:
+        broker: The queue of pending envelopes, e.g. a LocalBroker.
+        workers (int): The number of worker threads.
+        backoff (float): Seconds before the first retry of a failed task.
+    """
+
+    def __init__(self, app, broker, workers=2, backoff=1.0, clock=time.monotonic):
+        self.app = app
+        self.broker = broker
+        self.workers = workers
+        self.backoff = backoff
+        self._clock = clock
+        self._ids = itertools.count(1)
+        self._lock = threading.Condition()
+        self._threads = []
+        self._timer_thread = None
+        self._timers = []  # heap of (due, sequence, envelope, interval); interval is None for one-off delays
+        self._timer_sequence = itertools.count()
+        self._periodic_active = set()  # names of periodic tasks queued or running
+        self._pending = 0  # one-off tasks queued, running or waiting for a retry
+        self._running = 0
+        self._closing = False
+        self._stopped = False
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    def _envelope(self, name, args, priority, retries):
+        definition = TASKS.get(name)
+        if definition is None:
+            raise ValueError(f"Unknown task: {name}")
+        return {"id": next(self._ids), "name": name, "args": list(args),
+                "priority": definition.priority if priority is None else priority,
+                "retries": definition.retries if retries is None else retries, "attempt": 0}
+
+    def submit(self, name, args=(), priority=None, retries=None, delay=0):
+        """
+        Queues a registered task.
+
+        Args:
+            name (str): The registered task name.
+            args (tuple, optional): Positional arguments for the task.
+            priority (int, optional): Overrides the task's default priority.
+            retries (int, optional): Overrides the task's default number of retries.
+            delay (float, optional): Seconds to wait before queueing it.
+
+        Returns:
+            int: The task ID.
+
+        Raises:
+            ValueError: If no task is registered under `name`.
+            TaskQueueFull: If the broker is at capacity.
+            RuntimeError: If the runner is shutting down.
+        """
+        envelope = self._envelope(name, args, priority, retries)
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Task runner is shutting down")
+            self._pending += 1
+            self.submitted += 1
+        if delay > 0:
+            self._arm(self._clock() + delay, envelope)
+        else:
+            self._enqueue(envelope)
+        return envelope["id"]
+
+    def schedule(self, name, interval, args=(), priority=None, delay=None):
+        """
+        Runs a registered task every `interval` seconds, replacing an earlier schedule of the same task.
+
+        A failed run is retried like any other task before the next run is due.
+
+        Args:
+            name (str): The registered task name.
+            interval (float): Seconds between runs.
+            args (tuple, optional): Positional arguments for every run.
+            priority (int, optional): Overrides the task's default priority.
+            delay (float, optional): Seconds before the first run; defaults to `interval`.
+
+        Raises:
+            ValueError: If no task is registered under `name`.
+            RuntimeError: If the runner is shutting down.
+        """
+        envelope = self._envelope(name, args, priority, None)
+        envelope["periodic"] = True
+        with self._lock:
+            if self._closing:
+                raise RuntimeError("Task runner is shutting down")
+            self._timers = [timer for timer in self._timers
+                            if not (timer[3] is not None and timer[2]["name"] == name)]
+            heapq.heapify(self._timers)
+        self._arm(self._clock() + (interval if delay is None else delay), envelope, interval)
+
+    def _enqueue(self, envelope):
+        try:
+            self.broker.put(envelope)
+        except TaskQueueFull:
+            with self._lock:
+                self.rejected += 1
+                self._finish(envelope)
+            raise
+        self._start_workers()
+
+    def _start_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers and not self._stopped:
+                thread = threading.Thread(target=self._work, name=f"task-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _arm(self, due, envelope, interval=None):
+        with self._lock:
+            if self._closing and interval is None:
+                due = self._clock()  # retries and delays do not wait out a shutdown
+            heapq.heappush(self._timers, (due, next(self._timer_sequence), envelope, interval))
+            if self._timer_thread is None:
+                self._timer_thread = threading.Thread(target=self._run_timers, name="task-timer", daemon=True)
+                self._timer_thread.start()
+            self._lock.notify_all()
+
+    def _run_timers(self):
+        with self._lock:
+            while not self._stopped:
+                if not self._timers:
+                    self._lock.wait()
+                    continue
+                due, _, envelope, interval = self._timers[0]
+                now = self._clock()
+                if due > now:
+                    self._lock.wait(due - now)
+                    continue
+                heapq.heappop(self._timers)
+                if interval is not None:
+                    heapq.heappush(self._timers, (max(due + interval, now), next(self._timer_sequence),
+                                                  envelope, interval))
+                    if envelope["name"] in self._periodic_active:
+                        continue  # the previous run has not finished
+                    self._periodic_active.add(envelope["name"])
+                    envelope = dict(envelope, id=next(self._ids))
+                self._lock.release()
+                try:
+                    self._enqueue(envelope)
+                except TaskQueueFull:
+                    logger.warning(f"Dropped task {envelope['name']}: the task queue is full")
+                finally:
+                    self._lock.acquire()
+
+    def _finish(self, envelope):
+        # Called with the lock held once an envelope will not run again
+        if envelope.get("periodic"):
+            self._periodic_active.discard(envelope["name"])
+        else:
+            self._pending -= 1
+        self._lock.notify_all()
+
+    def _work(self):
+        while True:
+            envelope = self.broker.get(timeout=0.5)
+            if envelope is None:
+                if self._stopped:
+                    return
+                continue
+            with self._lock:
+                self._running += 1
+            retry_at = self._execute(envelope)
+            with self._lock:
+                self._running -= 1
+                if retry_at is None:
+                    self._finish(envelope)
+            if retry_at is not None:
+                self._arm(retry_at, envelope)
+
+    def _execute(self, envelope):
+        """Runs one envelope and returns when to retry it, or None if it is done."""
+        definition = TASKS[envelope["name"]]
+        try:
+            with self.app.app_context():
+                definition.function(*envelope["args"])
+        except Exception as e:
+            if envelope["attempt"] < envelope["retries"] and not self._stopped:
+                delay = self.backoff * 2 ** envelope["attempt"]
+                envelope["attempt"] += 1
+                with self._lock:
+                    self.retried += 1
+                logger.warning(f"Task {envelope['name']} failed ({e}); retry {envelope['attempt']} in {delay:.1f}s")
+                return self._clock() + delay
+            with self._lock:
+                self.failed += 1
+            logger.error(f"Task {envelope['name']} failed after {envelope['attempt'] + 1} attempts: {e}")
+            return None
+        with self._lock:
+            self.completed += 1
+        return None
+
+    def drain(self, timeout=None):
+        """
+        Waits until every submitted one-off task, including pending retries, has finished.
+
+        Args:
+            timeout (float, optional): Seconds to wait; None waits indefinitely.
+
+        Returns:
+            bool: True if the runner is idle, False if the timeout expired first.
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: self._pending == 0 and self._running == 0, timeout)
+
+    def shutdown(self, timeout=10.0):
+        """
+        Stops accepting tasks, runs what is queued and stops the threads.
+
+        Periodic schedules are cancelled and retries waiting for their backoff
+        are run right away.
+
+        Args:
+            timeout (float, optional): Seconds to wait for queued tasks to finish.
+
+        Returns:
+            bool: True if every task finished in time.
+        """
+        with self._lock:
+            self._closing = True
+            self._timers = [(self._clock(), sequence, envelope, None)
+                            for _, sequence, envelope, interval in self._timers if interval is None]
+            heapq.heapify(self._timers)
+            self._lock.notify_all()
+        drained = self.drain(timeout)
+        with self._lock:
+            self._stopped = True
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        if not drained:
+            logger.warning(f"Task runner stopped with {self._pending} tasks unfinished")
+        return drained
+
+    def stats(self):
+        """
+        Reports queue depth and task outcomes for monitoring.
+
+        Returns:
+            dict: Queued, running and waiting-for-retry counts and the submitted, completed,
+            failed, retried and rejected totals.
+        """
+        with self._lock:
+            return {"queued": len(self.broker), "running": self._running,
+                    "scheduled": sum(1 for timer in self._timers if timer[3] is None),
+                    "periodic": sorted({timer[2]["name"] for timer in self._timers if timer[3] is not None}),
+                    "workers": len(self._threads), "submitted": self.submitted, "completed": self.completed,
+                    "failed": self.failed, "retried": self.retried, "rejected": self.rejected}
+
+
+def defer(name, *args):
+    """
+    Runs a registered task in the background if the current app has a task runner.
+
+    Without a runner, outside an app context, or when the queue is full or
+    shutting down, the task runs right away on the calling thread instead, so
+    deferred work is never lost.
+
+    Args:
+        name (str): The registered task name.
+        *args: Positional arguments for the task.
+    """
+    runner = current_app.extensions.get("tasks") if has_app_context() else None
+    if runner is not None:
+        try:
+            runner.submit(name, args)
+            return
+        except (TaskQueueFull, RuntimeError) as e:
+            logger.warning(f"Running task {name} inline: {e}")
+    TASKS[name].function(*args)
+
+
+def init_tasks(app):
+    """
+    Attaches a background task runner to the app and drains it at exit.
+
+    Configuration keys:
+        TASK_WORKERS (int): Worker threads; 0 disables the runner and deferred tasks run inline.
+        TASK_BROKER (str): The broker holding queued tasks; "local" is an in-process queue.
+        TASK_QUEUE_SIZE (int): The most tasks the local broker queues before rejecting more.
+        TASK_RETRY_BACKOFF (float): Seconds before the first retry of a failed task.
+        TASK_DRAIN_TIMEOUT (float): Seconds queued tasks get to finish at exit.
+        CATALOG_REFRESH_INTERVAL (float): Seconds between background fetches of the wger exercise
+            catalog, the first right at startup; 0 disables them.
+        RECOMMENDER_REFRESH_INTERVAL (float): Seconds between rebuilds of every recommendation
+            neighbor list; 0 disables them.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        TaskRunner: The attached runner, or None when it is disabled.
+    """
+    workers = app.config.get("TASK_WORKERS", 2)
+    if workers <= 0:
+        return None
+    name = app.config.get("TASK_BROKER", "local")
+    if name not in BROKERS:
+        raise ValueError(f"Unknown TASK_BROKER: {name}")
+    runner = TaskRunner(app, BROKERS[name](app), workers=workers,
+                        backoff=app.config.get("TASK_RETRY_BACKOFF", 1.0))
+    app.extensions["tasks"] = runner
+    atexit.register(runner.shutdown, app.config.get("TASK_DRAIN_TIMEOUT", 10.0))
+
+    interval = app.config.get("CATALOG_REFRESH_INTERVAL", 0)
+    if interval > 0:
+        from app.models import recommendations  # noqa: F401 (registers catalog.refresh)
+        runner.schedule("catalog.refresh", interval, delay=0)
+    interval = app.config.get("RECOMMENDER_REFRESH_INTERVAL", 0)
+    if interval > 0:
+        from app.models import recommender  # noqa: F401 (registers recommender.refresh)
+        runner.schedule("recommender.refresh", interval)
+    logger.info(f"Task runner started with {workers} workers on the {name} broker")
+    return runner
@@ -0,0 +1,361 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app, request
+from app.tasks import PRIORITY_LOW, task
+
+logger = logging.getLogger(__name__)
+
+# W3C trace context: version-trace_id-parent_id-flags
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Statements are recorded without parameters and cut to this length
+MAX_STATEMENT_LENGTH = 200
+
+# Optional Tracer attached by init_tracing
+tracer = None
+
+# The innermost open span of the current request, or None when it is not sampled
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed operation in a trace.
+
+    Attributes:
+        trace_id (str): 32 hex digits shared by every span of the trace.
+        span_id (str): 16 hex digits identifying the span.
+        parent_id (str): The parent span's ID, or the caller's for a request span; None for a new trace.
+        name (str): What the span measures, e.g. "GET /login" or "db.query".
+        attributes (dict): Details such as the status code or SQL statement.
+        error (str): The exception raised inside the span, if any.
+        root (bool): Whether this is the span of a whole request in this process.
+    """
+
+    def __init__(self, tracer, trace_id, name, parent_id=None, attributes=None, root=False):
+        self.tracer = tracer
+        self.root = root
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        """Records a detail about the operation."""
+        self.attributes[key] = value
+
+    def traceparent(self):
+        """Returns the W3C traceparent header value making this span the parent of a downstream call."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def end(self):
+        """Stops the span's clock and hands it to the exporter."""
+        self.duration = time.perf_counter() - self._started
+        self.tracer.exporter.export(self)
+
+    def to_dict(self):
+        """
+        Returns the span in the exported format.
+
+        Returns:
+            dict: {"trace_id", "span_id", "parent_id", "name", "start", "duration_ms", "attributes", "error"}.
+        """
+        return {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "name": self.name, "start": self.start, "duration_ms": round(self.duration * 1000, 3),
+                "attributes": self.attributes, "error": self.error}
+
+
+class InMemoryExporter:
+    """
+    Keeps finished spans in a bounded list, for tests and debugging.
+
+    Attributes:
+        spans (list): Finished spans as dictionaries, in the order they ended.
+    """
+
+    def __init__(self, max_spans=10000):
+        self.max_spans = max_spans
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            self.spans.append(span.to_dict())
+            del self.spans[:-self.max_spans]
+
+    def clear(self):
+        """Drops every recorded span."""
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonlExporter:
+    """
+    Appends finished spans to a file, one JSON object per line.
+
+    Writes are buffered and flushed whenever a trace's root span ends, so a
+    request costs at most one write to the file. With `flush_on_root` off the
+    request costs none, and the buffer is flushed by a periodic task instead.
+
+    Attributes:
+        path (str): The file the spans are appended to.
+        flush_on_root (bool): Whether the end of a root span flushes the buffer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.flush_on_root = True
+
+    def export(self, span):
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            if span.root and self.flush_on_root:
+                self._file.flush()
+
+    def flush(self):
+        """Writes buffered spans to the file."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        """Flushes and closes the file."""
+        with self._lock:
+            self._file.close()
+
+
+EXPORTERS = {
+    "memory": lambda app: InMemoryExporter(),
+    "jsonl": lambda app: JsonlExporter(app.config.get("TRACE_FILE") or "traces.jsonl"),
+}
+
+
+class Tracer:
+    """
+    Starts sampled traces and hands their finished spans to an exporter.
+
+    The sampling decision is made once per trace: a request carrying a
+    traceparent follows its caller's sampled flag, any other request is
+    sampled with probability `sample_rate`. Spans of unsampled requests are
+    never created, so their cost is one context variable lookup per span site.
+
+    Attributes:
+        exporter: An object with an `export(span)` method.
+        sample_rate (float): The share of new traces recorded, from 0 to 1.
+    """
+
+    def __init__(self, exporter, sample_rate=0.01):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def sample(self, traceparent=None):
+        """
+        Decides whether a request is traced.
+
+        Args:
+            traceparent (str, optional): The incoming W3C traceparent header.
+
+        Returns:
+            tuple: (trace_id, parent_id) of the trace to record, or None if it is not sampled.
+        """
+        match = TRACEPARENT_PATTERN.match(traceparent) if traceparent else None
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            return (trace_id, parent_id) if int(flags, 16) & 1 else None
+        if random.random() < self.sample_rate:
+            return os.urandom(16).hex(), None
+        return None
+
+    def start_trace(self, name, traceparent=None, attributes=None):
+        """
+        Opens the root span of a request, continuing the caller's trace if one is given.
+
+        Args:
+            name (str): The span name.
+            traceparent (str, optional): The incoming W3C traceparent header.
+            attributes (dict, optional): Initial span attributes.
+
+        Returns:
+            Span: The new span, or None if the trace is not sampled.
+        """
+        context = self.sample(traceparent)
+        if context is None:
+            return None
+        trace_id, parent_id = context
+        return Span(self, trace_id, name, parent_id, attributes, root=True)
+
+
+def current_span():
+    """Returns the innermost open span of the current request, or None if it is not sampled."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a block as a child of the current span.
+
+    Outside a sampled request this does nothing and yields None.
+
+    Args:
+        name (str): The span name, e.g. "wger.get".
+        **attributes: Initial span attributes.
+
+    Yields:
+        Span: The child span, or None.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.tracer, parent.trace_id, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name):
+    """Decorates a function so every call is timed as a child span called `name`."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        parent = _current_span.get()
+        if parent is not None:
+            context._trace_span = Span(parent.tracer, parent.trace_id, "db.query", parent.span_id,
+                                       {"statement": statement[:MAX_STATEMENT_LENGTH], "executemany": executemany})
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        query_span = getattr(context, "_trace_span", None)
+        if query_span is not None:
+            context._trace_span = None
+            query_span.end()
+
+    @event.listens_for(engine, "handle_error")
+    def fail_query(exception_context):
+        query_span = getattr(exception_context.execution_context, "_trace_span", None)
+        if query_span is not None:
+            exception_context.execution_context._trace_span = None
+            query_span.error = f"{type(exception_context.original_exception).__name__}: " \
+                               f"{exception_context.original_exception}"
+            query_span.end()
+
+
+@task("tracing.flush", priority=PRIORITY_LOW)
+def flush_traces():
+    """Writes the spans buffered by the current app's jsonl exporter to its file."""
+    current_app.extensions["tracer"].exporter.flush()
+
+
+def init_tracing(app):
+    """
+    Traces sampled requests from arrival to teardown, including their database queries.
+
+    Register it before the other request hooks so that time spent waiting for
+    admission is part of the request span. Streamed response bodies are sent
+    after the span has ended.
+
+    Configuration keys:
+        TRACE_EXPORTER (str): "jsonl" or "memory"; empty disables tracing.
+        TRACE_FILE (str): The file spans are appended to by the jsonl exporter.
+        TRACE_SAMPLE_RATE (float): The share of requests without a traceparent that are traced.
+        TRACE_FLUSH_INTERVAL (float): With a task runner, seconds between flushes of the jsonl
+            exporter's buffer; requests then never write to the file.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        Tracer: The attached tracer, or None when tracing is disabled.
+    """
+    global tracer
+    name = app.config.get("TRACE_EXPORTER")
+    if not name:
+        return None
+    if name not in EXPORTERS:
+        raise ValueError(f"Unknown TRACE_EXPORTER: {name}")
+    tracer = Tracer(EXPORTERS[name](app), app.config.get("TRACE_SAMPLE_RATE", 0.01))
+    app.extensions["tracer"] = tracer
+    runner = app.extensions.get("tasks")
+    if runner is not None and isinstance(tracer.exporter, JsonlExporter):
+        tracer.exporter.flush_on_root = False
+        runner.schedule("tracing.flush", app.config.get("TRACE_FLUSH_INTERVAL", 1.0))
+        atexit.register(tracer.exporter.flush)
+
+    from app import db
+    with app.app_context():
+        _instrument_engine(db.engine)
+
+    @app.before_request
+    def start_request_span():
+        # Sampled from the raw environ, so unsampled requests build no span
+        environ = request.environ
+        root = tracer.start_trace(f"{request.method} {request.path}", environ.get("HTTP_TRACEPARENT"),
+                                  {"http.method": request.method, "http.path": request.path})
+        if root is None:
+            return
+        environ["tracing.span"] = root
+        environ["tracing.previous"] = _current_span.set(root)
+
+    @app.after_request
+    def record_response(response):
+        root = request.environ.get("tracing.span")
+        if root is not None:
+            root.set_attribute("http.status_code", response.status_code)
+            response.headers["traceresponse"] = root.traceparent()
+        return response
+
+    @app.teardown_request
+    def end_request_span(exc):
+        root = request.environ.pop("tracing.span", None)
+        if root is None:
+            return
+        if exc is not None:
+            root.error = f"{type(exc).__name__}: {exc}"
+        try:
+            _current_span.reset(request.environ.pop("tracing.previous"))
+        except ValueError:  # torn down from another context
+            _current_span.set(None)
+        root.end()
+
+    logger.info(f"Tracing enabled: {name} exporter, sample rate {tracer.sample_rate}")
+    return tracer
@@ -0,0 +1,79 @@
+"""
+Thread-scaling benchmark for the workout store.
+
+Runs log_workout from 1..N threads, each writing to its own set of users, while
+a reader thread keeps polling get_workouts. Reported with the striped per-user
+locks and, for comparison, with a single lock shared by every user. With
+--journal the journal is attached with fsync on commit, which is where extra
+threads pay off most since they share group commits.
+
+Usage:
+    python -m benchmarks.bench_concurrency [--writes N] [--max-threads N] [--journal]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.models import workout
+from app.models.journal import WorkoutJournal
+from app.models.locks import StripedLock
+
+
+def run(threads, writes):
+    workout.workout_logs.clear()
+    stop = threading.Event()
+    per_thread = writes // threads
+
+    def writer(t):
+        for i in range(per_thread):
+            workout.log_workout(t * 1000 + i % 100, 101, 10, 50.0, "2024-12-07", "")
+
+    def reader():
+        while not stop.is_set():
+            workout.get_workouts(0)
+
+    poller = threading.Thread(target=reader)
+    poller.start()
+    workers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    poller.join()
+
+    assert sum(len(entries) for entries in workout.workout_logs.values()) == per_thread * threads
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writes', type=int, default=40_000)
+    parser.add_argument('--max-threads', type=int, default=16)
+    parser.add_argument('--journal', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, locks in (("striped", StripedLock()), ("global", StripedLock(stripes=1))):
+            workout.user_locks = locks
+            print(f"{name} locks:")
+            threads = 1
+            while threads <= args.max_threads:
+                if args.journal:
+                    workout.journal = WorkoutJournal(os.path.join(directory, f"{name}-{threads}"))
+                    workout.journal.recover({})
+                    workout.journal.start()
+                rate = run(threads, args.writes)
+                if args.journal:
+                    workout.journal.close()
+                    workout.journal = None
+                print(f"  {threads:3d} threads: {rate:12,.0f} writes/s")
+                threads *= 2
+
+
+if __name__ == '__main__':
+    main()
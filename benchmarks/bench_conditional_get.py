@@ -0,0 +1,52 @@
+"""
+Polling benchmark for conditional GETs on /view-workouts.
+
+Simulates a mobile client polling a user's history while nothing changes and
+compares plain polling against polling with If-None-Match.
+
+Usage:
+    python -m benchmarks.bench_conditional_get [--workouts N] [--polls N]
+"""
+import argparse
+import time
+
+from app import create_app
+from app.models.workout import log_workout
+
+
+def poll(client, user_id, polls, conditional):
+    etag = None
+    transferred = 0
+    start = time.process_time()
+    for _ in range(polls):
+        headers = {'If-None-Match': etag} if conditional and etag else {}
+        response = client.get('/view-workouts', query_string={"user_id": user_id}, headers=headers)
+        transferred += len(response.data)
+        etag = response.headers.get('ETag', etag)
+    return transferred, time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workouts', type=int, default=2000)
+    parser.add_argument('--polls', type=int, default=500)
+    args = parser.parse_args()
+
+    app = create_app()
+    user_id = 900001
+    for i in range(args.workouts):
+        log_workout(user_id, 100 + i % 50, 10, 60.0, f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "set")
+
+    with app.test_client() as client:
+        plain_bytes, plain_cpu = poll(client, user_id, args.polls, conditional=False)
+        cond_bytes, cond_cpu = poll(client, user_id, args.polls, conditional=True)
+
+    print(f"{args.polls} polls over {args.workouts} workouts")
+    print(f"  plain:       {plain_bytes / 1024:10.1f} KiB  {plain_cpu * 1000 / args.polls:8.3f} ms CPU/poll")
+    print(f"  conditional: {cond_bytes / 1024:10.1f} KiB  {cond_cpu * 1000 / args.polls:8.3f} ms CPU/poll")
+    print(f"  savings:     {100 * (1 - cond_bytes / plain_bytes):9.1f}% bytes  "
+          f"{100 * (1 - cond_cpu / plain_cpu):8.1f}% CPU")
+
+
+if __name__ == '__main__':
+    main()
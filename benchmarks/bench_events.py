@@ -0,0 +1,52 @@
+"""
+Cost of idle event stream subscribers in the event hub.
+
+Opens many subscriptions, one per followed athlete, and measures the memory
+they take, the threads they start and how long publishing an event takes,
+both for a user with one subscriber and for a user followed by every stream.
+
+Usage:
+    python -m benchmarks.bench_events [--subscribers N] [--events N]
+"""
+import argparse
+import threading
+import time
+import tracemalloc
+
+from app.events import EventHub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--subscribers', type=int, default=10000)
+    parser.add_argument('--events', type=int, default=20000)
+    args = parser.parse_args()
+
+    hub = EventHub(max_subscribers=args.subscribers + 1)
+    threads = threading.active_count()
+    tracemalloc.start()
+    subscriptions = [hub.subscribe([user_id]) for user_id in range(args.subscribers)]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{args.subscribers} idle subscribers: {memory / args.subscribers:.0f} bytes each, "
+          f"{threading.active_count() - threads} extra threads")
+
+    start = time.perf_counter()
+    for n in range(args.events):
+        hub.publish(n % args.subscribers, "workout", {"n": n})
+    print(f"  publish to one subscriber:   {(time.perf_counter() - start) * 1e6 / args.events:7.2f} us/event")
+    for subscription in subscriptions:
+        subscription.get(0)
+
+    broadcast = EventHub(max_subscribers=args.subscribers)
+    followers = [broadcast.subscribe([0]) for _ in range(args.subscribers)]
+    events = max(1, args.events // args.subscribers)
+    start = time.perf_counter()
+    for n in range(events):
+        broadcast.publish(0, "workout", {"n": n})
+    print(f"  publish to {len(followers)} subscribers: "
+          f"{(time.perf_counter() - start) * 1e3 / events:7.2f} ms/event")
+
+
+if __name__ == '__main__':
+    main()
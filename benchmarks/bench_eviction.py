@@ -0,0 +1,93 @@
+"""
+Memory of the workout store with and without a budget under a skewed population.
+
+Each configuration runs in a fresh process: it logs a history for every user,
+then runs reads and writes over users picked from a Zipf distribution, so a
+few users are hot and most are cold. Reports the process's peak RSS, read
+latency percentiles and, with a budget, the store's hit rate and reload latency.
+
+Usage:
+    python -m benchmarks.bench_eviction [--users N] [--history N] [--operations N] [--budgets MB,MB,...]
+"""
+import argparse
+import itertools
+import logging
+import multiprocessing
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+MiB = 1024 * 1024
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(budget_mb, args, results):
+    logging.disable(logging.INFO)
+    from app.models import workout
+    from app.models.eviction import ColdStore
+
+    baseline = _peak_rss_mb()
+    directory = tempfile.mkdtemp(prefix="workout-spill-")
+    if budget_mb:
+        workout.eviction = ColdStore(directory, budget_mb * MiB, workout.workout_logs, workout.user_locks)
+    try:
+        for user_id in range(args.users):
+            workout.log_workouts(user_id, [{"exercise_id": 1 + n % 40, "repetitions": 5 + n % 10,
+                                            "weight": 20.0 + n % 60, "date": f"2024-{1 + n % 12:02d}-{1 + n % 28:02d}",
+                                            "comment": f"set {n}"} for n in range(args.history)])
+
+        rng = random.Random(7)
+        cumulative = list(itertools.accumulate(1 / rank ** 1.1 for rank in range(1, args.users + 1)))
+        order = list(range(args.users))
+        rng.shuffle(order)
+        reads = []
+        for position in rng.choices(range(args.users), cum_weights=cumulative, k=args.operations):
+            user_id = order[position]
+            if rng.random() < 0.1:
+                workout.log_workout(user_id, 1, 8, 50.0, "2024-12-01", "")
+            else:
+                start = time.perf_counter()
+                workout.get_workouts(user_id)
+                reads.append(time.perf_counter() - start)
+        reads.sort()
+        results.put({"budget_mb": budget_mb, "baseline_mb": baseline, "peak_mb": _peak_rss_mb(),
+                     "p50_us": reads[len(reads) // 2] * 1e6, "p99_us": reads[int(len(reads) * 0.99)] * 1e6,
+                     "stats": workout.eviction.stats() if workout.eviction is not None else None})
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--history', type=int, default=40, help="Workouts logged per user up front.")
+    parser.add_argument('--operations', type=int, default=100000)
+    parser.add_argument('--budgets', default="0,64,16", help="Memory budgets in MiB; 0 is unbounded.")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.users} users x {args.history} workouts, {args.operations} Zipf-distributed operations (10% writes)")
+    for budget_mb in (int(value) for value in args.budgets.split(',')):
+        results = context.Queue()
+        process = context.Process(target=run, args=(budget_mb, args, results))
+        process.start()
+        result = results.get()
+        process.join()
+
+        label = f"budget {budget_mb} MiB" if budget_mb else "unbounded"
+        line = (f"  {label:15s} peak RSS {result['peak_mb']:7.1f} MiB (interpreter {result['baseline_mb']:.1f})  "
+                f"read p50 {result['p50_us']:7.1f} us  p99 {result['p99_us']:8.1f} us")
+        stats = result["stats"]
+        if stats is not None:
+            line += (f"  hit rate {stats['hit_rate']:.3f}  evictions {stats['evictions']}  "
+                     f"reload avg {stats['reload_ms_avg']:.3f} ms")
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
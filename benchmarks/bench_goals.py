@@ -0,0 +1,68 @@
+"""
+Goal evaluation cost versus workout history length.
+
+For users with growing histories, times logging a workout and then reading
+the progress of three goals (target weight, weekly volume, weekly sessions),
+once through the event-driven GoalTracker and once by recomputing progress
+from the full history, as a goal check without running state would.
+
+Usage:
+    python -m benchmarks.bench_goals [--histories N,N,...] [--checks N]
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from app.models.goals import goal_tracker
+from app.models.workout import get_workouts, log_workout, log_workouts
+
+
+def rescan_progress(user_id, today):
+    week = today - timedelta(days=today.weekday())
+    best, volume, days = 0.0, 0.0, set()
+    for workout in get_workouts(user_id):
+        day = datetime.strptime(workout["date"], "%Y-%m-%d").date()
+        if workout["exercise_id"] == 1:
+            best = max(best, workout["weight"])
+        if day >= week:
+            volume += workout["weight"] * workout["repetitions"]
+            days.add(day)
+    return best, volume, len(days)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--histories', default="1000,10000,100000")
+    parser.add_argument('--checks', type=int, default=500)
+    args = parser.parse_args()
+
+    today = date.today()
+    print(f"{args.checks} log + progress checks per history length")
+    for offset, history in enumerate(int(n) for n in args.histories.split(',')):
+        user_id = 910000 + offset
+        log_workouts(user_id, [{"exercise_id": 1 + i % 20, "repetitions": 10, "weight": 40.0 + i % 60,
+                                "date": (today - timedelta(days=i % 700)).isoformat(), "comment": ""}
+                               for i in range(history)])
+        goal_tracker.add(user_id, "target_weight", 150, exercise_id=1)
+        goal_tracker.add(user_id, "weekly_volume", 20000)
+        goal_tracker.add(user_id, "weekly_sessions", 4)
+
+        start = time.perf_counter()
+        for _ in range(args.checks):
+            log_workout(user_id, 1, 10, 60.0, today.isoformat(), "")
+            goal_tracker.progress(user_id, today)
+        incremental = (time.perf_counter() - start) / args.checks
+
+        checks = max(1, min(args.checks, 2000000 // history))
+        start = time.perf_counter()
+        for _ in range(checks):
+            log_workout(user_id, 1, 10, 60.0, today.isoformat(), "")
+            rescan_progress(user_id, today)
+        rescan = (time.perf_counter() - start) / checks
+
+        print(f"  {history:7d} workouts: incremental {incremental * 1e6:9.1f} us/check   "
+              f"rescan {rescan * 1e6:11.1f} us/check")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Durability benchmark for the workout journal.
+
+Measures ingest throughput through `log_workout` with the journal attached and
+fsync-on-commit enabled, then recovery time for a store of --entries workouts
+(a snapshot plus a journal tail).
+
+Usage:
+    python -m benchmarks.bench_journal [--entries N] [--ingest N] [--threads N] [--dir PATH]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from app.models import workout
+from app.models.journal import WorkoutJournal
+
+
+def ingest(journal, total, threads):
+    workout.journal = journal
+    per_thread = total // threads
+
+    def writer(offset):
+        for i in range(per_thread):
+            workout.log_workout(offset * per_thread + i % 1000, 100 + i % 50, 10, 60.0, "2024-12-07", "set")
+
+    workers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    workout.journal = None
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=10_000_000)
+    parser.add_argument('--ingest', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--dir', default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        journal = WorkoutJournal(os.path.join(directory, "ingest"), sync=True)
+        journal.recover({})
+        journal.start()
+        rate = ingest(journal, args.ingest, args.threads)
+        journal.close()
+        print(f"ingest, fsync on commit, {args.threads} threads: {rate:,.0f} workouts/s "
+              f"({journal.durable_sequence / journal.commits:.1f} records per fsync)")
+
+        journal = WorkoutJournal(os.path.join(directory, "recovery"), sync=False)
+        journal.recover({})
+        journal.start()
+        entry = {"exercise_id": 101, "repetitions": 10, "weight": 60.0, "date": "2024-12-07", "comment": "set"}
+        tail = max(args.entries // 100, 1)
+        for i in range(args.entries - tail):
+            journal.append(i % 100_000, entry)
+        journal.snapshot()
+        for i in range(tail):
+            journal.append(i % 100_000, entry)
+        journal.close()
+
+        store = {}
+        start = time.perf_counter()
+        recovered = WorkoutJournal(os.path.join(directory, "recovery")).recover(store)
+        elapsed = time.perf_counter() - start
+        print(f"recovery of {recovered:,} workouts ({tail:,} from the journal tail): {elapsed:.2f} s "
+              f"({recovered / elapsed:,.0f} workouts/s)")
+
+
+if __name__ == '__main__':
+    main()
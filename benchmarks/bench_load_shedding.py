@@ -0,0 +1,83 @@
+"""
+Latency under overload with and without the concurrency limiter.
+
+Models a server with a fixed pool of worker threads. Requests to
+/recommendations, whose upstream call is replaced by a fixed sleep, arrive at
+a steady rate above what the pool can serve, while /health/live is probed
+periodically. Latency is measured from arrival, so time spent queued for a
+worker counts. Without the limiter the backlog (and every request's latency,
+health checks included) grows for as long as the overload lasts; with it,
+excess slow requests are shed with 503 and latency stays bounded.
+
+Usage:
+    python -m benchmarks.bench_load_shedding [--rate N] [--seconds N] [--workers N] [--limit N]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app, routes
+from config import Config
+
+
+def _percentile(latencies, fraction):
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+
+def run(max_in_flight, args):
+    Config.LOAD_SHED_MAX_IN_FLIGHT = max_in_flight
+    Config.LOAD_SHED_QUEUE_TIMEOUT = args.queue_timeout_ms / 1000
+    app = create_app()
+    client = app.test_client()
+
+    def request(path, params, arrived):
+        status = client.get(path, query_string=params).status_code
+        return path, status, time.perf_counter() - arrived
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        start = time.perf_counter()
+        sent = 0
+        while time.perf_counter() - start < args.seconds:
+            due = int((time.perf_counter() - start) * args.rate)
+            for _ in range(due - sent):
+                futures.append(pool.submit(request, '/recommendations', {"category": 1}, time.perf_counter()))
+                if sent % 20 == 0:
+                    futures.append(pool.submit(request, '/health/live', {}, time.perf_counter()))
+                sent += 1
+            time.sleep(0.001)
+
+    slow, health, statuses = [], [], {}
+    for future in futures:
+        path, status, latency = future.result()
+        (health if path == '/health/live' else slow).append(latency)
+        statuses[status] = statuses.get(status, 0) + 1
+    label = f"limit {max_in_flight}" if max_in_flight else "no limit"
+    print(f"  {label:9s} api p50 {_percentile(slow, 0.5):7.1f} ms  p99 {_percentile(slow, 0.99):7.1f} ms   "
+          f"health p99 {_percentile(health, 0.99):7.1f} ms   statuses {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rate', type=float, default=400, help="Slow requests per second.")
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--limit', type=int, default=8)
+    parser.add_argument('--upstream-ms', type=float, default=50)
+    parser.add_argument('--queue-timeout-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    def slow_upstream(category=None, equipment=None):
+        time.sleep(args.upstream_ms / 1000)
+        return []
+
+    routes.fetch_exercises = slow_upstream
+    print(f"{args.rate:.0f} req/s for {args.seconds:.0f} s on {args.workers} workers, "
+          f"upstream {args.upstream_ms:.0f} ms (capacity {args.workers * 1000 / args.upstream_ms:.0f} req/s)")
+    run(0, args)
+    run(args.limit, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""
+Accounts/sec benchmark: looping over /create-account versus bulk provisioning.
+
+Both runs use a fresh SQLite file database so per-commit costs are included.
+Password hashing (scrypt) dominates either way, so the bulk speedup grows
+with --workers up to the number of cores.
+
+Usage:
+    python -m benchmarks.bench_provisioning [--users N] [--workers N] [--batch-size N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from app import create_app, db
+from app.models.provisioning import provision_users
+from config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+
+            start = time.perf_counter()
+            for i in range(args.users):
+                client.post('/create-account', json={"username": f"route-{i}", "password": f"password-{i}"})
+            route_rate = args.users / (time.perf_counter() - start)
+
+            users = ((f"bulk-{i}", f"password-{i}") for i in range(args.users))
+            start = time.perf_counter()
+            result = provision_users(users, batch_size=args.batch_size, workers=args.workers)
+            bulk_rate = result["created"] / (time.perf_counter() - start)
+
+    print(f"{args.users:,} users, {args.workers} hashing workers")
+    print(f"  /create-account loop {route_rate:10,.1f} accounts/s")
+    print(f"  provision_users      {bulk_rate:10,.1f} accounts/s   ({bulk_rate / route_rate:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
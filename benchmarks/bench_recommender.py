@@ -0,0 +1,63 @@
+"""
+Benchmark for the co-occurrence recommendation index.
+
+Builds the index from a synthetic population where users favor exercises from a
+few muscle groups, then measures build time, memory and per-request serving
+latency of personalized top-k recommendations.
+
+Usage:
+    python -m benchmarks.bench_recommender [--users N] [--exercises N] [--per-user N]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from app.models.recommender import CooccurrenceIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--exercises', type=int, default=800)
+    parser.add_argument('--per-user', type=int, default=12)
+    parser.add_argument('--queries', type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    groups = [list(range(g, args.exercises, 20)) for g in range(20)]
+    interactions = []
+    for user_id in range(args.users):
+        pool = groups[rng.randrange(20)] + groups[rng.randrange(20)]
+        interactions.extend((user_id, rng.choice(pool)) for _ in range(args.per_user))
+
+    index = CooccurrenceIndex()
+    tracemalloc.start()
+    start = time.perf_counter()
+    for user_id, exercise_id in interactions:
+        index.observe(user_id, exercise_id)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    index.refresh()
+    refresh = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    users = [rng.randrange(args.users) for _ in range(args.queries)]
+    latencies = []
+    for user_id in users:
+        start = time.perf_counter()
+        index.recommend(user_id, 10)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    print(f"{args.users:,} users, {len(interactions):,} interactions, {args.exercises} exercises")
+    print(f"  incremental build: {build:.2f} s ({len(interactions) / build:,.0f} interactions/s)")
+    print(f"  neighbor refresh:  {refresh * 1000:.1f} ms")
+    print(f"  index memory:      {memory / 2 ** 20:.1f} MiB")
+    print(f"  serve top-10:      p50 {latencies[len(latencies) // 2] * 1e6:.0f} us, "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
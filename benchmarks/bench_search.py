@@ -0,0 +1,61 @@
+"""
+Query latency benchmark for the local exercise search index.
+
+Indexes a synthetic catalog resembling wger exercises and times exact, prefix
+(autocomplete) and misspelled queries, plus an incremental update.
+
+Usage:
+    python -m benchmarks.bench_search [--exercises N] [--queries N]
+"""
+import argparse
+import random
+import time
+
+from app.models.search import ExerciseSearchIndex
+
+WORDS = ["bench", "press", "incline", "decline", "dumbbell", "barbell", "cable", "row", "squat", "front",
+         "lunge", "curl", "hammer", "extension", "triceps", "biceps", "deadlift", "romanian", "pull", "up",
+         "chin", "dip", "fly", "lateral", "raise", "shrug", "plank", "crunch", "calf", "hip", "thrust"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--exercises', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    catalog = [{"id": i, "name": " ".join(rng.sample(WORDS, 3)).title(),
+                "description": "<p>" + " ".join(rng.choice(WORDS) for _ in range(40)) + ".</p>"}
+               for i in range(args.exercises)]
+
+    index = ExerciseSearchIndex()
+    start = time.perf_counter()
+    index.upsert(catalog)
+    print(f"indexed {args.exercises:,} exercises in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    queries = {
+        "exact": lambda: " ".join(rng.sample(WORDS, 2)),
+        "prefix": lambda: rng.choice(WORDS)[:3],
+        "typo": lambda: (lambda w: w[:2] + w[3:])(rng.choice([w for w in WORDS if len(w) > 5])),
+    }
+    for kind, make_query in queries.items():
+        latencies = []
+        for _ in range(args.queries):
+            query = make_query()
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"  {kind:6s} p50 {latencies[len(latencies) // 2] * 1000:6.3f} ms   "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.3f} ms")
+
+    changed = [dict(catalog[i], name=catalog[i]["name"] + " Variation") for i in range(0, args.exercises, 100)]
+    start = time.perf_counter()
+    index.upsert(catalog[:1000] + changed)
+    print(f"incremental upsert ({len(changed)} changed of {1000 + len(changed)}): "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
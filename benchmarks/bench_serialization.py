@@ -0,0 +1,57 @@
+"""
+Serialization micro-benchmark over representative API payloads.
+
+Compares the standard library JSON provider, the orjson provider and
+MessagePack on the bodies returned by /view-workouts, /recommendations and
+/favorites.
+
+Usage:
+    python -m benchmarks.bench_serialization [--rows N] [--repeat N]
+"""
+import argparse
+import timeit
+
+from app import create_app
+from app.serialization import NegotiatingJSONProvider, OrjsonProvider, msgpack, orjson
+
+
+def payloads(rows):
+    workouts = [{"exercise_id": 100 + i % 50, "repetitions": 8 + i % 5, "weight": 60.0 + i % 40,
+                 "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "comment": "Felt strong, last set to failure"}
+                for i in range(rows)]
+    exercises = [{"id": i, "uuid": f"00000000-0000-0000-0000-{i:012d}", "name": f"Exercise {i}",
+                  "description": "<p>Keep your back straight and lower the weight slowly.</p>" * 3,
+                  "category": i % 10, "muscles": [1, 4, 9], "equipment": [3, 7], "language": 2}
+                 for i in range(rows // 10)]
+    favorites = [{"exercise_id": i, "name": f"Exercise {i}", "description": "Chest exercise"}
+                 for i in range(rows // 20)]
+    return {
+        "view_workouts": {"status": "success", "workouts": workouts},
+        "recommendations": {"status": "success", "exercises": exercises},
+        "favorites": {"status": "success", "favorites": favorites},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    encoders = {"stdlib json": NegotiatingJSONProvider(app).dumps}
+    if orjson is not None:
+        encoders["orjson"] = OrjsonProvider(app).dumps
+    if msgpack is not None:
+        encoders["msgpack"] = lambda obj, **kwargs: msgpack.packb(obj, use_bin_type=True)
+
+    for name, payload in payloads(args.rows).items():
+        print(f"{name}:")
+        for encoder_name, dumps in encoders.items():
+            size = len(dumps(payload, separators=(",", ":")))
+            seconds = timeit.timeit(lambda: dumps(payload, separators=(",", ":")), number=args.repeat)
+            print(f"  {encoder_name:12s} {seconds * 1000 / args.repeat:9.3f} ms  {size / 1024:9.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput benchmark for the sharded workout store.
+
+For each shard count, starts the shards and as many client processes, each
+routing a mix of log_workout and get_workouts calls (one read per write) over
+its own ShardRouter, and reports total operations per second. Scaling is only
+visible with at least 2 x shards free cores, since clients need CPU too.
+
+Usage:
+    python -m benchmarks.bench_sharding [--shards 1 2 4] [--operations N] [--history N]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from app.sharding import ShardClient, ShardCluster, ShardRouter
+
+AUTHKEY = b"bench"
+
+
+def _client(addresses, operations, history, barrier, results):
+    router = ShardRouter(ShardClient(address, AUTHKEY).wait_ready() for address in addresses)
+    rng = random.Random(os.getpid())
+    users = [rng.randrange(1_000_000) for _ in range(200)]
+    for user_id in users:
+        router.call(user_id, "log_workouts", user_id, [
+            {"exercise_id": 101, "repetitions": 10, "weight": 50.0, "date": "2024-12-07", "comment": ""}
+        ] * history)
+    barrier.wait()
+    start = time.perf_counter()
+    for i in range(operations):
+        user_id = users[i % len(users)]
+        if i % 2:
+            router.call(user_id, "get_workouts", user_id, "2024-12-01", None)
+        else:
+            router.call(user_id, "log_workout", user_id, 101, 10, 50.0, "2024-12-07", "")
+    results.put(time.perf_counter() - start)
+    router.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--operations', type=int, default=5000, help="Operations per client process.")
+    parser.add_argument('--history', type=int, default=50, help="Workouts per user filtered by each read.")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{os.cpu_count()} cores, {args.operations:,} operations per client, {args.history} workouts per user")
+    for count in args.shards:
+        with tempfile.TemporaryDirectory() as directory:
+            cluster = ShardCluster(directory, AUTHKEY)
+            cluster.start(count)
+            addresses = [cluster.address(index) for index in range(count)]
+            barrier, results = context.Barrier(count), context.Queue()
+            clients = [context.Process(target=_client, args=(addresses, args.operations, args.history,
+                                                              barrier, results))
+                       for _ in range(count)]
+            for process in clients:
+                process.start()
+            elapsed = max(results.get() for _ in clients)
+            for process in clients:
+                process.join()
+            cluster.stop()
+        print(f"  {count} shards / {count} clients: {count * args.operations / elapsed:10,.0f} ops/s")
+
+
+if __name__ == '__main__':
+    main()
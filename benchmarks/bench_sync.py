@@ -0,0 +1,56 @@
+"""
+Delta sync versus full re-download as workout history grows.
+
+For users with growing histories, logs a few new workouts between syncs and
+compares downloading the full history from /view-workouts with fetching only
+the changes from /sync.
+
+Usage:
+    python -m benchmarks.bench_sync [--histories N,N,...] [--changes N] [--syncs N]
+"""
+import argparse
+import time
+
+from app import create_app
+from app.models.workout import log_workout, log_workouts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--histories', default="1000,10000,50000")
+    parser.add_argument('--changes', type=int, default=5, help="Workouts logged between syncs.")
+    parser.add_argument('--syncs', type=int, default=20)
+    args = parser.parse_args()
+
+    client = create_app().test_client()
+    print(f"{args.syncs} syncs with {args.changes} new workouts each")
+    for offset, history in enumerate(int(n) for n in args.histories.split(',')):
+        user_id = 920000 + offset
+        log_workouts(user_id, [{"exercise_id": 1 + i % 20, "repetitions": 10, "weight": 60.0,
+                                "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "comment": "set"}
+                               for i in range(history)])
+        cursor = client.get('/sync', query_string={"user_id": user_id}).get_json()
+
+        full_bytes = delta_bytes = 0
+        full_cpu = delta_cpu = 0.0
+        for _ in range(args.syncs):
+            for _ in range(args.changes):
+                log_workout(user_id, 1, 10, 60.0, "2024-12-02", "set")
+            start = time.process_time()
+            full_bytes += len(client.get('/view-workouts', query_string={"user_id": user_id}).data)
+            full_cpu += time.process_time() - start
+
+            start = time.process_time()
+            response = client.get('/sync', query_string={"user_id": user_id, "since": cursor["version"],
+                                                         "epoch": cursor["epoch"]})
+            delta_cpu += time.process_time() - start
+            delta_bytes += len(response.data)
+            cursor = response.get_json()
+
+        print(f"  {history:6d} workouts: full {full_bytes / args.syncs / 1024:9.1f} KiB "
+              f"{full_cpu * 1000 / args.syncs:8.2f} ms   delta {delta_bytes / args.syncs / 1024:6.2f} KiB "
+              f"{delta_cpu * 1000 / args.syncs:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
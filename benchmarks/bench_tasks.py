@@ -0,0 +1,96 @@
+"""
+Request latency with deferrable work run inline and on the background task runner.
+
+Two kinds of deferrable work are timed: indexing a fetched catalog page for
+search on /recommendations (wger is replaced by a canned response of
+--catalog exercises), and flushing traced spans to a jsonl file on
+/view-workouts with every request sampled. Each request is timed from the
+client's side; the runner is drained between requests so background work
+never overlaps the next measurement, and that drain time is reported as the
+work moved off the request path.
+
+Usage:
+    python -m benchmarks.bench_tasks [--requests N] [--catalog N]
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from app import create_app
+from app.models import recommendations
+from app.models.search import exercise_index
+from app.models.workout import log_workout
+from config import Config
+
+WORDS = ("barbell", "dumbbell", "squat", "press", "row", "curl", "lunge", "deadlift", "incline", "cable",
+         "kettlebell", "pull", "push", "bench", "overhead", "split", "romanian", "hammer", "front", "lateral")
+
+
+def _catalog(size):
+    return [{"id": n, "name": f"{WORDS[n % 20]} {WORDS[n * 7 % 20]} {WORDS[n * 13 % 20]} {n}",
+             "description": " ".join(WORDS[(n + k) % 20] for k in range(30))} for n in range(size)]
+
+
+def run(workers, path, query, requests, before=None):
+    Config.TASK_WORKERS = workers
+    app = create_app()
+    app.debug = False
+    client = app.test_client()
+    runner = app.extensions.get("tasks")
+    timings, drained = [], 0.0
+    for _ in range(requests):
+        if before is not None:
+            before()
+        start = time.perf_counter()
+        client.get(path, query_string=query)
+        timings.append(time.perf_counter() - start)
+        if runner is not None:
+            start = time.perf_counter()
+            runner.drain()
+            drained += time.perf_counter() - start
+    if runner is not None:
+        runner.shutdown()
+    timings.sort()
+    return timings[len(timings) // 2], timings[int(len(timings) * 0.99)], drained / requests
+
+
+def report(label, workers, result):
+    p50, p99, drained = result
+    mode = f"deferred ({workers} workers)" if workers else "inline"
+    print(f"  {label:28s} {mode:22s} p50 {p50 * 1e3:7.3f} ms  p99 {p99 * 1e3:7.3f} ms"
+          + (f"  background {drained * 1e3:7.3f} ms/request" if workers else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--catalog', type=int, default=800, help="Exercises in the canned wger response.")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    Config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+    catalog = _catalog(args.catalog)
+    recommendations.fetch_wger = lambda endpoint, params: ({"results": catalog}, None)
+    print(f"/recommendations indexing {args.catalog} fetched exercises:")
+    for workers in (0, 2):
+        report("catalog indexing", workers, run(workers, '/recommendations', {"category": 10}, args.requests,
+                                                before=exercise_index.clear))
+
+    for i in range(20):
+        log_workout(940000, 1, 10, 60.0, f"2024-03-{1 + i:02d}", "set")
+    directory = tempfile.mkdtemp(prefix="traces-")
+    Config.TRACE_EXPORTER, Config.TRACE_SAMPLE_RATE = "jsonl", 1.0
+    Config.TRACE_FILE = os.path.join(directory, "traces.jsonl")
+    print("/view-workouts with every request traced to a jsonl file:")
+    try:
+        for workers in (0, 2):
+            report("span flushing", workers, run(workers, '/view-workouts', {"user_id": 940000}, args.requests * 10))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+One batched team query versus a request per athlete.
+
+Logs workouts for a team of athletes, then compares fetching a date range of
+their workouts with one /view-workouts request per athlete against a single
+/team-workouts request, grouped, merged by date, or aggregated to totals.
+Cached /view-workouts bodies are cleared before every round, and the app
+runs without debug mode so JSON is encoded compactly as in production.
+
+Usage:
+    python -m benchmarks.bench_team [--athletes N] [--workouts N] [--repeat N]
+"""
+import argparse
+import logging
+import time
+
+from app import create_app
+from app.caching import response_cache
+from app.models.workout import log_workouts
+
+QUERY = {"start_date": "2024-04-01", "end_date": "2024-06-30"}
+
+
+def timed(function, repeat):
+    best, size = float('inf'), 0
+    for _ in range(repeat):
+        response_cache.clear()
+        start = time.perf_counter()
+        size = function()
+        best = min(best, time.perf_counter() - start)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--athletes', type=int, default=50)
+    parser.add_argument('--workouts', type=int, default=500, help="Workouts logged per athlete.")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    team = list(range(940000, 940000 + args.athletes))
+    for user_id in team:
+        log_workouts(user_id, [{"exercise_id": 1 + i % 20, "repetitions": 10, "weight": 60.0,
+                                "date": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}", "comment": "set"}
+                               for i in range(args.workouts)])
+    app = create_app()
+    app.debug = False
+    client = app.test_client()
+
+    def per_athlete():
+        return sum(len(client.get('/view-workouts', query_string={"user_id": user_id, **QUERY}).data)
+                   for user_id in team)
+
+    def batched(**extra):
+        return lambda: len(client.get('/team-workouts', query_string={"user_id": team, **QUERY, **extra}).data)
+
+    print(f"{args.athletes} athletes with {args.workouts} workouts each, one quarter requested, best of {args.repeat}")
+    for label, function in [("request per athlete", per_athlete), ("team, grouped", batched()),
+                            ("team, merged by date", batched(order="date")),
+                            ("team, totals per user", batched(aggregate="user"))]:
+        seconds, size = timed(function, args.repeat)
+        print(f"  {label:22s} {seconds * 1000:8.2f} ms  {size / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
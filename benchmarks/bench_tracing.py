@@ -0,0 +1,70 @@
+"""
+Per-request overhead of tracing at different sampling rates.
+
+Whole-request timings vary by more than tracing costs, so this times the
+instrumentation directly: the request hooks plus one child span (as around
+JSON serialization), run inside a request context at each sampling rate,
+and compares that with the median /view-workouts request without tracing.
+
+Usage:
+    python -m benchmarks.bench_tracing [--iterations N] [--rates R,R,...]
+"""
+import argparse
+import logging
+import time
+
+from app import create_app
+from app.models.workout import log_workout
+from app.tracing import span
+from config import Config
+
+
+def _hook(hooks, name):
+    return next(function for function in hooks[None] if function.__name__ == name)
+
+
+def instrumentation_cost(app, iterations):
+    start_request = _hook(app.before_request_funcs, "start_request_span")
+    record_response = _hook(app.after_request_funcs, "record_response")
+    end_request = _hook(app.teardown_request_funcs, "end_request_span")
+    response = app.response_class("{}", mimetype="application/json")
+    with app.test_request_context('/view-workouts?user_id=930000'):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            start_request()
+            with span("serialize"):
+                pass
+            record_response(response)
+            end_request(None)
+        return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50000)
+    parser.add_argument('--rates', default="0,0.01,1")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for i in range(20):
+        log_workout(930000, 1, 10, 60.0, f"2024-03-{1 + i:02d}", "set")
+    Config.TRACE_EXPORTER = ""
+    client = create_app().test_client()
+    timings = []
+    for _ in range(2000):
+        start = time.perf_counter()
+        client.get('/view-workouts', query_string={"user_id": 930000, "start_date": "2024-01-01"})
+        timings.append(time.perf_counter() - start)
+    request = sorted(timings)[len(timings) // 2]
+    print(f"/view-workouts without tracing: {request * 1e6:.1f} us/request (median)")
+
+    Config.TRACE_EXPORTER = "memory"
+    for rate in map(float, args.rates.split(',')):
+        Config.TRACE_SAMPLE_RATE = rate
+        cost = instrumentation_cost(create_app(), args.iterations)
+        print(f"  sample rate {rate:<5g} tracing adds {cost * 1e6:6.2f} us/request "
+              f"({100 * cost / request:4.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
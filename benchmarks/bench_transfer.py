@@ -0,0 +1,61 @@
+"""
+Throughput benchmark for bulk workout export and import.
+
+Exports a synthetic history as CSV and NDJSON, then parses and re-imports each
+export into a fresh user, reporting rows per second and peak traced memory.
+
+Usage:
+    python -m benchmarks.bench_transfer [--rows N] [--batch-size N]
+"""
+import argparse
+import io
+import random
+import time
+import tracemalloc
+
+from app.models import workout
+from app.models.transfer import export_workouts, import_workouts, parse_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    source_user = 1
+    workout.workout_logs[source_user] = [
+        {"exercise_id": rng.randrange(1, 500), "repetitions": rng.randrange(1, 20),
+         "weight": rng.randrange(0, 2000) / 10, "date": f"2024-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+         "comment": "" if i % 4 else "felt strong"}
+        for i in range(args.rows)
+    ]
+    print(f"{args.rows:,} rows, batch size {args.batch_size:,}")
+
+    for number, fmt in enumerate(("csv", "ndjson"), start=2):
+        buffer = io.StringIO()
+        start = time.perf_counter()
+        for chunk in export_workouts(source_user, fmt):
+            buffer.write(chunk)
+        elapsed = time.perf_counter() - start
+
+        # Memory is measured on a second pass that discards chunks, as a streamed response would
+        tracemalloc.start()
+        for _ in export_workouts(source_user, fmt):
+            pass
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  export {fmt:6s} {args.rows / elapsed:12,.0f} rows/s   {buffer.tell() / 1e6:7.1f} MB   "
+              f"peak {peak / 1e6:6.1f} MB")
+
+        buffer.seek(0)
+        start = time.perf_counter()
+        imported = import_workouts(number, parse_rows(buffer, fmt), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"  import {fmt:6s} {imported / elapsed:12,.0f} rows/s")
+        workout.workout_logs.pop(number, None)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,3 +8,99 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY') or 'dev'
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or 'sqlite:///user.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # JSON provider: "auto" (orjson when installed), "orjson" or "stdlib"
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+
+    # Response compression
+    COMPRESS_ENABLED = os.getenv('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+
+    # Durability for the in-memory workout store; journaling is off unless a directory is set
+    WORKOUT_JOURNAL_DIR = os.getenv('WORKOUT_JOURNAL_DIR')
+    WORKOUT_JOURNAL_SYNC = os.getenv('WORKOUT_JOURNAL_SYNC', '1') == '1'
+    WORKOUT_SNAPSHOT_INTERVAL = int(os.getenv('WORKOUT_SNAPSHOT_INTERVAL', 300))
+
+    # Memory budget for the in-memory workout store, enabled by setting a spill directory: when the
+    # estimated size of resident users exceeds WORKOUT_MEMORY_BUDGET bytes, the least recently used
+    # users are written to WORKOUT_SPILL_DIR and loaded back on their next read or write
+    WORKOUT_SPILL_DIR = os.getenv('WORKOUT_SPILL_DIR')
+    WORKOUT_MEMORY_BUDGET = int(os.getenv('WORKOUT_MEMORY_BUDGET', 256 * 1024 * 1024))
+
+    # Bulk user provisioning; PROVISION_WORKERS defaults to the CPU count
+    PROVISION_WORKERS = int(os.getenv('PROVISION_WORKERS', os.cpu_count() or 1))
+    PROVISION_BATCH_SIZE = int(os.getenv('PROVISION_BATCH_SIZE', 1000))
+
+    # How many recent changes /sync keeps per user; clients further behind must resync fully
+    SYNC_MAX_CHANGES = int(os.getenv('SYNC_MAX_CHANGES', 1000))
+
+    # The most users a single /team-workouts query may name
+    TEAM_MAX_USERS = int(os.getenv('TEAM_MAX_USERS', 200))
+
+    # Sharded mode: partition user data across SHARD_COUNT local processes (0 disables it).
+    # With SHARD_SPAWN=0 the shards are expected to be running already (`flask shards serve`).
+    SHARD_COUNT = int(os.getenv('SHARD_COUNT', 0))
+    SHARD_SOCKET_DIR = os.getenv('SHARD_SOCKET_DIR')
+    SHARD_SPAWN = os.getenv('SHARD_SPAWN', '1') == '1'
+    # Shared key for shard connections; empty generates a random one per cluster, stored in SHARD_SOCKET_DIR.
+    # SHARD_CALL_TIMEOUT bounds the wait for a shard's reply before the request fails with a 503
+    SHARD_AUTHKEY = os.getenv('SHARD_AUTHKEY', '')
+    SHARD_CALL_TIMEOUT = float(os.getenv('SHARD_CALL_TIMEOUT', 10))
+
+    # Tiered retention, enabled by setting an archive directory: raw entries older than
+    # WORKOUT_RAW_DAYS move to compressed archive segments (at least WORKOUT_ARCHIVE_MIN_ROWS
+    # at a time) and their daily summaries stay in memory for WORKOUT_SUMMARY_DAYS
+    WORKOUT_ARCHIVE_DIR = os.getenv('WORKOUT_ARCHIVE_DIR')
+    WORKOUT_RAW_DAYS = int(os.getenv('WORKOUT_RAW_DAYS', 90))
+    WORKOUT_SUMMARY_DAYS = int(os.getenv('WORKOUT_SUMMARY_DAYS', 730))
+    WORKOUT_ARCHIVE_MIN_ROWS = int(os.getenv('WORKOUT_ARCHIVE_MIN_ROWS', 500))
+    WORKOUT_RETENTION_INTERVAL = int(os.getenv('WORKOUT_RETENTION_INTERVAL', 3600))
+    # Queries without a start date read archived entries of this many days only (0 reads all of them)
+    WORKOUT_ARCHIVE_WINDOW_DAYS = int(os.getenv('WORKOUT_ARCHIVE_WINDOW_DAYS', 365))
+
+    # Load shedding for API routes: at most LOAD_SHED_MAX_IN_FLIGHT concurrent requests (0 disables),
+    # others wait up to LOAD_SHED_QUEUE_TIMEOUT seconds before a 503 with Retry-After
+    LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT', 32))
+    LOAD_SHED_QUEUE_TIMEOUT = float(os.getenv('LOAD_SHED_QUEUE_TIMEOUT', 0.5))
+
+    # Idempotency-Key support on write routes: responses are replayed for IDEMPOTENCY_TTL seconds,
+    # keeping at most IDEMPOTENCY_MAX_ENTRIES (0 disables) and about IDEMPOTENCY_MAX_BYTES in memory
+    IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', 86400))
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 10000))
+    IDEMPOTENCY_MAX_BYTES = int(os.getenv('IDEMPOTENCY_MAX_BYTES', 8 * 1024 * 1024))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))
+
+    # Server-sent event streams at /stream: a stream more than STREAM_BUFFER_SIZE events behind is dropped,
+    # the last STREAM_HISTORY_SIZE events can be resumed with Last-Event-ID, and idle streams get a
+    # keep-alive comment every STREAM_HEARTBEAT seconds. Every open stream holds a server worker thread, so
+    # keep STREAM_MAX_SUBSCRIBERS (per process) below the server's threads; raise it with an async worker class
+    STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', 256))
+    STREAM_HISTORY_SIZE = int(os.getenv('STREAM_HISTORY_SIZE', 10000))
+    STREAM_MAX_SUBSCRIBERS = int(os.getenv('STREAM_MAX_SUBSCRIBERS', 16))
+    STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+
+    # Request tracing: TRACE_EXPORTER is "jsonl" (spans appended to TRACE_FILE) or "memory"; empty disables it.
+    # Requests without an incoming traceparent are traced with probability TRACE_SAMPLE_RATE
+    TRACE_EXPORTER = os.getenv('TRACE_EXPORTER', '')
+    TRACE_FILE = os.getenv('TRACE_FILE', 'traces.jsonl')
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.01))
+    TRACE_FLUSH_INTERVAL = float(os.getenv('TRACE_FLUSH_INTERVAL', 1))
+
+    # Background tasks: deferred work runs on TASK_WORKERS threads (0 runs it inline on the request thread)
+    # from a priority queue of at most TASK_QUEUE_SIZE tasks; failed tasks are retried after
+    # TASK_RETRY_BACKOFF seconds, doubling each time, and queued tasks get TASK_DRAIN_TIMEOUT seconds at exit
+    TASK_WORKERS = int(os.getenv('TASK_WORKERS', 2))
+    TASK_BROKER = os.getenv('TASK_BROKER', 'local')
+    TASK_QUEUE_SIZE = int(os.getenv('TASK_QUEUE_SIZE', 1000))
+    TASK_RETRY_BACKOFF = float(os.getenv('TASK_RETRY_BACKOFF', 1))
+    TASK_DRAIN_TIMEOUT = float(os.getenv('TASK_DRAIN_TIMEOUT', 10))
+    # Seconds between background refreshes of the wger exercise catalog (0 disables them)
+    CATALOG_REFRESH_INTERVAL = float(os.getenv('CATALOG_REFRESH_INTERVAL', 0))
+    # Seconds between background rebuilds of every recommendation neighbor list (0 disables them)
+    RECOMMENDER_REFRESH_INTERVAL = float(os.getenv('RECOMMENDER_REFRESH_INTERVAL', 300))
+
+    # Background dependency probes behind /health/ready
+    HEALTH_PROBE_INTERVAL = float(os.getenv('HEALTH_PROBE_INTERVAL', 10))
+    HEALTH_PROBE_TIMEOUT = float(os.getenv('HEALTH_PROBE_TIMEOUT', 2))
+    HEALTH_REQUIRE_UPSTREAM = os.getenv('HEALTH_REQUIRE_UPSTREAM', '0') == '1'
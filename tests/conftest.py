@@ -0,0 +1,11 @@
+import pytest
+from app import create_app
+from config import Config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    app = create_app()
+    app.config['TESTING'] = True
+    return app.test_client()
@@ -0,0 +1,102 @@
+import pytest
+from app import create_app, serialization
+from app.caching import ResponseCache, response_cache
+from app.models.workout import log_workout
+from app.models.recommendations import save_favorite_exercise
+
+
+@pytest.fixture
+def client():
+    app = create_app()
+    app.config['TESTING'] = True
+    response_cache.clear()
+    with app.test_client() as client:
+        yield client
+
+
+def test_response_cache_is_invalidated_by_version():
+    """Test that a cached body is only served for the version it was built from."""
+    cache = ResponseCache()
+    cache.put(("workouts", 1, b""), 3, b"[]", "application/json")
+
+    assert cache.get(("workouts", 1, b""), 3) == (b"[]", "application/json")
+    assert cache.get(("workouts", 1, b""), 4) is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_response_cache_evicts_least_recently_used():
+    """Test that the cache never grows past its configured size."""
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", 1, b"a", "application/json")
+    cache.put("b", 1, b"b", "application/json")
+    cache.get("a", 1)
+    cache.put("c", 1, b"c", "application/json")
+
+    assert len(cache) == 2
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+
+
+def test_view_workouts_returns_304_until_a_new_workout_is_logged(client):
+    """Test conditional GETs on /view-workouts against the workout version."""
+    log_workout(501, 101, 10, 20.5, "2024-12-07", "Good session")
+
+    first = client.get('/view-workouts', query_string={"user_id": 501})
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+
+    unchanged = client.get('/view-workouts', query_string={"user_id": 501}, headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b''
+
+    log_workout(501, 102, 8, 40.0, "2024-12-08", "")
+    changed = client.get('/view-workouts', query_string={"user_id": 501}, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert len(changed.get_json()['workouts']) == 2
+
+
+def test_view_workouts_reuses_serialized_body(client):
+    """Test that an unchanged collection is served from the response cache."""
+    log_workout(502, 101, 10, 20.5, "2024-12-07", "")
+
+    client.get('/view-workouts', query_string={"user_id": 502})
+    second = client.get('/view-workouts', query_string={"user_id": 502})
+
+    assert second.status_code == 200
+    assert response_cache.hits == 1
+    assert second.get_json()['workouts'][0]['exercise_id'] == 101
+
+
+def test_etag_covers_the_query_and_negotiated_format(client):
+    """Test that a validator for one representation never revalidates another."""
+    log_workout(504, 101, 10, 20.5, "2024-12-07", "")
+    etag = client.get('/view-workouts', query_string={"user_id": 504}).headers['ETag']
+
+    daily = client.get('/view-workouts', query_string={"user_id": 504, "summary": "daily"},
+                       headers={'If-None-Match': etag})
+    packed = client.get('/view-workouts', query_string={"user_id": 504},
+                        headers={'If-None-Match': etag, 'Accept': 'application/msgpack'})
+    cached = client.get('/view-workouts', query_string={"user_id": 504})
+
+    assert daily.status_code == 200 and daily.headers['ETag'] != etag
+    if serialization.msgpack is not None:
+        assert packed.status_code == 200 and packed.headers['ETag'] not in (etag, daily.headers['ETag'])
+    assert cached.headers['ETag'] == etag
+    assert 'Accept' in cached.headers['Vary']
+
+
+def test_favorites_etag_changes_when_a_favorite_is_saved(client):
+    """Test conditional GETs on /favorites against the favorites version."""
+    save_favorite_exercise(503, 101, "Push-ups")
+    etag = client.get('/favorites', query_string={"user_id": 503}).headers['ETag']
+
+    assert client.get('/favorites', query_string={"user_id": 503},
+                      headers={'If-None-Match': etag}).status_code == 304
+
+    save_favorite_exercise(503, 102, "Squats")
+    response = client.get('/favorites', query_string={"user_id": 503}, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(response.get_json()['favorites']) == 2
@@ -0,0 +1,129 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app import create_app
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LastKnownGood, breakers
+from app.models import recommendations
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def flaky_wger(monkeypatch):
+    """Serves a one-exercise wger page on localhost, or 503s while `state["fail"]` is set."""
+    state = {"fail": False, "hits": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["hits"] += 1
+            if state["fail"]:
+                self.send_response(503)
+                self.end_headers()
+                return
+            body = json.dumps({"results": [{"id": 1, "name": "Push-ups"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(recommendations, "WGER_API_BASE", f"http://127.0.0.1:{server.server_port}/")
+    monkeypatch.setattr(recommendations, "last_known_good", LastKnownGood())
+    monkeypatch.setitem(breakers, "wger:exercise",
+                        CircuitBreaker("wger:exercise", min_calls=2, reset_timeout=0.2))
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_breaker_opens_on_failure_rate_and_recovers_through_half_open():
+    """Test the closed, open and half-open transitions."""
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=4, min_calls=4, reset_timeout=10, clock=clock)
+
+    for outcome in (True, False, True):
+        assert breaker.allow()
+        breaker.record_success() if outcome else breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is False  # only one trial call at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now = 20
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.snapshot()["opened"] == 2
+
+
+def test_last_known_good_evicts_oldest_key():
+    """Test that only the most recently stored keys are kept."""
+    clock = FakeClock()
+    cache = LastKnownGood(max_entries=2, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    clock.now = 5
+    cache.put("c", 3)
+
+    assert cache.get("a") is None
+    assert cache.get("b") == (2, 5.0)
+
+
+def test_open_circuit_fails_fast_with_stale_fallback(flaky_wger):
+    """Test against a flaky local stub: stale data while open, no upstream calls, then recovery."""
+    client = create_app().test_client()
+    fresh = client.get('/recommendations', query_string={"category": 4})
+
+    flaky_wger["fail"] = True
+    failing = [client.get('/recommendations', query_string={"category": 4}) for _ in range(2)]
+    hits_when_opened = flaky_wger["hits"]
+    shed = client.get('/recommendations', query_string={"category": 4})
+    unknown = client.get('/recommendations', query_string={"category": 5})
+    metrics = client.get('/metrics').get_json()
+
+    assert fresh.get_json()["exercises"] == [{"id": 1, "name": "Push-ups"}]
+    assert "Age" not in fresh.headers
+    assert all(r.get_json()["exercises"] == [{"id": 1, "name": "Push-ups"}] and "Age" in r.headers
+               for r in failing + [shed])
+    assert flaky_wger["hits"] == hits_when_opened  # the open circuit never called the stub
+    assert unknown.get_json()["exercises"] == []
+    assert metrics["circuit_breakers"]["wger:exercise"]["state"] == OPEN
+
+    flaky_wger["fail"] = False
+    time.sleep(0.25)
+    recovered = client.get('/recommendations', query_string={"category": 4})
+    assert "Age" not in recovered.headers
+    assert breakers["wger:exercise"].state == CLOSED
+
+
+def test_get_exercises_returns_503_while_open_without_fallback(flaky_wger):
+    """Test that /get-exercises fails fast with Retry-After when nothing was cached."""
+    flaky_wger["fail"] = True
+    client = create_app().test_client()
+    first = [client.get('/get-exercises').status_code for _ in range(2)]
+    hits = flaky_wger["hits"]
+    response = client.get('/get-exercises')
+
+    assert first == [500, 500]
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert flaky_wger["hits"] == hits
@@ -0,0 +1,100 @@
+import gzip
+import json
+import zlib
+import pytest
+from flask import Flask, Response, jsonify
+from app.compression import compress_stream, compressed_cache, init_compression
+from app.caching import mark_cacheable
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config.update(COMPRESS_MIN_SIZE=100, COMPRESS_LEVEL=6, COMPRESS_ALGORITHMS=["gzip"])
+
+    @app.route('/large')
+    def large():
+        return jsonify({"items": ["exercise"] * 200})
+
+    @app.route('/small')
+    def small():
+        return jsonify({"status": "OK"})
+
+    @app.route('/catalog')
+    def catalog():
+        return mark_cacheable(jsonify({"results": [{"id": i, "name": "Squat"} for i in range(100)]}))
+
+    @app.route('/stream')
+    def stream():
+        return Response((f"line {i}\n" for i in range(1000)), mimetype="text/plain")
+
+    init_compression(app)
+    compressed_cache.clear()
+    with app.test_client() as client:
+        yield client
+
+
+def test_large_response_is_gzipped_when_accepted(client):
+    """Test that bodies above the threshold are compressed for clients accepting gzip."""
+    response = client.get('/large', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert b'"exercise"' in gzip.decompress(response.data)
+
+
+def test_response_is_not_compressed_without_accept_encoding(client):
+    """Test that clients not advertising gzip receive the identity encoding."""
+    response = client.get('/large')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['items'][0] == 'exercise'
+
+
+def test_small_response_is_sent_uncompressed(client):
+    """Test that bodies under COMPRESS_MIN_SIZE are left alone."""
+    response = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_streamed_response_is_compressed_incrementally(client):
+    """Test that generator responses are compressed chunk by chunk."""
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data).decode().count('\n') == 1000
+
+
+def test_cacheable_responses_reuse_compressed_body(client):
+    """Test that identical catalog payloads are compressed only once."""
+    first = client.get('/catalog', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/catalog', headers={'Accept-Encoding': 'gzip'})
+
+    assert first.data == second.data
+    assert compressed_cache.misses == 1
+    assert compressed_cache.hits == 1
+
+
+def test_compress_stream_output_is_decodable_after_every_chunk():
+    """Test that each yielded piece is flushed so partial output can be decoded."""
+    decompressor = zlib.decompressobj(31)
+    stream = compress_stream(iter([b"first", b"second"]), "gzip", 6)
+
+    assert decompressor.decompress(next(stream)) == b"first"
+    assert decompressor.decompress(next(stream)) == b"second"
+
+
+def test_falls_back_to_gzip_without_optional_codecs(monkeypatch):
+    """Test that zstd and brotli are skipped when their packages are not installed."""
+    monkeypatch.setattr("app.compression.zstandard", None)
+    monkeypatch.setattr("app.compression.brotli", None)
+    app = Flask(__name__)
+    app.config.update(COMPRESS_MIN_SIZE=100, COMPRESS_LEVEL=6, COMPRESS_ALGORITHMS=["zstd", "br", "gzip"])
+
+    @app.route('/large')
+    def large():
+        return jsonify({"items": ["exercise"] * 200})
+
+    init_compression(app)
+    response = app.test_client().get('/large', headers={'Accept-Encoding': 'zstd, br, gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(response.data)) == {"items": ["exercise"] * 200}
@@ -0,0 +1,143 @@
+import json
+import threading
+import pytest
+from app import create_app
+from app.events import EventHub, SubscriberLimitReached
+from app.models.recommendations import save_favorite_exercise
+from app.models.workout import log_workout
+from config import Config
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'STREAM_HEARTBEAT', 0.05)
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def _parse(chunk):
+    """Returns the (id, event, data) of every event in an SSE chunk."""
+    events = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in fields:
+            events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_events_reach_only_subscribers_of_the_user():
+    """Test per-user fan-out to every stream following the user."""
+    hub = EventHub()
+    coach = hub.subscribe([1, 2])
+    athlete = hub.subscribe([2])
+    hub.publish(1, "workout", {"n": 1})
+    hub.publish(2, "workout", {"n": 2})
+    hub.publish(3, "workout", {"n": 3})
+
+    assert [entry[3]["n"] for entry in coach.get(0)] == [1, 2]
+    assert [entry[3]["n"] for entry in athlete.get(0)] == [2]
+    assert coach.get(0) == []
+
+
+def test_reconnect_resumes_after_last_event_id():
+    """Test that missed events are replayed, and a reset is sent when they left the history."""
+    hub = EventHub(history_size=3)
+    first = hub.publish(1, "workout", {"n": 1})
+    hub.publish(2, "workout", {"n": 2})
+    hub.publish(1, "workout", {"n": 3})
+
+    resumed = hub.subscribe([1], last_event_id=first).get(0)
+    assert [entry[3]["n"] for entry in resumed] == [3]
+
+    hub.publish(1, "workout", {"n": 4})
+    hub.publish(1, "workout", {"n": 5})
+    reset = hub.subscribe([1], last_event_id=first).get(0)
+    assert [(entry[0], entry[2]) for entry in reset] == [(5, "reset")]
+
+
+def test_reconnect_after_restart_gets_a_reset():
+    """Test that a Last-Event-ID from before a restart, ahead of the new counter, triggers a reset."""
+    hub = EventHub()
+    hub.publish(1, "workout", {"n": 1})
+
+    reset = hub.subscribe([1], last_event_id=500).get(0)
+    assert [(entry[0], entry[2]) for entry in reset] == [(1, "reset")]
+    assert hub.subscribe([1], last_event_id=1).get(0) == []
+
+
+def test_slow_subscriber_is_dropped():
+    """Test that a subscriber falling a full buffer behind is dropped without affecting others."""
+    hub = EventHub(buffer_size=3)
+    slow = hub.subscribe([1])
+    fast = hub.subscribe([1])
+    for n in range(3):
+        hub.publish(1, "workout", {"n": n})
+        fast.get(0)
+    hub.publish(1, "workout", {"n": 3})
+
+    assert slow.get(0) is None
+    assert [entry[3]["n"] for entry in fast.get(0)] == [3]
+    assert hub.stats()["subscribers"] == 1
+    assert hub.stats()["dropped"] == 1
+
+
+def test_idle_subscribers_need_no_threads():
+    """Test that thousands of idle subscriptions start no threads and are bounded by the limit."""
+    hub = EventHub(max_subscribers=5000)
+    threads = threading.active_count()
+    subscriptions = [hub.subscribe([user_id]) for user_id in range(5000)]
+
+    assert threading.active_count() == threads
+    with pytest.raises(SubscriberLimitReached):
+        hub.subscribe([1])
+    hub.publish(4999, "workout", {})
+    assert len(subscriptions[-1].get(0)) == 1
+    for subscription in subscriptions:
+        hub.unsubscribe(subscription)
+    assert hub.stats()["subscribers"] == 0
+
+
+def test_stream_route_sends_workouts_and_favorites(app):
+    """Test the SSE stream end to end, including resumption with Last-Event-ID."""
+    client = app.test_client()
+    response = client.get('/stream', query_string={"user_id": 6001}, buffered=False)
+    chunks = iter(response.response)
+
+    assert response.mimetype == 'text/event-stream'
+    assert next(chunks) == b"retry: 2000\n\n"
+    log_workout(6001, 1, 10, 50.0, "2024-12-02", "")
+    log_workout(6002, 1, 10, 50.0, "2024-12-02", "")
+    save_favorite_exercise(6001, 9, "Squat")
+    events = []
+    while len(events) < 2:
+        events += _parse(next(chunks))
+    response.close()
+
+    assert [(event, data["user_id"]) for _, event, data in events] == [("workout", 6001), ("favorite", 6001)]
+    assert app.extensions['events'].stats()["subscribers"] == 0
+
+    save_favorite_exercise(6001, 10, "Lunge")
+    resumed = client.get('/stream', query_string={"user_id": 6001}, headers={"Last-Event-ID": str(events[0][0])},
+                         buffered=False)
+    chunks = iter(resumed.response)
+    next(chunks)
+    replayed = _parse(next(chunks))
+    resumed.close()
+    assert [data["exercise"]["name"] for _, _, data in replayed] == ["Squat", "Lunge"]
+    assert client.get('/stream').status_code == 400
+
+
+def test_stream_route_refuses_streams_beyond_the_cap(app):
+    """Test that open streams are capped so they cannot hold every server worker."""
+    hub = app.extensions['events']
+    held = [hub.subscribe([6003]) for _ in range(hub.max_subscribers)]
+
+    response = app.test_client().get('/stream', query_string={"user_id": 6003})
+    for subscription in held:
+        hub.unsubscribe(subscription)
+
+    assert hub.max_subscribers == 16
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == "5"
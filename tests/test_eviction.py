@@ -0,0 +1,114 @@
+import os
+import threading
+import pytest
+from app import create_app
+from app.models import changelog, workout
+from app.models.eviction import CHANGE_BYTES, ENTRY_BYTES, ColdStore
+from app.models.team import get_team_workouts
+from config import Config
+
+
+@pytest.fixture
+def cold_store(tmp_path, monkeypatch):
+    def attach(users):
+        budget = users * 10 * (ENTRY_BYTES + len("ok") + CHANGE_BYTES)
+        store = ColdStore(str(tmp_path), budget, workout.workout_logs, workout.user_locks)
+        monkeypatch.setattr(workout, "eviction", store)
+        return store
+    yield attach
+    for user_id in range(9100, 9300):
+        workout.workout_logs.pop(user_id, None)
+
+
+def _log(user_id, count=10):
+    return workout.log_workouts(user_id, [{"exercise_id": 1 + n % 3, "repetitions": n, "weight": 42.5 + n,
+                                           "date": f"2024-06-{1 + n:02d}", "comment": "ok"} for n in range(count)])
+
+
+def test_least_recently_used_users_are_spilled_and_reloaded(cold_store, tmp_path):
+    """Test that cold users leave memory and come back unchanged on their next read."""
+    store = cold_store(users=3)
+    logged = {user_id: _log(user_id) for user_id in (9101, 9102, 9103)}
+    workout.get_workouts(9101)
+    logged[9104] = _log(9104)
+
+    assert 9102 not in workout.workout_logs
+    assert os.path.exists(tmp_path / "9102.bin")
+    assert workout.get_workouts(9102) == logged[9102]
+    assert 9103 not in workout.workout_logs  # the least recently used after 9102 came back
+    assert not os.path.exists(tmp_path / "9102.bin")
+
+    stats = store.stats()
+    assert stats["resident_users"] == 3 and stats["spilled_users"] == 1
+    assert stats["resident_bytes"] <= stats["budget_bytes"]
+    assert stats["evictions"] == 2 and stats["misses"] == 1
+    assert stats["reload_ms_avg"] > 0
+
+
+def test_unknown_users_do_not_count_as_hits(cold_store):
+    """Test that looking up a user with no workouts leaves the hit rate alone."""
+    store = cold_store(users=3)
+    _log(9121)
+    workout.get_workouts(9121)
+    hits = store.stats()["hits"]
+
+    assert workout.get_workouts(9129) == []
+    assert store.stats()["hits"] == hits and store.stats()["misses"] == 0
+
+
+def test_spilled_users_are_reloaded_by_writes_and_other_readers(cold_store):
+    """Test writes, delta sync, summaries and team queries for a user on disk."""
+    cold_store(users=1)
+    _log(9111)
+    _log(9112)
+    assert 9111 not in workout.workout_logs
+
+    workout.log_workout(9111, 3, 5, 20.0, "2024-06-30", "")
+    assert [entry["repetitions"] for entry in workout.get_workouts(9111)] == list(range(10)) + [5]
+    assert workout.get_workout_version(9111) == 11
+
+    assert 9112 not in workout.workout_logs
+    assert changelog.changelog.since(9112, 5) is None  # its changes left memory with it
+    assert len(changelog.get_changes(9112)["workouts"]) == 10
+    _log(9113)
+    assert len(workout.get_daily_summaries(9112)) == 10
+    _log(9114)
+    assert [len(entries) for entries in get_team_workouts([9111, 9112, 9113]).values()] == [11, 10, 10]
+
+
+def test_concurrent_readers_and_writers_under_a_small_budget(cold_store):
+    """Test that no entry is lost while users are spilled and reloaded from several threads."""
+    store = cold_store(users=2)
+    users = list(range(9200, 9216))
+    errors = []
+
+    def worker(offset):
+        try:
+            for n in range(30):
+                user_id = users[(offset + n) % len(users)]
+                workout.log_workout(user_id, 1, n, 10.0, "2024-06-01", "")
+                workout.get_workouts(users[(offset * 3 + n) % len(users)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sum(len(workout.get_workouts(user_id)) for user_id in users) == 8 * 30
+    assert store.stats()["evictions"] > 0
+
+
+def test_init_eviction_clears_stale_files_and_reports_metrics(tmp_path, monkeypatch):
+    """Test the configuration hook and the /metrics section."""
+    (tmp_path / "9120.bin").write_bytes(b"stale")
+    monkeypatch.setattr(workout, "eviction", None)
+    monkeypatch.setattr(Config, 'WORKOUT_SPILL_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    client = create_app().test_client()
+
+    assert not os.path.exists(tmp_path / "9120.bin")
+    assert client.get('/metrics').get_json()["workout_store"]["budget_bytes"] == Config.WORKOUT_MEMORY_BUDGET
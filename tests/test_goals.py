@@ -0,0 +1,154 @@
+import pytest
+from datetime import date, timedelta
+from app.models import goals
+from app.models.goals import Goal, GoalTracker
+from app.models.workout import log_workout
+
+
+def _workout(exercise_id, repetitions, weight, day):
+    return {"exercise_id": exercise_id, "repetitions": repetitions, "weight": weight, "date": day, "comment": ""}
+
+
+TODAY = date(2024, 12, 10)
+
+
+def test_weekly_goals_track_the_week_of_each_workout():
+    """Test weekly volume and distinct-day session counts per week."""
+    volume = Goal(1, 1, "weekly_volume", 1000, today=lambda: TODAY)
+    sessions = Goal(2, 1, "weekly_sessions", 3, today=lambda: TODAY)
+    for day, reps, weight in [(date(2024, 12, 2), 10, 50.0), (date(2024, 12, 2), 5, 40.0),
+                              (date(2024, 12, 4), 10, 60.0), (date(2024, 12, 9), 1, 10.0)]:
+        volume.apply(day, weight, reps * weight)
+        sessions.apply(day, weight, reps * weight)
+
+    first_week = volume.progress(date(2024, 12, 6))
+    assert first_week == {"goal_id": 1, "type": "weekly_volume", "exercise_id": None, "target": 1000,
+                          "week": "2024-12-02", "current": 1300.0, "progress": 1.0, "achieved": True}
+    assert volume.progress(date(2024, 12, 10))["current"] == 10.0
+    assert sessions.progress(date(2024, 12, 6))["current"] == 2
+    assert sessions.progress(date(2024, 12, 6))["progress"] == pytest.approx(0.6667)
+
+
+def test_old_weeks_expire():
+    """Test that only the retained weeks up to today's are kept, as today moves on."""
+    today = [date(2024, 1, 1) + timedelta(weeks=goals.RETAINED_WEEKS + 2)]
+    goal = Goal(1, 1, "weekly_volume", 100, today=lambda: today[0])
+    start = date(2024, 1, 1)
+    for week in range(goals.RETAINED_WEEKS + 3):
+        goal.apply(start + timedelta(weeks=week), 10.0, 10.0)
+    goal.apply(start, 10.0, 10.0)  # older than the horizon, ignored
+
+    assert len(goal.weeks) == goals.RETAINED_WEEKS
+    assert goal.progress(start)["current"] == 0
+
+    today[0] += timedelta(weeks=2)
+    assert goal.progress(today[0] - timedelta(weeks=2))["current"] == 10.0
+    assert len(goal.weeks) == goals.RETAINED_WEEKS - 2
+
+
+def test_future_workouts_do_not_expire_current_weeks():
+    """Test that the horizon follows today, not the latest week a workout was applied for."""
+    goal = Goal(1, 1, "weekly_volume", 100, today=lambda: TODAY)
+    goal.apply(TODAY, 10.0, 10.0)
+    goal.apply(TODAY + timedelta(weeks=goals.RETAINED_WEEKS + 5), 10.0, 10.0)
+
+    assert goal.progress(TODAY)["current"] == 10.0
+    assert list(goal.weeks) == [date(2024, 12, 9)]
+
+
+def test_workouts_logged_while_a_goal_is_seeded_count_once(monkeypatch):
+    """Test that a workout recorded between registering a goal and reading its history is neither lost nor doubled."""
+    tracker = GoalTracker()
+    today = date.today().isoformat()
+    logged = [_workout(1, 10, 10.0, today), _workout(1, 10, 20.0, today)]
+
+    def get_workouts(user_id, **kwargs):
+        # Both workouts are in the store, but only the second one's signal arrives during seeding
+        tracker.record(user_id, logged[1])
+        return list(logged)
+
+    monkeypatch.setattr(goals, "get_workouts", get_workouts)
+    created = tracker.add(9, "weekly_volume", 1000)
+    tracker.record(9, _workout(1, 1, 5.0, today))
+
+    assert created["current"] == 300.0
+    assert tracker.progress(9)[0]["current"] == 305.0
+
+
+def test_workouts_only_reach_goals_of_their_exercise(monkeypatch):
+    """Test that recording updates matching goals without reading workout history."""
+    tracker = GoalTracker()
+    tracker.add(7, "target_weight", 100, exercise_id=1)
+    tracker.add(7, "weekly_volume", 500, exercise_id=2)
+    tracker.add(7, "weekly_sessions", 2)
+    monkeypatch.setattr(goals, "get_workouts", lambda *args, **kwargs: pytest.fail("history was scanned"))
+
+    today = date.today()
+    tracker.record(7, _workout(1, 5, 105.0, today.isoformat()))
+    tracker.record(8, _workout(1, 5, 200.0, today.isoformat()))
+    progress = {goal["type"]: goal for goal in tracker.progress(7, today)}
+
+    assert progress["target_weight"]["current"] == 105.0
+    assert progress["target_weight"]["achieved"] is True
+    assert progress["weekly_volume"]["current"] == 0
+    assert progress["weekly_sessions"]["current"] == 1
+
+
+def test_invalid_goals_are_rejected():
+    """Test validation of the goal type, target and exercise."""
+    tracker = GoalTracker()
+    with pytest.raises(ValueError):
+        tracker.add(1, "daily_steps", 10)
+    with pytest.raises(ValueError):
+        tracker.add(1, "weekly_volume", 0)
+    with pytest.raises(ValueError):
+        tracker.add(1, "target_weight", 100)
+    with pytest.raises(ValueError):
+        tracker.add(1, "weekly_volume", float("nan"))
+    with pytest.raises(ValueError):
+        tracker.add(1, "weekly_volume", float("inf"))
+    with pytest.raises(ValueError):
+        tracker.add(1, "target_weight", 100, exercise_id="5")
+
+
+def test_goals_survive_a_restart(tmp_path):
+    """Test that saved goal definitions are restored and their progress rebuilt from the recovered workouts."""
+    path = str(tmp_path / goals.GOALS_FILE)
+    today = date.today().isoformat()
+    tracker = GoalTracker()
+    tracker.load(path)
+    tracker.add(5101, "target_weight", 100, exercise_id=1)
+    tracker.add(5101, "weekly_sessions", 3)
+
+    restored = GoalTracker()
+    assert restored.load(path) == 2
+    restored.rebuild({5101: [_workout(1, 5, 90.0, today), _workout(2, 5, 20.0, today)]})
+    progress = {goal["type"]: goal for goal in restored.progress(5101)}
+
+    assert [goal["goal_id"] for goal in restored.progress(5101)] == [1, 2]
+    assert progress["target_weight"]["current"] == 90.0
+    assert progress["weekly_sessions"]["current"] == 1
+    assert restored.add(5101, "weekly_volume", 10)["goal_id"] == 3
+
+
+def test_goals_api_reports_progress_from_logged_workouts(client):
+    """Test that goals are seeded from existing workouts and follow new ones."""
+    today = date.today().isoformat()
+    log_workout(5001, 301, 10, 80.0, today, "")
+
+    created = client.post('/goals', json={"user_id": 5001, "type": "target_weight", "target": 100, "exercise_id": 301})
+    client.post('/goals', json={"user_id": 5001, "type": "weekly_volume", "target": 2000})
+    client.post('/log-workout', json={"user_id": 5001, "exercise_id": 301, "repetitions": 5, "weight": 100.0,
+                                      "date": today})
+    response = client.get('/goals', query_string={"user_id": 5001})
+
+    assert created.status_code == 201
+    assert created.get_json()["goal"]["current"] == 80.0
+    weight, volume = response.get_json()["goals"]
+    assert weight["current"] == 100.0 and weight["achieved"] is True
+    assert volume["current"] == 1300.0 and volume["progress"] == 0.65
+    assert client.post('/goals', json={"user_id": 5001, "type": "weekly_volume"}).status_code == 400
+    assert client.post('/goals', json={"user_id": 5001, "type": "weekly_volume", "target": "nan"}).status_code == 400
+    assert client.post('/goals', json={"user_id": 5001, "type": "target_weight", "target": 100,
+                                       "exercise_id": "301"}).status_code == 400
+    assert client.get('/goals').status_code == 400
@@ -0,0 +1,126 @@
+import threading
+import time
+import pytest
+from app import routes
+from app.idempotency import IdempotencyCache, IdempotencyKeyReused
+from app.models.workout import get_workouts
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def workout(user_id, repetitions=10):
+    return {"user_id": user_id, "exercise_id": 1, "repetitions": repetitions, "date": "2024-11-20"}
+
+
+def test_retried_workout_is_logged_once(client):
+    """Test that a retry with the same key replays the first response without logging again."""
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post('/log-workout', json=workout(4001), headers=headers)
+    retry = client.post('/log-workout', json=workout(4001), headers=headers)
+    other = client.post('/log-workout', json=workout(4001), headers={"Idempotency-Key": "retry-2"})
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert other.status_code == 201
+    assert len(get_workouts(4001)) == 2
+
+
+def test_key_reused_with_different_body_is_rejected(client):
+    """Test that a key sent with another payload returns 422 instead of a mismatched replay."""
+    headers = {"Idempotency-Key": "reuse"}
+    client.post('/log-workout', json=workout(4002), headers=headers)
+    response = client.post('/log-workout', json=workout(4002, repetitions=11), headers=headers)
+
+    assert response.status_code == 422
+    assert len(get_workouts(4002)) == 1
+
+
+def test_keys_are_scoped_to_client_and_response_format(client):
+    """Test that a key is not replayed to another client or in another encoding."""
+    headers = {"Idempotency-Key": "shared"}
+    first = client.post('/log-workout', json=workout(4005), headers={**headers, "Authorization": "Bearer a"})
+    other_client = client.post('/log-workout', json=workout(4005), headers={**headers, "Authorization": "Bearer b"})
+    msgpack_retry = client.post('/log-workout', json=workout(4005),
+                                headers={**headers, "Authorization": "Bearer a", "Accept": "application/msgpack"})
+    json_retry = client.post('/log-workout', json=workout(4005), headers={**headers, "Authorization": "Bearer a"})
+
+    assert "Idempotent-Replayed" not in other_client.headers
+    assert "Idempotent-Replayed" not in msgpack_retry.headers
+    assert msgpack_retry.mimetype == "application/msgpack"
+    assert json_retry.headers["Idempotent-Replayed"] == "true"
+    assert json_retry.get_json() == first.get_json()
+    assert len(get_workouts(4005)) == 3
+
+
+def test_concurrent_duplicates_execute_once(client, monkeypatch):
+    """Test that a duplicate arriving while the original runs waits for its response."""
+    calls = []
+
+    def slow_log_workout(**kwargs):
+        calls.append(kwargs)
+        time.sleep(0.2)
+        return kwargs
+
+    monkeypatch.setattr(routes, 'log_workout', slow_log_workout)
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(
+        client.post('/log-workout', json=workout(4003), headers={"Idempotency-Key": "race"}))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [201] * 4
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 3
+
+
+def test_server_errors_are_not_replayed(client, monkeypatch):
+    """Test that a retry after a 500 runs the request again."""
+    calls = []
+
+    def flaky_log_workout(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise RuntimeError("store unavailable")
+        return kwargs
+
+    monkeypatch.setattr(routes, 'log_workout', flaky_log_workout)
+    headers = {"Idempotency-Key": "fails"}
+    failed = client.post('/log-workout', json=workout(4004), headers=headers)
+    retry = client.post('/log-workout', json=workout(4004), headers=headers)
+
+    assert failed.status_code == 500
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
+    assert len(calls) == 2
+
+
+def test_cache_stays_within_budget_and_expires():
+    """Test that the byte budget evicts the oldest responses and entries expire after the TTL."""
+    clock = FakeClock()
+    cache = IdempotencyCache(ttl=60, max_entries=100, max_bytes=2000, clock=clock)
+    for i in range(10):
+        key = ("POST", "/log-workout", f"key-{i}")
+        assert cache.begin(key, b"body", timeout=0) is None
+        cache.finish(key, 201, [("Content-Type", "application/json")], b"x" * 500)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 2000
+    assert stats["entries"] == 2
+    assert stats["evicted"] == 8
+    assert cache.begin(("POST", "/log-workout", "key-9"), b"body", timeout=0)[0] == 201
+    with pytest.raises(IdempotencyKeyReused):
+        cache.begin(("POST", "/log-workout", "key-9"), b"other", timeout=0)
+
+    clock.now = 61
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["bytes"] == 0
@@ -0,0 +1,164 @@
+import os
+import threading
+import pytest
+from app.models.journal import WorkoutJournal, decode_record, encode_record
+from app.models.retention import _unarchived_positions
+
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / "journal")
+
+
+def _log(journal, store, user_id, workout):
+    """Mirror what log_workout does with an attached journal."""
+    sequence = journal.append(user_id, workout)
+    store.setdefault(user_id, []).append(workout)
+    journal.wait_durable(sequence)
+
+
+def _workout(i, weight=50.0):
+    return {"exercise_id": 100 + i, "repetitions": 10, "weight": weight, "date": "2024-12-07", "comment": f"set {i}"}
+
+
+@pytest.mark.parametrize("user_id, workout", [
+    (1, _workout(1)),
+    (2, _workout(2, weight=0)),
+    ("user-3", _workout(3)),
+    (4, {"exercise_id": "101", "repetitions": None, "weight": 1.5, "date": "2024-12-07", "comment": ""}),
+])
+def test_records_round_trip(user_id, workout):
+    """Test that packed and JSON-fallback records decode to identical values."""
+    encoded = encode_record(user_id, workout)
+    decoded_user, decoded_workout, end = decode_record(encoded, 0)
+    assert (decoded_user, decoded_workout, end) == (user_id, workout, len(encoded))
+    assert type(decoded_workout["weight"]) is type(workout["weight"])
+
+
+def test_recovery_replays_the_journal(journal_dir):
+    """Test that every acknowledged workout is recovered after a restart."""
+    journal = WorkoutJournal(journal_dir)
+    journal.recover({})
+    journal.start()
+    store = {}
+    for i in range(50):
+        _log(journal, store, i % 5, _workout(i))
+    journal.close()
+
+    recovered = {}
+    assert WorkoutJournal(journal_dir).recover(recovered) == 50
+    assert recovered == store
+
+
+def test_recovery_combines_snapshot_and_journal_tail(journal_dir):
+    """Test that a snapshot plus the newer journal records restore the full history in order."""
+    journal = WorkoutJournal(journal_dir)
+    journal.recover({})
+    journal.start()
+    store = {}
+    for i in range(20):
+        _log(journal, store, 1, _workout(i))
+    assert journal.snapshot() == 20
+    for i in range(20, 30):
+        _log(journal, store, 1, _workout(i))
+    journal.snapshot()
+    for i in range(30, 35):
+        _log(journal, store, 1, _workout(i))
+    journal.close()
+
+    assert len([name for name in os.listdir(journal_dir) if name.startswith("snapshot-")]) == 1
+    recovered = {}
+    WorkoutJournal(journal_dir).recover(recovered)
+    assert recovered == store
+
+
+def test_snapshot_leaves_out_archived_entries(journal_dir):
+    """Test that snapshots drop archived positions and recovery can still place each entry."""
+    journal = WorkoutJournal(journal_dir)
+    journal.recover({})
+    journal.start()
+    store = {}
+    for i in range(30):
+        _log(journal, store, 1, _workout(i))
+    journal.archived_runs = lambda: {1: [(0, 10), (15, 20)]}
+    journal.snapshot()
+    for i in range(30, 40):
+        _log(journal, store, 1, _workout(i))
+    # 42 and 43 are archived by the time the snapshot asks, but were logged after it was sealed
+    journal.archived_runs = lambda: {1: [(0, 10), (15, 20), (28, 35), (42, 44)]}
+    journal.snapshot()
+    for i in range(40, 45):
+        _log(journal, store, 1, _workout(i))
+    journal.close()
+
+    recovered = {}
+    restarted = WorkoutJournal(journal_dir)
+    restarted.recover(recovered)
+
+    assert restarted.excluded_runs == {1: [(0, 10), (15, 20), (28, 35)]}
+    assert len(recovered[1]) == 45 - 22
+    positions = _unarchived_positions(restarted.excluded_runs[1])
+    assert all(entry["exercise_id"] - 100 == position for position, entry in zip(positions, recovered[1]))
+
+
+def test_snapshot_is_skipped_when_nothing_was_written(journal_dir):
+    """Test that an idle journal keeps its snapshot and segment instead of rewriting them."""
+    journal = WorkoutJournal(journal_dir)
+    journal.recover({})
+    journal.start()
+    assert journal.snapshot() == 0
+    assert not [name for name in os.listdir(journal_dir) if name.startswith("snapshot-")]
+
+    _log(journal, {}, 1, _workout(1))
+    assert journal.snapshot() == 1
+    files = sorted(os.listdir(journal_dir))
+    assert journal.snapshot() == 1
+    journal.close()
+
+    assert sorted(os.listdir(journal_dir)) == files
+    assert WorkoutJournal(journal_dir).recover({}) == 1
+
+
+def test_torn_tail_is_discarded(journal_dir):
+    """Test that a partially written record is dropped and later appends stay readable."""
+    journal = WorkoutJournal(journal_dir)
+    journal.recover({})
+    journal.start()
+    _log(journal, {}, 1, _workout(1))
+    journal.close()
+    segment = os.path.join(journal_dir, sorted(os.listdir(journal_dir))[-1])
+    with open(segment, "ab") as f:
+        f.write(b"\x40\x00\x00\x00garbage")
+
+    journal = WorkoutJournal(journal_dir)
+    assert journal.recover({}) == 1
+    journal.start()
+    _log(journal, {}, 1, _workout(2))
+    journal.close()
+
+    recovered = {}
+    assert WorkoutJournal(journal_dir).recover(recovered) == 2
+
+
+def test_concurrent_writers_share_commits(journal_dir):
+    """Test that concurrent appends are group-committed with fewer fsyncs than records."""
+    journal = WorkoutJournal(journal_dir)
+    journal.recover({})
+    journal.start()
+    store = {}
+
+    def writer(user_id):
+        for i in range(100):
+            _log(journal, store, user_id, _workout(i))
+
+    threads = [threading.Thread(target=writer, args=(user_id,)) for user_id in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+
+    assert journal.durable_sequence == 800
+    assert journal.commits < 800
+    recovered = {}
+    assert WorkoutJournal(journal_dir).recover(recovered) == 800
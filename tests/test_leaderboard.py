@@ -0,0 +1,124 @@
+import pytest
+from datetime import date
+from app import create_app
+from app.models.leaderboard import MAX_LIMIT, Leaderboards, RankedBoard
+from app.models.workout import log_workout
+
+
+TODAY = date(2024, 12, 6)
+
+
+def _workout(exercise_id, repetitions, weight, day):
+    return {"exercise_id": exercise_id, "repetitions": repetitions, "weight": weight, "date": day, "comment": ""}
+
+
+def test_ranked_board_orders_by_score_then_first_achieved():
+    """Test top-k ordering and rank lookup, with ties going to the earlier score."""
+    board = RankedBoard()
+    board.record_max("a", 100)
+    board.record_max("b", 120)
+    board.record_max("c", 100)
+    board.record_max("a", 90)  # lower than the existing best, ignored
+
+    assert [entry["user_id"] for entry in board.top(3)] == ["b", "a", "c"]
+    assert board.rank("c") == {"rank": 3, "user_id": "c", "score": 100}
+    assert board.rank("missing") is None
+
+
+def test_volume_accumulates_per_window():
+    """Test that volume sums across a week but day boards stay separate."""
+    boards = Leaderboards(today=lambda: TODAY)
+    boards.record(1, _workout(101, 10, 50.0, "2024-12-02"))
+    boards.record(1, _workout(101, 5, 60.0, "2024-12-04"))
+    boards.record(2, _workout(101, 10, 70.0, "2024-12-04"))
+
+    week = boards.query(101, metric="volume", window="week", day=date(2024, 12, 6))
+    day = boards.query(101, metric="volume", window="day", day=date(2024, 12, 2), user_id=2)
+
+    assert week["leaderboard"] == [{"rank": 1, "user_id": 1, "score": 800.0}, {"rank": 2, "user_id": 2, "score": 700.0}]
+    assert day["leaderboard"] == [{"rank": 1, "user_id": 1, "score": 500.0}]
+    assert day["user"] is None
+
+
+def test_old_buckets_expire_lazily():
+    """Test that day boards beyond the retention horizon are dropped as the days pass."""
+    today = [date(2024, 12, 2)]
+    boards = Leaderboards(retained_buckets={"day": 2}, today=lambda: today[0])
+    boards.record(1, _workout(101, 1, 50.0, "2024-12-01"))
+    boards.record(1, _workout(101, 1, 50.0, "2024-12-02"))
+    assert boards.query(101, window="day", day=date(2024, 12, 1))["leaderboard"]
+
+    today[0] = date(2024, 12, 3)
+    boards.record(1, _workout(101, 1, 50.0, "2024-12-03"))
+    boards.record(2, _workout(101, 1, 99.0, "2024-11-01"))  # older than the horizon
+
+    assert boards.query(101, window="day", day=date(2024, 12, 1))["leaderboard"] == []
+    assert boards.query(101, window="day", day=date(2024, 11, 1))["leaderboard"] == []
+    assert boards.query(101, window="all")["leaderboard"][0]["user_id"] == 2
+
+
+def test_idle_exercises_expire_on_a_later_day():
+    """Test that boards of an exercise with no new activity are dropped once they age out."""
+    today = [date(2024, 12, 2)]
+    boards = Leaderboards(retained_buckets={"day": 2, "week": 1}, today=lambda: today[0])
+    boards.record(1, _workout(101, 1, 50.0, "2024-12-02"))
+    boards.record(1, _workout(202, 1, 50.0, "2024-12-02"))
+
+    today[0] = date(2024, 12, 20)
+    boards.query(202, window="all")
+
+    assert boards.expire() == 0
+    assert set(boards._boards) == {(101, "max_weight", "all"), (101, "volume", "all"),
+                                   (202, "max_weight", "all"), (202, "volume", "all")}
+    assert boards.query(101, window="all")["leaderboard"][0]["user_id"] == 1
+
+
+def test_limit_is_validated_and_clamped():
+    """Test that a limit below 1 is rejected and a huge one is capped."""
+    boards = Leaderboards(today=lambda: TODAY)
+    for user_id in range(150):
+        boards.record(user_id, _workout(101, 1, float(user_id), "2024-12-06"))
+
+    with pytest.raises(ValueError):
+        boards.query(101, window="all", limit=0)
+    assert len(boards.query(101, window="all", limit=10 ** 9)["leaderboard"]) == MAX_LIMIT
+
+
+def test_future_dates_do_not_expire_current_boards():
+    """Test that a workout dated far ahead neither opens a board nor pushes today's boards out."""
+    boards = Leaderboards(today=lambda: TODAY)
+    boards.record(1, _workout(101, 5, 80.0, "2024-12-06"))
+    boards.record(2, _workout(101, 5, 500.0, "2099-01-01"))
+    boards.record(3, _workout(101, 5, 90.0, "2024-12-06"))
+
+    assert [entry["user_id"] for entry in boards.query(101, window="day", day=TODAY)["leaderboard"]] == [3, 1]
+    assert [entry["user_id"] for entry in boards.query(101, window="week", day=TODAY)["leaderboard"]] == [3, 1]
+    assert boards.query(101, window="day", day=date(2099, 1, 1))["leaderboard"] == []
+
+
+def test_unknown_metric_is_rejected():
+    """Test that invalid metric names raise ValueError."""
+    with pytest.raises(ValueError):
+        Leaderboards().query(101, metric="reps")
+
+
+def test_leaderboard_route_reflects_logged_workouts():
+    """Test that /leaderboard is updated by log_workout and returns a user's rank."""
+    today = date.today().isoformat()
+    log_workout(50_001, 8801, 5, 100.0, today, "")
+    log_workout(50_002, 8801, 5, 140.0, today, "")
+
+    with create_app().test_client() as client:
+        response = client.get('/leaderboard', query_string={
+            "exercise_id": 8801, "window": "week", "date": today, "user_id": 50_001})
+        invalid = client.get('/leaderboard', query_string={"exercise_id": 8801, "window": "year"})
+        no_entries = client.get('/leaderboard', query_string={"exercise_id": 8801, "limit": 0})
+        future = client.post('/log-workout', json={"user_id": 50_001, "exercise_id": 8801, "repetitions": 5,
+                                                   "weight": 900.0, "date": "2099-01-01"})
+
+    assert response.status_code == 200
+    assert response.json['leaderboard'][0] == {"rank": 1, "user_id": 50_002, "score": 140.0}
+    assert response.json['user']['rank'] == 2
+    assert invalid.status_code == 400
+    assert no_entries.status_code == 400
+    assert future.status_code == 400
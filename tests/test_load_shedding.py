@@ -0,0 +1,94 @@
+import threading
+import time
+import pytest
+import requests
+from app import create_app
+from app.load_shedding import ConcurrencyLimiter
+from config import Config
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'LOAD_SHED_MAX_IN_FLIGHT', 1)
+    monkeypatch.setattr(Config, 'LOAD_SHED_QUEUE_TIMEOUT', 0.05)
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def test_limiter_times_out_when_full():
+    """Test that a request waiting longer than the queue timeout is rejected."""
+    limiter = ConcurrencyLimiter(max_in_flight=1, queue_timeout=0.05)
+
+    assert limiter.acquire() is True
+    started = time.monotonic()
+    assert limiter.acquire() is False
+    assert time.monotonic() - started < 1
+    limiter.release(0.01)
+    assert limiter.acquire() is True
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_limiter_admits_priority_requests_first():
+    """Test that a freed slot goes to a waiting priority request before a normal one."""
+    limiter = ConcurrencyLimiter(max_in_flight=1, queue_timeout=2)
+    limiter.acquire()
+    admitted = []
+
+    def wait(is_priority):
+        if limiter.acquire(is_priority):
+            admitted.append(is_priority)
+
+    normal = threading.Thread(target=wait, args=(False,))
+    normal.start()
+    time.sleep(0.05)
+    urgent = threading.Thread(target=wait, args=(True,))
+    urgent.start()
+    time.sleep(0.05)
+
+    limiter.release(0.01)
+    urgent.join(1)
+    assert admitted == [True]
+    limiter.release(0.01)
+    normal.join(1)
+    assert admitted == [True, False]
+
+
+def test_overloaded_routes_return_503_but_health_answers(app):
+    """Test that a saturated limiter sheds API requests while liveness stays up."""
+    limiter = app.extensions['load_shedding']
+    limiter.acquire()
+    client = app.test_client()
+    try:
+        shed = client.get('/view-workouts', query_string={"user_id": 1})
+        live = client.get('/health/live')
+    finally:
+        limiter.release(0.01)
+    served = client.get('/view-workouts', query_string={"user_id": 1})
+
+    assert shed.status_code == 503
+    assert int(shed.headers['Retry-After']) >= 1
+    assert live.status_code == 200
+    assert served.status_code == 200
+
+
+def test_readiness_reports_cached_probe_results(app, monkeypatch):
+    """Test that a failing optional upstream is reported without making the app unready."""
+    def unreachable(*args, **kwargs):
+        raise requests.exceptions.ConnectionError("unreachable")
+
+    monkeypatch.setattr(requests, "get", unreachable)
+    probes = app.extensions['health_probes']
+    monkeypatch.setattr(probes, "start", lambda: None)
+    client = app.test_client()
+
+    before = client.get('/health/ready')
+    probes.run_once()
+    after = client.get('/health/ready')
+
+    assert before.status_code == 503
+    assert after.status_code == 200
+    checks = after.get_json()["checks"]
+    assert checks["database"]["ok"] is True
+    assert checks["wger"]["ok"] is False and checks["wger"]["required"] is False
@@ -0,0 +1,74 @@
+import io
+import json
+import pytest
+from app import create_app, db
+from app.commands import users_cli
+from app.models import provisioning
+from app.models.provisioning import parse_users, provision_users
+from app.models.user import User
+from config import Config
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['PROVISION_WORKERS'] = 1
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _ndjson(users):
+    return "".join(json.dumps({"username": username, "password": password}) + "\n" for username, password in users)
+
+
+def test_provision_users_skips_existing_and_repeated_usernames(app):
+    """Test that taken and repeated usernames are reported instead of failing the batch."""
+    existing = User(username="taken")
+    existing.set_password("secret")
+    db.session.add(existing)
+    db.session.commit()
+
+    users = [("alice", "pw1"), ("taken", "pw2"), ("bob", "pw3"), ("alice", "pw4"), ("carol", "pw5")]
+    result = provision_users(users, batch_size=2, workers=1)
+
+    assert result["created"] == 3
+    assert sorted(result["conflicts"]) == ["alice", "taken"]
+    alice = User.query.filter_by(username="alice").one()
+    assert alice.check_password("pw1")
+    assert User.query.filter_by(username="taken").one().check_password("secret")
+
+
+def test_provision_users_hashes_across_processes(app):
+    """Test that passwords hashed in worker processes verify like `set_password` hashes."""
+    result = provision_users([("dave", "pw1"), ("erin", "pw2")], workers=2)
+    again = provision_users([("frank", "pw3")], workers=2)
+
+    assert result["created"] == 2 and again["created"] == 1
+    assert User.query.filter_by(username="erin").one().check_password("pw2")
+    assert list(provisioning._pools) == [2]  # both runs hashed on the same spawned pool
+    assert provisioning._pools[2]._mp_context.get_start_method() == "spawn"
+
+
+def test_parse_users_reports_line_of_invalid_record():
+    """Test that a malformed record is rejected with its line number."""
+    stream = io.StringIO('{"username": "alice", "password": "pw"}\n{"username": "bob"}\n')
+    with pytest.raises(ValueError, match="line 2"):
+        list(parse_users(stream))
+
+
+def test_provision_cli(app, tmp_path):
+    """Test the `flask users provision` command and that bulk provisioning is not exposed over HTTP."""
+    provision_users([("grace", "pw2")], workers=1)
+    path = tmp_path / "users.csv"
+    path.write_text("username,password\ngrace,pw3\nivan,pw4\n")
+    result = app.test_cli_runner().invoke(users_cli, ["provision", str(path), "--format", "csv"])
+
+    assert result.exit_code == 0
+    assert "Created 1 accounts, skipped 1 existing usernames" in result.output
+    assert User.query.filter_by(username="grace").one().check_password("pw2")
+    assert app.test_client().post('/provision-users', data=_ndjson([("judy", "pw5")])).status_code == 404
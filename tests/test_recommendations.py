@@ -1,8 +1,18 @@
 import pytest
-from app.models.recommendations import fetch_exercises, save_favorite_exercise, get_favorite_exercises
+from app.circuit_breaker import breakers
+from app.models.recommendations import (fetch_catalog, fetch_exercises, save_favorite_exercise, get_favorite_exercises,
+                                        last_known_good)
 from unittest.mock import patch
 
 
+@pytest.fixture(autouse=True)
+def reset_wger_fallbacks():
+    """Clears circuit breaker state and last known good responses between tests."""
+    last_known_good.clear()
+    for breaker in breakers.values():
+        breaker.reset()
+
+
 @patch("app.models.recommendations.requests.get")
 def test_fetch_exercises_success(mock_get):
     """
@@ -32,6 +42,34 @@ def test_fetch_exercises_success(mock_get):
     assert exercises[0]["name"] == "Push-ups"
 
 
+@patch("app.models.recommendations.requests.get")
+def test_fetch_catalog_follows_next_links(mock_get):
+    """Test that the whole catalog is fetched page by page rather than only the first page."""
+    pages = [
+        {"next": "https://wger.de/api/v2/exercise/?language=2&limit=2&offset=2",
+         "results": [{"id": 1, "name": "Push-ups"}, {"id": 2, "name": "Squats"}]},
+        {"next": None, "results": [{"id": 3, "name": "Lunges"}]},
+    ]
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.side_effect = pages
+
+    exercises = fetch_catalog()
+
+    assert [exercise["id"] for exercise in exercises] == [1, 2, 3]
+    assert exercises.stale_age is None
+    assert mock_get.call_args_list[1].kwargs["params"] == {"language": "2", "limit": "2", "offset": "2"}
+
+
+@patch("app.models.recommendations.requests.get")
+def test_fetch_catalog_is_empty_when_a_page_fails(mock_get):
+    """Test that a partial catalog is never returned, so a refresh cannot mistake it for removals."""
+    first = {"next": "https://wger.de/api/v2/exercise/?language=2&limit=1&offset=1", "results": [{"id": 1}]}
+    mock_get.return_value.status_code = 200
+    mock_get.return_value.json.side_effect = [first, Exception("connection reset")]
+
+    assert fetch_catalog() == []
+
+
 @patch("app.models.recommendations.requests.get")
 def test_fetch_exercises_failure(mock_get):
     """
@@ -97,3 +135,29 @@ def test_get_favorite_exercises():
     # Check for a user with no favorites
     empty_favorites = get_favorite_exercises(2)  # User ID 2 has no favorites
     assert empty_favorites == []
+
+
+def test_concurrent_save_favorite_exercise_keeps_one_copy():
+    """
+    Stress test duplicate detection when many threads save the same favorites.
+
+    Every thread tries to save the same set of exercises for one user; each exercise
+    must end up exactly once.
+    """
+    import threading
+
+    user_id = 30_000
+    barrier = threading.Barrier(16)
+
+    def saver():
+        barrier.wait()
+        for exercise_id in range(200):
+            save_favorite_exercise(user_id, exercise_id, f"Exercise {exercise_id}")
+
+    threads = [threading.Thread(target=saver) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(f["exercise_id"] for f in get_favorite_exercises(user_id)) == list(range(200))
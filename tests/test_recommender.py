@@ -0,0 +1,157 @@
+import time
+import pytest
+from app import create_app
+from app.models.recommendations import ExerciseList
+from app.models.recommender import CooccurrenceIndex, index, personalized_recommendations
+from app.models.workout import log_workout
+from app.models.recommendations import remove_favorite_exercise, save_favorite_exercise
+from unittest.mock import patch
+from config import Config
+
+
+@pytest.fixture
+def populated_index():
+    idx = CooccurrenceIndex(neighbors=5)
+    # Bench press and push-ups are done together far more often than with squats
+    for user_id in range(10):
+        idx.observe(user_id, "bench")
+        idx.observe(user_id, "pushup")
+    for user_id in range(10, 13):
+        idx.observe(user_id, "bench")
+        idx.observe(user_id, "squat")
+    return idx
+
+
+def test_recommend_ranks_most_co_occurring_exercise_first(populated_index):
+    """Test that recommendations follow co-occurrence and exclude seen exercises."""
+    populated_index.observe(99, "bench")
+
+    recommendations = populated_index.recommend(99, limit=2)
+
+    assert [exercise_id for exercise_id, _ in recommendations] == ["pushup", "squat"]
+
+
+def test_index_updates_incrementally(populated_index):
+    """Test that a new interaction updates neighbor lists without a rebuild."""
+    assert [other for _, other in populated_index.neighbors_of("deadlift")] == []
+
+    populated_index.observe(0, "deadlift")
+
+    assert "deadlift" in [other for _, other in populated_index.neighbors_of("bench")]
+    assert populated_index.recommend(1, limit=5)[0][0] == "deadlift"
+
+
+def test_repeated_interaction_is_counted_once(populated_index):
+    """Test that logging the same exercise again does not inflate co-occurrence."""
+    before = populated_index.neighbors_of("bench")
+    populated_index.observe(0, "pushup")
+    assert populated_index.neighbors_of("bench") == before
+
+
+def test_forget_undoes_an_interaction(populated_index):
+    """Test that forgetting the only interaction removes the exercise's co-occurrences."""
+    populated_index.observe(99, "bench")
+    populated_index.observe(99, "deadlift")
+    populated_index.observe(0, "deadlift")
+    populated_index.observe(0, "deadlift")  # logged twice, so one forget leaves it seen
+
+    populated_index.forget(99, "deadlift")
+    populated_index.forget(0, "deadlift")
+
+    assert "deadlift" in populated_index.seen(0)
+    assert "deadlift" not in populated_index.seen(99)
+    assert [other for _, other in populated_index.neighbors_of("deadlift")] == ["pushup", "bench"]
+    assert populated_index.recommend(99, limit=1)[0][0] == "pushup"
+
+
+def test_refresh_builds_lists_off_the_lock(populated_index, monkeypatch):
+    """Test that refresh does not hold the index lock while building, and keeps writes made meanwhile."""
+    original = populated_index._similar
+    held = []
+
+    def similar(exercise_id, item_users, row):
+        held.append(populated_index._lock.locked())
+        if exercise_id == "bench" and len(held) == 1:
+            populated_index.observe(50, "bench")
+            populated_index.observe(50, "squat")
+        return original(exercise_id, item_users, row)
+
+    monkeypatch.setattr(populated_index, "_similar", similar)
+    assert populated_index.refresh() == 3
+
+    assert not any(held)
+    assert "bench" in populated_index._dirty
+    assert dict((other, similarity) for similarity, other in populated_index.neighbors_of("bench"))["squat"] == \
+        pytest.approx(4 / (14 * 4) ** 0.5)
+
+
+def test_removed_favorite_leaves_the_index():
+    """Test that removing a favorite is reflected in recommendations via the signal."""
+    save_favorite_exercise(40_011, 7011, "Rows")
+    save_favorite_exercise(40_011, 7012, "Curls")
+    remove_favorite_exercise(40_011, 7012)
+
+    assert index.seen(40_011) == {7011}
+
+
+def test_workouts_and_favorites_feed_the_index():
+    """Test that log_workout and save_favorite_exercise update the shared index via signals."""
+    log_workout(40_001, 7001, 10, 50.0, "2024-12-07", "")
+    save_favorite_exercise(40_001, 7002, "Rows")
+    log_workout(40_002, 7001, 10, 50.0, "2024-12-07", "")
+
+    assert [exercise["id"] for exercise in personalized_recommendations(40_002, limit=1)] == [7002]
+
+
+def test_fallback_fills_from_catalog_without_seen_exercises():
+    """Test that the catalog tops up short personalized lists, skipping known exercises."""
+    index.observe(40_003, 7101)
+    catalog = [{"id": 7101, "name": "Seen"}, {"id": 7102, "name": "New"}]
+
+    assert personalized_recommendations(40_003, limit=5, catalog=catalog) == [{"id": 7102, "name": "New"}]
+
+
+def test_catalog_filters_and_hydrates_personalized_exercises():
+    """Test that only exercises in the (filtered) catalog are recommended, as catalog entries with a score."""
+    for user_id in (40_021, 40_022):
+        index.observe(user_id, 7301)
+        index.observe(user_id, 7302)
+    index.observe(40_022, 7303)
+    index.observe(40_023, 7301)
+    catalog = [{"id": 7303, "name": "Dumbbell row", "category": 12}, {"id": 7304, "name": "Other", "category": 12}]
+
+    exercises = personalized_recommendations(40_023, limit=2, catalog=catalog)
+
+    assert [exercise["id"] for exercise in exercises] == [7303, 7304]
+    assert exercises[0]["name"] == "Dumbbell row" and exercises[0]["score"] > 0
+    assert "score" not in exercises[1]
+
+
+@patch("app.routes.fetch_exercises")
+def test_recommendations_route_personalizes_for_user(mock_fetch_exercises):
+    """Test that /recommendations?user_id= ranks the catalog fetched with the request's filters."""
+    mock_fetch_exercises.return_value = ExerciseList([{"id": 7201, "name": "Squat"}, {"id": 7202, "name": "Lunge"}])
+    log_workout(40_011, 7201, 10, 50.0, "2024-12-07", "")
+    log_workout(40_011, 7202, 10, 50.0, "2024-12-07", "")
+    log_workout(40_012, 7201, 10, 50.0, "2024-12-07", "")
+
+    with create_app().test_client() as client:
+        response = client.get('/recommendations', query_string={"user_id": 40_012, "limit": 1, "category": 9})
+
+    assert response.status_code == 200
+    assert [(exercise["id"], exercise["name"]) for exercise in response.json['exercises']] == [(7202, "Lunge")]
+    assert response.json['exercises'][0]["score"] > 0
+    mock_fetch_exercises.assert_called_once_with(category="9", equipment=None)
+
+
+def test_index_refresh_is_scheduled(monkeypatch):
+    """Test that RECOMMENDER_REFRESH_INTERVAL schedules the neighbor list rebuild on the task runner."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'RECOMMENDER_REFRESH_INTERVAL', 0.01)
+    runner = create_app().extensions["tasks"]
+
+    time.sleep(0.1)
+    assert runner.stats()["periodic"] == ["recommender.refresh"]
+    runner.shutdown(timeout=5)
+
+    assert runner.stats()["completed"] >= 1
@@ -0,0 +1,197 @@
+from datetime import date, timedelta
+import pytest
+from app import create_app
+from app.models import retention, workout
+from app.models.retention import RetentionEngine, WorkoutArchive
+from app.models.transfer import export_workouts
+from app.models.workout import get_daily_summaries, get_workouts, iter_workouts, log_workout, workout_logs
+
+TODAY = date(2024, 12, 31)
+
+
+def _log_days(user_id, first, days, per_day=2):
+    for offset in range(days):
+        day = (first + timedelta(days=offset)).isoformat()
+        for _ in range(per_day):
+            log_workout(user_id, 101, 10, 50.0, day, "")
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # The tests log history relative to a fixed TODAY, so plain queries read the whole archive
+    engine = RetentionEngine(WorkoutArchive(str(tmp_path)), raw_days=30, summary_days=60, min_rows=10, window_days=0)
+    monkeypatch.setattr(workout, "retention", engine)
+    return engine
+
+
+def test_sweep_archives_aged_prefix_and_queries_merge_it(engine, monkeypatch):
+    """Test that aged entries leave memory but are still returned when the range reaches them."""
+    workout_logs.pop(70_001, None)
+    _log_days(70_001, TODAY - timedelta(days=99), 100)
+
+    archived = engine.sweep(TODAY)
+    reads = []
+    original_read = retention._read_segment
+    monkeypatch.setattr(retention, "_read_segment", lambda path: reads.append(path) or original_read(path))
+
+    assert archived == 138
+    assert len(workout_logs[70_001]) == 62
+    assert len(get_workouts(70_001)) == 200
+    assert len(get_workouts(70_001, start_date="2024-09-23", end_date="2024-09-24")) == 4
+    assert get_workouts(70_001, start_date="2024-12-30") == workout_logs[70_001][-4:]
+    assert len(reads) == 2  # the last query starts after the archived segment and never opens it
+
+
+def test_export_streams_archived_segments_lazily(engine, monkeypatch):
+    """Test that exports merge archived rows back in without loading whole segments or the hot list."""
+    workout_logs.pop(70_008, None)
+    log_workout(70_008, 101, 1, 50.0, TODAY.isoformat(), "")
+    _log_days(70_008, TODAY - timedelta(days=99), 40)
+    log_workout(70_008, 101, 2, 50.0, TODAY.isoformat(), "")
+    logged = list(workout_logs[70_008])
+    engine.sweep(TODAY)
+    monkeypatch.setattr(workout, "ITER_CHUNK_ROWS", 1)
+    monkeypatch.setattr(retention, "_read_segment", lambda path: pytest.fail("segment read whole"))
+    monkeypatch.setattr(workout, "get_workouts", lambda *args, **kwargs: pytest.fail("history copied whole"))
+
+    assert list(iter_workouts(70_008)) == logged
+    assert list(iter_workouts(70_008, start_date="2024-09-23", end_date="2024-09-23")) == logged[1:3]
+    assert "".join(export_workouts(70_008, "ndjson")).count("\n") == 82
+
+
+def test_iteration_restarts_when_a_sweep_archives_mid_export(engine, monkeypatch):
+    """Test that entries archived while an export is running are neither skipped nor repeated."""
+    workout_logs.pop(70_009, None)
+    _log_days(70_009, TODAY - timedelta(days=99), 40)
+    log_workout(70_009, 101, 2, 50.0, TODAY.isoformat(), "")
+    logged = list(workout_logs[70_009])
+    monkeypatch.setattr(workout, "ITER_CHUNK_ROWS", 10)
+
+    rows = iter_workouts(70_009)
+    head = [next(rows) for _ in range(15)]
+    engine.sweep(TODAY)
+
+    assert head + list(rows) == logged
+
+
+def test_sweep_archives_aged_entries_logged_after_recent_ones(engine):
+    """Test that history imported after a recent workout is archived and merged back in insertion order."""
+    workout_logs.pop(70_006, None)
+    log_workout(70_006, 101, 1, 50.0, TODAY.isoformat(), "")
+    _log_days(70_006, TODAY - timedelta(days=99), 40)  # 80 aged entries
+    log_workout(70_006, 101, 2, 50.0, TODAY.isoformat(), "")
+    logged = list(workout_logs[70_006])
+
+    assert engine.sweep(TODAY) == 80
+    assert [entry["repetitions"] for entry in workout_logs[70_006]] == [1, 2]
+    assert get_workouts(70_006) == logged
+    assert get_workouts(70_006, start_date="2024-09-23", end_date="2024-09-23") == logged[1:3]
+
+
+def test_unparseable_dates_stay_hot_without_stopping_the_sweep(engine, tmp_path):
+    """Test that a malformed row is skipped and the recovered history is trimmed around it."""
+    workout_logs.pop(70_007, None)
+    malformed = {"exercise_id": 101, "repetitions": 3, "weight": 50.0, "date": "07/12/2024", "comment": ""}
+    workout_logs[70_007] = [malformed]
+    _log_days(70_007, TODAY - timedelta(days=99), 20)
+    recovered = {70_007: list(workout_logs[70_007])}
+
+    assert engine.sweep(TODAY) == 40
+    assert workout_logs[70_007] == [malformed]
+    assert len(get_workouts(70_007)) == 41
+
+    restarted = RetentionEngine(WorkoutArchive(str(tmp_path)), raw_days=30, summary_days=60, min_rows=10)
+    restarted.archive.load()
+    assert restarted.trim_recovered(recovered) == 40
+    assert recovered[70_007] == [malformed]
+
+
+def test_queries_without_start_date_read_only_the_archive_window(engine, monkeypatch):
+    """Test that an unbounded query does not decompress archived history older than `window_days`."""
+    workout_logs.pop(70_010, None)
+    _log_days(70_010, date.today() - timedelta(days=399), 400)
+    engine.window_days = 100
+    engine.sweep()
+    reads = []
+    original_read = retention._read_segment
+    monkeypatch.setattr(retention, "_read_segment", lambda path: reads.append(path) or original_read(path))
+
+    window_start = (date.today() - timedelta(days=100)).isoformat()
+    recent = get_workouts(70_010)
+    assert len(recent) == 202
+    assert min(entry["date"] for entry in recent) == window_start
+    assert len(get_workouts(70_010, start_date="2000-01-01")) == 800
+    assert len(list(iter_workouts(70_010))) == 800
+
+
+def test_sweep_includes_users_spilled_to_disk(engine, tmp_path, monkeypatch):
+    """Test that aged entries of a user evicted from memory are archived too."""
+    from app.models.eviction import ColdStore
+
+    workout_logs.pop(70_011, None)
+    _log_days(70_011, TODAY - timedelta(days=99), 20)
+    logged = list(workout_logs[70_011])
+    cold_store = ColdStore(str(tmp_path / "spill"), 0, workout_logs, workout.user_locks)
+    monkeypatch.setattr(workout, "eviction", cold_store)
+    cold_store.account(70_011)
+    cold_store.enforce()
+    assert 70_011 not in workout_logs
+
+    assert engine.sweep(TODAY) == 40
+    assert engine.archive.archived_count(70_011) == 40
+    assert get_workouts(70_011) == logged
+
+
+def test_sweep_waits_for_min_rows(engine):
+    """Test that fewer than `min_rows` aged entries stay in memory."""
+    workout_logs.pop(70_002, None)
+    _log_days(70_002, TODAY - timedelta(days=40), 4)
+
+    assert engine.sweep(TODAY) == 0
+    assert len(workout_logs[70_002]) == 8
+
+
+def test_daily_summaries_span_every_tier(engine):
+    """Test that summaries combine sidecars, in-memory summaries and hot entries."""
+    workout_logs.pop(70_003, None)
+    _log_days(70_003, date.today() - timedelta(days=99), 100)
+    engine.sweep()
+
+    summaries = get_daily_summaries(70_003)
+
+    assert len(summaries) == 100
+    assert all(summary["sets"] == 2 and summary["volume"] == 1000.0 for summary in summaries)
+    assert len(engine.daily_summaries[70_003]) == 30  # days 60 to 31 ago; older ones only in sidecars
+    assert [s["date"] for s in get_daily_summaries(70_003, start_date=summaries[5]["date"],
+                                                   end_date=summaries[6]["date"])] == \
+        [summaries[5]["date"], summaries[6]["date"]]
+
+
+def test_restart_restores_summaries_and_trims_recovered_entries(engine, tmp_path):
+    """Test that a new engine over the same archive resumes where the old one stopped."""
+    workout_logs.pop(70_004, None)
+    _log_days(70_004, date.today() - timedelta(days=49), 50)
+    engine.sweep()
+    recovered = {70_004: [{"exercise_id": 101, "repetitions": 10, "weight": 50.0,
+                           "date": (date.today() - timedelta(days=49 - day)).isoformat(), "comment": ""}
+                          for day in range(50) for _ in range(2)]}
+
+    restarted = RetentionEngine(WorkoutArchive(str(tmp_path)), raw_days=30, summary_days=60, min_rows=10)
+    restarted.archive.load()
+
+    assert restarted.restore_summaries() == 19
+    assert restarted.trim_recovered(recovered) == 38
+    assert recovered[70_004] == workout_logs[70_004]
+
+
+def test_view_workouts_daily_summary():
+    """Test the `summary=daily` view of /view-workouts."""
+    workout_logs.pop(70_005, None)
+    log_workout(70_005, 101, 10, 50.0, "2024-12-07", "")
+    log_workout(70_005, 101, 5, 60.0, "2024-12-07", "")
+
+    response = create_app().test_client().get('/view-workouts',
+                                              query_string={"user_id": 70_005, "summary": "daily"})
+
+    assert response.get_json()["summaries"] == [{"date": "2024-12-07", "exercise_id": 101, "sets": 2,
+                                                 "repetitions": 15, "volume": 800.0, "max_weight": 60.0}]
@@ -0,0 +1,83 @@
+import pytest
+from app import create_app
+from app.models.search import ExerciseSearchIndex, exercise_index, tokenize
+from unittest.mock import patch
+
+CATALOG = [
+    {"id": 1, "name": "Bench Press", "description": "<p>Lie on a flat bench and press the barbell.</p>"},
+    {"id": 2, "name": "Incline Dumbbell Press", "description": "Press dumbbells on an incline bench."},
+    {"id": 3, "name": "Squats", "description": "Leg exercise with a barbell."},
+    {"id": 4, "name": "Benchmark Plank", "description": "Core exercise."},
+]
+
+
+@pytest.fixture
+def index():
+    idx = ExerciseSearchIndex()
+    idx.upsert(CATALOG)
+    return idx
+
+
+def test_tokenize_strips_html_and_case():
+    """Test that markup is removed and tokens are lowercased."""
+    assert tokenize("<p>Bench PRESS</p>") == ["bench", "press"]
+
+
+def test_name_matches_rank_above_description_matches(index):
+    """Test that an exercise named after the term outranks one mentioning it in passing."""
+    results = index.search("bench", prefix=False)
+    assert [result["id"] for result in results][:2] == [1, 2]
+
+
+def test_prefix_autocomplete(index):
+    """Test that the last term matches as a prefix."""
+    assert {result["id"] for result in index.search("squ")} == {3}
+    assert 4 in {result["id"] for result in index.search("bench")}
+    assert 4 not in {result["id"] for result in index.search("bench", prefix=False)}
+
+
+def test_fuzzy_matching_handles_typos(index):
+    """Test that misspelled terms fall back to trigram matches."""
+    assert index.search("dumbell")[0]["id"] == 2
+
+
+def test_upsert_only_reindexes_changed_exercises(index):
+    """Test incremental rebuilds when the catalog changes."""
+    assert index.upsert(CATALOG) == 0
+    changed = [{"id": 3, "name": "Front Squats", "description": "Leg exercise."}]
+
+    assert index.upsert(changed) == 1
+    assert index.search("front")[0]["id"] == 3
+    assert index.search("barbell", prefix=False)[0]["id"] == 1
+
+
+def test_remove_drops_unused_tokens(index):
+    """Test that removing the only exercise with a term makes it unsearchable."""
+    index.remove(3)
+    assert index.search("squats") == []
+
+
+def test_reconcile_removes_exercises_missing_from_the_catalog(index):
+    """Test that a refresh against the complete catalog drops exercises wger no longer lists."""
+    changed = [{"id": 3, "name": "Front Squats", "description": "Leg exercise."}]
+
+    assert index.reconcile(CATALOG[:2] + changed) == (1, 1)
+    assert len(index) == 3
+    assert index.search("plank") == []
+    assert index.search("front")[0]["id"] == 3
+
+
+@patch("app.routes.fetch_catalog")
+def test_search_route_returns_ranked_results(mock_fetch_catalog):
+    """Test the /search-exercises endpoint against the shared index."""
+    exercise_index.clear()
+    exercise_index.upsert(CATALOG)
+
+    with create_app().test_client() as client:
+        response = client.get('/search-exercises', query_string={"q": "bench", "limit": 2, "prefix": "false"})
+        missing = client.get('/search-exercises')
+
+    assert response.status_code == 200
+    assert [result["id"] for result in response.json['results']] == [1, 2]
+    assert missing.status_code == 400
+    mock_fetch_catalog.assert_not_called()
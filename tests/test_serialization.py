@@ -0,0 +1,71 @@
+import datetime
+import pytest
+from app import create_app
+from app.caching import response_cache
+from app.models.workout import log_workout
+from app.serialization import NegotiatingJSONProvider, OrjsonProvider, MSGPACK_MIMETYPE, orjson
+
+msgpack = pytest.importorskip("msgpack")
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    response_cache.clear()
+    return app
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_provider_is_used_when_installed(app):
+    """Test that create_app picks orjson when it is available."""
+    assert isinstance(app.json, OrjsonProvider)
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_provider_matches_stdlib_output(app):
+    """Test that both providers produce identical compact, sorted output."""
+    payload = {"b": [1, 2.5, "x"], "a": {"date": datetime.date(2024, 12, 7)}, "c": None}
+    assert OrjsonProvider(app).dumps(payload, separators=(",", ":")) == \
+        NegotiatingJSONProvider(app).dumps(payload, separators=(",", ":"))
+
+
+def test_view_workouts_negotiates_msgpack(app):
+    """Test that Accept: application/msgpack returns a MessagePack body."""
+    log_workout(601, 101, 10, 20.5, "2024-12-07", "Good session")
+
+    with app.test_client() as client:
+        response = client.get('/view-workouts', query_string={"user_id": 601},
+                              headers={'Accept': MSGPACK_MIMETYPE})
+        json_response = client.get('/view-workouts', query_string={"user_id": 601})
+
+    assert response.mimetype == MSGPACK_MIMETYPE
+    assert msgpack.unpackb(response.data)['workouts'][0]['exercise_id'] == 101
+    assert json_response.get_json()['workouts'][0]['exercise_id'] == 101
+
+
+def test_log_workout_accepts_msgpack_body(app):
+    """Test that write routes parse MessagePack request bodies."""
+    body = msgpack.packb({"user_id": 602, "exercise_id": 101, "repetitions": 5,
+                          "weight": 80.0, "date": "2024-12-07"})
+
+    with app.test_client() as client:
+        response = client.post('/log-workout', data=body, content_type=MSGPACK_MIMETYPE)
+
+    assert response.status_code == 201
+    assert response.get_json()['workout']['weight'] == 80.0
+
+
+def test_falls_back_to_stdlib_json_without_optional_packages(monkeypatch):
+    """Test that the app still serves JSON when orjson and msgpack are not installed."""
+    monkeypatch.setattr("app.serialization.orjson", None)
+    monkeypatch.setattr("app.serialization.msgpack", None)
+    app = create_app()
+    log_workout(603, 101, 10, 20.5, "2024-12-07", "")
+
+    response = app.test_client().get('/view-workouts', query_string={"user_id": 603},
+                                     headers={'Accept': MSGPACK_MIMETYPE})
+
+    assert type(app.json) is NegotiatingJSONProvider
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['workouts'][0]['exercise_id'] == 101
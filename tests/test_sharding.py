@@ -0,0 +1,184 @@
+import os
+import stat
+import threading
+from multiprocessing.connection import Listener
+import pytest
+from app import create_app
+from app.models import changelog, recommendations, team, workout
+from app.sharding import AUTHKEY_FILE, HashRing, ShardClient, ShardCluster, ShardUnavailable, _shard_operations
+from config import Config
+from app.signals import workout_logged
+
+
+@pytest.fixture
+def cluster(tmp_path, monkeypatch):
+    cluster = ShardCluster(str(tmp_path), b"test-key")
+    router = cluster.start(2)
+    monkeypatch.setattr(workout, "router", router)
+    monkeypatch.setattr(recommendations, "router", router)
+    monkeypatch.setattr(changelog, "router", router)
+    monkeypatch.setattr(team, "router", router)
+    yield cluster
+    cluster.stop()
+
+
+def test_hash_ring_moves_only_users_of_the_new_shard():
+    """Test that growing the ring moves about 1/N of the users, all to the new shard."""
+    before, after = HashRing(4), HashRing(5)
+    moved = [user_id for user_id in range(10_000) if before.owner(user_id) != after.owner(user_id)]
+
+    assert all(after.owner(user_id) == 4 for user_id in moved)
+    assert 1000 < len(moved) < 3000
+    assert {before.owner(user_id) for user_id in range(1000)} == {0, 1, 2, 3}
+
+
+def test_store_functions_route_to_owning_shard(cluster):
+    """Test that workouts and favorites are stored in the shards, not in this process."""
+    received = []
+
+    def receiver(sender, user_id, workout, **extra):
+        received.append(user_id)
+
+    workout_logged.connect(receiver)
+    try:
+        for user_id in range(20):
+            workout.log_workout(user_id, 101, 10, 50.0, "2024-12-07", "")
+        workout.log_workouts(3, [{"exercise_id": 102, "repetitions": 5, "weight": 80.0,
+                                  "date": "2024-12-08", "comment": ""}])
+        recommendations.save_favorite_exercise(3, 7, "Squat")
+    finally:
+        workout_logged.disconnect(receiver)
+
+    assert 3 not in workout.workout_logs
+    assert len(workout.get_workouts(3)) == 2
+    assert workout.get_workouts(3, start_date="2024-12-08") == [
+        {"exercise_id": 102, "repetitions": 5, "weight": 80.0, "date": "2024-12-08", "comment": ""}]
+    assert workout.get_workout_version(3) == 2
+    assert recommendations.get_favorite_exercises(3)[0]["name"] == "Squat"
+    assert recommendations.save_favorite_exercise(3, 7, "Squat") == {"message": "Exercise already exists in favorites"}
+    assert set(received) >= set(range(20))
+    with pytest.raises(ValueError):
+        workout.get_workouts(3, start_date="not-a-date")
+
+
+def test_resize_rebalances_users(cluster):
+    """Test that growing and shrinking the cluster keeps every user's data reachable."""
+    for user_id in range(50):
+        workout.log_workout(user_id, 101, user_id, 50.0, "2024-12-07", "")
+    recommendations.save_favorite_exercise(1, 7, "Squat")
+
+    moved_up = cluster.resize(3)
+    after_grow = [workout.get_workouts(user_id)[0]["repetitions"] for user_id in range(50)]
+    moved_down = cluster.resize(1)
+
+    assert 0 < moved_up < 50
+    assert after_grow == list(range(50))
+    assert moved_down > 0
+    assert len(cluster) == 1
+    assert [workout.get_workouts(user_id)[0]["repetitions"] for user_id in range(50)] == list(range(50))
+    assert workout.get_workout_version(10) == 1
+    assert recommendations.get_favorite_exercises(1)[0]["exercise_id"] == 7
+
+
+def test_sync_and_removal_run_in_the_owning_shard(cluster):
+    """Test that the change log lives next to the user's data in its shard."""
+    workout.log_workout(5, 101, 10, 50.0, "2024-12-07", "")
+    recommendations.save_favorite_exercise(5, 7, "Squat")
+    first = changelog.get_changes(5)
+
+    assert recommendations.remove_favorite_exercise(5, 7) is True
+    assert recommendations.remove_favorite_exercise(5, 7) is False
+    delta = changelog.get_changes(5, first["version"], first["epoch"])
+
+    assert first["resync"] is True and first["version"] == 2
+    assert first["epoch"] != changelog.EPOCH  # issued by the shard process
+    assert [(change["type"], change["op"]) for change in delta["changes"]] == [("favorite", "delete")]
+    assert 5 not in changelog.changelog._sequences
+
+
+def test_cursors_from_before_a_move_resync_when_the_user_returns():
+    """Test that a user's change sequence moves with them, so an A -> B -> A move can't revive a cursor."""
+    operations = _shard_operations()
+    workout.workout_logs.pop(60_101, None)
+    changelog.changelog.drop(60_101)
+    workout.log_workout(60_101, 101, 10, 50.0, "2024-12-07", "")
+    cursor = changelog.get_changes(60_101)
+
+    state = operations["export_users"]([60_101])
+    operations["drop_users"]([60_101])
+    operations["import_users"](state)
+    unchanged = changelog.get_changes(60_101, cursor["version"], cursor["epoch"])
+
+    state = operations["export_users"]([60_101])
+    operations["drop_users"]([60_101])
+    state[60_101]["change_version"] += 1  # written to while on another shard
+    operations["import_users"](state)
+    returned = changelog.get_changes(60_101, cursor["version"], cursor["epoch"])
+
+    assert unchanged["resync"] is False and unchanged["changes"] == []
+    assert returned["resync"] is True and returned["version"] == cursor["version"] + 1
+
+
+def test_team_query_asks_each_shard_once(cluster, monkeypatch):
+    """Test that a team query is split by shard and reassembled in request order."""
+    for user_id in range(10):
+        workout.log_workout(user_id, 101, user_id, 50.0, "2024-12-07", "")
+    calls = []
+    for client in cluster.router.clients:
+        monkeypatch.setattr(client, "call", lambda operation, *args, call=client.call: calls.append(operation)
+                            or call(operation, *args))
+
+    result = team.get_team_workouts(list(reversed(range(10))), exercise_id=101)
+
+    assert list(result) == list(reversed(range(10)))
+    assert [entries[0]["repetitions"] for entries in result.values()] == list(reversed(range(10)))
+    assert calls == ["get_team_workouts", "get_team_workouts"]
+    assert 3 not in workout.workout_logs
+
+
+def test_cluster_key_is_private_to_the_socket_directory(cluster, tmp_path):
+    """Test that the socket directory and the stored key are only accessible to their owner."""
+    assert stat.S_IMODE(os.stat(tmp_path).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(tmp_path / AUTHKEY_FILE).st_mode) == 0o600
+    assert (tmp_path / AUTHKEY_FILE).read_bytes() == b"test-key"
+
+
+def test_unresponsive_shard_times_out(tmp_path):
+    """Test that a shard that accepts a call but never replies fails the call instead of blocking it."""
+    address = str(tmp_path / "hung.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=b"test-key")
+    accepted = []
+    threading.Thread(target=lambda: accepted.append(listener.accept()), daemon=True).start()
+    client = ShardClient(address, b"test-key", timeout=0.2)
+
+    with pytest.raises(ShardUnavailable):
+        client.call("get_workouts", 1, None, None)
+    with pytest.raises(ShardUnavailable):
+        ShardClient(str(tmp_path / "missing.sock"), b"test-key").call("get_workouts", 1, None, None)
+    listener.close()
+
+
+def test_unavailable_shard_is_reported_as_503(monkeypatch):
+    """Test that routes answer 503 with Retry-After while the user's shard is unreachable."""
+    class DownRouter:
+        def call(self, user_id, operation, *args):
+            raise ShardUnavailable("shard 0 did not answer")
+
+    monkeypatch.setattr(workout, "router", DownRouter())
+    response = create_app().test_client().get('/view-workouts', query_string={"user_id": 1})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+@pytest.mark.parametrize("authkey", ["", "dev"])
+def test_workers_refuse_to_connect_without_a_private_key(tmp_path, monkeypatch, authkey):
+    """Test that SHARD_SPAWN=0 needs a configured or stored key that is not the default."""
+    monkeypatch.setattr(Config, 'SHARD_COUNT', 1)
+    monkeypatch.setattr(Config, 'SHARD_SPAWN', False)
+    monkeypatch.setattr(Config, 'SHARD_SOCKET_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'SHARD_AUTHKEY', authkey)
+    monkeypatch.setattr(workout, "router", None)
+
+    with pytest.raises(RuntimeError):
+        create_app()
@@ -0,0 +1,82 @@
+import pytest
+from app.models.changelog import ChangeLog
+from app.models.workout import log_workout, log_workouts
+from config import Config
+
+
+def _entry(n):
+    return {"exercise_id": 1, "repetitions": n, "weight": 50.0, "date": "2024-12-02", "comment": ""}
+
+
+def test_change_log_returns_changes_after_a_version():
+    """Test per-user sequences, the compaction horizon and cursors ahead of the log."""
+    log = ChangeLog(max_changes=3)
+    for n in range(5):
+        log.record(1, "workout", "add", {"n": n})
+    log.record(2, "favorite", "add", {"n": 0})
+
+    version, changes = log.since(1, 3)
+    assert version == 5
+    assert [(change["seq"], change["data"]["n"]) for change in changes] == [(4, 3), (5, 4)]
+    assert [change["seq"] for change in log.since(1, 2)[1]] == [3, 4, 5]
+    assert log.since(1, 1) is None  # behind the horizon
+    assert log.since(1, 6) is None  # ahead of the log
+    assert log.since(1, 5) == (5, [])
+    assert log.since(2, 0)[0] == 1
+
+
+def test_adopted_sequences_never_go_back():
+    """Test that a user's sequence continues from the process it came from without reusing numbers."""
+    log = ChangeLog()
+    for n in range(5):
+        log.record(1, "workout", "add", {"n": n})
+
+    log.adopt(1, 3)
+    assert log.version(1) == 5 and log.since(1, 4) is None
+    log.adopt(2, 7)
+    assert log.record(2, "favorite", "add", {"n": 0}) == 8
+    assert log.users() == {1, 2}
+
+
+def test_sync_returns_only_new_changes(client):
+    """Test a first full sync followed by incremental syncs with adds and deletes."""
+    for n in range(3):
+        log_workout(7001, 1, n, 50.0, "2024-12-02", "")
+    first = client.get('/sync', query_string={"user_id": 7001}).get_json()
+
+    client.post('/log-workout', json={"user_id": 7001, "exercise_id": 2, "repetitions": 8, "date": "2024-12-03"})
+    client.post('/favorites', json={"user_id": 7001, "exercise_id": 9, "name": "Squat"})
+    deleted = client.delete('/favorites', query_string={"user_id": 7001, "exercise_id": 9})
+    cursor = {"user_id": 7001, "since": first["version"], "epoch": first["epoch"]}
+    delta = client.get('/sync', query_string=cursor).get_json()
+    empty = client.get('/sync', query_string={**cursor, "since": delta["version"]}).get_json()
+
+    assert first["resync"] is True
+    assert first["version"] == 3
+    assert [workout["repetitions"] for workout in first["workouts"]] == [0, 1, 2]
+    assert deleted.status_code == 200
+    assert delta["resync"] is False
+    assert delta["version"] == 6
+    assert [(c["seq"], c["type"], c["op"]) for c in delta["changes"]] == [
+        (4, "workout", "add"), (5, "favorite", "add"), (6, "favorite", "delete")]
+    assert delta["changes"][2]["data"] == {"exercise_id": 9}
+    assert empty["changes"] == []
+    assert client.delete('/favorites', query_string={"user_id": 7001, "exercise_id": 9}).status_code == 404
+
+
+def test_sync_falls_back_to_full_resync(client):
+    """Test that a compacted or foreign cursor gets the full state."""
+    log_workout(7002, 1, 1, 50.0, "2024-12-02", "")
+    first = client.get('/sync', query_string={"user_id": 7002}).get_json()
+    log_workouts(7002, [_entry(n) for n in range(Config.SYNC_MAX_CHANGES + 1)])
+
+    compacted = client.get('/sync', query_string={"user_id": 7002, "since": first["version"],
+                                                  "epoch": first["epoch"]}).get_json()
+    restarted = client.get('/sync', query_string={"user_id": 7002, "since": compacted["version"],
+                                                  "epoch": "stale"}).get_json()
+
+    assert compacted["resync"] is True
+    assert len(compacted["workouts"]) == Config.SYNC_MAX_CHANGES + 2
+    assert compacted["version"] == Config.SYNC_MAX_CHANGES + 2
+    assert restarted["resync"] is True
+    assert client.get('/sync').status_code == 400
@@ -0,0 +1,202 @@
+import threading
+import time
+import pytest
+from flask import Flask
+from app import create_app
+from app.models import recommendations
+from app.models.recommendations import ExerciseList
+from app.models.search import exercise_index
+from app.tasks import TASKS, LocalBroker, TaskQueueFull, TaskRunner, defer, task
+from config import Config
+
+
+@pytest.fixture
+def runner():
+    runner = TaskRunner(Flask(__name__), LocalBroker(max_size=100), workers=1, backoff=0.01)
+    yield runner
+    runner.shutdown(timeout=5)
+
+
+@pytest.fixture
+def calls():
+    calls = []
+    task("test.record")(lambda *args: calls.append(args))
+    yield calls
+    TASKS.pop("test.record", None)
+
+
+def test_local_broker_orders_by_priority_then_submission():
+    """Test that lower priorities come out first and equal priorities keep their order."""
+    broker = LocalBroker(max_size=3)
+    for n, priority in enumerate((5, 1, 5)):
+        broker.put({"id": n, "priority": priority})
+
+    with pytest.raises(TaskQueueFull):
+        broker.put({"id": 3, "priority": 0})
+    assert [broker.get(timeout=0)["id"] for _ in range(3)] == [1, 0, 2]
+    assert broker.get(timeout=0.01) is None
+
+
+def test_tasks_run_by_priority_and_drain(runner, calls):
+    """Test that queued tasks run in priority order and drain waits for all of them."""
+    gate = threading.Event()
+    task("test.block")(gate.wait)
+    try:
+        runner.submit("test.block")
+        time.sleep(0.05)  # the only worker is now blocked
+        runner.submit("test.record", ("low",), priority=9)
+        runner.submit("test.record", ("high",), priority=0)
+        assert not runner.drain(timeout=0.05)
+        gate.set()
+        assert runner.drain(timeout=5)
+    finally:
+        TASKS.pop("test.block")
+
+    assert calls == [("high",), ("low",)]
+    assert runner.stats()["completed"] == 3
+
+
+def test_failed_tasks_are_retried_with_exponential_backoff(runner):
+    """Test that a task is retried until it succeeds, waiting longer before each retry."""
+    attempts = []
+
+    @task("test.flaky", retries=3)
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            raise ValueError("not yet")
+
+    try:
+        runner.backoff = 0.05
+        runner.submit("test.flaky")
+        assert runner.drain(timeout=5)
+    finally:
+        TASKS.pop("test.flaky")
+
+    assert len(attempts) == 3
+    assert attempts[1] - attempts[0] >= 0.05 and attempts[2] - attempts[1] >= 0.1
+    stats = runner.stats()
+    assert stats["retried"] == 2 and stats["failed"] == 0 and stats["completed"] == 1
+
+
+def test_tasks_out_of_retries_are_counted_as_failed(runner, calls):
+    """Test that a task failing every attempt is given up on without stopping the worker."""
+    task("test.broken", retries=1)(lambda: 1 / 0)
+    try:
+        runner.submit("test.broken")
+        runner.submit("test.record", ("after",))
+        assert runner.drain(timeout=5)
+    finally:
+        TASKS.pop("test.broken")
+
+    assert calls == [("after",)]
+    assert runner.stats()["failed"] == 1 and runner.stats()["retried"] == 1
+
+
+def test_periodic_tasks_repeat_until_shutdown(runner, calls):
+    """Test that a scheduled task runs every interval and stops with the runner."""
+    runner.schedule("test.record", 0.02, args=("tick",), delay=0)
+    time.sleep(0.2)
+    assert runner.stats()["periodic"] == ["test.record"]
+    assert runner.shutdown(timeout=5)
+    runs = len(calls)
+
+    time.sleep(0.05)
+    assert 3 <= runs == len(calls)
+    with pytest.raises(RuntimeError):
+        runner.submit("test.record")
+
+
+def test_shutdown_runs_queued_and_delayed_tasks(runner, calls):
+    """Test that shutdown drains the queue and does not wait out task delays."""
+    runner.submit("test.record", ("queued",))
+    runner.submit("test.record", ("delayed",), delay=60)
+    assert runner.stats()["scheduled"] == 1
+
+    started = time.monotonic()
+    assert runner.shutdown(timeout=5)
+    assert time.monotonic() - started < 2
+    assert sorted(calls) == [("delayed",), ("queued",)]
+
+
+def test_unknown_tasks_are_rejected(runner):
+    """Test that only registered tasks can be submitted."""
+    with pytest.raises(ValueError):
+        runner.submit("test.missing")
+
+
+def test_defer_runs_inline_without_a_runner_or_room_in_the_queue(calls):
+    """Test that deferred work is never dropped."""
+    defer("test.record", "no app")
+    app = Flask(__name__)
+    app.extensions["tasks"] = TaskRunner(app, LocalBroker(max_size=0), workers=1)
+    with app.app_context():
+        defer("test.record", "full")
+
+    assert calls == [("no app",), ("full",)]
+    assert app.extensions["tasks"].stats()["rejected"] == 1
+
+
+def test_fetched_catalog_is_indexed_in_the_background(monkeypatch):
+    """Test that a request fetching the catalog returns before its exercises are indexed."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    app = create_app()
+    runner = app.extensions["tasks"]
+    monkeypatch.setattr(recommendations, "fetch_wger", lambda endpoint, params: (
+        {"results": [{"id": 7101, "name": "Zercher squat", "description": ""}]}, None))
+    exercise_index.clear()
+
+    with app.test_request_context():
+        recommendations.fetch_exercises()
+    assert runner.drain(timeout=5)
+
+    assert [result["id"] for result in exercise_index.search("zercher")] == [7101]
+    assert runner.stats()["completed"] == 1
+    assert app.test_client().get('/metrics').get_json()["tasks"]["completed"] == 1
+    runner.shutdown(timeout=5)
+
+
+def test_catalog_refresh_is_scheduled_and_retried(monkeypatch):
+    """Test that CATALOG_REFRESH_INTERVAL fetches the catalog at startup, retrying while wger is down."""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'CATALOG_REFRESH_INTERVAL', 3600)
+    monkeypatch.setattr(Config, 'TASK_RETRY_BACKOFF', 0.01)
+    results = [ExerciseList(), ExerciseList([{"id": 1}])]
+    monkeypatch.setattr(recommendations, "fetch_catalog", lambda: results.pop(0))
+    runner = create_app().extensions["tasks"]
+
+    deadline = time.monotonic() + 5
+    while results and time.monotonic() < deadline:
+        time.sleep(0.01)
+    runner.shutdown(timeout=5)
+
+    assert results == []
+    assert runner.stats()["retried"] == 1 and runner.stats()["failed"] == 0
+
+
+def test_periodic_maintenance_is_scheduled_on_the_runner(runner, tmp_path, monkeypatch):
+    """Test that retention sweeps and health probes run as periodic tasks instead of their own threads."""
+    from app.health import HealthProbes
+    from app.models import workout
+    from app.models.retention import init_retention
+
+    monkeypatch.setattr(workout, "retention", None)
+    monkeypatch.setattr(workout, "journal", None)
+    app = runner.app
+    app.config.update(WORKOUT_ARCHIVE_DIR=str(tmp_path / "archive"), WORKOUT_RETENTION_INTERVAL=3600)
+    app.extensions["tasks"] = runner
+    probes = HealthProbes(interval=3600, runner=runner)
+    app.extensions["health_probes"] = probes
+    probes.register("always", lambda: None)
+    threads = threading.active_count()
+
+    init_retention(app)
+    ready, _ = probes.status()
+    deadline = time.monotonic() + 5
+    while not ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+        ready, _ = probes.status()
+
+    assert ready
+    assert runner.stats()["periodic"] == ["health.probe", "retention.sweep"]
+    assert threading.active_count() <= threads + runner.workers + 1  # workers and the timer thread
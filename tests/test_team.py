@@ -0,0 +1,63 @@
+import pytest
+from app.models.team import get_team_workouts, merge_by_date, team_totals
+from app.models.workout import log_workouts, workout_logs
+
+
+def _entry(exercise_id, repetitions, weight, date):
+    return {"exercise_id": exercise_id, "repetitions": repetitions, "weight": weight, "date": date, "comment": ""}
+
+
+@pytest.fixture
+def team():
+    for user_id in (8101, 8102, 8103):
+        workout_logs.pop(user_id, None)
+    log_workouts(8101, [_entry(1, 10, 50.0, "2024-05-03"), _entry(2, 5, 80.0, "2024-05-01")])
+    log_workouts(8102, [_entry(1, 8, 60.0, "2024-05-01"), _entry(1, 8, 60.0, "2024-05-09")])
+    return [8101, 8102, 8103]
+
+
+def test_team_query_filters_every_user_in_one_pass(team):
+    """Test date and exercise filters, users without workouts and duplicate IDs."""
+    result = get_team_workouts(team + [8101], start_date="2024-05-01", end_date="2024-05-05", exercise_id=1)
+
+    assert list(result) == [8101, 8102, 8103]
+    assert [entry["date"] for entry in result[8101]] == ["2024-05-03"]
+    assert [entry["date"] for entry in result[8102]] == ["2024-05-01"]
+    assert result[8103] == []
+    with pytest.raises(ValueError):
+        get_team_workouts(team, start_date="05/01/2024")
+
+
+def test_merge_by_date_and_totals(team):
+    """Test the k-way merge order and both aggregations."""
+    result = get_team_workouts(team)
+    merged = merge_by_date(result)
+    totals = team_totals(result, by="user")
+    daily = team_totals(result, by="daily")["summaries"]
+
+    assert [(entry["date"], entry["user_id"]) for entry in merged] == [
+        ("2024-05-01", 8101), ("2024-05-01", 8102), ("2024-05-03", 8101), ("2024-05-09", 8102)]
+    assert totals["users"][0] == {"user_id": 8101, "sets": 2, "repetitions": 15, "volume": 900.0,
+                                  "max_weight": 80.0}
+    assert totals["users"][2]["sets"] == 0
+    assert totals["team"] == {"sets": 4, "repetitions": 31, "volume": 1860.0, "max_weight": 80.0}
+    assert [(s["date"], s["exercise_id"], s["sets"]) for s in daily] == [
+        ("2024-05-01", 1, 1), ("2024-05-01", 2, 1), ("2024-05-03", 1, 1), ("2024-05-09", 1, 1)]
+
+
+def test_team_workouts_route(client, team):
+    """Test the grouped, merged and aggregated responses and request validation."""
+    query = {"user_id": team, "start_date": "2024-05-01"}
+    grouped = client.get('/team-workouts', query_string=query).get_json()
+    merged = client.get('/team-workouts', query_string={**query, "order": "date"}).get_json()
+    totals = client.get('/team-workouts', query_string={**query, "aggregate": "user"}).get_json()
+
+    assert [(user["user_id"], len(user["workouts"])) for user in grouped["users"]] == [(8101, 2), (8102, 2), (8103, 0)]
+    assert [entry["user_id"] for entry in merged["workouts"]] == [8101, 8102, 8101, 8102]
+    assert totals["team"]["sets"] == 4
+    assert client.get('/team-workouts').status_code == 400
+    assert client.get('/team-workouts', query_string={**query, "order": "size"}).status_code == 400
+    assert client.get('/team-workouts', query_string={**query, "end_date": "May 9"}).status_code == 400
+    assert client.get('/team-workouts', query_string={"user_id": list(range(1000))}).status_code == 400
+    client.application.config['TEAM_MAX_USERS'] = 2
+    assert client.get('/team-workouts', query_string=query).status_code == 400
@@ -0,0 +1,105 @@
+import json
+import pytest
+from app import create_app, db
+from app.circuit_breaker import CircuitBreaker, breakers
+from app.models import recommendations
+from app.tracing import InMemoryExporter, JsonlExporter, Tracer, span
+from config import Config
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setattr(Config, 'TRACE_EXPORTER', 'memory')
+    monkeypatch.setattr(Config, 'TRACE_SAMPLE_RATE', 1.0)
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _spans(app):
+    return app.extensions['tracer'].exporter.spans
+
+
+def test_login_trace_covers_queries_hashing_and_serialization(app):
+    """Test that a sampled request records child spans under one request span."""
+    client = app.test_client()
+    client.post('/create-account', json={"username": "traced", "password": "secret"})
+    _spans(app).clear()
+
+    response = client.post('/login', json={"username": "traced", "password": "secret"})
+    spans = _spans(app)
+    root = spans[-1]
+
+    assert root["name"] == "POST /login"
+    assert root["parent_id"] is None
+    assert root["attributes"]["http.status_code"] == 200
+    assert response.headers["traceresponse"] == f"00-{root['trace_id']}-{root['span_id']}-01"
+    assert {s["trace_id"] for s in spans} == {root["trace_id"]}
+    children = {s["name"]: s for s in spans if s["parent_id"] == root["span_id"]}
+    assert {"db.query", "user.check_password", "serialize"} <= set(children)
+    assert "SELECT" in children["db.query"]["attributes"]["statement"]
+    assert children["user.check_password"]["duration_ms"] > 0
+    assert all(s["duration_ms"] <= root["duration_ms"] for s in spans)
+
+
+def test_incoming_traceparent_is_continued_and_propagated_to_wger(app, monkeypatch):
+    """Test W3C traceparent handling on the way in and out."""
+    sent_headers = []
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"results": [{"id": 1, "name": "Push-ups"}]}
+
+    def fake_get(url, headers=None, **kwargs):
+        sent_headers.append(headers)
+        return FakeResponse()
+
+    monkeypatch.setattr(recommendations.requests, "get", fake_get)
+    monkeypatch.setitem(breakers, "wger:exercise", CircuitBreaker("wger:exercise"))
+    monkeypatch.setattr(recommendations, "last_known_good", recommendations.LastKnownGood())
+    client = app.test_client()
+    client.get('/recommendations', query_string={"category": 11},
+               headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-01"})
+
+    root = _spans(app)[-1]
+    call = next(s for s in _spans(app) if s["name"] == "wger.get")
+    assert root["trace_id"] == TRACE_ID
+    assert root["parent_id"] == "00f067aa0ba902b7"
+    assert call["parent_id"] == root["span_id"]
+    assert call["attributes"]["http.status_code"] == 200
+    assert sent_headers[-1]["traceparent"] == f"00-{TRACE_ID}-{call['span_id']}-01"
+
+    _spans(app).clear()
+    unsampled = client.get('/health', headers={"traceparent": f"00-{TRACE_ID}-00f067aa0ba902b7-00"})
+    assert _spans(app) == []
+    assert "traceresponse" not in unsampled.headers
+
+
+def test_sampling_rate_and_noop_spans_outside_requests():
+    """Test that unsampled traces and code outside a request record nothing."""
+    tracer = Tracer(InMemoryExporter(), sample_rate=0.0)
+    assert tracer.start_trace("GET /") is None
+    assert Tracer(InMemoryExporter(), sample_rate=1.0).start_trace("GET /").root is True
+    with span("orphan") as orphan:
+        assert orphan is None
+
+
+def test_jsonl_exporter_appends_one_line_per_span(tmp_path):
+    """Test the file exporter's format."""
+    exporter = JsonlExporter(str(tmp_path / "traces" / "spans.jsonl"))
+    tracer = Tracer(exporter, sample_rate=1.0)
+    root = tracer.start_trace("GET /health")
+    root.end()
+    exporter.close()
+
+    lines = (tmp_path / "traces" / "spans.jsonl").read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["GET /health"]
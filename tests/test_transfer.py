@@ -0,0 +1,162 @@
+import gzip
+import io
+import pytest
+from app import create_app
+from app.commands import workouts_cli
+from app.models import workout
+from app.models.journal import WorkoutJournal
+from app.models.transfer import InvalidRow, export_workouts, import_workouts, parse_rows
+from app.models.workout import get_workouts, log_workout, workout_logs
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def test_export_and_import_round_trip():
+    """Test that exported history imports back unchanged in both formats."""
+    workout_logs.pop(60_001, None)
+    log_workout(60_001, 101, 10, 50.0, "2024-12-07", "Felt strong, \"PR\"")
+    log_workout(60_001, 102, 8, 0, "2024-12-08", "")
+
+    for fmt, target in (("csv", 60_002), ("ndjson", 60_003)):
+        workout_logs.pop(target, None)
+        exported = "".join(export_workouts(60_001, fmt))
+        assert import_workouts(target, parse_rows(io.StringIO(exported), fmt)) == 2
+        assert get_workouts(target) == get_workouts(60_001)
+
+
+def test_export_is_chunked(monkeypatch):
+    """Test that large exports are yielded in several chunks rather than one blob."""
+    monkeypatch.setattr("app.models.transfer.CHUNK_SIZE", 256)
+    workout_logs.pop(60_004, None)
+    for i in range(50):
+        log_workout(60_004, 101, 10, 50.0, "2024-12-07", "")
+
+    chunks = list(export_workouts(60_004, "ndjson"))
+
+    assert len(chunks) > 1
+    assert "".join(chunks).count("\n") == 50
+
+
+def test_parse_rows_reports_line_of_invalid_row():
+    """Test that malformed rows raise ValueError naming the line."""
+    body = io.StringIO("exercise_id,repetitions,weight,date,comment\n101,10,50,2024-12-07,\nx,1,1,2024-12-07,\n")
+    with pytest.raises(ValueError, match="line 3"):
+        list(parse_rows(body, "csv"))
+
+
+def test_import_route_accepts_gzip_body(app):
+    """Test streaming import of a gzip-compressed NDJSON upload."""
+    workout_logs.pop(60_005, None)
+    body = b"".join(b'{"exercise_id": %d, "repetitions": 5, "weight": 40.0, "date": "2024-12-07"}\n' % i
+                    for i in range(20))
+
+    with app.test_client() as client:
+        response = client.post('/import-workouts', query_string={"user_id": 60_005}, data=gzip.compress(body),
+                               headers={'Content-Encoding': 'gzip', 'Content-Type': 'application/x-ndjson'})
+
+    assert response.status_code == 201
+    assert response.json['imported'] == 20
+    assert len(get_workouts(60_005)) == 20
+
+
+def test_import_route_reports_rows_stored_before_an_invalid_one(app):
+    """Test that a failing upload keeps every row before the invalid one and says where to resume."""
+    workout_logs.pop(60_010, None)
+    rows = ['{"exercise_id": 101, "repetitions": 5, "weight": 40.0, "date": "2024-12-07"}'] * 5
+    rows.insert(3, '{"exercise_id": 101, "repetitions": -1, "weight": 40.0, "date": "2024-12-07"}')
+
+    response = app.test_client().post('/import-workouts', query_string={"user_id": 60_010},
+                                      data="\n".join(rows), headers={'Content-Type': 'application/x-ndjson'})
+
+    assert response.status_code == 400
+    assert response.json["line"] == 4
+    assert response.json["imported"] == 3
+    assert len(get_workouts(60_010)) == 3
+
+
+def test_import_keeps_the_partial_batch_before_an_invalid_row():
+    """Test that rows of an unfinished batch are stored when a later row fails."""
+    workout_logs.pop(60_011, None)
+    body = "exercise_id,repetitions,weight,date,comment\n" + "101,10,50,2024-12-07,\n" * 5 + "x,1,1,2024-12-07,\n"
+
+    with pytest.raises(InvalidRow) as excinfo:
+        import_workouts(60_011, parse_rows(io.StringIO(body), "csv"), batch_size=2)
+
+    assert (excinfo.value.line, excinfo.value.imported) == (7, 5)
+    assert len(get_workouts(60_011)) == 5
+
+
+def test_export_route_streams_csv_download(app):
+    """Test that the export endpoint streams an attachment, optionally gzipped."""
+    workout_logs.pop(60_006, None)
+    log_workout(60_006, 101, 10, 50.0, "2024-12-07", "")
+
+    client = app.test_client()
+    plain = client.get('/export-workouts', query_string={"user_id": 60_006, "format": "csv"})
+    zipped = client.get('/export-workouts', query_string={"user_id": 60_006, "format": "csv", "compress": "gzip"})
+    invalid = client.get('/export-workouts', query_string={"user_id": 60_006, "format": "xml"})
+
+    assert plain.is_streamed
+    assert plain.mimetype == 'text/csv'
+    assert plain.data.decode().splitlines() == ["exercise_id,repetitions,weight,date,comment", "101,10,50.0,2024-12-07,"]
+    assert gzip.decompress(zipped.data) == plain.data
+    assert invalid.status_code == 400
+
+
+@pytest.mark.parametrize("body, fmt", [
+    ('{"exercise_id": 101, "repetitions": 5, "date": "2024-12-07"}\n{"exercise_id": 101, "repetitions": "5", '
+     '"date": "2024-12-07"}\n', "ndjson"),
+    ("exercise_id,repetitions,weight,date,comment\n101,10,50,2024-12-07,\n101,10,-5,2024-12-07,\n", "csv"),
+    ("exercise_id,repetitions,weight,date,comment\n101,10,50,2024-12-07,\n101,10,nan,2024-12-07,\n", "csv"),
+    ("exercise_id,repetitions,weight,date,comment\n101,10,50,2024-12-07,\n101,10,50,07/12/2024,\n", "csv"),
+])
+def test_parse_rows_validates_like_log_workout(body, fmt):
+    """Test that imported rows are held to the same checks as /log-workout."""
+    with pytest.raises(ValueError, match="line 2" if fmt == "ndjson" else "line 3"):
+        list(parse_rows(io.StringIO(body), fmt))
+
+
+def test_cli_requires_a_journal(app, tmp_path, monkeypatch):
+    """Test that the `flask workouts` commands refuse to run against a server's memory."""
+    monkeypatch.setattr(workout, "journal", None)
+    result = app.test_cli_runner().invoke(workouts_cli, ["export", "60007", str(tmp_path / "out.ndjson")])
+
+    assert result.exit_code != 0
+    assert "WORKOUT_JOURNAL_DIR" in result.output
+
+
+def test_journal_directory_is_locked(tmp_path):
+    """Test that a second journal cannot claim a directory until the first is closed."""
+    first = WorkoutJournal(str(tmp_path))
+    first.lock()
+    with pytest.raises(RuntimeError, match="in use"):
+        WorkoutJournal(str(tmp_path)).lock()
+
+    first.close()
+    WorkoutJournal(str(tmp_path)).lock()
+
+
+def test_cli_export_and_import(app, tmp_path, monkeypatch):
+    """Test the `flask workouts` commands against gzip files."""
+    journal = WorkoutJournal(str(tmp_path / "journal"))
+    journal.recover({})
+    journal.start()
+    monkeypatch.setattr(workout, "journal", journal)
+    workout_logs.pop(60_007, None)
+    workout_logs.pop(60_008, None)
+    log_workout(60_007, 101, 10, 50.0, "2024-12-07", "")
+    path = str(tmp_path / "history.ndjson.gz")
+    runner = app.test_cli_runner()
+
+    assert runner.invoke(workouts_cli, ["export", "60007", path]).exit_code == 0
+    result = runner.invoke(workouts_cli, ["import", "60008", path])
+
+    assert result.exit_code == 0
+    assert "Imported 1 workouts" in result.output
+    assert get_workouts(60_008) == get_workouts(60_007)
+    journal.close()
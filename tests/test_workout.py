@@ -56,3 +56,71 @@ def test_get_workouts():
     filtered_workouts = get_workouts(user_id, start_date="2024-12-08")
     assert len(filtered_workouts) == 1
     assert filtered_workouts[0]["exercise_id"] == 102
+
+
+def test_concurrent_log_workout_loses_no_writes():
+    """
+    Stress test concurrent logging from many threads.
+
+    Threads write to a small set of shared users while readers take snapshots,
+    so first inserts and appends for the same user race against each other.
+
+    Asserts:
+        - Every workout logged is present afterwards.
+        - Per-user versions match the number of entries.
+    """
+    import threading
+    from app.models.workout import workout_versions
+
+    users = [10_000 + u for u in range(4)]
+    for user_id in users:
+        workout_logs.pop(user_id, None)
+        workout_versions.pop(user_id, None)
+    threads, per_thread = 16, 500
+    barrier = threading.Barrier(threads + 1)
+
+    def writer(t):
+        barrier.wait()
+        for i in range(per_thread):
+            log_workout(users[(t + i) % len(users)], 101, 10, 50.0, "2024-12-07", "")
+
+    def reader():
+        barrier.wait()
+        for _ in range(per_thread):
+            for user_id in users:
+                get_workouts(user_id)
+
+    workers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    workers.append(threading.Thread(target=reader))
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert sum(len(workout_logs[user_id]) for user_id in users) == threads * per_thread
+    for user_id in users:
+        assert workout_versions[user_id] == len(workout_logs[user_id])
+
+
+def test_get_workouts_returns_a_snapshot():
+    """
+    Test that readers get a copy that later writes do not modify.
+    """
+    workout_logs.pop(20_000, None)
+    log_workout(20_000, 101, 10, 50.0, "2024-12-07", "")
+    snapshot = get_workouts(20_000)
+    log_workout(20_000, 102, 10, 50.0, "2024-12-08", "")
+
+    assert len(snapshot) == 1
+    assert len(get_workouts(20_000)) == 2
+
+
+@pytest.mark.parametrize("field, value", [("date", "2024-13-01"), ("date", "2099-01-01"), ("date", None),
+                                          ("repetitions", "10"), ("repetitions", -1), ("weight", "heavy")])
+def test_log_workout_rejects_invalid_fields(field, value):
+    """Test that malformed or future workouts are rejected before they are stored."""
+    fields = {"exercise_id": 101, "repetitions": 10, "weight": 50.0, "date": "2024-12-07", "comment": ""}
+    fields[field] = value
+    with pytest.raises(ValueError):
+        log_workout(user_id=20_500, **fields)
+    assert 20_500 not in workout_logs